@@ -0,0 +1,133 @@
+"""
+Datasets of the analytics requests
+
+Every feature of a request, a column of an attribute data table, is read in
+chunks and averaged over time buckets of the configured resolution. Only
+the running sums and counts of the buckets are kept between chunks, so the
+memory used grows with the length of the period analysed divided by the
+resolution and not with the number of readings. The features are then
+aligned on their buckets and the missing values handled with the strategy of
+the request.
+"""
+from collections import namedtuple
+from typing import Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+from analysis.missing_values import MissingValuePipeline
+
+DEFAULT_RESOLUTION = '1H'
+TARGET = 'y'
+NO_FILTER = (None, '', 'None')
+
+Feature = namedtuple('Feature', ['table', 'column', 'filters'])
+
+
+def feature_name(feature: Feature) -> str:
+    """
+    Name of the column of a feature in a dataset
+    :param feature: Feature
+    :return: <table>.<column>
+    """
+    return '{}.{}'.format(feature.table, feature.column)
+
+
+def parse_filters(filters: Union[str, None]) -> Union[list, None]:
+    """
+    Parse the filter values stored with a requested column
+    :param filters: Comma separated values
+    :return: The values or None when the column is not filtered
+    """
+    if filters in NO_FILTER:
+        return None
+    return [value.strip() for value in filters.split(',')]
+
+
+class BucketMeans(object):
+    """
+    Running means of a feature over time buckets
+    """
+
+    def __init__(self, resolution: str = DEFAULT_RESOLUTION) -> None:
+        """
+        :param resolution: Size of the time buckets, a pandas frequency
+        """
+        self.resolution = resolution
+        self.sums = pd.Series(dtype=float)
+        self.counts = pd.Series(dtype=float)
+
+    def add(self, timestamps: pd.Series, values: pd.Series) -> None:
+        """
+        Add a chunk of readings. Values that are not numeric are ignored
+        :param timestamps: Time stamps of the readings
+        :param values: Values of the readings
+        """
+        values = pd.to_numeric(values, errors='coerce').replace(
+            [np.inf, -np.inf], np.nan)
+        buckets = pd.to_datetime(timestamps).dt.floor(self.resolution)
+        grouped = values.groupby(buckets.values)
+        self.sums = self.sums.add(grouped.sum(), fill_value=0)
+        self.counts = self.counts.add(grouped.count(), fill_value=0)
+
+    def means(self) -> pd.Series:
+        """
+        :return: Mean of every bucket, NaN for buckets without numeric values
+        """
+        counts = self.counts.replace(0, np.nan)
+        return (self.sums / counts).sort_index()
+
+
+def bucket_means(chunks: Iterable[pd.DataFrame], column: str,
+                 filters: Union[list, None] = None,
+                 resolution: str = DEFAULT_RESOLUTION) -> pd.Series:
+    """
+    Average a column of readings read in chunks over time buckets
+    :param chunks: DataFrames with the api_timestamp column and column
+    :param column: Column averaged
+    :param filters: Values of the column the readings are restricted to, all
+                    readings when None
+    :param resolution: Size of the time buckets
+    :return: Mean of the column by bucket
+    """
+    means = BucketMeans(resolution)
+    for chunk in chunks:
+        if filters is not None:
+            chunk = chunk[chunk[column].astype(str).isin(filters)]
+        if len(chunk):
+            means.add(chunk['api_timestamp'], chunk[column])
+    return means.means()
+
+
+def align(features: {str: pd.Series}, timeseries: bool,
+          resolution: str = DEFAULT_RESOLUTION) -> pd.DataFrame:
+    """
+    Align features on their time buckets
+    :param features: Bucket means by feature name
+    :param timeseries: Whether the dataset is a time series, whose buckets
+                       without any reading are kept as missing values
+    :param resolution: Size of the time buckets
+    :return: One row per bucket, one column per feature
+    """
+    dataset = pd.DataFrame(features)
+    if timeseries and len(dataset):
+        dataset = dataset.reindex(pd.date_range(
+            dataset.index.min(), dataset.index.max(), freq=resolution))
+    return dataset
+
+
+def handle_missing_values(dataset: pd.DataFrame, strategy: str,
+                          default: float = 0.0) -> pd.DataFrame:
+    """
+    Remove or fill the missing values of a dataset. Rows whose values are
+    still missing once filled, such as the leading rows of a forward fill,
+    are removed
+    :param dataset: Dataset
+    :param strategy: remove, mean, median, forward fill, backward fill,
+                     default or interpolate, in time between the buckets
+    :param default: Value filled in by the default strategy
+    :return: Dataset without missing values
+    :raise ValueError: when the strategy is unknown
+    """
+    return MissingValuePipeline(strategy, value=default).transform(
+        dataset).dropna(axis=0)
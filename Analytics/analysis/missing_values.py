@@ -0,0 +1,380 @@
+"""
+Typed, vectorised handling of missing values
+
+FillMissingValues and MissingValues replace blank strings with a regular
+expression over every cell of the dataset before each fill. The pipeline
+below coerces the columns of a chunk once instead: columns holding numbers
+become float arrays, columns listed as datetimes datetime arrays, and blank
+strings are mapped to NaN / NaT during the coercion. Columns holding text
+keep their values, only their blanks become missing.
+
+Missing values are then removed or filled with the mean, the median, the
+previous or next value, a default value or by interpolating linearly in
+time. Readings of several sensors in one dataset are filled per sensor by
+grouping them on the by column.
+
+Chunks read in sequence, e.g. from AttributeDataStore.iter_frames, are
+processed by stream. The last values of every group are carried over
+between chunks by the forward fill, the rows at the end of a chunk waiting
+for a value are held back until the next chunks provide it by the backward
+fill and the interpolation. The mean and the median are computed over every
+chunk: fit them with partial_fit in a first pass over the chunks.
+
+    pipeline = MissingValuePipeline('interpolate', by='s_id',
+                                    time='api_timestamp')
+    for chunk in pipeline.stream(chunks):
+        ...
+"""
+from typing import Any, Iterable, Iterator, Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+REMOVE = 'remove'
+MEAN = 'mean'
+MEDIAN = 'median'
+FORWARD_FILL = 'forward fill'
+BACKWARD_FILL = 'backward fill'
+DEFAULT = 'default'
+INTERPOLATE = 'interpolate'
+STRATEGIES = (REMOVE, MEAN, MEDIAN, FORWARD_FILL, BACKWARD_FILL, DEFAULT,
+              INTERPOLATE)
+
+
+def blanks(column: pd.Series) -> np.ndarray:
+    """
+    Find the blank strings of a column
+    :param column: Column
+    :return: Mask of the empty or whitespace only strings
+    """
+    if column.dtype != object:
+        return np.zeros(len(column), dtype=bool)
+    return column.str.strip().eq('').values
+
+
+def coerce_column(column: pd.Series, datetime: bool = False) -> pd.Series:
+    """
+    Coerce a column to a typed array, blank strings becoming missing values
+    :param column: Column
+    :param datetime: Whether the column holds datetimes
+    :return: The datetime column, the numeric column or, for a column holding
+             text, the column with its blanks replaced by NaN
+    """
+    if datetime:
+        if is_datetime64_any_dtype(column):
+            return column
+        # blanks, like any value that is not a datetime, become NaT
+        return pd.to_datetime(column, errors='coerce')
+    if column.dtype != object:
+        return column
+
+    numeric = pd.to_numeric(column, errors='coerce')
+    failed = numeric.isna().values & column.notna().values
+    if not failed.any():
+        return numeric
+    # only the values that are not numbers are searched for blanks
+    blank = np.zeros(len(column), dtype=bool)
+    blank[failed] = blanks(column[failed])
+    if blank[failed].all():
+        return numeric
+    return column.where(~blank)
+
+
+def coerce(frame: pd.DataFrame, datetimes: Iterable[str] = (),
+           skip: Iterable[str] = ()) -> pd.DataFrame:
+    """
+    Coerce the columns of a DataFrame to typed arrays
+    :param frame: DataFrame
+    :param datetimes: Columns holding datetimes
+    :param skip: Columns left as they are, such as identifiers
+    :return: The coerced DataFrame
+    """
+    datetimes, skip = set(datetimes), set(skip)
+    coerced = frame.copy(deep=False)
+    for column in frame.columns:
+        if column not in skip:
+            coerced[column] = coerce_column(frame[column],
+                                            column in datetimes)
+    return coerced
+
+
+class MissingValuePipeline(object):
+    """
+    Remove or fill the missing values of a dataset, at once or chunk by chunk
+    """
+
+    def __init__(self, strategy: str, value: Any = 0.0, by: str = None,
+                 time: str = None, datetimes: Iterable[str] = ()) -> None:
+        """
+        :param strategy: remove, mean, median, forward fill, backward fill,
+                         default or interpolate
+        :param value: Value filled in by the default strategy
+        :param by: Column grouping the rows filled together, such as s_id
+        :param time: Column holding the time of the rows, the index is used
+                     by the interpolation when None
+        :param datetimes: Other columns holding datetimes
+        :raise ValueError: when the strategy is unknown
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError('Unknown missing values strategy {}'.format(
+                strategy))
+        self.strategy = strategy
+        self.value = value
+        self.by = by
+        self.time = time
+        self.datetimes = set(datetimes) | ({time} if time else set())
+        self._sums = None
+        self._counts = None
+        self._values = []
+        self._carry = None
+        self._context = None
+        self._pending = None
+
+    def coerce(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Coerce the columns of a chunk to typed arrays
+        :param frame: Chunk
+        :return: The coerced chunk
+        """
+        return coerce(frame, self.datetimes, [self.by] if self.by else [])
+
+    def transform(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Remove or fill the missing values of a whole dataset
+        :param frame: Dataset
+        :return: The dataset, rows that could not be filled keep their
+                 missing values
+        """
+        return self._fill(self.coerce(frame))
+
+    def partial_fit(self, frame: pd.DataFrame) -> 'MissingValuePipeline':
+        """
+        Add a chunk to the means or medians filled in by stream
+        :param frame: Chunk
+        :return: The pipeline
+        """
+        if self.strategy not in (MEAN, MEDIAN):
+            return self
+        frame = self.coerce(frame)
+        keys = self._keys(frame)
+        values = frame[self._columns(frame, numeric=True)]
+        if self.strategy == MEDIAN:
+            self._values.append(values.set_index(pd.Index(keys)))
+            return self
+
+        grouped = values.groupby(keys)
+        sums, counts = grouped.sum(), grouped.count()
+        if self._sums is None:
+            self._sums, self._counts = sums, counts
+        else:
+            self._sums = self._sums.add(sums, fill_value=0)
+            self._counts = self._counts.add(counts, fill_value=0)
+        return self
+
+    def stream(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Remove or fill the missing values of a dataset read in chunks
+        :param chunks: Chunks, in order
+        :return: The chunks without missing values, rows held back by the
+                 backward fill and the interpolation being returned with the
+                 following chunks
+        :raise ValueError: when the means or medians were not fitted
+        """
+        for chunk in chunks:
+            processed = self.process(chunk)
+            if len(processed):
+                yield processed
+        rest = self.flush()
+        if len(rest):
+            yield rest
+
+    def process(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Remove or fill the missing values of the next chunk of a dataset
+        :param frame: Chunk
+        :return: The rows of the dataset ready
+        :raise ValueError: when the means or medians were not fitted
+        """
+        frame = self.coerce(frame)
+        if self.strategy in (MEAN, MEDIAN) and not self._fitted():
+            raise ValueError('The {}s are not fitted, call partial_fit with '
+                             'every chunk first'.format(self.strategy))
+
+        if self.strategy == FORWARD_FILL:
+            carried = 0 if self._carry is None else len(self._carry)
+            if carried:
+                frame = pd.concat([self._carry, frame])
+            filled = self._fill(frame)
+            self._carry = filled.groupby(self._keys(filled)).tail(1)
+            return filled.iloc[carried:]
+
+        if self.strategy in (BACKWARD_FILL, INTERPOLATE):
+            context = 0 if self._context is None else len(self._context)
+            frame = pd.concat([rows for rows in (self._context, self._pending,
+                                                 frame) if rows is not None])
+            held = max(self._held_from(frame), context)
+            if self.strategy == INTERPOLATE:
+                self._context = frame.iloc[self._anchors(frame, held)]
+            self._pending = frame.iloc[held:]
+            return self._fill(frame).iloc[context:held]
+
+        return self._fill(frame)
+
+    def flush(self) -> pd.DataFrame:
+        """
+        Return the rows held back once every chunk was processed
+        :return: The rows held back, that keep their missing values
+        """
+        context, pending = self._context, self._pending
+        self._context, self._pending, self._carry = None, None, None
+        if pending is None:
+            return pd.DataFrame()
+        if context is None:
+            return self._fill(pending)
+        return self._fill(pd.concat([context, pending])).iloc[len(context):]
+
+    def statistics(self) -> pd.DataFrame:
+        """
+        :return: The fitted means or medians, one row per group
+        """
+        if self.strategy == MEDIAN:
+            return pd.concat(self._values).groupby(level=0).median()
+        return self._sums / self._counts.replace(0, np.nan)
+
+    def _fitted(self) -> bool:
+        return self._sums is not None or bool(self._values)
+
+    def _columns(self, frame: pd.DataFrame, numeric: bool = False) -> list:
+        columns = [c for c in frame.columns if c not in (self.by, self.time)]
+        if numeric:
+            columns = [c for c in columns if is_numeric_dtype(frame[c])]
+        return columns
+
+    def _keys(self, frame: pd.DataFrame) -> np.ndarray:
+        if self.by is None:
+            return np.zeros(len(frame), dtype=np.int8)
+        return frame[self.by].values
+
+    def _times(self, frame: pd.DataFrame) -> np.ndarray:
+        if self.time is not None:
+            times = pd.DatetimeIndex(frame[self.time])
+        elif isinstance(frame.index, pd.DatetimeIndex):
+            times = frame.index
+        else:
+            return np.arange(len(frame), dtype=float)
+        return np.where(times.isna(), np.nan,
+                        times.asi8.astype(float))
+
+    def _held_from(self, frame: pd.DataFrame) -> int:
+        """
+        Find the first row that may still change with the next chunks, the
+        first row after the last value of a group and column
+        :param frame: Rows held back followed by the chunk
+        :return: Position of the first row held back
+        """
+        keys = self._keys(frame)
+        positions = pd.Series(np.arange(len(frame), dtype=float))
+        numeric = self.strategy == INTERPOLATE
+        held = len(frame)
+        for column in self._columns(frame, numeric):
+            last = positions.where(frame[column].notna().values).groupby(
+                keys).max() + 1
+            if self.strategy == BACKWARD_FILL:
+                # groups without a value yet wait for their first one, the
+                # interpolation never fills them
+                last = last.fillna(positions.groupby(keys).min())
+            if last.notna().any():
+                held = min(held, int(last.min()))
+        return held
+
+    def _anchors(self, frame: pd.DataFrame, held: int) -> np.ndarray:
+        """
+        Find the last value of every group and column before the rows held
+        back, the interpolation of the rows held back starts from them
+        :param frame: Rows held back followed by the chunk
+        :param held: Position of the first row held back
+        :return: Positions of the rows holding the values
+        """
+        keys = self._keys(frame)
+        positions = pd.Series(np.arange(len(frame), dtype=float))
+        before = positions < held
+        anchors = [positions.where(frame[column].notna().values & before)
+                   .groupby(keys).max().dropna()
+                   for column in self._columns(frame, numeric=True)]
+        if not anchors:
+            return np.array([], dtype=int)
+        return np.unique(np.concatenate(anchors)).astype(int)
+
+    def _fill(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Remove or fill the missing values of coerced rows
+        :param frame: Coerced rows
+        :return: The rows without missing values
+        """
+        if self.strategy == REMOVE:
+            return frame.dropna(axis=0)
+
+        filled = frame.copy()
+        keys = self._keys(frame)
+        if self.strategy in (MEAN, MEDIAN):
+            columns = self._columns(frame, numeric=True)
+            if self._fitted():
+                statistics = self.statistics()
+            elif self.strategy == MEAN:
+                statistics = frame[columns].groupby(keys).mean()
+            else:
+                statistics = frame[columns].groupby(keys).median()
+            statistics = statistics.reindex(index=keys, columns=columns)
+            for column in columns:
+                filled[column] = frame[column].where(
+                    frame[column].notna().values, statistics[column].values)
+        elif self.strategy in (FORWARD_FILL, BACKWARD_FILL):
+            columns = self._columns(frame)
+            grouped = frame[columns].groupby(keys)
+            grouped = grouped.ffill() if self.strategy == FORWARD_FILL \
+                else grouped.bfill()
+            for column in columns:
+                filled[column] = grouped[column].values
+        elif self.strategy == DEFAULT:
+            for column in self._columns(frame):
+                if not is_datetime64_any_dtype(frame[column]):
+                    filled[column] = frame[column].fillna(self.value)
+        else:
+            times = self._times(frame)
+            for column in self._columns(frame, numeric=True):
+                filled[column] = interpolate(frame[column].values, times,
+                                             keys)
+        return filled
+
+
+def interpolate(values: np.ndarray, times: np.ndarray,
+                keys: Union[np.ndarray, None] = None) -> np.ndarray:
+    """
+    Interpolate missing values linearly in time, between the values before
+    and after them in the same group
+    :param values: Values
+    :param times: Times of the values, as numbers
+    :param keys: Groups of the values
+    :return: The values, those without a value before and after them in
+             their group are left missing
+    """
+    values = values.astype(float)
+    missing = np.isnan(values)
+    if not missing.any():
+        return values
+    if keys is None:
+        keys = np.zeros(len(values), dtype=np.int8)
+
+    valid = ~missing & ~np.isnan(times)
+    anchors = pd.DataFrame({'time': np.where(valid, times, np.nan),
+                            'value': np.where(valid, values, np.nan)})
+    grouped = anchors.groupby(keys)
+    before, after = grouped.ffill(), grouped.bfill()
+    span = (after['time'] - before['time']).values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(span > 0,
+                          (times - before['time'].values) / span, 0.0)
+    interpolated = before['value'].values + weight * (
+        after['value'].values - before['value'].values)
+    return np.where(missing, interpolated, values)
@@ -0,0 +1,221 @@
+"""
+Operations of the analytics requests
+
+The operations run in the processes of a pool on datasets spilled to .npy
+files, one row per time bucket with the features followed by the target.
+The file is memory mapped: datasets of up to in_memory_rows rows are fitted
+at once, larger ones batch by batch with the incremental estimators of
+scikit-learn so only batch_rows rows are read in to memory at a time.
+
+    regression      linear regression of the target on the features
+    clustering      k-means clustering of the features and the target
+    classification  linear classification of the target, binned in to
+                    classes of equal frequency, from the features
+"""
+from typing import Any, Iterator
+
+import numpy as np
+
+REGRESSION = 'regression'
+CLUSTERING = 'clustering'
+CLASSIFICATION = 'classification'
+DEFAULT_IN_MEMORY_ROWS = 100000
+DEFAULT_BATCH_ROWS = 10000
+DEFAULT_CLUSTERS = 3
+DEFAULT_CLASSES = 3
+DEFAULT_EPOCHS = 5
+
+
+def batches(data: np.ndarray, batch_rows: int) -> Iterator[np.ndarray]:
+    """
+    Read a memory mapped dataset batch by batch
+    :param data: Dataset
+    :param batch_rows: Number of rows per batch
+    :return: Batches, loaded in to memory
+    """
+    for start in range(0, len(data), batch_rows):
+        yield np.asarray(data[start:start + batch_rows], dtype=np.float64)
+
+
+def fit_scaler(data: np.ndarray, batch_rows: int) -> Any:
+    """
+    Fit a standard scaler batch by batch
+    :param data: Dataset
+    :param batch_rows: Number of rows per batch
+    :return: The scaler
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    for batch in batches(data, batch_rows):
+        scaler.partial_fit(batch)
+    return scaler
+
+
+def regression(data: np.ndarray, in_memory_rows: int, batch_rows: int,
+               epochs: int = DEFAULT_EPOCHS, **options: Any) -> dict:
+    """
+    Regress the last column of a dataset on the others
+    :param data: Dataset
+    :param in_memory_rows: Rows above which the model is fitted in batches
+    :param batch_rows: Number of rows per batch
+    :param epochs: Number of passes over the batches
+    :return: Coefficients of the features, intercept and R squared
+    """
+    if len(data) <= in_memory_rows:
+        from sklearn.linear_model import LinearRegression
+
+        x, y = np.asarray(data[:, :-1]), np.asarray(data[:, -1])
+        model = LinearRegression().fit(x, y)
+        return {'coefficients': model.coef_.tolist(),
+                'intercept': float(model.intercept_),
+                'r2': float(model.score(x, y)), 'incremental': False}
+
+    from sklearn.linear_model import SGDRegressor
+
+    scaler = fit_scaler(data, batch_rows)
+    model = SGDRegressor(random_state=0)
+    for _ in range(epochs):
+        for batch in batches(data, batch_rows):
+            batch = scaler.transform(batch)
+            model.partial_fit(batch[:, :-1], batch[:, -1])
+
+    # the model is fitted on standardised data, express it in the units of
+    # the dataset
+    scale, mean = scaler.scale_, scaler.mean_
+    coefficients = model.coef_ * scale[-1] / scale[:-1]
+    intercept = mean[-1] + scale[-1] * model.intercept_[0] - \
+        np.dot(coefficients, mean[:-1])
+
+    residual, total = 0.0, 0.0
+    for batch in batches(data, batch_rows):
+        predicted = batch[:, :-1].dot(coefficients) + intercept
+        residual += np.square(batch[:, -1] - predicted).sum()
+        total += np.square(batch[:, -1] - mean[-1]).sum()
+    return {'coefficients': coefficients.tolist(),
+            'intercept': float(intercept),
+            'r2': float(1 - residual / total) if total else None,
+            'incremental': True}
+
+
+def clustering(data: np.ndarray, in_memory_rows: int, batch_rows: int,
+               clusters: int = DEFAULT_CLUSTERS, epochs: int = DEFAULT_EPOCHS,
+               **options: Any) -> dict:
+    """
+    Cluster the rows of a dataset with k-means
+    :param data: Dataset
+    :param in_memory_rows: Rows above which the model is fitted in batches
+    :param batch_rows: Number of rows per batch
+    :param clusters: Number of clusters
+    :param epochs: Number of passes over the batches
+    :return: Centers and sizes of the clusters and the inertia
+    """
+    clusters = min(clusters, len(data))
+    if len(data) <= in_memory_rows:
+        from sklearn.cluster import KMeans
+
+        model = KMeans(n_clusters=clusters, n_init=10, random_state=0).fit(
+            np.asarray(data))
+        return {'centers': model.cluster_centers_.tolist(),
+                'sizes': np.bincount(model.labels_,
+                                     minlength=clusters).tolist(),
+                'inertia': float(model.inertia_), 'incremental': False}
+
+    from sklearn.cluster import MiniBatchKMeans
+
+    model = MiniBatchKMeans(n_clusters=clusters, n_init=3,
+                            batch_size=batch_rows, random_state=0)
+    for _ in range(epochs):
+        for batch in batches(data, batch_rows):
+            model.partial_fit(batch)
+
+    sizes, inertia = np.zeros(clusters, dtype=np.int64), 0.0
+    for batch in batches(data, batch_rows):
+        labels = model.predict(batch)
+        sizes += np.bincount(labels, minlength=clusters)
+        inertia += np.square(batch - model.cluster_centers_[labels]).sum()
+    return {'centers': model.cluster_centers_.tolist(),
+            'sizes': sizes.tolist(), 'inertia': float(inertia),
+            'incremental': True}
+
+
+def classification(data: np.ndarray, in_memory_rows: int, batch_rows: int,
+                   classes: int = DEFAULT_CLASSES,
+                   epochs: int = DEFAULT_EPOCHS, **options: Any) -> dict:
+    """
+    Classify the last column of a dataset, binned in to classes of equal
+    frequency, from the others
+    :param data: Dataset
+    :param in_memory_rows: Rows above which the model is fitted in batches
+    :param batch_rows: Number of rows per batch
+    :param classes: Number of classes
+    :param epochs: Number of passes over the batches
+    :return: Upper bounds of the classes, coefficients and intercepts of the
+             classifier and its accuracy
+    """
+    bounds = np.unique(np.quantile(data[:, -1], np.linspace(
+        0, 1, classes + 1)[1:-1]))
+    labels = np.arange(len(bounds) + 1)
+
+    if len(data) <= in_memory_rows:
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+
+        x = np.asarray(data[:, :-1])
+        y = np.searchsorted(bounds, data[:, -1], side='right')
+        if len(np.unique(y)) < 2:
+            return {'bounds': bounds.tolist(), 'accuracy': 1.0,
+                    'incremental': False}
+        model = make_pipeline(StandardScaler(), LogisticRegression(
+            solver='lbfgs', max_iter=1000)).fit(x, y)
+        classifier = model.steps[-1][1]
+        return {'bounds': bounds.tolist(),
+                'coefficients': classifier.coef_.tolist(),
+                'intercepts': classifier.intercept_.tolist(),
+                'accuracy': float(model.score(x, y)), 'incremental': False}
+
+    from sklearn.linear_model import SGDClassifier
+
+    scaler = fit_scaler(data[:, :-1], batch_rows)
+    model = SGDClassifier(random_state=0)
+    for _ in range(epochs):
+        for batch in batches(data, batch_rows):
+            model.partial_fit(scaler.transform(batch[:, :-1]),
+                              np.searchsorted(bounds, batch[:, -1],
+                                              side='right'),
+                              classes=labels)
+
+    correct = 0
+    for batch in batches(data, batch_rows):
+        correct += (model.predict(scaler.transform(batch[:, :-1])) ==
+                    np.searchsorted(bounds, batch[:, -1],
+                                    side='right')).sum()
+    return {'bounds': bounds.tolist(), 'coefficients': model.coef_.tolist(),
+            'intercepts': model.intercept_.tolist(),
+            'accuracy': float(correct / len(data)), 'incremental': True}
+
+
+OPERATIONS = {REGRESSION: regression, CLUSTERING: clustering,
+              CLASSIFICATION: classification}
+
+
+def run_operation(operation: str, path: str,
+                  in_memory_rows: int = DEFAULT_IN_MEMORY_ROWS,
+                  batch_rows: int = DEFAULT_BATCH_ROWS,
+                  **options: Any) -> dict:
+    """
+    Run an operation on a dataset spilled to disk, in a worker process
+    :param operation: regression, clustering or classification
+    :param path: Path of the .npy file holding the dataset
+    :param in_memory_rows: Rows above which the model is fitted in batches
+    :param batch_rows: Number of rows per batch
+    :param options: Options of the operation
+    :return: Result of the operation
+    """
+    if operation not in OPERATIONS:
+        raise ValueError('Unknown operation {}'.format(operation))
+    data = np.load(path, mmap_mode='r')
+    if not len(data):
+        raise ValueError('The dataset is empty')
+    return OPERATIONS[operation](data, in_memory_rows, batch_rows, **options)
@@ -0,0 +1,263 @@
+"""
+Execution of the analytics requests on Celery
+
+Requests accepted by POST /analytics are queued on a dedicated queue:
+
+    celery -A manage.celery_task worker -Q analytics -P solo -l info
+
+A request is executed in three steps. Its columns are read from the
+attribute data tables in chunks and averaged over time buckets
+(analysis.dataset), the missing values are handled with the strategy of the
+request and the dataset is spilled to a .npy file. The operation then runs
+on a process pool shared by the requests executed by the worker, reading the
+file memory mapped (analysis.operations). The size and columns of the
+dataset are stored in the analytics_result table once it is built, followed
+by the result, or the reason of the failure, and the status of the request
+is updated, both are returned by GET /analytics/status.
+
+The pool is created by the worker process, which must not be a daemon: with
+the default prefork pool of Celery operations run in the worker process
+instead, so run the analytics queue with the solo or threads pool.
+
+    analytics:
+      queue: analytics
+      resolution: 1H
+      chunk_size: 50000
+      workers: 2
+      in_memory_rows: 100000
+      batch_rows: 10000
+      clusters: 3
+      classes: 3
+      default_fill: 0
+      spill_directory: null
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Union
+
+import celery
+import numpy as np
+import pandas as pd
+from celery.result import AsyncResult
+from celery.utils.log import get_task_logger
+from kombu.exceptions import OperationalError
+
+from analysis.dataset import (DEFAULT_RESOLUTION, TARGET, Feature, align,
+                              bucket_means, feature_name,
+                              handle_missing_values, parse_filters)
+from analysis.operations import (DEFAULT_BATCH_ROWS, DEFAULT_CLASSES,
+                                 DEFAULT_CLUSTERS, DEFAULT_IN_MEMORY_ROWS,
+                                 run_operation)
+from db import db
+from models.analytics_result import (COMPLETED, FAILED, RUNNING,
+                                     AnalyticsResult)
+from models.attribute_data import COLUMN_NAMES, get_data_store
+from models.operation import Operation
+from models.request_analytics import RequestAnalytics
+from models.request_table_cols import RequestTablesCols
+from settings import GetConfig
+from utility import convert_to_date
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+celery_logger = get_task_logger(__name__)
+
+DEFAULT_QUEUE = 'analytics'
+DEFAULT_CHUNK_SIZE = 50000
+DEFAULT_WORKERS = 2
+TIMESTAMP = 'api_timestamp'
+
+_pool = None
+
+
+def dispatch(request_id: int) -> Union[AsyncResult, None]:
+    """
+    Queue the execution of an analytics request
+    :param request_id: id of the analytics request
+    :return: the queued task or None when the broker is unavailable, the
+             request then stays accepted
+    """
+    try:
+        return execute_analytics.apply_async(
+            args=(request_id,),
+            queue=GetConfig.setting('analytics', 'queue', DEFAULT_QUEUE))
+    except OperationalError as e:
+        logger.error('Unable to queue analytics request {}: {}'.format(
+            request_id, e))
+        return None
+
+
+def request_features(request_id: int) -> ([Feature], Feature):
+    """
+    Get the columns of an analytics request
+    :param request_id: id of the analytics request
+    :return: the features and the target
+    :raise ValueError: when the request has no target or an unknown column
+    """
+    features, target = [], None
+    for column in RequestTablesCols.query.filter_by(
+            request_id=request_id).order_by(RequestTablesCols.id):
+        if column.col_name not in COLUMN_NAMES:
+            raise ValueError('Unknown column {} of {}, attribute data '
+                             'tables have the columns {}'.format(
+                                 column.col_name, column.table_name,
+                                 ', '.join(COLUMN_NAMES)))
+        feature = Feature(column.table_name, column.col_name,
+                          parse_filters(column.filters))
+        if column.type_col == 'Y':
+            target = feature
+        else:
+            features.append(feature)
+    if target is None:
+        raise ValueError('The request has no target column')
+    return features, target
+
+
+def request_period(request: RequestAnalytics) -> (Any, Any):
+    """
+    Get the period an analytics request is restricted to
+    :param request: the analytics request
+    :return: the start and end of the period, None when not restricted
+    """
+    period = []
+    for date in (request.data_range_from, request.data_range_to):
+        valid, date = convert_to_date(date) if date else (False, None)
+        period.append(date if valid else None)
+    return tuple(period)
+
+
+def load_dataset(request: RequestAnalytics, features: [Feature],
+                 target: Feature) -> pd.DataFrame:
+    """
+    Build the dataset of an analytics request, reading every column in
+    chunks
+    :param request: the analytics request
+    :param features: the features of the request
+    :param target: the target of the request
+    :return: one row per time bucket, the features followed by the target,
+             without missing values
+    """
+    store = get_data_store()
+    fromdate, todate = request_period(request)
+    resolution = GetConfig.setting('analytics', 'resolution',
+                                   DEFAULT_RESOLUTION)
+    chunk_size = int(GetConfig.setting('analytics', 'chunk_size',
+                                       DEFAULT_CHUNK_SIZE))
+
+    columns = {}
+    for name, feature in [(feature_name(f), f) for f in features] + \
+            [(TARGET, target)]:
+        read = [TIMESTAMP] if feature.column == TIMESTAMP else \
+            [TIMESTAMP, feature.column]
+        columns[name] = bucket_means(
+            store.iter_frames(feature.table, read, fromdate, todate,
+                              chunk_size),
+            feature.column, feature.filters, resolution)
+
+    dataset = align(columns, request.timeseries, resolution)
+    return handle_missing_values(
+        dataset, request.missing_values,
+        float(GetConfig.setting('analytics', 'default_fill', 0)))
+
+
+def spill(dataset: pd.DataFrame) -> str:
+    """
+    Write a dataset to a .npy file read memory mapped by the operations
+    :param dataset: the dataset
+    :return: path of the file
+    """
+    handle, path = tempfile.mkstemp(suffix='.npy', prefix='analytics-',
+                                    dir=GetConfig.setting(
+                                        'analytics', 'spill_directory', None))
+    with os.fdopen(handle, 'wb') as f:
+        np.save(f, dataset.values.astype(np.float64))
+    return path
+
+
+def execute_operation(operation: str, path: str, **options: Any) -> dict:
+    """
+    Run an operation on the process pool of the worker, or in the worker
+    process when it cannot have children
+    :param operation: regression, clustering or classification
+    :param path: path of the dataset spilled to disk
+    :param options: options of the operation
+    :return: the result of the operation
+    """
+    global _pool
+    if multiprocessing.current_process().daemon:
+        return run_operation(operation, path, **options)
+
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=int(GetConfig.setting(
+            'analytics', 'workers', DEFAULT_WORKERS)))
+    try:
+        return _pool.submit(run_operation, operation, path,
+                            **options).result()
+    except BrokenProcessPool:
+        # a process of the pool died, e.g. killed running out of memory
+        _pool = None
+        raise
+
+
+@celery.task(bind=True)
+def execute_analytics(self, request_id: int) -> dict:
+    """
+    Execute an analytics request and store its result
+    :param request_id: id of the analytics request
+    :return: the stored execution
+    """
+    request = RequestAnalytics.find_by_id(request_id)
+    if request is None:
+        return {'request_id': request_id, 'status': FAILED,
+                'reason': 'Unknown analytics request'}
+
+    execution = AnalyticsResult.find_by_request_id(request_id) or \
+        AnalyticsResult(request_id)
+    execution.task_id = self.request.id
+    request.status = RUNNING
+    execution.save()
+    execution.commit()
+
+    path = None
+    try:
+        operation = Operation.query.get(request.operation_id).name
+        features, target = request_features(request_id)
+        dataset = load_dataset(request, features, target)
+        execution.rows = len(dataset)
+        execution.features = [feature_name(f) for f in features]
+        # committed before running, a failure rolls the session back
+        execution.save()
+        execution.commit()
+        if not len(dataset):
+            raise ValueError('No readings left once missing values were '
+                             'handled')
+
+        path = spill(dataset)
+        result = execute_operation(
+            operation, path,
+            in_memory_rows=int(GetConfig.setting(
+                'analytics', 'in_memory_rows', DEFAULT_IN_MEMORY_ROWS)),
+            batch_rows=int(GetConfig.setting('analytics', 'batch_rows',
+                                             DEFAULT_BATCH_ROWS)),
+            clusters=int(GetConfig.setting('analytics', 'clusters',
+                                           DEFAULT_CLUSTERS)),
+            classes=int(GetConfig.setting('analytics', 'classes',
+                                          DEFAULT_CLASSES)))
+        request.status = COMPLETED
+        execution.finish(result=result)
+    except Exception as e:
+        db.session.rollback()
+        celery_logger.error('Analytics request {} failed: {}'.format(
+            request_id, e))
+        request.status = FAILED
+        execution.finish(reason=str(e))
+    finally:
+        if path is not None:
+            os.remove(path)
+
+    return dict(execution.json(), status=request.status)
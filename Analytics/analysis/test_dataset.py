@@ -0,0 +1,66 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from analysis.dataset import (BucketMeans, align, bucket_means,
+                              handle_missing_values, parse_filters)
+
+
+class TestDataset(unittest.TestCase):
+    def setUp(self):
+        self.chunk = pd.DataFrame({
+            'api_timestamp': pd.to_datetime(['2019-01-01 00:10',
+                                             '2019-01-01 00:50',
+                                             '2019-01-01 01:20']),
+            'value': ['1', '3', 'n/a']})
+
+    def tearDown(self):
+        pass
+
+    def test_bucket_means_across_chunks(self):
+        means = BucketMeans('1H')
+        means.add(self.chunk['api_timestamp'], self.chunk['value'])
+        means.add(self.chunk['api_timestamp'][:1], pd.Series(['5']))
+        result = means.means()
+        self.assertEqual(result[pd.Timestamp('2019-01-01 00:00')], 3.0)
+        self.assertTrue(np.isnan(result[pd.Timestamp('2019-01-01 01:00')]))
+
+    def test_filters(self):
+        self.assertIsNone(parse_filters('None'))
+        self.assertEqual(parse_filters('1, 3'), ['1', '3'])
+        result = bucket_means([self.chunk], 'value', ['3'])
+        self.assertEqual(result.tolist(), [3.0])
+
+    def test_align_timeseries(self):
+        x = pd.Series([1.0, 2.0], index=pd.to_datetime(
+            ['2019-01-01 00:00', '2019-01-01 03:00']))
+        y = pd.Series([4.0], index=pd.to_datetime(['2019-01-01 00:00']))
+        self.assertEqual(len(align({'x': x, 'y': y}, False)), 2)
+        dataset = align({'x': x, 'y': y}, True)
+        self.assertEqual(len(dataset), 4)
+        self.assertEqual(dataset.columns.tolist(), ['x', 'y'])
+
+    def test_handle_missing_values(self):
+        dataset = pd.DataFrame({'x': [1.0, np.nan, 3.0],
+                                'y': [np.nan, 2.0, 4.0]})
+        self.assertEqual(len(handle_missing_values(dataset, 'remove')), 1)
+        self.assertEqual(handle_missing_values(dataset, 'mean')['x'].tolist(),
+                         [1.0, 2.0, 3.0])
+        self.assertEqual(len(handle_missing_values(dataset, 'forward fill')),
+                         2)
+        self.assertEqual(
+            handle_missing_values(dataset, 'default', 7.0)['y'].tolist(),
+            [7.0, 2.0, 4.0])
+        self.assertEqual(
+            handle_missing_values(dataset, 'interpolate')['x'].tolist(),
+            [2.0, 3.0])
+        with self.assertRaises(ValueError):
+            handle_missing_values(dataset, 'spline')
+
+
+if __name__ == '__main__':
+    unittest.main()
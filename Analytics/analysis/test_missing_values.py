@@ -0,0 +1,77 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from analysis.missing_values import (STRATEGIES, MissingValuePipeline,
+                                     coerce)
+
+
+class TestMissingValuePipeline(unittest.TestCase):
+    def setUp(self):
+        self.dataset = pd.DataFrame({
+            's_id': ['a', 'b', 'a', 'b', 'a', 'b'],
+            'api_timestamp': ['2019-01-01 00:00', '2019-01-01 00:00',
+                              '2019-01-01 00:10', '2019-01-01 00:20',
+                              '2019-01-01 00:40', '2019-01-01 00:40'],
+            'value': ['1', '10', ' ', '', '4', '30']})
+
+    def tearDown(self):
+        pass
+
+    def pipeline(self, strategy):
+        return MissingValuePipeline(strategy, value=-1, by='s_id',
+                                    time='api_timestamp')
+
+    def test_coerce(self):
+        coerced = coerce(pd.DataFrame({'a': [3, 6, ' ', 9],
+                                       'b': ['x', '', 'y', 'z']}))
+        self.assertEqual(coerced['a'].dtype, np.float64)
+        self.assertTrue(np.isnan(coerced['a'][2]))
+        self.assertEqual(coerced['b'].tolist()[::2], ['x', 'y'])
+        self.assertTrue(pd.isna(coerced['b'][1]))
+
+    def test_fill_per_sensor(self):
+        expected = {'mean': [2.5, 20.0], 'median': [2.5, 20.0],
+                    'forward fill': [1.0, 10.0],
+                    'backward fill': [4.0, 30.0], 'default': [-1.0, -1.0],
+                    'interpolate': [1.75, 20.0]}
+        for strategy, values in expected.items():
+            filled = self.pipeline(strategy).transform(self.dataset)
+            self.assertEqual(filled['value'][[2, 3]].tolist(), values,
+                             strategy)
+        self.assertEqual(
+            len(self.pipeline('remove').transform(self.dataset)), 4)
+
+    def test_stream_matches_transform(self):
+        rng = np.random.RandomState(0)
+        dataset = pd.DataFrame({
+            's_id': rng.choice(['a', 'b', 'c'], 300),
+            'api_timestamp': pd.date_range('2019-01-01', periods=300,
+                                           freq='min').astype(str),
+            'value': rng.normal(size=300).round(3).astype(str)})
+        dataset.loc[rng.rand(300) < 0.4, 'value'] = ''
+        chunks = [dataset.iloc[i:i + 17] for i in range(0, 300, 17)]
+
+        for strategy in STRATEGIES:
+            expected = self.pipeline(strategy).transform(dataset)
+            pipeline = self.pipeline(strategy)
+            for chunk in chunks:
+                pipeline.partial_fit(chunk)
+            streamed = pd.concat(list(pipeline.stream(chunks)))
+            self.assertEqual(streamed.index.tolist(),
+                             expected.index.tolist(), strategy)
+            np.testing.assert_allclose(streamed['value'].values,
+                                       expected['value'].values,
+                                       err_msg=strategy)
+
+    def test_stream_requires_statistics(self):
+        with self.assertRaises(ValueError):
+            list(self.pipeline('median').stream([self.dataset]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+
+import numpy as np
+
+from analysis.operations import (CLASSIFICATION, CLUSTERING, REGRESSION,
+                                 run_operation)
+
+
+class TestOperations(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        x = rng.uniform(0, 10, size=(2000, 2))
+        y = 3 * x[:, 0] - 2 * x[:, 1] + 5 + rng.normal(0, 0.1, size=2000)
+        handle, self.path = tempfile.mkstemp(suffix='.npy')
+        with os.fdopen(handle, 'wb') as f:
+            np.save(f, np.column_stack([x, y]))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_regression(self):
+        for in_memory_rows in (10000, 100):
+            result = run_operation(REGRESSION, self.path, in_memory_rows, 250)
+            self.assertEqual(result['incremental'], in_memory_rows == 100)
+            np.testing.assert_allclose(result['coefficients'], [3, -2],
+                                       atol=0.1)
+            self.assertAlmostEqual(result['intercept'], 5, delta=0.5)
+            self.assertGreater(result['r2'], 0.99)
+
+    def test_clustering(self):
+        for in_memory_rows in (10000, 100):
+            result = run_operation(CLUSTERING, self.path, in_memory_rows, 250,
+                                   clusters=4)
+            self.assertEqual(len(result['centers']), 4)
+            self.assertEqual(sum(result['sizes']), 2000)
+
+    def test_classification(self):
+        for in_memory_rows in (10000, 100):
+            result = run_operation(CLASSIFICATION, self.path, in_memory_rows,
+                                   250, classes=3)
+            self.assertEqual(len(result['bounds']), 2)
+            self.assertGreater(result['accuracy'], 0.8)
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            run_operation('forecast', self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
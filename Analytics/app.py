@@ -6,10 +6,14 @@ from flask_restful import Api
 
 from db import db
 from models.revoked_tokens import RevokedTokens
+from models.api_sync_state import APISyncState
 from models.attribute_range import AttributeRange
+from output import init_output
+from profiling import init_profiling
 from resources.Widgets.create_widget_layout import CreateWidgetLayout
 from resources.Widgets.delete_widget import DeleteWidgets
 from resources.Widgets.get_layouts import GetLayouts
+from resources.Widgets.get_snapshot import GetSnapshot
 from resources.Widgets.get_widget_layout import GetWidgetLayout
 from resources.Widgets.get_widgets import GetWidgets
 from resources.Widgets.save_layouts import SaveWidgetLayout
@@ -27,17 +31,19 @@ from resources.alerts.create_alert import CreateAlert
 from resources.alerts.delete_alert import DeleteAlerts
 from resources.alerts.get_alerts import GetAlerts
 from resources.alerts.push_alert import PushAlert
-from resources.analytics import Analytics
+from resources.analytics import Analytics, AnalyticsStatus
 from resources.attributes import AttributeAlias
 from resources.attributes import DeleteAttributeAlias
 from resources.attributes import GetAttributes
 from resources.attributes import UpdateAttributeSubTheme
+from resources.batch_predictions import BatchPredictions
 from resources.export_data import ExportData
 from resources.forgot_password import ForgotPassword
 from resources.healthcheck import HealthCheck
 from resources.import_retry import ImportRetry
 from resources.import_status import ImportStatus
 from resources.login import Login, SecretResource
+from resources.metrics import Metrics, SlowRequests
 from resources.logout import UserLogoutAccess, UserLogoutRefresh
 from resources.moving_sensors import CreateTracker
 from resources.moving_sensors import DeleteTracker
@@ -104,6 +110,8 @@ def create_app(**config_overrides):
 
     db.init_app(app)
     db.app = app
+    init_profiling(app)
+    init_output(app, api)
 
     jwt = JWTManager(app)
 
@@ -141,12 +149,17 @@ def create_app(**config_overrides):
         """
         return user.email
 
-    db.create_all()
+    # Creating the schema is a deployment step, python manage.py create_db,
+    # the test suites still get their tables created with the app
+    if app.config.get('CREATE_SCHEMA', app.testing):
+        db.create_all()
 
     migrate = Migrate(app, db)
     api.add_resource(Analytics, '/analytics')
+    api.add_resource(AnalyticsStatus, '/analytics/status')
     api.add_resource(RequestForData, '/data')  # current /data endpoint
     api.add_resource(PredictionStatus, '/pred_status')
+    api.add_resource(BatchPredictions, '/batch_predictions')
 
     # login Endpoints
     api.add_resource(Register, '/register')
@@ -165,6 +178,7 @@ def create_app(**config_overrides):
     api.add_resource(GetWidgetLayout, '/widgets/get_layout')
     api.add_resource(GetLayouts, '/widgets/get_layouts')
     api.add_resource(SaveWidgetLayout, '/widgets/save_layouts')
+    api.add_resource(GetSnapshot, '/widgets/snapshot')
 
     # Admin Endpoints
     api.add_resource(CreateNewUser, '/admin/create_new_user')
@@ -233,4 +247,8 @@ def create_app(**config_overrides):
 
     # HealthCheck Endpoints
     api.add_resource(HealthCheck, '/')
+
+    # Prometheus Endpoints
+    api.add_resource(Metrics, '/metrics')
+    api.add_resource(SlowRequests, '/metrics/slow_requests')
     return app
@@ -0,0 +1,126 @@
+"""
+Benchmark the read paths of the API on a synthetic city
+
+Generates a city with benchmarks/city_generator.py and times /data (raw,
+operation, date range, grouped and harmonised long, wide and geo), the
+theme tree, the exports and the moving sensor endpoints with
+pytest-benchmark. The file is not collected by the test suite and is run
+explicitly, saving the results as JSON under .benchmarks so regressions can
+be compared across commits:
+
+    python -m pytest benchmarks/bench_read_paths.py --benchmark-autosave
+    python -m pytest benchmarks/bench_read_paths.py --benchmark-compare --benchmark-compare-fail=mean:10%
+
+Large cities are generated once and reused:
+
+    python benchmarks/city_generator.py --database bench_city --sensors 5000 --attributes 200 --readings 100000000
+    python -m pytest benchmarks/bench_read_paths.py --city-database bench_city --city-reuse --benchmark-autosave
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+LIMIT = 1000
+
+
+def get(client, url: str, headers: dict = None):
+    """
+    GET an endpoint and check it succeeded
+    :param client: Flask testing client
+    :param url: URL requested
+    :param headers: Request headers
+    :return: The response
+    """
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.data[:200]
+    return response
+
+
+def test_data_raw(benchmark, client, city):
+    benchmark(get, client, '/data?attributedata={}&limit={}'.format(
+        city['attributes'][0], LIMIT))
+
+
+def test_data_raw_multiple_attributes(benchmark, client, city):
+    benchmark(get, client, '/data?attributedata={}&limit={}'.format(
+        ','.join(city['attributes'][:3]), LIMIT))
+
+
+def test_data_date_range(benchmark, client, city):
+    benchmark(get, client, '/data?attributedata={}&limit={}&fromdate='
+                           '2019-01-01&todate=2019-01-08'.format(
+                               city['attributes'][0], LIMIT))
+
+
+@pytest.mark.parametrize('operation', ['mean', 'median', 'sum'])
+def test_data_operation(benchmark, client, city, operation):
+    benchmark(get, client, '/data?attributedata={}&operation={}'.format(
+        city['attributes'][0], operation))
+
+
+@pytest.mark.parametrize('per_sensor', [False, True])
+def test_data_grouped(benchmark, client, city, per_sensor):
+    benchmark(get, client, '/data?attributedata={}&limit={}&grouped=True'
+                           '&per_sensor={}&freq=1H'.format(
+                               ','.join(city['attributes'][:2]), LIMIT,
+                               per_sensor))
+
+
+@pytest.mark.parametrize('harmonising_method', ['long', 'wide', 'geo'])
+def test_data_harmonised(benchmark, client, city, harmonising_method):
+    benchmark(get, client, '/data?attributedata={}&limit={}&grouped=True'
+                           '&harmonising_method={}'.format(
+                               ','.join(city['attributes'][:3]), LIMIT,
+                               harmonising_method))
+
+
+def test_data_themes(benchmark, client, city):
+    benchmark(get, client, '/data')
+
+
+def test_data_all_sensors(benchmark, client, city):
+    benchmark(get, client, '/data?sensor=all')
+
+
+def test_theme_tree(benchmark, client, city):
+    benchmark(get, client, '/admin/themes/get_tree')
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'json', 'geojson'])
+def test_export(benchmark, client, auth_header, city, file_format, tmpdir):
+    from models.attributes import Attributes
+
+    table_name = Attributes.get_by_name(city['attributes'][0])[0].table_name
+
+    def export():
+        response = client.post('/export_data', headers=auth_header, json={
+            'file_name': 'benchmark', 'table_name': table_name,
+            'format': file_format, 'directory': str(tmpdir),
+            'limit': LIMIT})
+        assert response.status_code == 200, response.data[:200]
+
+    benchmark(export)
+
+
+def test_moving_sensors(benchmark, client, city):
+    benchmark(get, client, '/data?moving=True&sensor=all')
+
+
+def test_moving_attribute_data(benchmark, client, city):
+    benchmark(get, client, '/data?moving=True&attributedata=no2&limit={}'
+              .format(LIMIT))
+
+
+def test_moving_location_data(benchmark, client, auth_header, city):
+    benchmark(get, client, '/moving/get_loc_data?tracker_id={}'
+                           '&start_date=01/01/2019%2000:00'
+                           '&end_date=01/01/2020%2000:00'.format(
+                               city['trackers'][0]), auth_header)
+
+
+def test_moving_export_kml(benchmark, client, auth_header, city, tmpdir):
+    with tmpdir.as_cwd():
+        response = benchmark(client.get, '/moving/export_kml?tracker_id={}'
+                             .format(city['trackers'][0]),
+                             headers=auth_header)
+    assert response.status_code == 201
@@ -0,0 +1,471 @@
+"""
+Generate a synthetic city
+
+Populates themes, subthemes, attributes, an API, locations, sensors and their
+attribute data tables, and moving sensor trackers with their location data,
+at a configurable scale. Readings follow a daily cycle with noise, every
+sensor reports a few attributes at a fixed interval and readings are bulk
+loaded with COPY in to the configured storage backend, so large cities
+(e.g. 5000 sensors, 200 attributes, 100M readings) can be generated in a
+reasonable time. Every generated entity is named with a prefix so the city
+can be removed again.
+
+Generate large cities in to a database of their own, the synthetic API has
+no importer and would otherwise be scheduled along with the real ones:
+
+    createdb bench_city
+    python benchmarks/city_generator.py --database bench_city --sensors 5000 --attributes 200 --readings 100000000
+    python benchmarks/city_generator.py --database bench_city --remove
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import math
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from random import Random
+from typing import Iterator
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from geoalchemy2.elements import WKTElement
+
+from db import db
+from models.api import API
+from models.attribute_data import CONSOLIDATED, get_data_store
+from models.attributes import Attributes
+from models.data_version import SENSORS, TRACKERS, data_versions
+from models.location import Location
+from models.pin_location_data import LocationData, Tracker
+from models.reading import ReadingAttribute, ReadingSensor
+from models.sensor import Sensor
+from models.sensor_attribute import SensorAttribute
+from models.theme import SubTheme, Theme
+from models.unit import Unit
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+PREFIX = 'synthetic_'
+START = datetime(2019, 1, 1)
+COPY_CHUNK_SIZE = 100000
+# Bounding box of the generated sensor locations (Greater London)
+BOUNDS = ((51.28, 51.69), (-0.51, 0.33))
+TRACKER_ATTRIBUTES = ('no2', 'o3')
+
+
+class CityGenerator(object):
+    """
+    Populate the database with a synthetic city
+    """
+
+    def __init__(self, sensors: int = 50, attributes: int = 10,
+                 readings: int = 100000, themes: int = 3,
+                 subthemes: int = 3, attributes_per_sensor: int = 3,
+                 interval: int = 15, trackers: int = 5,
+                 tracker_points: int = 200, seed: int = 0,
+                 prefix: str = PREFIX) -> None:
+        """
+        :param sensors: Number of sensors
+        :param attributes: Number of attributes
+        :param readings: Total number of readings across all attributes
+        :param themes: Number of themes
+        :param subthemes: Number of subthemes per theme
+        :param attributes_per_sensor: Number of attributes each sensor reports
+        :param interval: Minutes between the readings of a sensor
+        :param trackers: Number of moving sensor trackers
+        :param tracker_points: Number of locations recorded per tracker
+        :param seed: Random seed, the same seed generates the same city
+        :param prefix: Prefix of the names of the generated entities
+        """
+        self.n_sensors = sensors
+        self.n_attributes = attributes
+        self.n_readings = readings
+        self.n_themes = themes
+        self.n_subthemes = subthemes
+        self.attributes_per_sensor = min(attributes_per_sensor, attributes)
+        self.interval = timedelta(minutes=interval)
+        self.n_trackers = trackers
+        self.tracker_points = tracker_points
+        self.seed = seed
+        self.prefix = prefix
+        self.rng = Random(seed)
+
+        self.api = None
+        self.attributes = []
+        self.sensors = []
+        self.trackers = []
+
+    def generate(self) -> dict:
+        """
+        Generate the city
+        :return: The number of entities generated per kind
+        """
+        start = time.perf_counter()
+        unit = self.create_unit()
+        subthemes = self.create_themes()
+        self.create_attributes(subthemes, unit)
+        self.create_sensors()
+        readings = self.create_readings()
+        points = self.create_trackers()
+        db.session.commit()
+        # sensors and tracker points are inserted with Core statements
+        data_versions.bump([SENSORS, TRACKERS])
+        logger.info('Generated the city in {:.1f}s'.format(
+            time.perf_counter() - start))
+        return {'themes': self.n_themes,
+                'subthemes': len(subthemes),
+                'attributes': len(self.attributes),
+                'sensors': len(self.sensors),
+                'readings': readings,
+                'trackers': len(self.trackers),
+                'tracker_points': points}
+
+    def name(self, kind: str, index: int) -> str:
+        """
+        Name a generated entity
+        :param kind: Kind of entity
+        :param index: Index of the entity
+        :return: Prefixed name
+        """
+        return '{}{}_{:05d}'.format(self.prefix, kind, index)
+
+    def create_unit(self) -> Unit:
+        """
+        Create the unit of the generated attributes
+        :return: The unit
+        """
+        unit = Unit.get_by_symbol(self.prefix + 'unit')
+        if not unit:
+            unit = Unit(self.prefix + 'unit', 'Synthetic unit')
+            unit.save()
+        return unit
+
+    def create_themes(self) -> [SubTheme]:
+        """
+        Create the themes and their subthemes, and a moving sensor theme
+        for the trackers
+        :return: The subthemes of the attributes
+        """
+        themes = [Theme(self.name('theme', t)) for t in range(self.n_themes)]
+        db.session.add_all(themes)
+        db.session.flush()
+        subthemes = [SubTheme(theme.id, self.name('subtheme', s))
+                     for theme in themes for s in range(self.n_subthemes)]
+        db.session.add_all(subthemes)
+
+        moving = Theme(self.prefix + 'Moving_Sensor')
+        db.session.add(moving)
+        db.session.flush()
+        self.moving_subtheme = SubTheme(moving.id,
+                                        self.prefix + 'Moving_Airquality')
+        db.session.add(self.moving_subtheme)
+        db.session.flush()
+        return subthemes
+
+    def create_attributes(self, subthemes: [SubTheme], unit: Unit) -> None:
+        """
+        Create the attributes and their data tables
+        :param subthemes: Subthemes the attributes are spread across
+        :param unit: Unit of the attributes
+        """
+        for a in range(self.n_attributes):
+            name = self.name('attr', a)
+            self.attributes.append(Attributes(
+                id=str(uuid.uuid4()), name=name,
+                table_name=name + '_' + str(uuid.uuid4()).replace('-', '_'),
+                sub_theme=subthemes[a % len(subthemes)].id, unit=unit.id,
+                description='Synthetic attribute {}'.format(a)))
+        db.session.add_all(self.attributes)
+        db.session.flush()
+        get_data_store().create_tables([a.table_name
+                                        for a in self.attributes])
+
+    def create_sensors(self) -> None:
+        """
+        Create the API, the sensors, their locations and the attributes each
+        sensor reports
+        """
+        self.api = API(name=self.prefix + 'api', url='http://synthetic.city',
+                       api_key='', api_class='benchmarks.city_generator.'
+                                             'SyntheticCity',
+                       refresh_time=86400, token_expiry=None,
+                       timestamp=datetime.utcnow())
+        self.api = self.api.save()
+        db.session.flush()
+
+        (lat_min, lat_max), (lon_min, lon_max) = BOUNDS
+        locations = []
+        for _ in range(self.n_sensors):
+            lat = self.rng.uniform(lat_min, lat_max)
+            lon = self.rng.uniform(lon_min, lon_max)
+            locations.append(Location(lat, lon, WKTElement(
+                'POINT(%f %f)' % (lat, lon), 4326)))
+        db.session.add_all(locations)
+        db.session.flush()
+
+        now = datetime.utcnow()
+        self.sensors = [{'id': str(uuid.UUID(int=self.rng.getrandbits(128))),
+                         'a_id': self.api.id, 'l_id': location.id,
+                         'name': self.name('sensor', s), 'timestamp': now}
+                        for s, location in enumerate(locations)]
+        db.session.execute(Sensor.__table__.insert(), self.sensors)
+        db.session.execute(SensorAttribute.__table__.insert(), [
+            {'s_id': sensor['id'], 'a_id': attribute.id, 'timestamp': now}
+            for sensor, attributes in self.reported_attributes()
+            for attribute in attributes])
+        db.session.commit()
+
+    def reported_attributes(self) -> Iterator:
+        """
+        Assign attributes to the sensors, round robin so every attribute is
+        reported by a similar number of sensors
+        :return: Each sensor with the attributes it reports
+        """
+        for s, sensor in enumerate(self.sensors):
+            yield sensor, [self.attributes[(s * self.attributes_per_sensor + i)
+                                           % len(self.attributes)]
+                           for i in range(self.attributes_per_sensor)]
+
+    def create_readings(self) -> int:
+        """
+        Generate the readings of every attribute
+        :return: Number of readings generated
+        """
+        series = {attribute.table_name: [] for attribute in self.attributes}
+        for sensor, attributes in self.reported_attributes():
+            for attribute in attributes:
+                series[attribute.table_name].append(sensor['id'])
+
+        n_series = sum(len(sensor_ids) for sensor_ids in series.values())
+        per_series = max(1, self.n_readings // max(n_series, 1))
+        total = 0
+        for a, (table_name, sensor_ids) in enumerate(series.items()):
+            if not sensor_ids:
+                continue
+            start = time.perf_counter()
+            count = copy_readings(table_name, self.readings(
+                a, sensor_ids, per_series))
+            total += count
+            logger.info('{} readings in to {} in {:.1f}s'.format(
+                count, table_name, time.perf_counter() - start))
+        return total
+
+    def readings(self, seed: int, sensor_ids: [str],
+                 per_series: int) -> Iterator[tuple]:
+        """
+        Generate the readings of an attribute, a daily cycle around a base
+        level specific to each sensor with gaussian noise
+        :param seed: Seed of the attribute
+        :param sensor_ids: Sensors reporting the attribute
+        :param per_series: Number of readings per sensor
+        :return: Sensor id, value, api_timestamp and timestamp of each reading
+        """
+        rng = Random(self.seed * 100003 + seed)
+        level = rng.uniform(10, 100)
+        now = datetime.utcnow()
+        step = self.interval.total_seconds() / 86400
+        for sensor_id in sensor_ids:
+            base = level * rng.uniform(0.5, 1.5)
+            for r in range(per_series):
+                cycle = math.sin(2 * math.pi * r * step)
+                value = base * (1 + 0.3 * cycle) + rng.gauss(0, base * 0.05)
+                yield (sensor_id, '{:.3f}'.format(value),
+                       START + r * self.interval, now)
+
+    def create_trackers(self) -> int:
+        """
+        Create moving sensor trackers and their location data, each tracker
+        follows a random walk
+        :return: Number of locations generated
+        """
+        self.trackers = [Tracker(self.name('tracker', t),
+                                 self.moving_subtheme.id,
+                                 'Synthetic tracker', START)
+                         for t in range(self.n_trackers)]
+        db.session.add_all(self.trackers)
+        db.session.flush()
+
+        (lat_min, lat_max), (lon_min, lon_max) = BOUNDS
+        points = []
+        for tracker in self.trackers:
+            lat = self.rng.uniform(lat_min, lat_max)
+            lon = self.rng.uniform(lon_min, lon_max)
+            for p in range(self.tracker_points):
+                lat += self.rng.gauss(0, 0.0005)
+                lon += self.rng.gauss(0, 0.0005)
+                points.append({
+                    'tracker_id': tracker.id,
+                    'measurement_date': START + p * self.interval,
+                    'latitude': lat, 'longitude': lon,
+                    'speed': abs(self.rng.gauss(5, 2)),
+                    'heading': self.rng.uniform(0, 360),
+                    'elevation': self.rng.uniform(0, 50),
+                    'sat_cnt': self.rng.randint(4, 12), 'fix_quality': 1,
+                    'signal_quality': self.rng.randint(-90, -50),
+                    'battery': self.rng.uniform(20, 100), 'charger': False,
+                    'value': {name: '{:.3f}'.format(self.rng.uniform(0, 100))
+                              for name in TRACKER_ATTRIBUTES}})
+        if points:
+            db.session.execute(LocationData.__table__.insert(), points)
+        return len(points)
+
+    def remove(self) -> None:
+        """ Remove every entity of the city generated with the prefix """
+        pattern = self.prefix.replace('_', r'\_') + '%'
+        store = get_data_store()
+        attributes = Attributes.query.filter(
+            Attributes.name.like(pattern)).all()
+        for attribute in attributes:
+            try:
+                store.drop_table(attribute.table_name)
+            except Exception as e:
+                logger.warning('Unable to drop {}: {}'.format(
+                    attribute.table_name, e))
+                db.session.rollback()
+
+        sensors = Sensor.query.filter(Sensor.name.like(pattern)).all()
+        sensor_ids = [sensor.id for sensor in sensors]
+        location_ids = [sensor.l_id for sensor in sensors]
+        trackers = Tracker.query.filter(Tracker.id.like(pattern)).all()
+        tracker_ids = [tracker.id for tracker in trackers]
+
+        db.session.query(LocationData).filter(
+            LocationData.tracker_id.in_(tracker_ids)).delete(
+            synchronize_session=False)
+        db.session.query(Tracker).filter(Tracker.id.in_(tracker_ids)).delete(
+            synchronize_session=False)
+        db.session.query(SensorAttribute).filter(
+            SensorAttribute.s_id.in_(sensor_ids)).delete(
+            synchronize_session=False)
+        db.session.query(Sensor).filter(Sensor.id.in_(sensor_ids)).delete(
+            synchronize_session=False)
+        db.session.query(Location).filter(Location.id.in_(location_ids)) \
+            .delete(synchronize_session=False)
+        db.session.query(Attributes).filter(
+            Attributes.name.like(pattern)).delete(synchronize_session=False)
+        db.session.query(SubTheme).filter(SubTheme.name.like(pattern)).delete(
+            synchronize_session=False)
+        db.session.query(Theme).filter(Theme.name.like(pattern)).delete(
+            synchronize_session=False)
+        db.session.query(API).filter(API.name.like(pattern)).delete(
+            synchronize_session=False)
+        db.session.query(Unit).filter(Unit.symbol.like(pattern)).delete(
+            synchronize_session=False)
+        db.session.commit()
+        logger.info('Removed {} attributes, {} sensors and {} trackers'.format(
+            len(attributes), len(sensor_ids), len(tracker_ids)))
+
+
+def copy_readings(table_name: str, readings: Iterator[tuple]) -> int:
+    """
+    Bulk load readings in to the configured storage backend with COPY
+    :param table_name: Attribute data table name
+    :param readings: Sensor id, value, api_timestamp and timestamp of each
+                     reading, readings must not already exist
+    :return: Number of readings loaded
+    """
+    store = get_data_store()
+    if store.backend == CONSOLIDATED:
+        target = 'reading (attribute_id, sensor_id, ts, value, raw, timestamp)'
+        attribute_key = ReadingAttribute.key_for(table_name, create=True)
+        sensor_keys = {}
+
+        def row(reading: tuple) -> tuple:
+            s_id, value, api_timestamp, timestamp = reading
+            if s_id not in sensor_keys:
+                sensor_keys.update(ReadingSensor.keys_for([s_id],
+                                                          create=True))
+            return (attribute_key, sensor_keys[s_id], api_timestamp, value,
+                    value, timestamp)
+    else:
+        target = '{} (s_id, value, api_timestamp, timestamp)'.format(
+            store.table(table_name).name)
+
+        def row(reading: tuple) -> tuple:
+            return reading
+    db.session.commit()
+
+    statement = 'COPY {} FROM STDIN WITH CSV'.format(target)
+    connection = db.engine.raw_connection()
+    count = 0
+    try:
+        cursor = connection.cursor()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for reading in readings:
+            writer.writerow(row(reading))
+            count += 1
+            if count % COPY_CHUNK_SIZE == 0:
+                _copy(cursor, statement, buffer)
+        _copy(cursor, statement, buffer)
+        connection.commit()
+    finally:
+        connection.close()
+    # COPY is out of sight of the data stores and the session listeners
+    data_versions.bump([table_name])
+    return count
+
+
+def _copy(cursor, statement: str, buffer: io.StringIO) -> None:
+    """
+    Send the buffered rows to the database and empty the buffer
+    :param cursor: DBAPI cursor
+    :param statement: COPY statement
+    :param buffer: CSV rows
+    """
+    if buffer.tell() == 0:
+        return
+    buffer.seek(0)
+    cursor.copy_expert(statement, buffer)
+    buffer.seek(0)
+    buffer.truncate()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--database', type=str, default=None,
+                        help='Database to generate the city in')
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--attributes', type=int, default=10)
+    parser.add_argument('--readings', type=int, default=100000)
+    parser.add_argument('--themes', type=int, default=3)
+    parser.add_argument('--subthemes', type=int, default=3)
+    parser.add_argument('--attributes-per-sensor', type=int, default=3)
+    parser.add_argument('--interval', type=int, default=15,
+                        help='Minutes between the readings of a sensor')
+    parser.add_argument('--trackers', type=int, default=5)
+    parser.add_argument('--tracker-points', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prefix', type=str, default=PREFIX)
+    parser.add_argument('--remove', action='store_true',
+                        help='Remove the city generated with the prefix')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    overrides = {'CREATE_SCHEMA': True}
+    if args.database:
+        overrides['DATABASE_NAME'] = args.database
+    with create_app(**overrides).app_context():
+        generator = CityGenerator(
+            sensors=args.sensors, attributes=args.attributes,
+            readings=args.readings, themes=args.themes,
+            subthemes=args.subthemes,
+            attributes_per_sensor=args.attributes_per_sensor,
+            interval=args.interval, trackers=args.trackers,
+            tracker_points=args.tracker_points, seed=args.seed,
+            prefix=args.prefix)
+        if args.remove:
+            generator.remove()
+        else:
+            print(json.dumps(generator.generate(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
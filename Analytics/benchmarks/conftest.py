@@ -0,0 +1,96 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+
+def pytest_addoption(parser):
+    from benchmarks.city_generator import PREFIX
+
+    group = parser.getgroup('city', 'synthetic city benchmarked')
+    group.addoption('--city-database', default='test_analysis',
+                    help='Database the city is generated in')
+    group.addoption('--city-sensors', type=int, default=50)
+    group.addoption('--city-attributes', type=int, default=10)
+    group.addoption('--city-readings', type=int, default=100000)
+    group.addoption('--city-trackers', type=int, default=5)
+    group.addoption('--city-tracker-points', type=int, default=200)
+    group.addoption('--city-prefix', default=PREFIX)
+    group.addoption('--city-reuse', action='store_true',
+                    help='Benchmark a previously generated city and keep it')
+
+
+@pytest.fixture(scope='session')
+def app(request):
+    """ Testing version of the flask app on the city database """
+    from app import create_app
+
+    test_app = create_app(
+        DATABASE_NAME=request.config.getoption('--city-database'),
+        TESTING=True)
+    context = test_app.app_context()
+    context.push()
+    yield test_app
+    context.pop()
+
+
+@pytest.fixture(scope='session')
+def city(request, app):
+    """
+    Generate the synthetic city, or reuse it with --city-reuse, and remove it
+    once the session completes
+    :return: Names of the generated attributes and ids of the trackers
+    """
+    from benchmarks.city_generator import CityGenerator
+    from models.attributes import Attributes
+    from models.pin_location_data import Tracker
+
+    option = request.config.getoption
+    generator = CityGenerator(
+        sensors=option('--city-sensors'),
+        attributes=option('--city-attributes'),
+        readings=option('--city-readings'),
+        trackers=option('--city-trackers'),
+        tracker_points=option('--city-tracker-points'),
+        prefix=option('--city-prefix'))
+    pattern = generator.prefix.replace('_', r'\_') + '%'
+
+    reuse = option('--city-reuse')
+    if not (reuse and Attributes.query.filter(
+            Attributes.name.like(pattern)).count()):
+        generator.remove()
+        generator.generate()
+
+    yield {
+        'attributes': sorted(attribute.name for attribute in
+                             Attributes.query.filter(
+                                 Attributes.name.like(pattern))),
+        'trackers': sorted(tracker.id for tracker in Tracker.query.filter(
+            Tracker.id.like(pattern)))
+    }
+
+    if not reuse:
+        generator.remove()
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def auth_header(app, client):
+    """ HTTP authorization header of a temporary admin user """
+    from models.users import Users
+
+    admin_user = Users("Benchmark admin", "benchmark@FCC.com",
+                       Users.generate_hash(b"1234").decode("utf8"), True,
+                       True)
+    admin_user.save()
+    admin_user.commit()
+    response = client.post('/login', data=dict(
+        email="benchmark@FCC.com", password="1234", remember=True))
+    admin_user.delete()
+    admin_user.commit()
+    return {'Authorization': 'Bearer {}'.format(
+        response.get_json()["access_token"])}
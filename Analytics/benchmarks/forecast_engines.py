@@ -0,0 +1,95 @@
+"""
+Benchmark the forecasting engines on recorded series
+
+Backtests every engine on each series, fitting the first 70% and computing
+the MAPE over the remaining 30%, and reports the time taken and the error.
+Series are read from CSV files with api_timestamp and value columns, from
+attribute data tables or, when neither is given, generated.
+
+    python benchmarks/forecast_engines.py --csv readings.csv
+    python benchmarks/forecast_engines.py --attribute-table no2_<uuid> --sensor <sensor-id>
+    python benchmarks/forecast_engines.py --engines seasonal_naive holt_winters arima
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from forecast.engines import backtest, engine_names
+from forecast.series import prepare_series
+
+LIMIT = 10000
+
+
+def csv_series(path: str) -> (list, list):
+    """
+    Read a recorded series from a CSV file
+    :param path: Path of a CSV file with api_timestamp and value columns
+    :return: Values and timestamps
+    """
+    df = pd.read_csv(path, parse_dates=['api_timestamp'])
+    return list(df.value), list(df.api_timestamp)
+
+
+def table_series(table_name: str, sensor_id: str) -> (list, list):
+    """
+    Read a recorded series from an attribute data table
+    :param table_name: Attribute data table name
+    :param sensor_id: Sensor id, all sensors when None
+    :return: Values and timestamps
+    """
+    from app import create_app
+    from models.attribute_data import get_data_store
+
+    with create_app().app_context():
+        rows = get_data_store().by_sensor(table_name, sensor_id, LIMIT)
+        return [float(r.value) for r in rows], [r.api_timestamp for r in rows]
+
+
+def synthetic_series(days: int = 28, seed: int = 0) -> (list, list):
+    """
+    Generate an hourly series with a daily cycle, a trend and noise
+    :param days: Length of the series in days
+    :param seed: Random seed
+    :return: Values and timestamps
+    """
+    rng = np.random.RandomState(seed)
+    timestamps = pd.date_range('2019-01-01', periods=24 * days, freq='H')
+    hours = np.arange(len(timestamps))
+    values = 40 + 15 * np.sin(2 * np.pi * hours / 24) + 0.02 * hours + \
+        rng.normal(0, 3, len(hours))
+    return list(values), list(timestamps)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--csv', nargs='*', default=[])
+    parser.add_argument('--attribute-table', dest='attribute_table')
+    parser.add_argument('--sensor', default=None)
+    parser.add_argument('--engines', nargs='*', default=engine_names())
+    args = parser.parse_args()
+
+    series = {path: csv_series(path) for path in args.csv}
+    if args.attribute_table:
+        series[args.attribute_table] = table_series(args.attribute_table,
+                                                    args.sensor)
+    if not series:
+        series['synthetic hourly'] = synthetic_series()
+
+    print('{:<32}{:<16}{:>10}{:>12}'.format('series', 'engine', 'MAPE',
+                                            'seconds'))
+    for name, (values, timestamps) in series.items():
+        df, freq = prepare_series(values, timestamps)
+        for result in backtest(df, freq, args.engines):
+            mape = 'failed' if result['mape'] is None else \
+                '{:.2f}'.format(result['mape'])
+            print('{:<32}{:<16}{:>10}{:>12.3f}'.format(
+                name[-32:], result['engine'], mape, result['seconds']))
+
+
+if __name__ == '__main__':
+    main()
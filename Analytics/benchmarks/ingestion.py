@@ -0,0 +1,178 @@
+"""
+Benchmark the importers offline
+
+Runs importers end to end against the responses recorded from their
+sources, served by the replay server of importers.recorder, and reports per
+importer the rows inserted per second, the peak memory allocated and the
+number of SQL statements executed, with the time spent in each stage of the
+pipeline. The sync state of each API is reset before every run so no import
+is skipped as unchanged; run against a scratch database.
+
+Record the sources once, then replay them as often as needed:
+
+    python benchmarks/ingestion.py --record --recordings recordings
+    python benchmarks/ingestion.py --recordings recordings --repeat 3
+    python benchmarks/ingestion.py --recordings recordings --apis tfl_bike_points --json results.json
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from db import db
+from importers.http_client import get_client
+from importers.instrumentation import INSERT
+from importers.recorder import RECORD, REPLAY, Recorder, recording_source
+from models.api import API
+from models.api_sync_state import APISyncState
+
+
+class StatementCounter(object):
+    """
+    Count the SQL statements executed by every engine
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        event.listen(Engine, 'before_cursor_execute', self.increment)
+
+    def increment(self, *args) -> None:
+        self.count += 1
+
+    def close(self) -> None:
+        event.remove(Engine, 'before_cursor_execute', self.increment)
+
+
+def run_importer(api: API, counter: StatementCounter,
+                 trace_memory: bool = False) -> dict:
+    """
+    Run the importer of an API once
+    :param api: API entry of the importer
+    :param counter: Statement counter
+    :param trace_memory: Whether to trace the memory allocated, which slows
+                         the run down
+    :return: Outcome, duration, rows inserted, statements executed, peak
+             memory when traced and stage totals of the run
+    """
+    sync_state = APISyncState.find_by_api_id(api.id)
+    if sync_state is not None:
+        db.session.delete(sync_state)
+        db.session.commit()
+
+    _module, _class = api.api_class.rsplit('.', 1)
+    data_class = getattr(importlib.import_module(_module), _class)
+
+    if trace_memory:
+        tracemalloc.start()
+    statements = counter.count
+    start = time.perf_counter()
+    importer, status, error = None, None, None
+    try:
+        with recording_source(api.name):
+            importer = data_class()
+            status = importer.run()
+    except Exception as e:
+        db.session.rollback()
+        error = str(e)
+    seconds = time.perf_counter() - start
+    statements = counter.count - statements
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    stages = importer.metrics.json() if importer is not None else []
+    rows = sum(stage['rows'] for stage in stages if stage['stage'] == INSERT)
+    return {
+        'state': 'error' if error else getattr(status, 'state', 'unknown'),
+        'reason': error or getattr(status, 'reason', None),
+        'seconds': seconds,
+        'rows': rows,
+        'rows_per_second': rows / seconds if seconds else 0.0,
+        'statements': statements,
+        'peak_memory_bytes': peak,
+        'stages': stages
+    }
+
+
+def benchmark(api: API, counter: StatementCounter, repeat: int) -> dict:
+    """
+    Benchmark the importer of an API
+    :param api: API entry of the importer
+    :param counter: Statement counter
+    :param repeat: Number of timed runs
+    :return: The fastest timed run, with the peak memory of an extra traced
+             run
+    """
+    runs = [run_importer(api, counter) for _ in range(repeat)]
+    result = min(runs, key=lambda run: run['seconds'])
+    result['peak_memory_bytes'] = run_importer(
+        api, counter, trace_memory=True)['peak_memory_bytes']
+    return result
+
+
+def print_results(results: {str: dict}) -> None:
+    """
+    Print a table of the benchmark results
+    :param results: Results keyed by API name
+    """
+    print('{:<40}{:>10}{:>10}{:>10}{:>12}{:>12}{:>12}'.format(
+        'API', 'state', 'rows', 'seconds', 'rows/s', 'statements',
+        'peak MiB'))
+    for name, result in sorted(results.items()):
+        print('{:<40}{:>10}{:>10}{:>10.2f}{:>12.0f}{:>12}{:>12.1f}'.format(
+            name[:39], str(result['state'])[:9], result['rows'],
+            result['seconds'], result['rows_per_second'],
+            result['statements'],
+            (result['peak_memory_bytes'] or 0) / 2 ** 20))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--recordings', type=str, default='recordings',
+                        help='Directory of the recordings')
+    parser.add_argument('--record', action='store_true',
+                        help='Record the live sources instead of replaying')
+    parser.add_argument('--apis', nargs='*', default=None,
+                        help='Names of the APIs to run, all by default')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', type=str, default=None,
+                        help='File the results are written to')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        apis = [api for api in API.get_all()
+                if args.apis is None or api.name in args.apis]
+        client = get_client()
+        client.recorder = Recorder(args.recordings,
+                                   RECORD if args.record else REPLAY)
+        counter = StatementCounter()
+        results = {}
+        try:
+            for api in apis:
+                if args.record:
+                    results[api.name] = run_importer(api, counter)
+                else:
+                    results[api.name] = benchmark(api, counter, args.repeat)
+        finally:
+            counter.close()
+            client.close()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark the handling of missing values
+
+Builds readings shaped like the values of attribute tables, numbers mixed
+with blank strings, and reports the time taken and the peak memory
+allocated to remove or fill their missing values with FillMissingValues and
+MissingValues and with the typed pipeline (analysis/missing_values.py), on
+the whole dataset and streamed chunk by chunk. The interpolation and the
+fills per sensor are only offered by the pipeline.
+
+    python benchmarks/missing_values.py
+    python benchmarks/missing_values.py --readings 1000000 --chunk-size 50000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from analysis.missing_values import (BACKWARD_FILL, DEFAULT, FORWARD_FILL,
+                                     INTERPOLATE, MEAN, MEDIAN, REMOVE,
+                                     MissingValuePipeline)
+from resources.fill_missing_value import FillMissingValues
+from resources.missing_values import MissingValues
+
+
+def readings(n_readings: int, n_columns: int, n_sensors: int,
+             blank_ratio: float, seed: int = 0) -> pd.DataFrame:
+    """
+    Build readings with blank values
+    :param n_readings: Number of readings
+    :param n_columns: Number of value columns
+    :param n_sensors: Number of sensors
+    :param blank_ratio: Share of blank values
+    :param seed: Random seed
+    :return: Readings with s_id, api_timestamp and the value columns
+    """
+    rng = np.random.RandomState(seed)
+    frame = pd.DataFrame({
+        's_id': rng.randint(n_sensors, size=n_readings).astype(str),
+        'api_timestamp': pd.date_range('2019-01-01', periods=n_readings,
+                                       freq='min')})
+    for column in range(n_columns):
+        values = rng.normal(40, 10, n_readings).round(2).astype(object)
+        values[rng.rand(n_readings) < blank_ratio] = ''
+        frame['value_{}'.format(column)] = values
+    return frame
+
+
+def measure(function: Callable[[], Any], repeat: int) -> (float, float):
+    """
+    Time a function and measure the memory it allocates
+    :param function: Function
+    :param repeat: Number of runs, the fastest is reported
+    :return: Seconds taken and peak megabytes allocated
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / 1024 ** 2
+
+
+def current(strategy: str, values: pd.DataFrame) -> Callable[[], Any]:
+    """
+    Handle missing values with FillMissingValues and MissingValues
+    :param strategy: Strategy
+    :param values: Value columns
+    :return: Function running the strategy, None when not supported
+    """
+    return {
+        REMOVE: lambda: MissingValues(values).remove_rows(),
+        MEAN: lambda: FillMissingValues(values).mean(),
+        MEDIAN: lambda: FillMissingValues(values).median(),
+        FORWARD_FILL: lambda: FillMissingValues(values).forward_fill(),
+        BACKWARD_FILL: lambda: FillMissingValues(values).backward_fill(),
+        DEFAULT: lambda: FillMissingValues(values).default(0),
+    }.get(strategy)
+
+
+def streamed(pipeline: Callable[[], MissingValuePipeline],
+             frame: pd.DataFrame, chunk_size: int) -> Callable[[], Any]:
+    """
+    Handle missing values chunk by chunk with the pipeline
+    :param pipeline: Function creating the pipeline
+    :param frame: Readings
+    :param chunk_size: Number of readings per chunk
+    :return: Function running the pipeline
+    """
+    def run() -> int:
+        handled = pipeline()
+        chunks = [frame.iloc[start:start + chunk_size]
+                  for start in range(0, len(frame), chunk_size)]
+        for chunk in chunks:
+            handled.partial_fit(chunk)
+        return sum(len(chunk) for chunk in handled.stream(chunks))
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--readings', type=int, default=200000)
+    parser.add_argument('--columns', type=int, default=4)
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--blank-ratio', type=float, default=0.2)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    frame = readings(args.readings, args.columns, args.sensors,
+                     args.blank_ratio)
+    values = frame.drop(['s_id', 'api_timestamp'], axis=1)
+    print('{} readings, {} value columns, {} sensors, {:.0%} blank'.format(
+        args.readings, args.columns, args.sensors, args.blank_ratio))
+    print('{:<16} {:<28} {:>10} {:>10}'.format('strategy', 'implementation',
+                                              'seconds', 'peak MB'))
+
+    for strategy in (REMOVE, MEAN, MEDIAN, FORWARD_FILL, BACKWARD_FILL,
+                     DEFAULT, INTERPOLATE):
+        runs = [('current classes', current(strategy, values)),
+                ('pipeline', lambda: MissingValuePipeline(
+                    strategy).transform(values)),
+                ('pipeline per sensor', lambda: MissingValuePipeline(
+                    strategy, by='s_id', time='api_timestamp').transform(
+                    frame)),
+                ('pipeline per sensor, chunks', streamed(
+                    lambda: MissingValuePipeline(strategy, by='s_id',
+                                                 time='api_timestamp'),
+                    frame, args.chunk_size))]
+        for name, run in runs:
+            if run is None:
+                print('{:<16} {:<28} {:>10} {:>10}'.format(
+                    strategy, name, '-', '-'))
+                continue
+            seconds, peak = measure(run, args.repeat)
+            print('{:<16} {:<28} {:>10.3f} {:>10.1f}'.format(
+                strategy, name, seconds, peak))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Benchmark the serialisation and compression of widget payloads
+
+Builds payloads shaped like the responses of /data (raw readings in the
+rows and columnar formats, grouped readings, harmonised wide readings) and
+of /widgets/snapshot, and reports the time taken to produce the response
+body and its size, uncompressed and compressed, with the JSON encoder of flask-restful and with the output layer
+(output.py). Grouped and harmonised payloads are measured as the resources
+produce them: parsed from DataFrame.to_json and serialised again by
+flask-restful, and embedded as RawJSON by the output layer.
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --readings 100000 --repeat 5
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import output
+from output import frame_records
+
+
+def raw_readings(readings: int, sensors: int, seed: int = 0) -> list:
+    """
+    Build a raw /data response
+    :param readings: Number of readings
+    :param sensors: Number of sensors
+    :param seed: Random seed
+    :return: Attribute with its readings, as returned by /data
+    """
+    rng = np.random.RandomState(seed)
+    timestamps = pd.date_range('2019-01-01', periods=readings, freq='min')
+    values = rng.normal(40, 10, readings).round(2)
+    return [{
+        'Attribute_Table': 'no2_7f6d2bd6c1c84e0a8d8a1e56d54bd5a5',
+        'Attribute_id': 'no2_7f6d2bd6c1c84e0a8d8a1e56d54bd5a5',
+        'Attribute_Name': 'NO2',
+        'Attribute_Description': 'Nitrogen dioxide',
+        'Attribute_Unit_Description': 'Micrograms per cubic metre',
+        'Attribute_Unit_Value': 'ug/m3',
+        'Total_Records': readings,
+        'Attribute_Values': [{
+            'Attribute_Name': 'NO2',
+            'Attribute_id': 'no2_7f6d2bd6c1c84e0a8d8a1e56d54bd5a5',
+            'Sensor_id': 'sensor-{}'.format(i % sensors),
+            'Timestamp': str(timestamp),
+            'Value': str(value),
+            'Name': 'Sensor {}'.format(i % sensors),
+            'Latitude': 51.5 + (i % sensors) / 1000,
+            'Longitude': -0.12 - (i % sensors) / 1000
+        } for i, (timestamp, value) in enumerate(zip(timestamps, values))]
+    }]
+
+
+def columnar_readings(rows: list) -> list:
+    """
+    Convert a raw /data response to the columnar format
+    :param rows: Raw /data response
+    :return: Attributes with their sensors and parallel arrays of readings
+    """
+    columnar = []
+    for attribute in rows:
+        readings = attribute['Attribute_Values']
+        sensors, index = [], {}
+        for reading in readings:
+            if reading['Sensor_id'] not in index:
+                index[reading['Sensor_id']] = len(sensors)
+                sensors.append({key: reading[key] for key in (
+                    'Sensor_id', 'Name', 'Latitude', 'Longitude')})
+        columns = {key: value for key, value in attribute.items()
+                   if key != 'Attribute_Values'}
+        columns.update({
+            'Sensors': sensors,
+            'Sensor_index': np.array([index[r['Sensor_id']]
+                                      for r in readings], dtype=np.int32),
+            'Timestamp': pd.to_datetime([r['Timestamp'] for r in readings])
+                .values.astype('datetime64[ms]').astype(np.int64),
+            'Value': np.array([float(r['Value']) for r in readings])})
+        columnar.append(columns)
+    return columnar
+
+
+def grouped_frame(readings: int, sensors: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Build the DataFrame request_grouped_data serialises
+    :param readings: Number of rows
+    :param sensors: Number of sensors
+    :param seed: Random seed
+    :return: Hourly readings per sensor
+    """
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'Attribute_Name': 'NO2',
+        'Attribute_Table': 'no2_7f6d2bd6c1c84e0a8d8a1e56d54bd5a5',
+        'Sensor_id': ['sensor-{}'.format(i % sensors)
+                      for i in range(readings)],
+        'Timestamp': pd.date_range('2019-01-01', periods=readings, freq='H'),
+        'Value': rng.normal(40, 10, readings).round(2),
+        'Name': ['Sensor {}'.format(i % sensors) for i in range(readings)],
+        'Latitude': 51.5 + np.arange(readings) % sensors / 1000,
+        'Longitude': -0.12 - np.arange(readings) % sensors / 1000})
+
+
+def wide_frame(readings: int, attributes: int = 4,
+               seed: int = 0) -> pd.DataFrame:
+    """
+    Build the pivoted DataFrame request_harmonised_data serialises in the
+    wide format
+    :param readings: Number of timestamps
+    :param attributes: Number of attributes
+    :param seed: Random seed
+    :return: Readings of every attribute by timestamp
+    """
+    rng = np.random.RandomState(seed)
+    timestamps = pd.date_range('2019-01-01', periods=readings, freq='H')
+    df = pd.DataFrame({
+        'Timestamp': np.repeat(timestamps, attributes),
+        'Attribute_Name': np.tile(['attribute_{}'.format(i)
+                                   for i in range(attributes)], readings),
+        'Value': rng.normal(40, 10, readings * attributes),
+        'Latitude': 51.5, 'Longitude': -0.12})
+    df['timestamp'] = df['Timestamp'].astype('int64') / 10 ** 6
+    return df.pivot_table(index='Timestamp', columns='Attribute_Name',
+                          values=['Value', 'timestamp', 'Latitude',
+                                  'Longitude'])
+
+
+WIDE_REPLACEMENTS = [('["', ''), ('"]', ''), ('","', ',')]
+
+
+def flask_restful_body(data: Any) -> bytes:
+    """
+    Serialise a response as the default representation of flask-restful
+    :param data: Response data
+    :return: Response body
+    """
+    return (json.dumps(data) + '\n').encode('utf8')
+
+
+def payloads(readings: int, sensors: int, widgets: int) -> {str: (
+        Callable[[], bytes], Callable[[], bytes])}:
+    """
+    Build the representative payloads
+    :param readings: Number of readings of a widget
+    :param sensors: Number of sensors
+    :param widgets: Number of widgets of the snapshot
+    :return: For each payload, functions producing its response body with
+             flask-restful and with the output layer
+    """
+    raw = raw_readings(readings, sensors)
+    columnar = columnar_readings(raw)
+    columnar_lists = [{key: value.tolist() if isinstance(value, np.ndarray)
+                       else value for key, value in attribute.items()}
+                      for attribute in columnar]
+    grouped = grouped_frame(readings, sensors)
+    wide = wide_frame(readings // 4)
+
+    def wide_json() -> str:
+        text = wide.to_json(orient='records')
+        for old, new in WIDE_REPLACEMENTS:
+            text = text.replace(old, new)
+        return text
+
+    snapshot = {'widgets': [{'id': i, 'type': 'plot'}
+                            for i in range(widgets)],
+                'data': {str(i): {'status': 200, 'data': raw}
+                         for i in range(widgets)}}
+    return {
+        'raw readings': (lambda: flask_restful_body(raw),
+                         lambda: output.dumps(raw) + b'\n'),
+        'columnar readings': (lambda: flask_restful_body(columnar_lists),
+                              lambda: output.dumps(columnar) + b'\n'),
+        'grouped readings': (
+            lambda: flask_restful_body(json.loads(
+                grouped.to_json(orient='records'))),
+            lambda: output.dumps(frame_records(grouped)) + b'\n'),
+        'harmonised wide': (
+            lambda: flask_restful_body(json.loads(wide_json())),
+            lambda: output.dumps(frame_records(wide, WIDE_REPLACEMENTS)) +
+            b'\n'),
+        'snapshot': (lambda: flask_restful_body(snapshot),
+                     lambda: output.dumps(snapshot) + b'\n'),
+    }
+
+
+def best_time(function: Callable[[], Any], repeat: int) -> (float, Any):
+    """
+    Time a function
+    :param function: Function to time
+    :param repeat: Number of runs
+    :return: The fastest run in seconds and the result of the function
+    """
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--readings', type=int, default=20000)
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--widgets', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--gzip-level', type=int,
+                        default=output.DEFAULT_GZIP_LEVEL)
+    parser.add_argument('--brotli-quality', type=int,
+                        default=output.DEFAULT_BROTLI_QUALITY)
+    args = parser.parse_args()
+
+    encodings = [('identity', lambda body: body),
+                 ('gzip', lambda body: gzip.compress(
+                     body, compresslevel=args.gzip_level))]
+    if output.brotli is not None:
+        encodings.append(('br', lambda body: output.brotli.compress(
+            body, quality=args.brotli_quality)))
+
+    print('JSON encoder: {}'.format(
+        'orjson' if output.orjson is not None else 'json'))
+    print('{:<20}{:<16}{:<10}{:>12}{:>14}'.format(
+        'payload', 'encoder', 'encoding', 'ms', 'bytes'))
+    for name, encoders in payloads(args.readings, args.sensors,
+                                   args.widgets).items():
+        for encoder, encode in zip(('flask-restful', 'output'), encoders):
+            encode_seconds, body = best_time(encode, args.repeat)
+            for encoding, compress in encodings:
+                seconds, compressed = best_time(lambda: compress(body),
+                                                args.repeat)
+                print('{:<20}{:<16}{:<10}{:>12.1f}{:>14,}'.format(
+                    name, encoder, encoding,
+                    (encode_seconds + seconds) * 1000, len(compressed)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark the per table and consolidated attribute data layouts
+
+Generates synthetic readings for a number of attributes in both layouts and
+times the queries used by the /data endpoint, the exports, the attribute
+range updates and the importers. The synthetic attribute tables are removed
+once the benchmark completes.
+
+    python benchmarks/storage_layout.py --attributes 20 --sensors 50 --readings 200
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from random import Random
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from db import db
+from models.attribute_data import ConsolidatedStore, PerTableStore
+
+TABLE_PREFIX = 'bench_storage_'
+
+
+def generate_rows(n_sensors: int, n_readings: int, seed: int) -> [dict]:
+    """
+    Generate synthetic readings
+    :param n_sensors: Number of sensors reporting the attribute
+    :param n_readings: Number of readings per sensor
+    :param seed: Random seed
+    :return: Rows with s_id, value, api_timestamp and timestamp
+    """
+    rng = Random(seed)
+    start = datetime(2019, 1, 1)
+    now = datetime.utcnow()
+    return [{
+        's_id': 'bench-sensor-{:04d}'.format(s),
+        'value': str(round(rng.gauss(20, 5), 3)),
+        'api_timestamp': start + timedelta(minutes=15 * r),
+        'timestamp': now
+    } for s in range(n_sensors) for r in range(n_readings)]
+
+
+def timed(func, repeat: int) -> float:
+    """
+    Time a callable
+    :param func: Callable to time
+    :param repeat: Number of repetitions
+    :return: Mean time in milliseconds
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+        db.session.rollback()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def run_queries(store, tables: [str], repeat: int) -> {str: float}:
+    """
+    Time the read paths of a store over all benchmark tables
+    :param store: AttributeDataStore to benchmark
+    :param tables: Attribute data table names
+    :param repeat: Number of repetitions
+    :return: Mean time in milliseconds per query type
+    """
+    fromdate, todate = datetime(2019, 1, 1), datetime(2019, 1, 2)
+    return {
+        'count': timed(lambda: [store.count(t) for t in tables], repeat),
+        'latest 30': timed(lambda: [store.latest(t, 30) for t in tables],
+                           repeat),
+        'between 1 day': timed(
+            lambda: [store.between(t, fromdate, todate) for t in tables],
+            repeat),
+        'by sensor': timed(
+            lambda: [store.by_sensor(t, 'bench-sensor-0001', 10000)
+                     for t in tables], repeat),
+        'min / max': timed(
+            lambda: [(store.minimum(t), store.maximum(t)) for t in tables],
+            repeat),
+        'export 1000': timed(lambda: [store.read_frame(t, 1000)
+                                      for t in tables], repeat),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--attributes', type=int, default=20)
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--readings', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        per_table, consolidated = PerTableStore(), ConsolidatedStore()
+        tables = [TABLE_PREFIX + str(i) for i in range(args.attributes)]
+        per_table.create_tables(tables)
+        consolidated.create_tables(tables)
+        db.session.commit()
+
+        results = {}
+        try:
+            insert_times = {'per_table': 0.0, 'consolidated': 0.0}
+            for i, table in enumerate(tables):
+                rows = generate_rows(args.sensors, args.readings, i)
+
+                start = time.perf_counter()
+                db.session.execute(per_table.table(table).insert(), rows)
+                db.session.commit()
+                insert_times['per_table'] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                consolidated.insert(table, rows)
+                insert_times['consolidated'] += time.perf_counter() - start
+
+            results['per_table'] = run_queries(per_table, tables,
+                                               args.repeat)
+            results['consolidated'] = run_queries(consolidated, tables,
+                                                  args.repeat)
+        finally:
+            for table in tables:
+                per_table.drop_table(table)
+                consolidated.drop_table(table)
+
+        print('{} attributes x {} sensors x {} readings'.format(
+            args.attributes, args.sensors, args.readings))
+        print('{:<16}{:>14}{:>14}'.format('', 'per_table', 'consolidated'))
+        print('{:<16}{:>12.1f}ms{:>12.1f}ms'.format(
+            'bulk insert', insert_times['per_table'] * 1000,
+            insert_times['consolidated'] * 1000))
+        for query in results['per_table']:
+            print('{:<16}{:>12.1f}ms{:>12.1f}ms'.format(
+                query, results['per_table'][query],
+                results['consolidated'][query]))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,14 +3,20 @@
 from __future__ import absolute_import
 
 import logging
+import os
+import threading
 
 import flask
+import redis
 from celery import Celery
 from settings.get_config_decorator import GetConfig
 
 logging.basicConfig(level='INFO')
 logger = logging.getLogger(__name__)
 
+_redis_clients = {}
+_redis_lock = threading.Lock()
+
 
 def make_celery(app: flask.app.Flask) -> Celery:
     """
@@ -19,7 +25,9 @@ def make_celery(app: flask.app.Flask) -> Celery:
     :param app: The Flask application
     """
 
-    celery = Celery(app.import_name)
+    celery = Celery(app.import_name, include=['forecast.precompute',
+                                             'importers.tasks',
+                                             'analysis.tasks'])
     celery.config_from_object(GetConfig.configure('celery'))
     celery.conf.update(app.config)
     logger.info("Celery configurations: BROKER_URL= {} RESULT_BANKEND = {} "
@@ -33,3 +41,18 @@ def make_celery(app: flask.app.Flask) -> Celery:
 
     celery.Task = ContextTask
     return celery
+
+
+def redis_client(setting: str = 'CELERY_RESULT_BACKEND') -> redis.StrictRedis:
+    """
+    Get the Redis client of the broker or the result backend. One client, and
+    so one connection pool, is created per process and URL
+    :param setting: Celery setting holding the Redis URL
+    :return: Redis client
+    """
+    key = (os.getpid(), GetConfig.setting('celery', setting,
+                                          'redis://localhost:6379/0'))
+    with _redis_lock:
+        if key not in _redis_clients:
+            _redis_clients[key] = redis.StrictRedis.from_url(key[1])
+        return _redis_clients[key]
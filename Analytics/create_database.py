@@ -0,0 +1,46 @@
+"""
+Script to create the database schema
+
+Creates the tables of every model that do not exist yet and adds the columns
+and indexes introduced since existing tables were created. The application no longer creates the schema when it starts,
+run this once when deploying and whenever models are added:
+    python manage.py create_db
+
+The revocations of the revoked tokens table are then loaded into Redis.
+"""
+import logging
+
+from flask_script import Command
+
+from db import db
+from models.revoked_tokens import RevokedTokens
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+# Idempotent changes to tables created by earlier versions
+UPGRADES = [
+    'ALTER TABLE revoked_tokens ADD COLUMN IF NOT EXISTS expires TIMESTAMP',
+    'CREATE INDEX IF NOT EXISTS ix_revoked_tokens_jti ON revoked_tokens (jti)',
+    'ALTER TABLE predictionresults ADD COLUMN IF NOT EXISTS model_version '
+    'INTEGER',
+]
+
+
+class CreateDatabase(Command):
+    """
+    Create the tables of all models
+    """
+
+    def run(self) -> None:
+        """
+        Execute Command
+        """
+        db.create_all()
+        for statement in UPGRADES:
+            db.session.execute(statement)
+        db.session.commit()
+        logger.info('Created the tables of {} models'.format(
+            len(db.metadata.tables)))
+        if RevokedTokens.warm_cache():
+            logger.info('Loaded the revoked tokens cache')
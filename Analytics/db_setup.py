@@ -70,7 +70,7 @@ def create_minimal_db_entries():
     :raises ValueError: If any dependencies are not created succesfully
     """
     try:
-        app = create_app()
+        app = create_app(CREATE_SCHEMA=True)
         create_unit()
         theme = create_theme()
         create_sub_theme(theme)
@@ -22,7 +22,7 @@ from models.api import API
 from models.sensor import Sensor
 from models.sensor_attribute import SensorAttribute
 from models.attributes import Attributes
-from models.attribute_data import ModelClass
+from models.attribute_data import get_data_store
 from flask_script import Command, Option
 
 class DropDatasource(Command):
@@ -74,9 +74,9 @@ class DropDatasource(Command):
 						.filter(Attributes.id.in_((attribute_ids))).all()
 
 
+		store = get_data_store()
 		for attribute in attributes:
-			model = ModelClass(attribute.table_name.lower())
-			model.__table__.drop(db.engine)
+			store.drop_table(attribute.table_name)
 			db.session.delete(attribute)
 	
 	
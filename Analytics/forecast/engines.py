@@ -0,0 +1,440 @@
+"""
+Forecasting engines
+
+Every engine fits a regularly spaced series (the ds and y columns produced
+by forecast.series.prepare_series) and forecasts the values that follow it.
+Prophet is the most accurate on long, strongly seasonal series but needs
+seconds to minutes per fit. Seasonal naive, Holt-Winters and ARIMA are plain
+numpy and fit in milliseconds.
+
+Engines are looked up by name with get_engine. The AUTO mode is resolved by
+forecast.service, which backtests the engines from cheapest to most
+expensive and uses the first whose MAPE is within tolerance.
+"""
+import logging
+import time
+from typing import Any, Union
+
+import numpy as np
+import pandas as pd
+
+from forecast.series import holdout_error, split_holdout
+from settings import GetConfig
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+AUTO = 'auto'
+DEFAULT_INTERVAL_WIDTH = 0.8
+
+
+def season_length(freq: str, n_obs: int) -> int:
+    """
+    Get the number of periods in a season of a series. Sub daily series are
+    assumed to repeat daily, daily series weekly and weekly series yearly
+    :param freq: Frequency of the series
+    :param n_obs: Number of observations, at least two seasons are required
+    :return: The season length, 1 if the series has no usable season
+    """
+    try:
+        seconds = pd.Timedelta(pd.tseries.frequencies.to_offset(
+            freq)).total_seconds()
+    except ValueError:
+        return 1
+
+    if seconds <= 0:
+        return 1
+    if seconds < 86400:
+        m = int(round(86400 / seconds))
+    elif seconds == 86400:
+        m = 7
+    elif seconds == 7 * 86400:
+        m = 52
+    else:
+        m = 1
+
+    return m if m > 1 and n_obs >= 2 * m else 1
+
+
+def fill_gaps(df: pd.DataFrame) -> np.ndarray:
+    """
+    Interpolate the gaps left by resampling
+    :param df: Series with the columns ds and y
+    :return: Values of the series without NaN
+    :raises ValueError: If the series holds no values
+    """
+    y = df.y.astype(float).interpolate(limit_direction='both').values
+    if len(y) == 0 or np.isnan(y).all():
+        raise ValueError('Series holds no values to forecast')
+    return y
+
+
+def future_index(last_ds: Any, n_pred: int, freq: str) -> pd.DatetimeIndex:
+    """
+    Time stamps of the periods following a series
+    :param last_ds: Time stamp of the last observation
+    :param n_pred: Number of periods
+    :param freq: Frequency of the series
+    :return: Time stamps of the next n_pred periods
+    """
+    return pd.date_range(start=last_ds, periods=n_pred + 1, freq=freq)[1:]
+
+
+def interval_width() -> float:
+    """
+    Width of the forecast intervals of every engine, Prophet's default of
+    80% unless configured
+    :return: Probability covered by the interval
+    """
+    return float(GetConfig.setting('forecast', 'interval_width',
+                                   DEFAULT_INTERVAL_WIDTH))
+
+
+def forecast_frame(ds: pd.DatetimeIndex, yhat: np.ndarray,
+                   sigma: np.ndarray) -> pd.DataFrame:
+    """
+    Build a forecast with a normal interval of the configured width
+    :param ds: Time stamps of the forecast
+    :param yhat: Forecast values
+    :param sigma: Standard deviation of the error at each step
+    :return: DataFrame with the columns ds, yhat, yhat_upper and yhat_lower
+    """
+    from scipy.stats import norm
+
+    z = norm.ppf(0.5 + interval_width() / 2)
+    return pd.DataFrame({'ds': ds, 'yhat': yhat,
+                         'yhat_upper': yhat + z * sigma,
+                         'yhat_lower': yhat - z * sigma})
+
+
+class ForecastEngine(object):
+    """
+    Base forecasting engine
+    """
+    name = None
+    label = None
+    cost = 0
+
+    def fit(self, df: pd.DataFrame, freq: str,
+            init: Union[dict, None] = None) -> Any:
+        """
+        Fit the engine to a series
+        :param df: Series with the columns ds and y
+        :param freq: Frequency of the series
+        :param init: Parameters of a previous fit to warm start from
+        :return: Picklable fitted state
+        """
+        raise NotImplementedError
+
+    def predict(self, fitted: Any, n_pred: int, freq: str) -> pd.DataFrame:
+        """
+        Forecast the values following the fitted series
+        :param fitted: Fitted state returned by fit
+        :param n_pred: Number of values to forecast
+        :param freq: Frequency of the series
+        :return: DataFrame with the columns ds, yhat, yhat_upper and
+                 yhat_lower
+        """
+        raise NotImplementedError
+
+    def params(self, fitted: Any) -> Union[dict, None]:
+        """
+        Extract JSON serialisable parameters to warm start the next fit from
+        :param fitted: Fitted state returned by fit
+        :return: Parameters or None if the engine does not warm start
+        """
+        return None
+
+    def evaluate(self, df: pd.DataFrame, freq: str,
+                 init: Union[dict, None] = None) -> float:
+        """
+        Backtest the engine, fitting the start of the series and computing
+        the MAPE over the rest of it
+        :param df: Series with the columns ds and y
+        :param freq: Frequency of the series
+        :param init: Parameters to warm start the fit from
+        :return: The holdout MAPE
+        """
+        train, n_holdout = split_holdout(df)
+        fitted = self.fit(train, freq, init)
+        return holdout_error(df, self.predict(fitted, n_holdout,
+                                              freq).yhat.values)
+
+
+class SeasonalNaive(ForecastEngine):
+    """
+    Repeat the last observed season
+    """
+    name = 'seasonal_naive'
+    label = 'SeasonalNaive'
+    cost = 1
+
+    def fit(self, df: pd.DataFrame, freq: str,
+            init: Union[dict, None] = None) -> dict:
+        y = fill_gaps(df)
+        m = season_length(freq, len(y))
+        errors = y[m:] - y[:-m] if len(y) > m else np.zeros(1)
+        return {'last_ds': df.ds.iloc[-1], 'season': y[-m:], 'm': m,
+                'sigma': float(np.std(errors))}
+
+    def predict(self, fitted: dict, n_pred: int,
+                freq: str) -> pd.DataFrame:
+        m = fitted['m']
+        steps = np.arange(n_pred)
+        yhat = fitted['season'][steps % m]
+        sigma = fitted['sigma'] * np.sqrt(np.ceil((steps + 1) / m))
+        return forecast_frame(future_index(fitted['last_ds'], n_pred, freq),
+                              yhat, sigma)
+
+
+class HoltWinters(ForecastEngine):
+    """
+    Additive Holt-Winters exponential smoothing. The smoothing parameters are
+    chosen by grid search on a cold fit and reused on a warm fit
+    """
+    name = 'holt_winters'
+    label = 'HoltWinters'
+    cost = 2
+
+    ALPHAS = (0.1, 0.3, 0.5, 0.8)
+    BETAS = (0.01, 0.1, 0.3)
+    GAMMAS = (0.05, 0.2, 0.5)
+
+    @staticmethod
+    def smooth(y: np.ndarray, m: int, alpha: float, beta: float,
+               gamma: float) -> (float, float, float, np.ndarray, float):
+        """
+        Run the smoothing recursions over a series
+        :param y: Values of the series
+        :param m: Season length
+        :param alpha: Level smoothing
+        :param beta: Trend smoothing
+        :param gamma: Season smoothing
+        :return: Sum of squared one step errors, final level, trend and
+                 season, and the standard deviation of the one step errors
+        """
+        if m > 1:
+            level = y[:m].mean()
+            trend = (y[m:2 * m].mean() - level) / m
+            season = y[:m] - level
+        else:
+            level = y[0]
+            trend = y[1] - y[0] if len(y) > 1 else 0.0
+            season = np.zeros(1)
+            gamma = 0.0
+
+        season = season.astype(float).copy()
+        sse, errors = 0.0, []
+        for t in range(len(y)):
+            i = t % m
+            s = season[i]
+            error = y[t] - (level + trend + s)
+            sse += error * error
+            errors.append(error)
+            new_level = alpha * (y[t] - s) + (1 - alpha) * (level + trend)
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            season[i] = gamma * (y[t] - new_level) + (1 - gamma) * s
+            level = new_level
+
+        # rotate the season so it starts with the period following the series
+        season = np.roll(season, -(len(y) % m))
+        return sse, level, trend, season, float(np.std(errors))
+
+    def fit(self, df: pd.DataFrame, freq: str,
+            init: Union[dict, None] = None) -> dict:
+        y = fill_gaps(df)
+        m = season_length(freq, len(y))
+
+        if init and init.get('m') == m:
+            candidates = [(init['alpha'], init['beta'], init['gamma'])]
+        else:
+            candidates = [(a, b, g) for a in self.ALPHAS for b in self.BETAS
+                          for g in (self.GAMMAS if m > 1 else (0.0,))]
+
+        best = None
+        for alpha, beta, gamma in candidates:
+            result = self.smooth(y, m, alpha, beta, gamma)
+            if best is None or result[0] < best[1][0]:
+                best = ((alpha, beta, gamma), result)
+
+        (alpha, beta, gamma), (_, level, trend, season, sigma) = best
+        return {'last_ds': df.ds.iloc[-1], 'm': m, 'alpha': alpha,
+                'beta': beta, 'gamma': gamma, 'level': level, 'trend': trend,
+                'season': season, 'sigma': sigma}
+
+    def predict(self, fitted: dict, n_pred: int,
+                freq: str) -> pd.DataFrame:
+        steps = np.arange(1, n_pred + 1)
+        yhat = fitted['level'] + steps * fitted['trend'] + \
+            fitted['season'][(steps - 1) % fitted['m']]
+        sigma = fitted['sigma'] * np.sqrt(steps)
+        return forecast_frame(future_index(fitted['last_ds'], n_pred, freq),
+                              yhat, sigma)
+
+    def params(self, fitted: dict) -> dict:
+        return {'m': fitted['m'], 'alpha': fitted['alpha'],
+                'beta': fitted['beta'], 'gamma': fitted['gamma']}
+
+
+class Arima(ForecastEngine):
+    """
+    ARIMA(p, 1, 0) with drift and, for seasonal series, a seasonal
+    autoregressive term, fitted by least squares
+    """
+    name = 'arima'
+    label = 'ARIMA'
+    cost = 3
+
+    MAX_ORDER = 8
+
+    def fit(self, df: pd.DataFrame, freq: str,
+            init: Union[dict, None] = None) -> dict:
+        y = fill_gaps(df)
+        x = np.diff(y)
+        m = season_length(freq, len(y))
+        p = max(1, min(self.MAX_ORDER, len(x) // 10))
+        lags = list(range(1, p + 1))
+        if m > p and len(x) > 3 * m:
+            lags.append(m)
+
+        start = max(lags)
+        if len(x) <= start + 1:
+            raise ValueError('Series is too short for ARIMA')
+
+        design = np.column_stack(
+            [np.ones(len(x) - start)] +
+            [x[start - lag:len(x) - lag] for lag in lags])
+        coef, _, _, _ = np.linalg.lstsq(design, x[start:], rcond=None)
+        residuals = x[start:] - design.dot(coef)
+        return {'last_ds': df.ds.iloc[-1], 'last_y': y[-1],
+                'history': x[-start:], 'lags': lags, 'coef': coef,
+                'sigma': float(np.std(residuals))}
+
+    def predict(self, fitted: dict, n_pred: int,
+                freq: str) -> pd.DataFrame:
+        history = list(fitted['history'])
+        coef, lags = fitted['coef'], fitted['lags']
+        diffs = []
+        for _ in range(n_pred):
+            x_next = coef[0] + sum(c * history[-lag]
+                                   for c, lag in zip(coef[1:], lags))
+            history.append(x_next)
+            diffs.append(x_next)
+
+        yhat = fitted['last_y'] + np.cumsum(diffs)
+        sigma = fitted['sigma'] * np.sqrt(np.arange(1, n_pred + 1))
+        return forecast_frame(future_index(fitted['last_ds'], n_pred, freq),
+                              yhat, sigma)
+
+
+class ProphetEngine(ForecastEngine):
+    """
+    Facebook Prophet, warm started from the parameters of the previous fit.
+    fbprophet is only imported once the engine is used
+    """
+    name = 'prophet'
+    label = 'Prophet'
+    cost = 10
+
+    def __init__(self, uncertainty_samples: Union[int, None] = None) -> None:
+        """
+        Initialise ProphetEngine
+        :param uncertainty_samples: Number of samples used to estimate the
+                                    forecast interval
+        """
+        if uncertainty_samples is None:
+            uncertainty_samples = GetConfig.setting(
+                'forecast', 'prophet_uncertainty_samples', 1000)
+        self.uncertainty_samples = int(uncertainty_samples)
+
+    def fit(self, df: pd.DataFrame, freq: str,
+            init: Union[dict, None] = None) -> Any:
+        from fbprophet import Prophet
+
+        if init:
+            try:
+                return Prophet(
+                    interval_width=interval_width(),
+                    uncertainty_samples=self.uncertainty_samples).fit(
+                    df, init=self.stan_init(init))
+            except Exception as e:
+                logger.info('Warm start failed, fitting cold: {}'.format(e))
+        return Prophet(interval_width=interval_width(),
+                       uncertainty_samples=self.uncertainty_samples).fit(df)
+
+    def predict(self, fitted: Any, n_pred: int, freq: str) -> pd.DataFrame:
+        future = fitted.make_future_dataframe(periods=n_pred, freq=freq,
+                                              include_history=False)
+        return fitted.predict(future)
+
+    def params(self, fitted: Any) -> dict:
+        return {name: np.asarray(value).tolist()
+                for name, value in fitted.params.items()}
+
+    @staticmethod
+    def stan_init(params: dict) -> dict:
+        """
+        Turn stored parameters in to initial values for the Stan optimiser
+        :param params: Parameters returned by params()
+        :return: Initial values for Prophet.fit
+        """
+        init = {}
+        for name in ['k', 'm', 'sigma_obs']:
+            init[name] = np.asarray(params[name]).ravel()[0]
+        for name in ['delta', 'beta']:
+            init[name] = np.asarray(params[name])[0]
+        return init
+
+
+ENGINES = {engine.name: engine for engine in
+           (SeasonalNaive, HoltWinters, Arima, ProphetEngine)}
+_instances = {}
+
+
+def engine_names() -> [str]:
+    """
+    Names accepted by get_engine, cheapest first
+    :return: Engine names
+    """
+    return [name for name, _ in sorted(ENGINES.items(),
+                                       key=lambda item: item[1].cost)]
+
+
+def get_engine(name: Union[str, None] = None) -> ForecastEngine:
+    """
+    Get a forecasting engine by name
+    :param name: Engine name, the configured default engine when None
+    :return: The forecasting engine
+    :raises ValueError: If the engine does not exist
+    """
+    if name is None:
+        name = GetConfig.setting('forecast', 'default_engine',
+                                 ProphetEngine.name)
+    if name not in ENGINES:
+        raise ValueError('Unknown forecasting engine {}, expected one of '
+                         '{}'.format(name, ', '.join(engine_names())))
+    if name not in _instances:
+        _instances[name] = ENGINES[name]()
+    return _instances[name]
+
+
+def backtest(df: pd.DataFrame, freq: str,
+             names: Union[list, None] = None) -> [dict]:
+    """
+    Backtest engines on a series
+    :param df: Series with the columns ds and y
+    :param freq: Frequency of the series
+    :param names: Engines to backtest, all engines when None
+    :return: Engine name, holdout MAPE and fit seconds per engine
+    """
+    results = []
+    for name in names or engine_names():
+        start = time.perf_counter()
+        try:
+            mape = get_engine(name).evaluate(df, freq)
+        except Exception as e:
+            logger.info('{} failed to backtest: {}'.format(name, e))
+            mape = None
+        results.append({'engine': name, 'mape': mape,
+                        'seconds': time.perf_counter() - start})
+    return results
@@ -0,0 +1,248 @@
+"""
+Precomputation of popular forecasts
+
+Once an importer has finished, the forecasts users request most often on the
+attribute tables it feeds are refreshed in the Celery workers, so requests
+made through /data?predictions=True are answered from a fresh cache instead
+of waiting on a fit.
+
+Popularity is read from the prediction access history: the number of users
+who requested the results of an (attribute table, sensor, engine)
+combination within the lookback period. The request time is kept on the
+link between a user and a result, refreshes move the links onto the new
+result without touching it, so a combination nobody has requested during
+the lookback period is no longer refreshed. The most popular stale
+combinations are refreshed, at the longest horizon requested, until the
+estimated fit time, taken from the fit times of the stored forecast models,
+exhausts the compute budget of the cycle.
+
+    forecast:
+      precompute_budget_seconds: 600
+      precompute_lookback_days: 7
+      precompute_max_series: 20
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Union
+
+import celery
+from celery import group
+from celery.utils.log import get_task_logger
+from kombu.exceptions import OperationalError
+from sqlalchemy import desc, distinct, func
+
+from db import db
+from forecast.engines import ENGINES
+from models.api import API
+from models.attribute_data import get_data_store
+from models.attributes import Attributes
+from models.forecast_model import ALL_SENSORS, ForecastModel
+from models.prediction_results import PredictionResults
+from models.reading import to_float
+from models.sensor import Sensor
+from models.sensor_attribute import SensorAttribute
+from models.user_predictions import UserPredictions
+from settings import GetConfig
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+celery_logger = get_task_logger(__name__)
+
+DEFAULT_BUDGET_SECONDS = 600
+DEFAULT_LOOKBACK_DAYS = 7
+DEFAULT_MAX_SERIES = 20
+DEFAULT_FIT_SECONDS = 30.0
+MIN_READINGS = 100
+WINDOW = 10000
+
+
+def importer_tables(class_name: str) -> [str]:
+    """
+    Find the attribute tables an importer feeds
+    :param class_name: Name of the class that implements the importer
+    :return: Attribute table names
+    """
+    api = API.get_by_api_class(class_name)
+    if api is None:
+        return []
+    rows = db.session.query(Attributes.table_name).join(
+        SensorAttribute, SensorAttribute.a_id == Attributes.id).join(
+        Sensor, Sensor.id == SensorAttribute.s_id).filter(
+        Sensor.a_id == api.id).distinct().all()
+    return [row.table_name for row in rows]
+
+
+def queue_precomputation(importer_class_name: str) -> None:
+    """
+    Queue the refresh of popular forecasts on the attribute tables an
+    importer has just updated
+    :param importer_class_name: name of class that implements the importer
+    """
+    table_names = importer_tables(importer_class_name)
+    if not table_names:
+        return
+
+    try:
+        precompute_forecasts.delay(table_names)
+        logger.info("Queued forecast precomputation for {}".format(
+            importer_class_name))
+    except OperationalError as e:
+        logger.error("Unable to queue forecast precomputation for {}: "
+                     "{}".format(importer_class_name, e))
+
+
+def popular_forecasts(table_names: Union[list, None] = None,
+                      since: Union[datetime, None] = None) -> [dict]:
+    """
+    Rank the requested forecasts by the number of users requesting them
+    :param table_names: Only rank forecasts of these attribute tables, all
+                        tables when None
+    :param since: Only count users who requested a result after this time,
+                  the configured lookback period when None
+    :return: The attribute table, sensor id, longest horizon requested,
+             engine label and number of users of each forecast, most popular
+             first
+    """
+    if since is None:
+        since = datetime.now() - timedelta(days=float(GetConfig.setting(
+            'forecast', 'precompute_lookback_days', DEFAULT_LOOKBACK_DAYS)))
+
+    users = func.count(distinct(UserPredictions.user_id)).label('users')
+    horizon = func.max(PredictionResults.num_predictions).label('horizon')
+    query = db.session.query(
+        PredictionResults.attribute_table, PredictionResults.sensor_id,
+        PredictionResults.forcasting_engine, horizon, users).join(
+        UserPredictions,
+        UserPredictions.pred_result_id == PredictionResults.id).filter(
+        UserPredictions.timestamp >= since)
+    if table_names is not None:
+        query = query.filter(PredictionResults.attribute_table.in_(
+            table_names))
+    rows = query.group_by(
+        PredictionResults.attribute_table, PredictionResults.sensor_id,
+        PredictionResults.forcasting_engine).order_by(
+        desc(users), desc(func.max(UserPredictions.timestamp))).all()
+
+    return [{'attribute_table': row.attribute_table,
+             'sensor_id': row.sensor_id,
+             'n_pred': row.horizon,
+             'engine': row.forcasting_engine,
+             'users': row.users} for row in rows]
+
+
+def engine_name(label: str) -> Union[str, None]:
+    """
+    Find the engine a result was produced by
+    :param label: Engine label stored with the prediction result
+    :return: The engine name or None for the default engine
+    """
+    for name, engine in ENGINES.items():
+        if engine.label == label:
+            return name
+    return None
+
+
+def estimated_fit_seconds(attribute_table: str, sensor_id: str,
+                          engine: Union[str, None]) -> float:
+    """
+    Estimate the time a refresh of a forecast will take
+    :param attribute_table: Attribute table of the series
+    :param sensor_id: Sensor of the series
+    :param engine: Engine name, None for the default engine
+    :return: The slowest recorded fit of the series, or a default when the
+             series was never fitted
+    """
+    query = db.session.query(func.max(ForecastModel.fit_seconds)).filter(
+        ForecastModel.attribute_table == attribute_table,
+        ForecastModel.sensor_id == sensor_id)
+    if engine is not None:
+        query = query.filter(ForecastModel.engine == engine)
+    seconds = query.scalar()
+    return DEFAULT_FIT_SECONDS if seconds is None else seconds
+
+
+def plan(candidates: [dict], budget_seconds: float,
+         max_series: int) -> [dict]:
+    """
+    Select the stale forecasts to refresh within the compute budget
+    :param candidates: Forecasts ranked by popularity
+    :param budget_seconds: Estimated fit time available to the cycle
+    :param max_series: Maximum number of forecasts to refresh
+    :return: The forecasts to refresh, most popular first
+    """
+    planned, spent = [], 0.0
+    for candidate in candidates:
+        if len(planned) >= max_series:
+            break
+        engine = engine_name(candidate['engine'])
+        sensor_id = candidate['sensor_id']
+        latest = PredictionResults.find_by_prediction_args(
+            candidate['attribute_table'],
+            None if sensor_id == ALL_SENSORS else sensor_id, engine)
+        if latest is not None and \
+                not latest.is_stale(candidate['attribute_table']):
+            continue
+
+        cost = estimated_fit_seconds(candidate['attribute_table'],
+                                     sensor_id, engine)
+        if spent + cost > budget_seconds:
+            continue
+        spent += cost
+        planned.append(dict(candidate, engine=engine))
+    return planned
+
+
+@celery.task(bind=True)
+def precompute_forecasts(self, table_names: Union[list, None] = None) -> dict:
+    """
+    Refresh the most popular stale forecasts of attribute tables within the
+    configured compute budget
+    :param table_names: Attribute tables that have received new data, all
+                        tables when None
+    :return: a dictionary containing the status and the forecasts queued
+    """
+    budget = float(GetConfig.setting('forecast', 'precompute_budget_seconds',
+                                     DEFAULT_BUDGET_SECONDS))
+    max_series = int(GetConfig.setting('forecast', 'precompute_max_series',
+                                       DEFAULT_MAX_SERIES))
+
+    planned = plan(popular_forecasts(table_names), budget, max_series)
+    if planned:
+        group(refresh_forecast.s(p['attribute_table'], p['sensor_id'],
+                                 p['n_pred'], p['engine'])
+              for p in planned).apply_async()
+    celery_logger.info("Precomputing {} forecasts of {}".format(
+        len(planned), table_names))
+    return {"status": "precomputation queued", "result": planned}
+
+
+@celery.task(bind=True)
+def refresh_forecast(self, attribute_table: str, sensor_id: str, n_pred: int,
+                     engine: Union[str, None] = None) -> dict:
+    """
+    Generate a forecast from the most recent readings and move the users of
+    the results it supersedes onto it
+    :param attribute_table: the name of the table the readings are taken from
+    :param sensor_id: the id of the sensor, "All sensors" for every sensor
+    :param n_pred: the number of predictions to be made
+    :param engine: the forecasting engine, None for the default engine
+    :return: a dictionary containing the status and the new prediction id
+    """
+    readings = get_data_store().by_sensor(
+        attribute_table, None if sensor_id == ALL_SENSORS else sensor_id,
+        WINDOW)
+    readings = [(r.api_timestamp, to_float(r.value)) for r in readings]
+    readings = [(ts, value) for ts, value in readings if value is not None]
+    if len(readings) < MIN_READINGS:
+        return {"status": "not enough data to make reliable predictions",
+                "result": "UNABLE"}
+
+    timestamps, values = zip(*readings)
+    result = PredictionResults.generate_predictions_results(
+        attribute_table, None if sensor_id == ALL_SENSORS else sensor_id,
+        n_pred, list(values), list(timestamps), engine)
+    PredictionResults.find_by_id(result["Prediction_id"]).supersede()
+
+    return {"status": "task complete",
+            "result": {"Prediction_id": result["Prediction_id"]}}
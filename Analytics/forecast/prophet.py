@@ -1,4 +1,3 @@
-from fbprophet import Prophet
 import json
 
 '''
@@ -36,6 +35,8 @@ class ProphetForecast(object):
         self.dataset = dataset
 
     def fit(self):
+        from fbprophet import Prophet
+
         self.dataset.columns = ['ds', 'y']
         self.p = Prophet()
         self.p.fit(self.dataset)
@@ -0,0 +1,101 @@
+"""
+Time series preparation shared by the forecasting engines
+"""
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from resources.helper_functions import mean_absolute_percentage_error
+
+DEFAULT_FREQ = '1H'
+HOLDOUT_PERCENTAGE = 30
+
+
+def prepare_series(values: [float], timestamps: [datetime]) -> (pd.DataFrame,
+                                                                 str):
+    """
+    Build a regularly spaced series out of raw readings. The frequency is
+    inferred from the timestamps, falling back to the most common interval
+    between readings and finally to one hour
+    :param values: Reading values
+    :param timestamps: Timestamps of the readings, datetimes or ISO 8601
+                       strings
+    :return: DataFrame with the columns ds and y ordered by ds, and the
+             frequency of the series
+    """
+    df = pd.DataFrame(columns=['value', 'api_timestamp'])
+    df['value'] = values
+    df['api_timestamp'] = pd.to_datetime(timestamps)
+    df['value'] = df.value.astype(float)
+    df = df.set_index('api_timestamp').sort_index()
+
+    # try to infer freq
+    pred_freq = pd.infer_freq(index=df.index)
+
+    if not pred_freq:
+        # backup frequency inference if pandas can't figure it out
+        averaged_df = df.groupby('api_timestamp').mean()
+        res = (pd.Series(averaged_df.index[1:]) -
+               pd.Series(averaged_df.index[:-1])).value_counts()
+        if len(res):
+            pred_freq = pd.tseries.frequencies.to_offset(
+                res.index[0]).freqstr
+
+        # last resort backup: default to 1H
+        if not pred_freq:
+            pred_freq = DEFAULT_FREQ
+
+    # resample to make predictions consistent
+    df = df.resample(pred_freq).mean()
+
+    # prophet requires specific naming of columns
+    df = df.reset_index()
+    df = df.rename(index=str, columns={'api_timestamp': 'ds', 'value': 'y'})
+
+    # prophet fails with inf values, replacing them with nan
+    df = df.replace([np.inf, -np.inf], np.nan)
+    return df, pred_freq
+
+
+def split_holdout(df: pd.DataFrame) -> (pd.DataFrame, int):
+    """
+    Split off the most recent part of a series to evaluate a forecast on
+    :param df: Series with the columns ds and y
+    :return: The training part of the series and the length of the holdout
+    """
+    n_holdout = int(round(len(df) / 100 * HOLDOUT_PERCENTAGE))
+    return df.iloc[0:len(df) - n_holdout], n_holdout
+
+
+def holdout_error(df: pd.DataFrame, predicted: [float]) -> float:
+    """
+    Mean absolute percentage error of predictions over the holdout
+    :param df: Full series with the columns ds and y
+    :param predicted: Predictions for the holdout period
+    :return: MAPE rounded to three decimals
+    """
+    actual = df.y.values[len(df) - len(predicted):len(df)]
+    return float(np.round(mean_absolute_percentage_error(actual, predicted),
+                          3))
+
+
+def format_predictions(timestamps: [Any], values: [float],
+                       upper: [float], lower: [float]) -> [dict]:
+    """
+    Format forecast values the way the prediction endpoints return them
+    :param timestamps: Timestamps of the forecast values
+    :param values: Forecast values
+    :param upper: Upper bounds of the forecast interval
+    :param lower: Lower bounds of the forecast interval
+    :return: List of dictionaries with Value, Value_Upper, Value_Lower and
+             Timestamp
+    """
+    return [{
+        'Value': np.round(values[i], 3),
+        'Value_Upper': np.round(upper[i], 3),
+        'Value_Lower': np.round(lower[i], 3),
+        'Timestamp': datetime.strftime(pd.to_datetime(timestamps[i]),
+                                       '%Y-%m-%d %H:%M:%S')
+    } for i in range(len(values))]
@@ -0,0 +1,225 @@
+"""
+Forecasting service
+
+Fitted forecasting models are persisted per (attribute_table, sensor_id,
+freq, engine) in the forecastmodel table. A request for a series the stored
+model was fitted on is answered without fitting. When new data has arrived
+the model is refitted warm, starting from the previously fitted parameters,
+which converges in a fraction of the time of a cold fit. The holdout MAPE,
+which needs a second, cold fit on the start of the series, is only recomputed
+once the stored error is older than the configured refresh interval.
+
+In auto mode the engines are backtested from cheapest to most expensive and
+the first whose MAPE is within tolerance is used. The choice is kept with the
+stored model and revisited whenever its MAPE is due.
+"""
+import logging
+import pickle
+import time
+from datetime import datetime, timedelta
+from typing import Any, Union
+
+import numpy as np
+import pandas as pd
+
+from forecast.engines import (AUTO, ForecastEngine, backtest, engine_names,
+                              get_engine)
+from forecast.series import format_predictions, prepare_series
+from models.forecast_model import ForecastModel
+from settings import GetConfig
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAPE_REFRESH_HOURS = 24
+DEFAULT_AUTO_MAX_MAPE = 15.0
+
+
+def mape_refresh_interval() -> timedelta:
+    """
+    Get how long a computed holdout error is trusted for
+    :return: The configured interval, 24 hours by default
+    """
+    return timedelta(hours=float(GetConfig.setting(
+        'forecast', 'mape_refresh_hours', DEFAULT_MAPE_REFRESH_HOURS)))
+
+
+class ForecastService(object):
+    """
+    Serve forecasts from persisted models, refitting them warm when the
+    underlying series has changed
+    """
+
+    def __init__(self, mape_refresh: Union[timedelta, None] = None,
+                 auto_max_mape: Union[float, None] = None) -> None:
+        """
+        Initialise ForecastService
+        :param mape_refresh: How long a computed holdout error is trusted for
+        :param auto_max_mape: Highest MAPE accepted from an engine in auto
+                              mode before trying a more expensive engine
+        """
+        self.mape_refresh = mape_refresh or mape_refresh_interval()
+        if auto_max_mape is None:
+            auto_max_mape = GetConfig.setting('forecast', 'auto_max_mape',
+                                              DEFAULT_AUTO_MAX_MAPE)
+        self.auto_max_mape = float(auto_max_mape)
+
+    def forecast(self, attribute_table: str, sensor_id: Union[str, None],
+                 values: [float], timestamps: [Any], n_pred: int,
+                 engine: Union[str, None] = None) -> ([dict], float, str, int):
+        """
+        Forecast a series
+        :param attribute_table: Attribute table the readings were taken from
+        :param sensor_id: Sensor the readings were taken from, None for all
+                          sensors
+        :param values: Reading values
+        :param timestamps: Timestamps of the readings
+        :param n_pred: Number of values to forecast
+        :param engine: Engine name, 'auto' or None for the default engine
+        :return: The forecast values, the holdout MAPE, the engine label and
+                 the version of the stored model the forecast was made with
+        """
+        df, freq = prepare_series(values, timestamps)
+        last_ds = pd.Timestamp(df.ds.max()).to_pydatetime()
+        n_obs = len(df)
+
+        auto = engine == AUTO
+        mape = None
+        if auto:
+            engine, mape = self.choose_engine(attribute_table, sensor_id, df,
+                                              freq)
+        forecaster = get_engine(engine)
+
+        stored = ForecastModel.find_by_series(attribute_table, sensor_id,
+                                              freq, forecaster.name)
+        fitted = None
+        fit_seconds = None
+        if stored is not None and stored.covers(last_ds, n_obs):
+            fitted = self.load(stored)
+
+        if fitted is None:
+            init = stored.params if stored is not None else None
+            start = time.perf_counter()
+            fitted = forecaster.fit(df, freq, init)
+            fit_seconds = time.perf_counter() - start
+            logger.info('{} {} fit of {} {} took {:.2f}s'.format(
+                'Warm' if init else 'Cold', forecaster.label,
+                attribute_table, sensor_id, fit_seconds))
+
+        forecast = forecaster.predict(fitted, n_pred, freq)
+        predictions = format_predictions(forecast.ds.values,
+                                         forecast.yhat.values,
+                                         forecast.yhat_upper.values,
+                                         forecast.yhat_lower.values)
+
+        if mape is None and (stored is None or
+                             stored.mape_is_due(self.mape_refresh)):
+            # fitted cold, parameters fitted on the whole series have seen
+            # the holdout
+            mape = forecaster.evaluate(df, freq)
+
+        if fit_seconds is not None or mape is not None or \
+                (auto and not stored.auto_selected):
+            stored = self.persist(stored, forecaster, attribute_table,
+                                  sensor_id, freq, fitted, last_ds, n_obs,
+                                  mape, fit_seconds, auto)
+
+        if mape is None:
+            mape = stored.mape
+        return predictions, mape, forecaster.label, stored.version
+
+    def choose_engine(self, attribute_table: str,
+                      sensor_id: Union[str, None], df: pd.DataFrame,
+                      freq: str) -> (str, Union[float, None]):
+        """
+        Choose the cheapest engine whose backtested MAPE is within tolerance,
+        or the most accurate engine if none is
+        :param attribute_table: Attribute table of the series
+        :param sensor_id: Sensor of the series, None for all sensors
+        :param df: Series with the columns ds and y
+        :param freq: Frequency of the series
+        :return: The engine name and its MAPE, None if the previous choice
+                 still stands
+        """
+        selected = ForecastModel.find_auto_selected(attribute_table,
+                                                    sensor_id, freq)
+        if selected is not None and \
+                not selected.mape_is_due(self.mape_refresh):
+            return selected.engine, None
+
+        best = None
+        for name in engine_names():
+            result = backtest(df, freq, [name])[0]
+            mape = result['mape']
+            if mape is None or not np.isfinite(mape):
+                continue
+            if best is None or mape < best[1]:
+                best = (name, mape)
+            if mape <= self.auto_max_mape:
+                break
+
+        if best is None:
+            raise ValueError('No forecasting engine was able to fit {} '
+                             '{}'.format(attribute_table, sensor_id))
+        logger.info('Selected {} for {} {} with MAPE {}'.format(
+            best[0], attribute_table, sensor_id, best[1]))
+        return best
+
+    @staticmethod
+    def load(stored: ForecastModel) -> Any:
+        """
+        Load a persisted model
+        :param stored: The stored forecast model
+        :return: The fitted model or None if it can not be loaded
+        """
+        try:
+            return stored.fitted_model
+        except (pickle.UnpicklingError, AttributeError, ImportError,
+                EOFError) as e:
+            logger.error('Unable to load forecast model {}: {}'.format(
+                stored.id, e))
+            return None
+
+    @staticmethod
+    def persist(stored: Union[ForecastModel, None], forecaster: ForecastEngine,
+                attribute_table: str, sensor_id: Union[str, None], freq: str,
+                fitted: Any, last_ds: datetime, n_obs: int,
+                mape: Union[float, None], fit_seconds: Union[float, None],
+                auto_selected: bool = False) -> ForecastModel:
+        """
+        Store a fitted model and its holdout error
+        :param stored: The previously stored model of the series, if any
+        :param forecaster: The engine the model was fitted with
+        :param attribute_table: Attribute table of the series
+        :param sensor_id: Sensor of the series, None for all sensors
+        :param freq: Frequency of the series
+        :param fitted: The fitted model
+        :param last_ds: Time stamp of the last observation
+        :param n_obs: Number of observations fitted on
+        :param mape: The holdout MAPE, None if it was not recomputed
+        :param fit_seconds: Time taken by the fit, None if nothing was fitted
+        :param auto_selected: Whether auto mode chose the engine
+        :return: The stored model
+        """
+        if stored is None:
+            stored = ForecastModel(attribute_table, sensor_id, freq,
+                                   forecaster.name, last_ds, n_obs)
+        elif fit_seconds is not None:
+            stored.version += 1
+
+        if fit_seconds is not None:
+            stored.fitted_model = fitted
+            stored.params = forecaster.params(fitted)
+            stored.last_ds = last_ds
+            stored.n_obs = n_obs
+            stored.fit_seconds = fit_seconds
+        if mape is not None:
+            stored.mape = mape
+            stored.mape_timestamp = datetime.now()
+        stored.updated_timestamp = datetime.now()
+
+        stored.save()
+        if auto_selected:
+            stored.select_for_auto()
+        stored.commit()
+        return stored
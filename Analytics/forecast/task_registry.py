@@ -0,0 +1,141 @@
+"""
+Registry of submitted prediction tasks
+
+Prediction task ids are recorded in Redis sorted sets scored by submission
+time when the task is queued, one set per user and one for all users. A page
+of the listing is a ZREVRANGE of the set and the states of the tasks on the
+page are read from the Celery result backend with a single MGET, so listing
+costs depend on the page size rather than on the size of the keyspace.
+
+Entries are dropped once they are older than the results they point to,
+which expire after CELERY_TASK_RESULT_EXPIRES seconds.
+"""
+import json
+import logging
+import time
+from typing import Union
+
+import redis
+
+from create_celery import redis_client
+from settings import GetConfig
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'prediction-tasks'
+RESULT_KEY_PREFIX = 'celery-task-meta-'
+DEFAULT_RESULT_EXPIRES = 24 * 60 * 60
+PENDING = 'PENDING'
+
+
+class PredictionTaskRegistry(object):
+    """
+    Record prediction task ids per user and list them a page at a time
+    """
+
+    def __init__(self, client: redis.StrictRedis = None,
+                 result_expires: Union[int, None] = None) -> None:
+        """
+        Initialise PredictionTaskRegistry
+        :param client: Redis client of the Celery result backend, created
+                       from CELERY_RESULT_BACKEND when None
+        :param result_expires: Seconds after which task results, and with
+                               them registry entries, expire
+        """
+        self._client = client
+        if result_expires is None:
+            result_expires = GetConfig.setting(
+                'celery', 'CELERY_TASK_RESULT_EXPIRES', DEFAULT_RESULT_EXPIRES)
+        self.result_expires = int(result_expires)
+
+    @property
+    def client(self) -> redis.StrictRedis:
+        """
+        Connect to the Celery result backend on first use
+        :return: Redis client
+        """
+        if self._client is None:
+            self._client = redis_client()
+        return self._client
+
+    @staticmethod
+    def key(user_id: Union[int, None] = None) -> str:
+        """
+        Name of the sorted set holding the tasks of a user
+        :param user_id: User id, None for the tasks of all users
+        :return: Redis key
+        """
+        if user_id is None:
+            return '{}:all'.format(KEY_PREFIX)
+        return '{}:user:{}'.format(KEY_PREFIX, user_id)
+
+    def record(self, task_ids: [str], user_id: Union[int, None] = None,
+               submitted: Union[float, None] = None) -> None:
+        """
+        Record submitted tasks. Failures are logged, the tasks themselves are
+        already queued
+        :param task_ids: Ids of the submitted tasks
+        :param user_id: Id of the user the tasks were submitted for
+        :param submitted: Submission time as a UNIX time stamp, now if None
+        """
+        if submitted is None:
+            submitted = time.time()
+        scores = {task_id: submitted for task_id in task_ids}
+        expired = submitted - self.result_expires
+
+        keys = [self.key()]
+        if user_id is not None:
+            keys.append(self.key(user_id))
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipe.zadd(key, scores)
+                pipe.zremrangebyscore(key, '-inf', expired)
+                pipe.expire(key, self.result_expires)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error('Unable to record prediction tasks {}: {}'.format(
+                task_ids, e))
+
+    def page(self, user_id: Union[int, None] = None, page: int = 1,
+             per_page: int = 50) -> (int, [dict]):
+        """
+        List submitted tasks, most recent first, with their states
+        :param user_id: User id, None for the tasks of all users
+        :param page: Page number starting from 1
+        :param per_page: Number of tasks per page
+        :return: The total number of tasks and the tasks on the page with
+                 their id, submission time and state
+        """
+        key = self.key(user_id)
+        start = (max(page, 1) - 1) * per_page
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zremrangebyscore(key, '-inf', time.time() - self.result_expires)
+        pipe.zcard(key)
+        pipe.zrevrange(key, start, start + per_page - 1, withscores=True)
+        _, total, entries = pipe.execute()
+
+        task_ids = [task_id.decode('utf8') for task_id, _ in entries]
+        states = self.states(task_ids)
+        return total, [{'task_id': task_id, 'submitted': submitted,
+                        'state': state}
+                       for (_, submitted), task_id, state in
+                       zip(entries, task_ids, states)]
+
+    def states(self, task_ids: [str]) -> [str]:
+        """
+        Read the states of tasks from the result backend with one MGET
+        :param task_ids: Task ids
+        :return: The state of every task, PENDING when no result is stored
+        """
+        if not task_ids:
+            return []
+        metas = self.client.mget([RESULT_KEY_PREFIX + task_id
+                                  for task_id in task_ids])
+        return [json.loads(meta).get('status', PENDING) if meta else PENDING
+                for meta in metas]
+
+
+task_registry = PredictionTaskRegistry()
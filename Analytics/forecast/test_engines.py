@@ -0,0 +1,80 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from forecast.engines import (Arima, HoltWinters, SeasonalNaive, backtest,
+                              get_engine, season_length)
+from forecast.series import prepare_series
+
+
+class TestForecastEngines(unittest.TestCase):
+    def setUp(self):
+        timestamps = pd.date_range('2019-01-01', periods=24 * 21, freq='H')
+        hours = np.arange(len(timestamps))
+        values = 20 + 5 * np.sin(2 * np.pi * hours / 24) + 0.01 * hours
+        self.df, self.freq = prepare_series(list(values), list(timestamps))
+
+    def tearDown(self):
+        pass
+
+    def test_season_length(self):
+        self.assertEqual(season_length('H', 24 * 3), 24)
+        self.assertEqual(season_length('D', 30), 7)
+        self.assertEqual(season_length('H', 30), 1)
+
+    def test_predictions_follow_series(self):
+        for engine in (SeasonalNaive(), HoltWinters(), Arima()):
+            fitted = engine.fit(self.df, self.freq)
+            forecast = engine.predict(fitted, 12, self.freq)
+
+            self.assertEqual(len(forecast), 12)
+            self.assertEqual(forecast.ds.iloc[0],
+                             self.df.ds.iloc[-1] + pd.Timedelta(hours=1))
+            self.assertTrue((forecast.yhat_upper >= forecast.yhat).all())
+            self.assertTrue((forecast.yhat_lower <= forecast.yhat).all())
+
+    def test_seasonal_series_is_forecast_accurately(self):
+        for result in backtest(self.df, self.freq,
+                               ['seasonal_naive', 'holt_winters', 'arima']):
+            self.assertIsNotNone(result['mape'], result['engine'])
+            self.assertLess(result['mape'], 5, result['engine'])
+
+    def test_string_timestamps_are_parsed(self):
+        timestamps = pd.date_range('2019-01-01', periods=48, freq='H')
+        df, freq = prepare_series(list(range(48)), np.datetime_as_string(
+            timestamps.values, unit='us').tolist())
+        self.assertEqual(freq, 'H')
+        self.assertEqual(df.ds.tolist(), list(timestamps))
+
+        irregular = timestamps.delete([5, 17])
+        df, freq = prepare_series(list(range(46)), [str(t) for t in
+                                                    irregular])
+        self.assertEqual(len(df), 48)
+        forecast = HoltWinters().predict(HoltWinters().fit(df, freq), 3,
+                                         freq)
+        self.assertEqual(len(forecast), 3)
+
+    def test_gaps_are_interpolated(self):
+        df = self.df.copy()
+        df.iloc[10:20, df.columns.get_loc('y')] = np.nan
+        fitted = HoltWinters().fit(df, self.freq)
+        forecast = HoltWinters().predict(fitted, 5, self.freq)
+        self.assertFalse(forecast.yhat.isnull().any())
+
+    def test_warm_fit_reuses_parameters(self):
+        engine = HoltWinters()
+        fitted = engine.fit(self.df, self.freq)
+        warm = engine.fit(self.df, self.freq, engine.params(fitted))
+        self.assertEqual(engine.params(fitted), engine.params(warm))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            get_engine('not_an_engine')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,9 +6,9 @@ from datetime import datetime, timedelta
 from typing import Union
 
 import numpy as np
-import requests
 
 from importers.base import BaseImporter
+from importers.http_client import get_client
 from importers.json_reader import JsonReader
 from .state_decorator import Status, ImporterStatus
 from .attr_range_decorator import update_attribute_ranges
@@ -83,7 +83,7 @@ class KCLAirQuality(BaseImporter):
             for code in _codes:
                 self.url = self.BASE_URL % (code, _today, _tomorrow)
 
-                data = requests.get((self.url).replace(' ', '').replace('\n', '') + self.api_key, headers=headers)
+                data = get_client().get((self.url).replace(' ', '').replace('\n', '') + self.api_key, headers=headers)
                 dataset = json.loads(data.text)
                 jr = JsonReader(object_seperator='@SpeciesCode')
                 jr.create_objects(dataset)
@@ -3,8 +3,6 @@ from typing import Callable, Any, Union
 import logging
 import http.client
 
-import sendgrid
-from sendgrid.helpers.mail import Email, Content, Mail
 import flask
 
 from models.attributes import Attributes
@@ -14,11 +12,10 @@ from models.alert_model import AlertWidgetModel
 from models.users import Users
 from models.sensor import Sensor
 from models.location import Location
-from app import create_app
 from db import db
+from importers.instrumentation import ATTRIBUTE_RANGES, record
 from settings.get_config_decorator import GetConfig
 
-application = create_app()
 logging.basicConfig(level='INFO')
 logger = logging.getLogger(__name__)
 
@@ -38,65 +35,84 @@ def update_attribute_ranges(import_function: Callable) -> Callable:
         :param kwargs: Keyword Arguments of import_function parameter
         """
         import_function(*args, **kwargs)
-
-        attribute_entries = Attributes.get_all()
-        for attribute in attribute_entries:
-            attribute_range = AttributeRange.get_by_attr_id(attribute.id)
-            if attribute_range:
-                most_recent_entry = Attributes.most_recent_timestamp(
-                    attribute.table_name)
-                if most_recent_entry:
-                    if attribute_range.latest_update < most_recent_entry:
-                        attr_min = Attributes.attribute_min(
-                            attribute.table_name)
-                        attr_max = Attributes.attribute_max(
-                            attribute.table_name)
-                        try:
-                            attribute_range.minimum_sensor_id = \
-                                attr_min.s_id
-                            attribute_range.minimum = attr_min.value
-                            attribute_range.minimum_recorded_date = \
-                                attr_min.timestamp
-                            attribute_range.maximum_sensor_id = \
-                                attr_max.s_id
-                            attribute_range.maximum = attr_max.value
-                            attribute_range.maximum_recorded_date = \
-                                attr_max.timestamp
-                            attribute_range.latest_update = datetime.now()
-                            attribute_range.save()
-                            attribute_range.commit()
-
-                            PushAlert.check_alerts(attribute_range)
-                            check_min_and_max_alert_widgets(attribute_range)
-                        except AttributeError:
-                            pass
-            else:
-                attr_min = Attributes.attribute_min(attribute.table_name)
-                attr_max = Attributes.attribute_max(attribute.table_name)
-                try:
-                    new_range_entry = \
-                        AttributeRange(attribute.id,
-                                       attr_min.s_id,
-                                       attr_min.value,
-                                       attr_min.timestamp,
-                                       attr_max.s_id,
-                                       attr_max.value,
-                                       attr_max.timestamp,
-                                       datetime.now())
-                    new_range_entry.save()
-                    new_range_entry.commit()
-                    check_min_and_max_alert_widgets(new_range_entry)
-                    PushAlert.check_alerts(new_range_entry)
-                except AttributeError:
-                    new_range_entry = AttributeRange(attribute.id, None, None,
-                                                     None, None, None, None,
-                                                     datetime.now())
-                    new_range_entry.save()
-                    new_range_entry.commit()
+        importer = args[0] if args else None
+        if getattr(importer, 'source_unchanged', False):
+            # no new readings, the ranges are still current
+            return
+
+        metrics = getattr(importer, 'metrics', None)
+        if metrics is None:
+            refresh_attribute_ranges()
+        else:
+            with metrics.stage(ATTRIBUTE_RANGES):
+                refresh_attribute_ranges()
 
     return range_wrapper
 
 
+def refresh_attribute_ranges() -> None:
+    """
+    Update the minimum and maximum values of the attributes that have
+    received readings since their range was last computed
+    """
+    attribute_entries = Attributes.get_all()
+    for attribute in attribute_entries:
+        attribute_range = AttributeRange.get_by_attr_id(attribute.id)
+        if attribute_range:
+            most_recent_entry = Attributes.most_recent_timestamp(
+                attribute.table_name)
+            if most_recent_entry:
+                if attribute_range.latest_update < most_recent_entry:
+                    attr_min = Attributes.attribute_min(
+                        attribute.table_name)
+                    attr_max = Attributes.attribute_max(
+                        attribute.table_name)
+                    try:
+                        attribute_range.minimum_sensor_id = \
+                            attr_min.s_id
+                        attribute_range.minimum = attr_min.value
+                        attribute_range.minimum_recorded_date = \
+                            attr_min.timestamp
+                        attribute_range.maximum_sensor_id = \
+                            attr_max.s_id
+                        attribute_range.maximum = attr_max.value
+                        attribute_range.maximum_recorded_date = \
+                            attr_max.timestamp
+                        attribute_range.latest_update = datetime.now()
+                        attribute_range.save()
+                        attribute_range.commit()
+                        record(rows=1)
+
+                        PushAlert.check_alerts(attribute_range)
+                        check_min_and_max_alert_widgets(attribute_range)
+                    except AttributeError:
+                        pass
+        else:
+            attr_min = Attributes.attribute_min(attribute.table_name)
+            attr_max = Attributes.attribute_max(attribute.table_name)
+            try:
+                new_range_entry = \
+                    AttributeRange(attribute.id,
+                                   attr_min.s_id,
+                                   attr_min.value,
+                                   attr_min.timestamp,
+                                   attr_max.s_id,
+                                   attr_max.value,
+                                   attr_max.timestamp,
+                                   datetime.now())
+                new_range_entry.save()
+                new_range_entry.commit()
+                record(rows=1)
+                check_min_and_max_alert_widgets(new_range_entry)
+                PushAlert.check_alerts(new_range_entry)
+            except AttributeError:
+                new_range_entry = AttributeRange(attribute.id, None, None,
+                                                 None, None, None, None,
+                                                 datetime.now())
+                new_range_entry.save()
+                new_range_entry.commit()
+
+
 def check_min_and_max_alert_widgets(attribute_range_entry: db.Model):
     """
     Send emails to users for alert widgets that have been triggered
@@ -212,6 +228,9 @@ def send_alert_email(email: str, username: str, attribute: str,
         lat=sensor_lat, lon=sensor_lon,value=value,
         recorded_date=recorded_date, verb=alert_description, diff=diff)
 
+    import sendgrid
+    from sendgrid.helpers.mail import Email, Content, Mail
+
     sg = sendgrid.SendGridAPIClient(apikey=GetConfig.configure('sendgrid',
                                                                'api_key'))
 
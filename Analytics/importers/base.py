@@ -1,33 +1,39 @@
+import hashlib
 import json
 import logging
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from http import HTTPStatus
 from typing import Any, Callable, Union
 
 import pandas as pd
-import requests
-import sqlalchemy
 from geoalchemy2.elements import WKTElement
 from requests import HTTPError
-from sqlalchemy.exc import IntegrityError
 
 from db import db
+from importers.http_client import get_client
+from importers.instrumentation import FETCH, FLATTEN, INSERT, SENSORS, ImportMetrics, record, timed_stage
 from importers.json_reader import JsonReader
 from models import location
 from models.api import API
-from models.attribute_data import ModelClass
+from models.api_sync_state import APISyncState
+from models.attribute_data import get_data_store
 from models.attributes import Attributes
 from models.sensor import Sensor
 from models.sensor_attribute import SensorAttribute
 from models.theme import Theme, SubTheme
 from models.unit import Unit
+from settings import GetConfig
 from utility import convert_unix_to_timestamp, convert_to_date
-from .state_decorator import ImporterStatus
+from .source_unchanged import SourceUnchanged
+from .state_decorator import ImporterStatus, RunStatus
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 64 * 1024
+DEFAULT_WATERMARK_LOOKBACK = 3600
+
 
 class BaseImporter(object):
     importer_status = ImporterStatus.get_importer_status()
@@ -56,12 +62,19 @@ class BaseImporter(object):
         self.token_expiry = token_expiry
         self.api_class = api_class
         self.dataset = None
+        self.sync_state = None
+        self.source_unchanged = False
+        self.validators = (None, None)
+        self.payload_hash = None
+        self.metrics = ImportMetrics()
 
     def _create_datasource(self, headers: Union[dict, str]) -> None:
         """
         Create DataSource
         :param headers: Request headers
         :return: None
+        :raise SourceUnchanged: when the source reports no change since the last import, or returns the same
+                                payload as on the last successful import
         """
         _, status_code, message = self.load_dataset(headers)
 
@@ -70,8 +83,28 @@ class BaseImporter(object):
 
         if status_code != 200:
             raise HTTPError(message)
+
+        sync_state = self.load_sync_state()
+        if sync_state is not None and self.payload_hash is not None and \
+                sync_state.payload_hash == self.payload_hash:
+            self.source_unchanged = True
+            sync_state.unchanged()
+            raise SourceUnchanged('{} returned the same payload as on the last import'.format(self.api_name))
         return
 
+    def run(self) -> Any:
+        """
+        Import the data of the API once
+        :return: The success, no-change or failure status reported by the run, None when it reported none
+        """
+        run_status = RunStatus(self.importer_status)
+        self.importer_status = run_status
+        try:
+            self._create_datasource()
+        finally:
+            del self.importer_status
+        return run_status.outcome
+
     def _refresh_token(self):
         """
         Refresh token must be overriden by sub class
@@ -80,15 +113,72 @@ class BaseImporter(object):
         """
         raise NotImplementedError
 
+    def load_sync_state(self) -> Union[db.Model, None]:
+        """
+        Load the watermarks and validators of the last successful import
+        :return: The API sync state or None when the API was never imported
+        """
+        if self.sync_state is None:
+            api = API.get_by_name(self.api_name)
+            if api is not None:
+                self.sync_state = APISyncState.get_or_create(api.id)
+        return self.sync_state
+
+    def high_water_mark(self) -> Union[datetime, None]:
+        """
+        Most recent api_timestamp ingested from the API, sources accepting a time range
+        can be queried from it instead of fetching their full history
+        :return: The time stamp or None when nothing was ingested yet
+        """
+        sync_state = self.load_sync_state()
+        return sync_state.high_water_mark if sync_state is not None else None
+
+    @staticmethod
+    def watermark_lookback() -> timedelta:
+        """
+        Margin left below the watermarks for readings the source reports late, the readings
+        inserted twice as a result are dropped by the data store
+        :return: The configured margin, one hour by default
+        """
+        return timedelta(seconds=int(GetConfig.setting('importer_queue', 'watermark_lookback_seconds',
+                                                       DEFAULT_WATERMARK_LOOKBACK)))
+
+    @timed_stage(FETCH)
     def load_dataset(self, headers: str) -> (Any, HTTPStatus):
         """
         Load Data set
+        The request is conditional on the ETag and Last-Modified returned by the source on the last
+        successful import
         :param headers: Request headers
         :return: Data set and an HTTP status code
-        """
-        data = requests.get(self.url.replace(' ', '').replace('\n', '') + self.api_key, headers=headers)
-
-        self.dataset = json.loads(data.text)
+        :raise SourceUnchanged: when the source answers 304 Not Modified
+        """
+        sync_state = self.load_sync_state()
+        request_headers = dict(headers or {})
+        if sync_state is not None:
+            request_headers.update(sync_state.conditional_headers())
+
+        data = get_client().get(self.url.replace(' ', '').replace('\n', '') + self.api_key,
+                                headers=request_headers, stream=True)
+
+        if data.status_code == HTTPStatus.NOT_MODIFIED:
+            self.source_unchanged = True
+            if sync_state is not None:
+                sync_state.unchanged()
+            raise SourceUnchanged('{} has not changed since the last import'.format(self.api_name))
+
+        self.validators = (data.headers.get('ETag'), data.headers.get('Last-Modified'))
+
+        # fingerprint the payload while it is downloaded
+        digest = hashlib.sha256()
+        chunks = []
+        for chunk in data.iter_content(chunk_size=CHUNK_SIZE):
+            digest.update(chunk)
+            chunks.append(chunk)
+        self.payload_hash = digest.hexdigest()
+        record(size=sum(len(chunk) for chunk in chunks))
+
+        self.dataset = json.loads(b''.join(chunks))
         status_code, message = self.nginx_http_status(self.dataset, data.status_code)
         return self.dataset, status_code, message
 
@@ -113,6 +203,7 @@ class BaseImporter(object):
 
         return status_code, None
 
+    @timed_stage(FLATTEN)
     def create_dataframe(self, object_separator: Union[str, None] = None, ignore_tags: [str] = [],
                          ignore_values: [Any] = [],
                          ignore_tag_values: {str: Any} = {}, ignore_object_tags: [str] = []) -> pd.DataFrame:
@@ -130,6 +221,7 @@ class BaseImporter(object):
         jr.create_objects(self.dataset, ignore_tags=ignore_tags, ignore_values=ignore_values,
                           ignore_tag_values=ignore_tag_values, ignore_object_tags=ignore_object_tags)
         df = jr.create_dataframe()
+        record(rows=len(df.index))
 
         return df
 
@@ -272,6 +364,7 @@ class BaseImporter(object):
         self.insert_data(attr_objects, sensor_objects, dataframe, sensor_tag, '',
                          api_timestamp_tag, value_tag, attribute_tag, unit_value_tag)
 
+    @timed_stage(SENSORS)
     def save_sensors(self, sensors: list, latitude: list, longitude: list, api_id: int, sensor_prefix: str,
                      **kwargs: {str: Any}) -> [db.Model]:
         """
@@ -334,6 +427,7 @@ class BaseImporter(object):
             sensor = sensor.save()
             sensor_objects[sensor.name] = sensor
 
+        record(rows=len(sensor_objects))
         return sensor_objects
 
     def save_location(self, latitude: float, longitude: float) -> db.Model:
@@ -350,6 +444,7 @@ class BaseImporter(object):
 
         return loc
 
+    @timed_stage(SENSORS)
     def save_attributes(self, attribute_tag: list, unit_value: list, description: list,
                         bespoke_unit_tag: list, bespoke_sub_theme: list) -> [db.Model]:
         """
@@ -426,6 +521,7 @@ class BaseImporter(object):
         a = a.save()
         return a
 
+    @timed_stage(SENSORS)
     def save_attr_sensor(self, attrs, sensors) -> None:
         """
         Save Attributes and Sensors
@@ -443,27 +539,16 @@ class BaseImporter(object):
                 sa = SensorAttribute(sensor.id, attr.id)
                 sa.save()
 
+    @timed_stage(SENSORS)
     def create_tables(self, attributes: [db.Model]) -> None:
         """
         Create Data Base Tables
         :param attributes: Attributes
         """
-        table_query = db.session.execute("select * from pg_catalog.pg_tables")
-        table_tuples = table_query.fetchall()
-        tables = set()
-        for t in table_tuples:
-            tables.add(t[1])
-
-        for attr in attributes:
-            if attr.table_name.lower() not in tables:
-                db.session.execute(
-                    'CREATE TABLE %s (s_id TEXT NOT NULL, value TEXT NOT NULL, api_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL, timestamp TIMESTAMP WITHOUT TIME ZONE, PRIMARY KEY(s_id, value, api_timestamp))' % (
-                        attr.table_name))
-                logger.info('Created Table', attr.table_name.lower())
-
-            else:
-                logger.info('{} already exists'.format(attr.table_name.replace('-', '_')))
+        get_data_store().create_tables(
+            [attr.table_name for attr in attributes])
 
+    @timed_stage(INSERT)
     def insert_data(self, attr_objects: [db.Model], sensor_objects: [db.Model], dataframe: pd.DataFrame,
                     sensor_tag: str, sensor_prefix: str, api_timestamp_tag: str,
                     attr_value_tag: Union[str, None] = None,
@@ -480,10 +565,15 @@ class BaseImporter(object):
         :param attribute_tag: Attribute tag
         :param unit_value_tag: Unit Value tag
         """
-        db.metadata.clear()
+        store = get_data_store()
+        sync_state = self.load_sync_state()
         sensors = dataframe[sensor_tag].tolist()
         value_exists = set()
-        _classes = []
+        # rows older than the watermark of their sensor in the attribute table, less the lookback margin,
+        # were ingested by a previous import
+        lookback = self.watermark_lookback()
+        watermarks = {}
+        latest = {}
 
         api_timestamp = []
         if api_timestamp_tag is not None:
@@ -502,10 +592,8 @@ class BaseImporter(object):
                 _values = _dataframe[attr_value_tag].tolist()
                 sensors = _dataframe[sensor_tag].tolist()
 
-            model = ModelClass(attr.table_name.lower())
-            _classes.append(model)
             values = []
-            models = []
+            rows = []
 
             if attr_value_tag is None:
                 values = dataframe[attr.name].tolist()
@@ -523,39 +611,32 @@ class BaseImporter(object):
 
                 if a_date is None:
                     a_date = datetime.utcnow()
+                elif sync_state is not None:
+                    key = (attr.table_name, sensor_id)
+                    if key not in watermarks:
+                        watermarks[key] = sync_state.sensor_mark(*key)
+                    if watermarks[key] is not None and a_date < watermarks[key] - lookback:
+                        continue
+                    if key not in latest or a_date > latest[key]:
+                        latest[key] = a_date
 
                 _hash = self._hash_it(sensor_prefix + str(sensor_name), str(values[i]), str(a_date))
                 if _hash in value_exists:
                     continue
 
-                m = model()
-                m.s_id = sensor_id
-                m.value = values[i]
-                m.api_timestamp = a_date
-                m.timestamp = datetime.utcnow()
-                models.append(m)
-
-                try:
-                    if i % 10 == 0:
-                        db.session.add_all(models)
-                        db.session.commit()
-                except IntegrityError as e:
-                    db.session.rollback()
-                    logger.info(
-                        'Sensor id: %s with value %s at time %s already exists' % (sensor_id, values[i], a_date))
-
+                rows.append({
+                    's_id': sensor_id,
+                    'value': values[i],
+                    'api_timestamp': a_date,
+                    'timestamp': datetime.utcnow()
+                })
                 value_exists.add(_hash)
 
-            db.session.add_all(models)
+            store.insert(attr.table_name, rows)
+            record(rows=len(rows))
 
-        try:
-            db.session.commit()
-            for _class in _classes:
-                sqlalchemy.orm.instrumentation.unregister_class(_class)
-                del _class._decl_class_registry[_class.__name__]
-        except IntegrityError as e:
-            db.session.rollback()
-            logger.info('Unable to save certain values as they already are in the system, check logs')
+        if sync_state is not None:
+            sync_state.advance(latest, *self.validators, payload_hash=self.payload_hash)
 
     def _hash_it(self, *args: [Any]) -> int:
         """
@@ -569,6 +650,7 @@ class BaseImporter(object):
 
         return abs(hash(to_hash)) % (10 ** 8)
 
+    @timed_stage(SENSORS)
     def stage_api_commit(self) -> int:
         """
         Stage API commit to database
@@ -0,0 +1,128 @@
+"""
+Importer dependency graph
+
+Importers that rely on the sensors created by another importer declare it in
+their api_endpoints entry, by API_NAME:
+
+    api_endpoints:
+      greenwich_occ:
+        API_NAME: GreenwichOCC
+        DEPENDS_ON: [GreenwichMeta]
+
+Importers without dependencies are the roots of the graph and are scheduled
+at their refresh time, in parallel. A dependent importer is not scheduled on
+its own: it is queued as soon as every importer it depends on has succeeded
+since its own last run.
+"""
+import logging
+from collections import deque
+from typing import Union
+
+from settings import GetConfig
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+
+def configured_dependencies(endpoints: Union[dict, None] = None) -> {str: [str]}:
+    """
+    Read the dependencies declared in the api_endpoints configuration
+    :param endpoints: api_endpoints configuration, read from config.env.yml
+                      when None
+    :return: The API names each API depends on, keyed by API name
+    """
+    if endpoints is None:
+        try:
+            endpoints = GetConfig.configure('api_endpoints')
+        except (KeyError, TypeError):
+            return {}
+
+    dependencies = {}
+    for endpoint in (endpoints or {}).values():
+        if not isinstance(endpoint, dict) or not endpoint.get('API_NAME'):
+            continue
+        depends_on = endpoint.get('DEPENDS_ON') or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        dependencies[endpoint['API_NAME']] = list(depends_on)
+    return dependencies
+
+
+class ImporterDAG(object):
+    """
+    Directed acyclic graph of importers and the importers they depend on
+    """
+
+    def __init__(self, api_names: [str], dependencies: {str: [str]}) -> None:
+        """
+        Build the graph and check it has no cycle
+        :param api_names: Names of the APIs in the api table
+        :param dependencies: The API names each API depends on
+        :raise ValueError: if the dependencies form a cycle
+        """
+        self.parents = {name: [] for name in api_names}
+        self.children = {name: [] for name in api_names}
+        for name in api_names:
+            for parent in dependencies.get(name, []):
+                if parent not in self.parents:
+                    logger.warning('{} depends on unknown importer {}, the '
+                                   'dependency is ignored'.format(name,
+                                                                  parent))
+                    continue
+                self.parents[name].append(parent)
+                self.children[parent].append(name)
+        self.order = self.topological_order()
+
+    def roots(self) -> [str]:
+        """
+        Importers that do not depend on any other importer
+        :return: API names
+        """
+        return [name for name in self.order if not self.parents[name]]
+
+    def dependents(self, api_name: str) -> [str]:
+        """
+        Importers that depend directly on an importer
+        :param api_name: API name
+        :return: API names
+        """
+        return list(self.children.get(api_name, []))
+
+    def topological_order(self) -> [str]:
+        """
+        Order the importers so every importer comes after its dependencies
+        :return: API names
+        :raise ValueError: if the dependencies form a cycle
+        """
+        pending = {name: len(parents) for name, parents in
+                   self.parents.items()}
+        ready = deque(name for name, count in pending.items() if count == 0)
+        order = []
+        while ready:
+            name = ready.popleft()
+            order.append(name)
+            for child in self.children[name]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    ready.append(child)
+
+        if len(order) != len(pending):
+            cycle = sorted(set(pending) - set(order))
+            raise ValueError('Importer dependencies form a cycle between '
+                             '{}'.format(', '.join(cycle)))
+        return order
+
+    def levels(self) -> [[str]]:
+        """
+        Group the importers in the waves a full refresh cycle runs in
+        :return: Lists of API names, each list only depending on the previous
+                 ones
+        """
+        depth = {}
+        for name in self.order:
+            depth[name] = max([depth[p] + 1 for p in self.parents[name]],
+                              default=0)
+        levels = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for name in self.order:
+            levels[depth[name]].append(name)
+        return levels
@@ -6,6 +6,7 @@ import sys
 from importers.base import BaseImporter, Location
 from models import location
 from models.sensor import Sensor
+from .source_unchanged import SourceUnchanged
 from .state_decorator import ImporterStatus, Status
 from .token_exception import TokenExpired
 from .attr_range_decorator import update_attribute_ranges
@@ -179,6 +180,8 @@ class GreenwichMeta(BaseImporter):
 
             self.importer_status.status = Status.success(__class__.__name__)
 
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
 
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
@@ -255,6 +258,8 @@ class GreenwichOCC(BaseImporter):
                                    is_dependent=True)
             self.importer_status.status = Status.success(__class__.__name__)
 
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
 
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
@@ -304,6 +309,8 @@ class GreenwichMeta_2(BaseImporter):
                                    is_dependent=True)
             self.importer_status.status = Status.success(__class__.__name__)
 
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
 
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
@@ -385,6 +392,8 @@ class GreenwichOCC_2(BaseImporter):
 
             self.importer_status.status = Status.success(__class__.__name__)
 
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
 
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
@@ -435,6 +444,8 @@ class GreenwichKiwiPump(BaseImporter):
 
             self.importer_status.status = Status.success(__class__.__name__)
 
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
 
@@ -499,6 +510,8 @@ class GreenwichWholeHouse(BaseImporter):
 
             self.importer_status.status = Status.success(__class__.__name__)
 
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
 
@@ -575,6 +588,8 @@ class GreenwichSiemens(BaseImporter):
 
             self.importer_status.status = Status.success(__class__.__name__)
 
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
 
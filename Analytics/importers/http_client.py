@@ -0,0 +1,275 @@
+"""
+Shared HTTP client for importers
+
+Every request made by an importer goes through a single HTTPClient so that
+sources are reached through pooled keep-alive connections, one pool per
+host, with connect and read timeouts, gzip transfer encoding and retries
+with a jittered exponential back-off on connection errors, timeouts and
+429/5xx responses. A 429 or 503 carrying a Retry-After header is retried
+after the delay the source asks for. Requests to a host can be limited to a
+number of requests per second, so an importer fetching one URL per site
+does not trip the rate limit of its provider.
+
+    http_client:
+      connect_timeout: 5
+      read_timeout: 60
+      max_retries: 3
+      backoff_factor: 0.5
+      max_backoff: 30
+      pool_maxsize: 10
+      rate_limits:
+        api.erg.kcl.ac.uk: 5
+      recording: off
+      recording_dir: recordings
+
+Responses can be recorded, and replayed without a network, by setting
+recording to record or replay, see importers.recorder.
+"""
+import logging
+import random
+import threading
+import time
+from typing import Any, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from importers.recorder import OFF, RECORD, REPLAY, Recorder
+from settings import GetConfig
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 60
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_MAX_BACKOFF = 30
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_RECORDING_DIR = 'recordings'
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class RateLimiter(object):
+    """
+    Space the requests sent to a host so they do not exceed a rate
+    """
+
+    def __init__(self, rate: float) -> None:
+        """
+        :param rate: Maximum number of requests per second
+        """
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> float:
+        """
+        Block until the next request can be sent
+        :return: The number of seconds waited
+        """
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class HTTPClient(object):
+    """
+    HTTP client with a keep-alive connection pool and a rate limiter per host
+    """
+
+    def __init__(self, connect_timeout: Union[float, None] = None,
+                 read_timeout: Union[float, None] = None,
+                 max_retries: Union[int, None] = None,
+                 backoff_factor: Union[float, None] = None,
+                 max_backoff: Union[float, None] = None,
+                 pool_maxsize: Union[int, None] = None,
+                 rate_limits: Union[dict, None] = None,
+                 recorder: Union[Recorder, None] = None) -> None:
+        """
+        Create the client, settings not passed are read from the http_client
+        section of the configuration
+        :param connect_timeout: Seconds allowed to open a connection
+        :param read_timeout: Seconds allowed between bytes of the response
+        :param max_retries: Number of retries after the first attempt
+        :param backoff_factor: Base of the exponential back-off in seconds
+        :param max_backoff: Longest delay between two attempts in seconds
+        :param pool_maxsize: Connections kept alive per host
+        :param rate_limits: Maximum requests per second, keyed by host
+        :param recorder: Recorder saving or replaying the responses
+        """
+        def setting(value, name, default):
+            return GetConfig.setting('http_client', name, default) \
+                if value is None else value
+
+        self.timeout = (
+            float(setting(connect_timeout, 'connect_timeout',
+                          DEFAULT_CONNECT_TIMEOUT)),
+            float(setting(read_timeout, 'read_timeout', DEFAULT_READ_TIMEOUT)))
+        self.max_retries = int(setting(max_retries, 'max_retries',
+                                       DEFAULT_MAX_RETRIES))
+        self.backoff_factor = float(setting(backoff_factor, 'backoff_factor',
+                                            DEFAULT_BACKOFF_FACTOR))
+        self.max_backoff = float(setting(max_backoff, 'max_backoff',
+                                         DEFAULT_MAX_BACKOFF))
+        self.pool_maxsize = int(setting(pool_maxsize, 'pool_maxsize',
+                                        DEFAULT_POOL_MAXSIZE))
+        self.rate_limits = setting(rate_limits, 'rate_limits', {}) or {}
+        if recorder is None:
+            # a bare off is read from YAML as False
+            mode = GetConfig.setting('http_client', 'recording', OFF) or OFF
+            if mode != OFF:
+                recorder = Recorder(GetConfig.setting(
+                    'http_client', 'recording_dir', DEFAULT_RECORDING_DIR),
+                    mode)
+        self.recorder = recorder
+        self.sessions = {}
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def session(self, host: str) -> requests.Session:
+        """
+        Get the session holding the connection pool of a host
+        :param host: Host name, with its port when not the default one
+        :return: The session of the host
+        """
+        with self.lock:
+            if host not in self.sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=self.pool_maxsize,
+                                      max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['Accept-Encoding'] = 'gzip, deflate'
+                self.sessions[host] = session
+            return self.sessions[host]
+
+    def limiter(self, host: str) -> Union[RateLimiter, None]:
+        """
+        Get the rate limiter of a host
+        :param host: Host name, with its port when not the default one
+        :return: The rate limiter or None when the host is not rate limited
+        """
+        with self.lock:
+            if host not in self.limiters:
+                rate = self.rate_limits.get(host)
+                self.limiters[host] = RateLimiter(float(rate)) if rate \
+                    else None
+            return self.limiters[host]
+
+    def backoff(self, attempt: int,
+                response: Union[requests.Response, None] = None) -> float:
+        """
+        Compute the delay before the next attempt
+        :param attempt: Number of the failed attempt, starting at 0
+        :param response: The response of the failed attempt, if any
+        :return: The Retry-After delay of the response when there is one,
+                 otherwise a random delay up to the exponential back-off
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        ceiling = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def request(self, method: str, url: str,
+                **kwargs: {str: Any}) -> requests.Response:
+        """
+        Send a request, retrying it on connection errors, timeouts and
+        429/5xx responses. Responses are saved in record mode and requests
+        are answered from the recordings in replay mode
+        :param method: HTTP method
+        :param url: Request URL
+        :param kwargs: Keyword arguments of requests.Session.request
+        :return: The response, the last one received when every attempt
+                 failed with a retryable status
+        :raise requests.ConnectionError: when every attempt failed to connect
+        :raise requests.Timeout: when every attempt timed out
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        source_url = url
+        replaying = self.recorder is not None and \
+            self.recorder.mode == REPLAY
+        if replaying:
+            url, kwargs['headers'] = self.recorder.replay_request(
+                method, url, kwargs.get('headers'))
+        host = urlsplit(url).netloc
+        session = self.session(host)
+        limiter = None if replaying else self.limiter(host)
+
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.wait()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning('{} {} failed: {}, retrying in {:.1f}s'.format(
+                    method, host, e, delay))
+            else:
+                if response.status_code not in RETRY_STATUSES or \
+                        attempt >= self.max_retries:
+                    if self.recorder is not None and \
+                            self.recorder.mode == RECORD:
+                        self.recorder.save(method, source_url, response)
+                    return response
+                delay = self.backoff(attempt, response)
+                response.close()
+                logger.warning('{} {} returned {}, retrying in {:.1f}s'.format(
+                    method, host, response.status_code, delay))
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs: {str: Any}) -> requests.Response:
+        """
+        Send a GET request
+        :param url: Request URL
+        :param kwargs: Keyword arguments of requests.Session.request
+        :return: The response
+        """
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs: {str: Any}) -> requests.Response:
+        """
+        Send a POST request
+        :param url: Request URL
+        :param kwargs: Keyword arguments of requests.Session.request
+        :return: The response
+        """
+        return self.request('POST', url, **kwargs)
+
+    def close(self) -> None:
+        """ Close the connections of every host """
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HTTPClient:
+    """
+    Get the HTTP client shared by the importers of the process
+    :return: The shared HTTPClient
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient()
+        return _client
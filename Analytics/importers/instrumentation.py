@@ -0,0 +1,146 @@
+"""
+Importer pipeline instrumentation
+
+Each stage of a BaseImporter run is timed along with the bytes and rows it
+handled and the SQL statements it issued:
+
+    fetch             download of the source payload, bytes received
+    flatten           JSON to DataFrame conversion, rows produced
+    sensors           API, sensor, attribute and table resolution, sensors
+    insert            watermark filtering and inserts, rows inserted
+    attribute_ranges  attribute range update, attributes updated
+
+The stages of a run are persisted with it in the importer_run_stage table
+by the Celery importer task.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+FETCH = 'fetch'
+FLATTEN = 'flatten'
+SENSORS = 'sensors'
+INSERT = 'insert'
+ATTRIBUTE_RANGES = 'attribute_ranges'
+STAGES = (FETCH, FLATTEN, SENSORS, INSERT, ATTRIBUTE_RANGES)
+
+_active = threading.local()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_statement(conn, cursor, statement, parameters, context,
+                    executemany) -> None:
+    """
+    Count the SQL statements executed by the thread's active stage
+    """
+    stage = getattr(_active, 'stage', None)
+    if stage is not None:
+        stage.statements += 1
+
+
+class StageMetrics(object):
+    """
+    Totals of one stage of an importer run
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        :param name: Stage name
+        """
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.rows = 0
+        self.statements = 0
+
+    def json(self) -> dict:
+        """
+        Create a JSON dict of the stage totals
+        :return: the stage totals as a JSON (dict)
+        """
+        return {
+            'stage': self.name,
+            'calls': self.calls,
+            'seconds': self.seconds,
+            'bytes': self.bytes,
+            'rows': self.rows,
+            'statements': self.statements
+        }
+
+
+class ImportMetrics(object):
+    """
+    Stage totals of an importer run
+    """
+
+    def __init__(self) -> None:
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str) -> StageMetrics:
+        """
+        Time a stage and count the SQL statements it executes, a stage
+        entered several times accumulates its totals
+        :param name: Stage name
+        :return: The totals of the stage, to add bytes and rows to
+        """
+        metrics = self.stages.setdefault(name, StageMetrics(name))
+        previous = getattr(_active, 'stage', None)
+        if previous is metrics:
+            # already accounted by the enclosing call
+            yield metrics
+            return
+        _active.stage = metrics
+        start = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            metrics.seconds += time.perf_counter() - start
+            metrics.calls += 1
+            _active.stage = previous
+
+    def json(self) -> [dict]:
+        """
+        Create a JSON list of the stage totals in pipeline order
+        :return: the totals of every stage that ran
+        """
+        order = {name: index for index, name in enumerate(STAGES)}
+        return [stage.json() for stage in sorted(
+            self.stages.values(), key=lambda s: order.get(s.name, len(order)))]
+
+
+def record(rows: int = 0, size: int = 0) -> None:
+    """
+    Add rows and bytes to the thread's active stage, if any
+    :param rows: Number of rows handled
+    :param size: Number of bytes handled
+    """
+    stage = getattr(_active, 'stage', None)
+    if stage is not None:
+        stage.rows += rows
+        stage.bytes += size
+
+
+def timed_stage(name: str) -> Callable:
+    """
+    Method decorator, account the execution of an importer method to a
+    stage of the importer's metrics
+    :param name: Stage name
+    :return: Method decorator
+    """
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            metrics = getattr(self, 'metrics', None)
+            if metrics is None:
+                return method(self, *args, **kwargs)
+            with metrics.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
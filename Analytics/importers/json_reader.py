@@ -23,9 +23,10 @@ It is a recursive algorithm that doesn't the depth of the json structure and fla
 '''
 
 import json
-import requests
 import pandas as pd
 
+from importers.http_client import get_client
+
 class JsonReader(object):
     def __init__(self, url = None, object_seperator: str = None):
         self.url = url
@@ -34,7 +35,7 @@ class JsonReader(object):
         self.json_objects = JsonObjects()
 
     def fetch_data(self):
-        data = requests.get(self.url)
+        data = get_client().get(self.url)
         _json = json.loads(data.text)
         return _json
 
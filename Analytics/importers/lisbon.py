@@ -5,11 +5,12 @@ import sys
 from typing import Union
 
 import pandas as pd
-import requests
 from requests.auth import HTTPBasicAuth
 
 from importers.base import BaseImporter
+from importers.http_client import get_client
 from importers.json_reader import JsonReader
+from .source_unchanged import SourceUnchanged
 from .state_decorator import ImporterStatus, Status
 from .attr_range_decorator import update_attribute_ranges
 
@@ -71,6 +72,8 @@ class LisbonAPI(BaseImporter):
                                        bespoke_sub_theme=[], location_tag='loc',
                                        api_timestamp_tag='run_time_stamp')
             self.importer_status.status = Status.success(__class__.__name__)
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
 
@@ -82,5 +85,5 @@ class LisbonAPI(BaseImporter):
         """
         headers = {"grant_type": "client_credentials"}
         token_url = 'https://iot.alticelabs.com/api/devices/token'
-        token = requests.post(token_url, headers=headers, auth=HTTPBasicAuth(self.USER_NAME, self.USER_PASSCODE))
+        token = get_client().post(token_url, headers=headers, auth=HTTPBasicAuth(self.USER_NAME, self.USER_PASSCODE))
         return str(token.text)
@@ -11,6 +11,7 @@ import pandas as pd
 from importers.base import BaseImporter, Location
 from models import location
 from models.sensor import Sensor
+from .source_unchanged import SourceUnchanged
 from .state_decorator import ImporterStatus, Status
 from .token_exception import TokenExpired
 from .attr_range_decorator import update_attribute_ranges
@@ -69,6 +70,8 @@ class MilanAPI(BaseImporter):
                                    bespoke_sub_theme=[], location_tag=loc, sensor_prefix='Lampione_',
                                    api_timestamp_tag='datetime')
             self.importer_status.status = Status.success(__class__.__name__)
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
 
@@ -120,6 +123,8 @@ class Milan_API_sensori_meteo_meta(BaseImporter):
                                    location_tag=loc, sensor_prefix='', api_timestamp_tag='api_timestamp_tag',
                                    is_dependent=True)
             self.importer_status.status = Status.success(__class__.__name__)
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
 
@@ -193,6 +198,8 @@ class Milan_API_sensori_meteo(BaseImporter):
                                    bespoke_sub_theme=[], location_tag=loc, sensor_prefix='',
                                    api_timestamp_tag='api_timestamp_tag')
             self.importer_status.status = Status.success(__class__.__name__)
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
 
@@ -250,6 +257,8 @@ class Milan_API_sc_parking_kiunsys_meta(BaseImporter):
                                    location_tag=loc, sensor_prefix='', api_timestamp_tag='api_timestamp_tag',
                                    is_dependent=True)
             self.importer_status.status = Status.success(__class__.__name__)
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
 
@@ -315,6 +324,8 @@ class Milan_API_sc_parking_kiunsys(BaseImporter):
                                    bespoke_sub_theme=[], location_tag=loc, sensor_prefix='',
                                    api_timestamp_tag='api_timestamp_tag')
             self.importer_status.status = Status.success(__class__.__name__)
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
 
@@ -341,14 +352,20 @@ class Milan_API_sc_emobility_refeel(BaseImporter):
         """
         Get Import configurations
         Instantiate BaseImporter
+        Only the statuses since the last one ingested, less the watermark lookback, are requested,
+        up to 30 days back
         """
 
-        self.BASE_URL += 'fromTime={0}&toTime={1}'.format(
-            (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%dT%H:%m:%SZ'),
-            (datetime.now()).strftime('%Y-%m-%dT%H:%m:%SZ'))
         super().__init__(self.API_NAME, self.BASE_URL, self.REFRESH_TIME,
                          self.API_KEY, self.API_CLASS,
                          self.TOKEN_EXPIRY)
+        from_time = datetime.utcnow() - timedelta(days=30)
+        high_water_mark = self.high_water_mark()
+        if high_water_mark is not None:
+            from_time = max(from_time, high_water_mark - self.watermark_lookback())
+        self.url = self.BASE_URL + 'fromTime={0}&toTime={1}'.format(
+            from_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'))
 
     def _create_datasource(self, headers: Union[str, None] = None) -> None:
         """
@@ -360,11 +377,11 @@ class Milan_API_sc_emobility_refeel(BaseImporter):
                 headers = json.loads(self.HEADERS.replace("'", '"'))
             super()._create_datasource(headers)
 
-            data = self.load_dataset(headers)
+            data = self.dataset
             df = pd.DataFrame(columns=['plate', 'rentalState', 'date', 'duration'])
             index = 0
 
-            for plate in data[0]['vehicles']:
+            for plate in data['vehicles']:
                 for s in plate['statuses']:
                     df.at[index, 'plate'] = plate['plate']
                     df.at[index, 'rentalState'] = s['rentalState']
@@ -391,6 +408,8 @@ class Milan_API_sc_emobility_refeel(BaseImporter):
                                    bespoke_sub_theme=[2, 2], location_tag=loc, sensor_prefix='',
                                    api_timestamp_tag='api_timestamp_tag')
             self.importer_status.status = Status.success(__class__.__name__)
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
 
@@ -0,0 +1,292 @@
+"""
+Record and replay of importer sources
+
+In record mode the shared HTTP client saves every response it receives,
+status, headers and decoded body, gzip compressed, in one file per source
+under the recording directory. The source is the API being imported, set
+with recording_source() by the importer task, or the host of the request
+otherwise. Request headers and query strings are not saved, requests are
+identified by a digest of their method and URL.
+
+In replay mode the client sends every request to a stub HTTP server on
+localhost serving the recorded responses, so importers run end to end, HTTP
+stack included, without a network. A request is answered with the next
+response recorded for the same method and URL, or for the same method and
+path when the URL changed since the recording (e.g. a time range in the
+query string); the last response is repeated once they are exhausted.
+
+    http_client:
+      recording: off | record | replay
+      recording_dir: recordings
+"""
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import socketserver
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Union
+from urllib.parse import quote, unquote, urlsplit
+
+import requests
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+OFF = 'off'
+RECORD = 'record'
+REPLAY = 'replay'
+MODES = (OFF, RECORD, REPLAY)
+EXTENSION = '.jsonl.gz'
+DIGEST_HEADER = 'X-Replay-Digest'
+PATH_HEADER = 'X-Replay-Path'
+# The body is saved decoded and is served with a length of its own
+SKIPPED_HEADERS = frozenset(('content-encoding', 'content-length',
+                             'transfer-encoding', 'connection',
+                             'keep-alive'))
+
+_active = threading.local()
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    HTTP server handling each request in a thread, the equivalent of
+    http.server.ThreadingHTTPServer which needs Python 3.7
+    """
+    daemon_threads = True
+
+
+@contextmanager
+def recording_source(name: str) -> None:
+    """
+    Save the responses received by the thread under a source name
+    :param name: Source name, the name of the API being imported
+    """
+    previous = getattr(_active, 'source', None)
+    _active.source = name
+    try:
+        yield
+    finally:
+        _active.source = previous
+
+
+def request_digest(method: str, url: str) -> str:
+    """
+    Identify a request
+    :param method: HTTP method
+    :param url: Request URL
+    :return: Hex digest of the method and URL
+    """
+    return hashlib.sha256('{} {}'.format(method.upper(), url).encode(
+        'utf8')).hexdigest()
+
+
+def request_path(method: str, url: str) -> str:
+    """
+    Identify a request regardless of its query string
+    :param method: HTTP method
+    :param url: Request URL
+    :return: Method, host and path of the request
+    """
+    parts = urlsplit(url)
+    return '{} {}{}'.format(method.upper(), parts.netloc, parts.path)
+
+
+class Recorder(object):
+    """
+    Save the responses of the importer sources and serve them back
+    """
+
+    def __init__(self, directory: str, mode: str = RECORD) -> None:
+        """
+        :param directory: Directory of the recordings
+        :param mode: record or replay
+        :raise ValueError: when the mode is unknown
+        """
+        if mode not in (RECORD, REPLAY):
+            raise ValueError('Unknown recording mode {}'.format(mode))
+        self.directory = directory
+        self.mode = mode
+        self.server = None
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def source(url: str) -> str:
+        """
+        Name of the source of a request
+        :param url: Request URL
+        :return: The active recording source, or the host of the URL
+        """
+        return getattr(_active, 'source', None) or urlsplit(url).netloc
+
+    def path(self, source: str) -> str:
+        """
+        Path of the recording of a source
+        :param source: Source name
+        :return: Path of the compressed recording
+        """
+        safe = ''.join(c if c.isalnum() or c in '-_.' else '_'
+                       for c in source)
+        return os.path.join(self.directory, safe + EXTENSION)
+
+    def save(self, method: str, url: str,
+             response: requests.Response) -> None:
+        """
+        Append a response to the recording of its source
+        :param method: HTTP method of the request
+        :param url: Request URL
+        :param response: Response received
+        """
+        entry = {
+            'digest': request_digest(method, url),
+            'path': request_path(method, url),
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': [(name, value) for name, value in
+                        response.headers.items()
+                        if name.lower() not in SKIPPED_HEADERS],
+            'body': base64.b64encode(response.content).decode('ascii')
+        }
+        line = (json.dumps(entry) + '\n').encode('utf8')
+        with self.lock:
+            # appended gzip members are read back as a single stream
+            with gzip.open(self.path(self.source(url)), 'ab') as f:
+                f.write(line)
+
+    def load(self, source: str) -> [dict]:
+        """
+        Read the recording of a source
+        :param source: Source name
+        :return: Recorded responses, in the order they were received
+        """
+        path = self.path(source)
+        if not os.path.exists(path):
+            return []
+        with gzip.open(path, 'rt', encoding='utf8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def replay_request(self, method: str, url: str,
+                       headers: Union[dict, None]) -> (str, dict):
+        """
+        Redirect a request to the replay server
+        :param method: HTTP method
+        :param url: Request URL
+        :param headers: Request headers
+        :return: URL and headers of the request to the replay server
+        """
+        with self.lock:
+            if self.server is None:
+                self.server = ReplayServer(self)
+        headers = dict(headers or {})
+        headers[DIGEST_HEADER] = request_digest(method, url)
+        headers[PATH_HEADER] = quote(request_path(method, url))
+        return '{}/{}'.format(self.server.url, quote(self.source(url))), \
+            headers
+
+    def close(self) -> None:
+        """ Stop the replay server """
+        with self.lock:
+            if self.server is not None:
+                self.server.close()
+                self.server = None
+
+
+class ReplayServer(object):
+    """
+    Stub HTTP server on localhost answering with recorded responses
+    """
+
+    def __init__(self, recorder: Recorder) -> None:
+        """
+        Start the server
+        :param recorder: Recorder holding the recordings
+        """
+        self.recorder = recorder
+        self.recordings = {}
+        self.cursors = {}
+        self.lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_request(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                entry = server.next_response(
+                    self.path.lstrip('/'), self.headers.get(DIGEST_HEADER),
+                    self.headers.get(PATH_HEADER))
+                if entry is None:
+                    body = b'{"error": "Not recorded"}'
+                    self.send_response(404)
+                else:
+                    body = base64.b64decode(entry['body'])
+                    self.send_response(entry['status'], entry['reason'])
+                    for name, value in entry['headers']:
+                        self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_PUT = do_DELETE = do_request
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}'.format(self.httpd.server_port)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        logger.info('Replaying recordings of {} at {}'.format(
+            recorder.directory, self.url))
+
+    def next_response(self, source: str, digest: str,
+                      path: str) -> Union[dict, None]:
+        """
+        Pick the response to a request
+        :param source: Quoted source name
+        :param digest: Digest of the request method and URL
+        :param path: Quoted method, host and path of the request
+        :return: The next response recorded for the request or None when
+                 the request was not recorded
+        """
+        source, path = unquote(source), unquote(path or '')
+        with self.lock:
+            if source not in self.recordings:
+                self.recordings[source] = self.index(
+                    self.recorder.load(source))
+            for field, key in (('digest', digest), ('path', path)):
+                matches = self.recordings[source][field].get(key)
+                if matches:
+                    cursor = (source, field, key)
+                    index = self.cursors.get(cursor, 0)
+                    self.cursors[cursor] = index + 1
+                    return matches[min(index, len(matches) - 1)]
+        logger.warning('No recorded response for {} in {}'.format(
+            path, source))
+        return None
+
+    @staticmethod
+    def index(entries: [dict]) -> {str: {str: [dict]}}:
+        """
+        Index recorded responses by request digest and by request path
+        :param entries: Recorded responses of a source
+        :return: Responses in recording order keyed by digest and by path
+        """
+        index = {'digest': {}, 'path': {}}
+        for entry in entries:
+            for field in index:
+                index[field].setdefault(entry[field], []).append(entry)
+        return index
+
+    def close(self) -> None:
+        """ Stop the server """
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,4 +1,3 @@
-import importlib
 import logging
 import sys
 import time
@@ -7,15 +6,17 @@ from datetime import datetime, timedelta
 import sqlalchemy
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
-from retrying import retry
+from kombu.exceptions import OperationalError
 from sqlalchemy.orm import sessionmaker, scoped_session
 
 sys.path.append('../')
 
 from app import create_app
+from create_celery import make_celery
 from importers.state_decorator import ImporterStatus
-from models.api import API as Api_Class
+from importers.tasks import dispatch, load_dag
 from models.importer_status import ImporterStatuses
+from models.revoked_tokens import RevokedTokens
 from models.attributes import Attributes
 from models.attribute_range import AttributeRange
 
@@ -23,6 +24,7 @@ from settings import GetConfig
 
 config = GetConfig.configure('postgres')
 application = create_app()
+celery_app = make_celery(application)
 logging.basicConfig(level='INFO', filename='importers.log', filemode='a')
 logger = logging.getLogger(__name__)
 
@@ -35,13 +37,6 @@ sched = BackgroundScheduler(jobstores=jobstore)
 sched.start()
 
 
-class RetryingException(Exception):
-    """
-    Exception that is raised when a function that has a retry decorator fails
-    """
-    pass
-
-
 class Scheduler(object):
     """ Schedule the execution of importer tasks """
 
@@ -51,7 +46,8 @@ class Scheduler(object):
     def status_has_changed(self, status: ImporterStatus):
         """
         Receive the status of an importer and persist it to the Importer
-        Status table
+        Status table. Failed runs are retried, and forecasts precomputed
+        after successful runs, by the Celery importer task
         :param status: Status object identifying the
         """
         logger.info(status)
@@ -59,6 +55,8 @@ class Scheduler(object):
         if importer_status:
             if status.state == "success":
                 importer_status.state = "success"
+            elif status.state == "no-change":
+                importer_status.state = "no-change"
             else:
                 importer_status.state = "failure"
                 importer_status.reason = status.reason
@@ -67,44 +65,14 @@ class Scheduler(object):
             importer_status.timestamp = datetime.now()
             importer_status.commit()
 
-            if status.state == "failure" and not importer_status.retrying:
-                importer_status.retrying = True
-                importer_status.save()
-                importer_status.commit()
-                try:
-                    Scheduler.retry_importer(status.name)
-                    logger.info("Exponential retry procedure was "
-                                "successful for class {}".format(status.name))
-                except RetryingException:
-                    logger.info("Exponential retry procedure was "
-                                "unsuccessful for class {}".format(status.name))
-
-                importer_status.retrying = False
-                importer_status.save()
-                importer_status.commit()
-
     @staticmethod
-    @retry(wait_exponential_multiplier=10000, stop_max_delay=100000)
-    def retry_importer(importer_class_name: str):
+    def purge_revoked_tokens():
         """
-        Retry importer if it has failed at intervals that correspond to a
-        exponential back-off procedure
-        :param importer_class_name: name of class that implements the importer
-        :raise RetryingException: raise if importer retry was unsuccessful
+        Delete the revocations of JWTs that have expired
         """
-        logger.info("Importer retry for {}".format(importer_class_name))
-        retry_class = Api_Class.get_by_api_class(importer_class_name)
-        if retry_class:
-            api_name = retry_class.name
-            class_name = retry_class.api_class
-            Scheduler.fetch_data(class_name, api_name)
-
-        result_entry = ImporterStatuses.find_by_name(importer_class_name)
-        if result_entry:
-            if result_entry.state != "success":
-                raise RetryingException
-                # raising an exception informs the @retry decorator to retry
-                # the function according to it's arguments
+        with application.app_context():
+            deleted = RevokedTokens.purge_expired()
+        logger.info('Purged {} expired revoked tokens'.format(deleted))
 
     @staticmethod
     def get_apis() -> list:
@@ -124,43 +92,58 @@ class Scheduler(object):
         return apis
 
     @staticmethod
-    def fetch_data(class_name: str, api_name: str):
+    def dispatch_importer(class_name: str, api_name: str):
         """
-        Import sensor data from the specified API endpoint
+        Queue an importer run on the Celery importer queue, where a worker
+        runs it once no previous run of the importer is in progress
         :param class_name: name of the class that implements the
                            corresponding importer
         :param api_name: identifying name stored in the database for the
                          respective importer
         """
-        _module, _class = class_name.rsplit('.', 1)
-        data_class = getattr(importlib.import_module(_module), _class)
-        _d_class = data_class()
-        logger.info('Starting Importer for {} at:{} '.format
-                    (_class, time.strftime('%Y-%m-%d%H:%M:%S')))
-        with application.app_context():
-            _d_class._create_datasource()
+        try:
+            task = dispatch(class_name, api_name)
+            logger.info('Queued Importer for {} as task {}'.format(
+                api_name, task.id))
+        except OperationalError as e:
+            logger.error('Unable to queue Importer for {}: {}'.format(
+                api_name, e))
 
     @staticmethod
     def main_task():
         """
         Schedule the executions for each of the importers at their specified
-        refresh time
+        refresh time. The runs are executed by the Celery importer workers.
+        Importers that depend on other importers are not scheduled, they are
+        queued as soon as the importers they depend on have succeeded
         """
 
         interval = 5
         apis = Scheduler.get_apis()
+        with application.app_context():
+            try:
+                dag = load_dag()
+                roots = set(dag.roots())
+                logger.info('Importer refresh cycle: {}'.format(dag.levels()))
+            except ValueError as e:
+                logger.error('{}, importers are scheduled without their '
+                             'dependencies'.format(e))
+                roots = {api.name for api in apis}
+
         for api in apis:
             class_name = api.api_class.split('.')[2]
-            sched.add_job(Scheduler.fetch_data, 'interval',
+            if api.name not in roots:
+                if sched.get_job(class_name, jobstore='sqlalchemy'):
+                    sched.remove_job(class_name, jobstore='sqlalchemy')
+                continue
+            sched.add_job(Scheduler.dispatch_importer, 'interval',
                           name='{}'.format(api.name),
                           seconds=api.refresh_time,
                           start_date=datetime.now()+timedelta(
                               minutes=interval),
-                          end_date=datetime.now()+timedelta(hours=23),
                           args=[api.api_class, api.name],
                           replace_existing=True, id='{}'.format(class_name),
                           jobstore='sqlalchemy', misfire_grace_time=300)
-            interval += interval
 
     @staticmethod
     def run():
@@ -199,6 +182,11 @@ class Scheduler(object):
                       start_date=datetime.now() + timedelta(seconds=5),
                       days=1, name='Primary_Scheduler',replace_existing=True,
                       id='Primary_Scheduler', jobstore='sqlalchemy')
+        sched.add_job(Scheduler.purge_revoked_tokens, 'interval',
+                      start_date=datetime.now() + timedelta(seconds=5),
+                      hours=1, name='Revoked_Tokens_Purge',
+                      replace_existing=True, id='Revoked_Tokens_Purge',
+                      jobstore='sqlalchemy')
 
         try:
             # This is here to simulate application activity (which keeps
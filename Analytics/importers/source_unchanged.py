@@ -0,0 +1,9 @@
+class SourceUnchanged(Exception):
+    """ Custom Exception for Importer for when the source has not changed since the last import"""
+
+    def __init__(self, message: str) -> None:
+        """
+        Initiate Source Unchanged Exception
+        :param message: Exception message
+        """
+        super().__init__(message)
@@ -83,6 +83,44 @@ class ImporterStatus(object):
         self.changed.notify(self, value, *args, **kwargs)
 
 
+class RunStatus(object):
+    """
+    Statuses reported by a single importer run. They are passed on to the
+    ImporterStatus singleton and the last final one is kept as the outcome of
+    the run, so runs executing in the same process do not read each other's
+    """
+    FINAL_STATES = ('success', 'no-change', 'failure')
+
+    def __init__(self, tracker: ImporterStatus) -> None:
+        """
+        Instantiate RunStatus
+        :param tracker: the ImporterStatus singleton
+        """
+        self.tracker = tracker
+        self.changed = tracker.changed
+        self._status = None
+        self.outcome = None
+
+    @property
+    def status(self) -> Any:
+        """
+        Status Property
+        :return: the last status reported by the run
+        """
+        return self._status
+
+    @status.setter
+    def status(self, value: Any) -> None:
+        """
+        Record the status of the run and pass it on to the ImporterStatus
+        :param value: New value of status
+        """
+        self._status = value
+        if getattr(value, 'state', None) in self.FINAL_STATES:
+            self.outcome = value
+        self.tracker.status = value
+
+
 class Status:
     """
     Status Template Class
@@ -189,6 +227,16 @@ class Status:
         """
         return Status(importer_name, state="success")
 
+    @classmethod
+    def unchanged(cls, importer_name: str) -> State:
+        """
+        Create No Change Status, the source returned the same data as on the
+        last successful import
+        :param importer_name: Name of calling class
+        :return: No Change Status
+        """
+        return Status(importer_name, state="no-change")
+
     @classmethod
     def failure(cls, importer_name: str, reason: str, stack_trace: str) -> State:
         """
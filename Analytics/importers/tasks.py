@@ -0,0 +1,225 @@
+"""
+Importer execution on Celery
+
+Importer runs are dispatched as Celery tasks on a dedicated queue so that
+ingestion scales by adding workers:
+
+    celery -A manage.celery_task worker -Q importers -l info
+
+A run first takes one of the concurrency slots of its API, Redis locks named
+importer-lock:<api name>:<slot>. With the default single slot per API, a
+run that finds the previous one still in progress is skipped rather than
+overlapping it. Every run is recorded in the importer_run table, with the
+time, bytes, rows and SQL statements of each stage of its pipeline in the
+importer_run_stage table (see importers.instrumentation), and failed
+runs are retried with an exponential back-off. Once a run succeeds, the
+importers depending on it (see importers.dag) whose other dependencies have
+also succeeded are queued. A run whose source answered its conditional
+request with 304 Not Modified, or returned the payload of its last
+successful run, is recorded as no-change: its dependents are queued but
+forecasts are not precomputed.
+
+    importer_queue:
+      queue: importers
+      lock_timeout: 3600
+      max_retries: 5
+      retry_backoff: 10
+      default_concurrency: 1
+      concurrency:
+        <api name>: 2
+"""
+import importlib
+import logging
+from typing import Union
+
+import celery
+from celery.result import AsyncResult
+from celery.utils.log import get_task_logger
+from redis.exceptions import LockError, RedisError
+from redis.lock import Lock
+
+from create_celery import redis_client
+from db import db
+from forecast.precompute import queue_precomputation
+from importers.dag import ImporterDAG, configured_dependencies
+from importers.recorder import recording_source
+from models.api import API
+from models.importer_run import FAILURE, NO_CHANGE, SKIPPED, SUCCESS, \
+    ImporterRun
+from models.importer_status import ImporterStatuses
+from settings import GetConfig
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+celery_logger = get_task_logger(__name__)
+
+DEFAULT_QUEUE = 'importers'
+DEFAULT_LOCK_TIMEOUT = 60 * 60
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_BACKOFF = 10
+LOCK_PREFIX = 'importer-lock'
+DAG_PREFIX = 'importer-dag'
+
+def concurrency(api_name: str) -> int:
+    """
+    Get the number of runs of an importer allowed at once
+    :param api_name: Name of the API in the api table
+    :return: The configured limit for the API or the default limit
+    """
+    limits = GetConfig.setting('importer_queue', 'concurrency', {}) or {}
+    return int(limits.get(api_name, GetConfig.setting(
+        'importer_queue', 'default_concurrency', 1)))
+
+
+def acquire_slot(api_name: str) -> Union[Lock, None]:
+    """
+    Take a free concurrency slot of an importer
+    :param api_name: Name of the API in the api table
+    :return: The lock held on the slot or None if every slot is taken
+    """
+    client = redis_client('BROKER_URL')
+    timeout = int(GetConfig.setting('importer_queue', 'lock_timeout',
+                                    DEFAULT_LOCK_TIMEOUT))
+    for slot in range(concurrency(api_name)):
+        lock = client.lock('{}:{}:{}'.format(LOCK_PREFIX, api_name, slot),
+                           timeout=timeout)
+        if lock.acquire(blocking=False):
+            return lock
+    return None
+
+
+def load_dag() -> ImporterDAG:
+    """
+    Build the dependency graph of the importers in the api table
+    :return: The importer graph
+    :raise ValueError: if the configured dependencies form a cycle
+    """
+    return ImporterDAG([api.name for api in API.get_all()],
+                       configured_dependencies())
+
+
+def dispatch_dependents(api_name: str) -> [str]:
+    """
+    Record the success of an importer and queue the importers depending on
+    it once all their dependencies have succeeded since their last run
+    :param api_name: Name of the API whose importer succeeded
+    :return: Names of the APIs queued
+    """
+    dag = load_dag()
+    client = redis_client('BROKER_URL')
+    queued = []
+    for child in dag.dependents(api_name):
+        key = '{}:{}'.format(DAG_PREFIX, child)
+        pipe = client.pipeline()
+        pipe.sadd(key, api_name)
+        pipe.smembers(key)
+        _, done = pipe.execute()
+        done = {parent.decode('utf8') for parent in done}
+        # only the parent deleting the set queues the child when parents
+        # finish at the same time
+        if set(dag.parents[child]) <= done and client.delete(key):
+            child_api = API.get_by_name(child)
+            dispatch(child_api.api_class, child)
+            queued.append(child)
+    return queued
+
+
+def dispatch(api_class: str, api_name: str) -> AsyncResult:
+    """
+    Queue a run of an importer
+    :param api_class: the full path of the class that implements the importer
+    :param api_name: identifying name stored in the database for the importer
+    :return: the queued task
+    """
+    return run_importer.apply_async(
+        args=(api_class, api_name),
+        queue=GetConfig.setting('importer_queue', 'queue', DEFAULT_QUEUE))
+
+
+@celery.task(bind=True)
+def run_importer(self, api_class: str, api_name: str) -> dict:
+    """
+    Run an importer while holding one of its concurrency slots
+    :param api_class: the full path of the class that implements the importer
+    :param api_name: identifying name stored in the database for the importer
+    :return: the recorded run
+    """
+    _module, _class = api_class.rsplit('.', 1)
+    api = API.get_by_name(api_name)
+    run = ImporterRun(api.id if api else None, _class, self.request.id,
+                      self.request.hostname, self.request.retries)
+
+    try:
+        lock = acquire_slot(api_name)
+    except RedisError as e:
+        run.finish(FAILURE, 'Unable to lock importer: {}'.format(e))
+        raise
+
+    if lock is None:
+        run.finish(SKIPPED, 'Every concurrency slot of {} is taken by a '
+                            'previous run'.format(api_name))
+        celery_logger.info('Skipped {}, a previous run is still in '
+                           'progress'.format(_class))
+        return run.json()
+
+    run.start()
+    importer = None
+    try:
+        data_class = getattr(importlib.import_module(_module), _class)
+        with recording_source(api_name):
+            importer = data_class()
+            status = importer.run()
+        if status is None or status.state in (SUCCESS, NO_CHANGE):
+            run.finish(SUCCESS if status is None else status.state)
+        else:
+            run.finish(FAILURE, getattr(status, 'reason', None))
+    except Exception as e:
+        db.session.rollback()
+        run.finish(FAILURE, str(e))
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            celery_logger.warning('Lock of {} expired before the run '
+                                  'finished'.format(_class))
+
+    metrics = getattr(importer, 'metrics', None)
+    if metrics is not None:
+        run.record_stages(metrics.json())
+
+    if run.state in (SUCCESS, NO_CHANGE):
+        if run.state == SUCCESS:
+            queue_precomputation(_class)
+        try:
+            dependents = dispatch_dependents(api_name)
+            if dependents:
+                celery_logger.info('Queued importers depending on {}: '
+                                   '{}'.format(api_name, dependents))
+        except (ValueError, RedisError) as e:
+            celery_logger.error('Unable to queue importers depending on {}: '
+                                '{}'.format(api_name, e))
+    elif self.request.retries < int(GetConfig.setting(
+            'importer_queue', 'max_retries', DEFAULT_MAX_RETRIES)):
+        set_retrying(_class, True)
+        backoff = int(GetConfig.setting('importer_queue', 'retry_backoff',
+                                        DEFAULT_RETRY_BACKOFF))
+        raise self.retry(countdown=backoff * 2 ** self.request.retries,
+                         max_retries=None)
+
+    set_retrying(_class, False)
+    return run.json()
+
+
+def set_retrying(import_class_name: str, retrying: bool) -> None:
+    """
+    Flag whether an importer is executing the exponential back-off retry
+    procedure
+    :param import_class_name: name of class that implements the importer
+    :param retrying: whether the importer will be retried
+    """
+    importer_status = ImporterStatuses.find_by_name(import_class_name)
+    if importer_status and importer_status.retrying != retrying:
+        importer_status.retrying = retrying
+        importer_status.save()
+        importer_status.commit()
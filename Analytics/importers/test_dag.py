@@ -0,0 +1,52 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+
+from importers.dag import ImporterDAG, configured_dependencies
+
+
+class TestImporterDAG(unittest.TestCase):
+    def setUp(self):
+        self.endpoints = {
+            'greenwich_meta': {'API_NAME': 'GreenwichMeta'},
+            'greenwich_occ': {'API_NAME': 'GreenwichOCC',
+                              'DEPENDS_ON': ['GreenwichMeta']},
+            'milan_meta': {'API_NAME': 'MilanMeta'},
+            'milan_meteo': {'API_NAME': 'MilanMeteo',
+                            'DEPENDS_ON': 'MilanMeta'},
+            'summary': {'API_NAME': 'Summary',
+                        'DEPENDS_ON': ['GreenwichOCC', 'MilanMeteo']}
+        }
+        self.dependencies = configured_dependencies(self.endpoints)
+        self.dag = ImporterDAG([e['API_NAME'] for e in
+                                self.endpoints.values()], self.dependencies)
+
+    def tearDown(self):
+        pass
+
+    def test_dependencies_are_read_from_config(self):
+        self.assertEqual(self.dependencies['MilanMeteo'], ['MilanMeta'])
+        self.assertEqual(self.dependencies['GreenwichMeta'], [])
+
+    def test_independent_importers_are_roots(self):
+        self.assertEqual(set(self.dag.roots()), {'GreenwichMeta', 'MilanMeta'})
+        self.assertEqual(self.dag.levels(),
+                         [['GreenwichMeta', 'MilanMeta'],
+                          ['GreenwichOCC', 'MilanMeteo'], ['Summary']])
+
+    def test_dependents(self):
+        self.assertEqual(self.dag.dependents('GreenwichOCC'), ['Summary'])
+        self.assertEqual(self.dag.dependents('Summary'), [])
+
+    def test_unknown_dependency_is_ignored(self):
+        dag = ImporterDAG(['A'], {'A': ['Missing']})
+        self.assertEqual(dag.roots(), ['A'])
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ImporterDAG(['A', 'B'], {'A': ['B'], 'B': ['A']})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gzip
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler
+
+import requests
+
+from importers.http_client import HTTPClient
+from importers.recorder import ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """ Local stand-in for an importer source """
+    protocol_version = 'HTTP/1.1'
+    hits = {}
+
+    def do_GET(self):
+        StubHandler.hits[self.path] = StubHandler.hits.get(self.path, 0) + 1
+        if self.path == '/flaky' and StubHandler.hits[self.path] < 3:
+            return self.reply(503, b'{}', {'Retry-After': '0'})
+        if self.path == '/slow':
+            time.sleep(0.5)
+        if self.path == '/gzip':
+            return self.reply(200, gzip.compress(b'{"value": 1}'),
+                              {'Content-Encoding': 'gzip'})
+        self.reply(200, json.dumps({'path': self.path}).encode())
+
+    def reply(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHTTPClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.server.daemon_threads = True
+        cls.host = '127.0.0.1:{}'.format(cls.server.server_port)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubHandler.hits = {}
+        self.client = HTTPClient(connect_timeout=1, read_timeout=0.2,
+                                 max_retries=2, backoff_factor=0.01,
+                                 rate_limits={})
+
+    def tearDown(self):
+        self.client.close()
+
+    def url(self, path):
+        return 'http://{}{}'.format(self.host, path)
+
+    def test_retries_unavailable_source(self):
+        response = self.client.get(self.url('/flaky'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StubHandler.hits['/flaky'], 3)
+
+    def test_read_timeout(self):
+        with self.assertRaises(requests.Timeout):
+            self.client.get(self.url('/slow'))
+        self.assertEqual(StubHandler.hits['/slow'], 3)
+
+    def test_gzip_is_decoded(self):
+        self.assertEqual(self.client.get(self.url('/gzip')).json(),
+                         {'value': 1})
+
+    def test_rate_limit(self):
+        client = HTTPClient(max_retries=0, rate_limits={self.host: 20})
+        start = time.monotonic()
+        for _ in range(5):
+            client.get(self.url('/ok'))
+        client.close()
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_connection_is_reused(self):
+        self.client.get(self.url('/ok'))
+        self.client.get(self.url('/ok'))
+        self.assertEqual(list(self.client.sessions), [self.host])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+
+from sqlalchemy import create_engine
+
+from importers.instrumentation import FETCH, INSERT, SENSORS, \
+    ImportMetrics, record, timed_stage
+
+
+class Pipeline(object):
+    def __init__(self):
+        self.metrics = ImportMetrics()
+        self.engine = create_engine('sqlite://')
+
+    @timed_stage(FETCH)
+    def fetch(self):
+        record(size=1024)
+
+    @timed_stage(SENSORS)
+    def resolve(self, count):
+        for _ in range(count):
+            self.engine.execute('select 1')
+        self.resolve_more()
+
+    @timed_stage(SENSORS)
+    def resolve_more(self):
+        self.engine.execute('select 2')
+
+    @timed_stage(INSERT)
+    def insert(self, rows):
+        record(rows=rows)
+
+
+class TestImportMetrics(unittest.TestCase):
+    def setUp(self):
+        self.pipeline = Pipeline()
+
+    def test_stage_totals(self):
+        self.pipeline.fetch()
+        self.pipeline.resolve(3)
+        self.pipeline.insert(10)
+        self.pipeline.insert(5)
+
+        stages = {stage['stage']: stage
+                  for stage in self.pipeline.metrics.json()}
+        self.assertEqual(stages[FETCH]['bytes'], 1024)
+        self.assertEqual(stages[SENSORS]['statements'], 4)
+        self.assertEqual(stages[SENSORS]['calls'], 1)
+        self.assertEqual(stages[INSERT]['rows'], 15)
+        self.assertEqual(stages[INSERT]['calls'], 2)
+        self.assertGreater(stages[SENSORS]['seconds'], 0)
+
+    def test_stages_in_pipeline_order(self):
+        self.pipeline.insert(1)
+        self.pipeline.fetch()
+        self.assertEqual([stage['stage'] for stage in
+                          self.pipeline.metrics.json()], [FETCH, INSERT])
+
+    def test_statements_outside_stages_not_counted(self):
+        self.pipeline.engine.execute('select 1')
+        self.pipeline.resolve(0)
+        self.assertEqual(self.pipeline.metrics.stages[SENSORS].statements, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler
+
+from importers.http_client import HTTPClient
+from importers.recorder import (RECORD, REPLAY, Recorder,
+                                ThreadingHTTPServer, recording_source)
+
+
+class SourceHandler(BaseHTTPRequestHandler):
+    """ Local stand-in for an importer source """
+    protocol_version = 'HTTP/1.1'
+    hits = 0
+
+    def do_GET(self):
+        SourceHandler.hits += 1
+        body = json.dumps({'path': self.path, 'hit': SourceHandler.hits})
+        body = gzip.compress(body.encode())
+        self.send_response(200)
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('ETag', '"{}"'.format(SourceHandler.hits))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        SourceHandler.hits = 0
+        self.directory = tempfile.mkdtemp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SourceHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = 'http://127.0.0.1:{}/data'.format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def client(self, mode):
+        return HTTPClient(max_retries=0, rate_limits={},
+                          recorder=Recorder(self.directory, mode))
+
+    def record(self, *queries):
+        client = self.client(RECORD)
+        with recording_source('test_api'):
+            responses = [client.get(self.url + query).json()
+                         for query in queries]
+        client.close()
+        return responses
+
+    def test_replay_without_network(self):
+        recorded = self.record('?day=1', '?day=1')
+        self.server.shutdown()
+
+        client = self.client(REPLAY)
+        with recording_source('test_api'):
+            replayed = [client.get(self.url + '?day=1') for _ in range(3)]
+        client.close()
+
+        self.assertEqual([r.json() for r in replayed[:2]], recorded)
+        self.assertEqual(replayed[2].json(), recorded[1])
+        self.assertEqual(replayed[0].headers['ETag'], '"1"')
+        self.assertEqual(SourceHandler.hits, 2)
+
+    def test_replay_by_path(self):
+        recorded = self.record('?day=1')
+        client = self.client(REPLAY)
+        with recording_source('test_api'):
+            replayed = client.get(self.url + '?day=2')
+        client.close()
+        self.assertEqual(replayed.json(), recorded[0])
+
+    def test_recording_per_source(self):
+        self.record('?day=1')
+        self.assertEqual(os.listdir(self.directory), ['test_api.jsonl.gz'])
+
+        client = self.client(REPLAY)
+        response = client.get(self.url + '?day=1')
+        client.close()
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
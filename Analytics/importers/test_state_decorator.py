@@ -0,0 +1,41 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+
+from importers.state_decorator import ImporterStatus, RunStatus, Status
+
+
+class TestRunStatus(unittest.TestCase):
+    def setUp(self):
+        self.tracker = ImporterStatus.get_importer_status()
+        self.received = []
+        self.tracker.changed.register(self.receive)
+
+    def tearDown(self):
+        self.tracker.changed.callbacks.remove(self.receive)
+
+    def receive(self, tracker, status):
+        self.received.append(status)
+
+    def test_runs_keep_their_own_outcome(self):
+        first = RunStatus(self.tracker)
+        second = RunStatus(self.tracker)
+
+        first.status = Status.init_state(__name__, 'First')
+        second.status = Status.success('Second')
+        first.status = Status.failure('First', 'timeout', '')
+
+        self.assertEqual(first.outcome.state, 'failure')
+        self.assertEqual(second.outcome.state, 'success')
+        self.assertEqual(len(self.received), 3)
+        self.assertIs(self.tracker.status, first.status)
+
+    def test_run_without_final_status_has_no_outcome(self):
+        run = RunStatus(self.tracker)
+        run.status = Status.init_state(__name__, 'Importer')
+        self.assertIsNone(run.outcome)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@ import numpy as np
 import pandas as pd
 
 from importers.base import BaseImporter
+from .source_unchanged import SourceUnchanged
 from .state_decorator import ImporterStatus, Status
 from .attr_range_decorator import update_attribute_ranges
 
@@ -51,5 +52,7 @@ class TfL_BikePoints(BaseImporter):
                                                value_tag='value', latitude_tag='lat', longitude_tag='lon',
                                                description_tag='sourceSystemKey', api_timestamp_tag='modified')
             self.importer_status.status = Status.success(__class__.__name__)
+        except SourceUnchanged:
+            self.importer_status.status = Status.unchanged(__class__.__name__)
         except Exception as e:
             self.importer_status.status = Status.failure(__class__.__name__, e.__str__(), traceback.format_exc())
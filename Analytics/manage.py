@@ -11,6 +11,8 @@ from drop_datasource import DropDatasource
 from add_datasource import AddDatasource
 from create_celery import make_celery
 from add_startup_admin import AddStartupAdmin
+from create_database import CreateDatabase
+from migrate_readings import MigrateReadings
 from settings.get_config_decorator import GetConfig
 
 hostValue = os.environ.get('MAN_HOST_VALUE')
@@ -18,6 +20,7 @@ application = create_app()
 celery_task = make_celery(application)
 manager = Manager(app=application)
 manager.add_command('db', MigrateCommand)
+manager.add_command('create_db', CreateDatabase)
 
 manager.add_command('runserver', Server(
     **(GetConfig.configure('flask_server'))
@@ -27,6 +30,7 @@ manager.add_command("gunicorn", GunicornServer())
 manager.add_command('remove', DropDatasource)
 manager.add_command('add', AddDatasource)
 manager.add_command('add_superuser', AddStartupAdmin)
+manager.add_command('migrate_readings', MigrateReadings)
 
 if __name__ == '__main__':
     manager.run()
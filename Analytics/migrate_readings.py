@@ -0,0 +1,146 @@
+"""
+Script to migrate attribute data to the consolidated reading table
+
+Copies the readings of every `<attribute>_<uuid>` table in to the `reading`
+table, issuing integer surrogate keys for the attribute tables and sensors on
+the way. The copy runs inside the database, one INSERT ... SELECT per table,
+and can be repeated safely as readings that were already copied are skipped.
+The reading table keeps one reading per sensor and time stamp: readings of a
+sensor sharing a time stamp with a different value are logged and only the
+first is copied, and their attribute table is not dropped.
+Once the data is migrated set the storage backend in config.env.yml to
+consolidated.
+
+All attribute tables can be migrated:
+    python manage.py migrate_readings
+
+A single attribute table can be migrated:
+    python manage.py migrate_readings -t <attribute-table-name>
+
+The per table layout can be dropped after copying with:
+    python manage.py migrate_readings -d True
+"""
+import logging
+
+from flask_script import Command, Option
+
+from db import db
+from models.attributes import Attributes
+from models.data_version import data_versions
+from models.reading import ReadingAttribute
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+NUMERIC_PATTERN = r'^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$'
+
+
+class MigrateReadings(Command):
+    """
+    Copy attribute data tables in to the consolidated reading table
+    """
+
+    def __init__(self, table_name: str = None, drop: bool = False):
+        """
+        Migrate Readings
+        :param table_name: Attribute data table to migrate, all if None
+        :param drop: Drop the attribute data tables once they are copied
+        """
+        self.table_name = table_name
+        self.drop = drop
+
+    def get_options(self) -> [Option]:
+        """
+        Get command line arguments
+        :return: A list of Options
+        """
+        return [
+            Option('--table_name', '-t', dest='table_name',
+                   default=self.table_name),
+            Option('--drop', '-d', dest='drop', default=self.drop),
+        ]
+
+    def run(self, table_name: str, drop: bool) -> None:
+        """
+        Execute Command
+        :param table_name: Attribute data table to migrate, all if None
+        :param drop: Drop the attribute data tables once they are copied
+        """
+        db.create_all()
+        existing = set(t[0] for t in db.session.execute(
+            "SELECT tablename FROM pg_catalog.pg_tables").fetchall())
+
+        table_names = [a.table_name.lower() for a in Attributes.get_all()]
+        if table_name:
+            table_names = [table_name.lower()]
+
+        for name in table_names:
+            if name not in existing:
+                logger.info('{} does not exist, skipping'.format(name))
+                continue
+
+            copied = self.migrate_table(name)
+            logger.info('Copied {} readings from {}'.format(copied, name))
+            if copied:
+                # written with raw SQL, out of sight of the session listeners
+                data_versions.bump([name])
+
+            discarded = self.discarded_readings(name)
+            if discarded:
+                logger.warning('{} readings of {} share their sensor and time '
+                               'stamp with a reading of a different value '
+                               'and were not copied'.format(discarded, name))
+                if drop in (True, 'True', 'true'):
+                    logger.warning('Not dropping {}'.format(name))
+                continue
+
+            if drop in (True, 'True', 'true'):
+                db.session.execute('DROP TABLE {}'.format(name))
+                db.session.commit()
+                data_versions.bump([name])
+                logger.info('Dropped {}'.format(name))
+
+    @staticmethod
+    def migrate_table(table_name: str) -> int:
+        """
+        Copy the readings of one attribute data table
+        :param table_name: Attribute data table name
+        :return: Number of readings copied
+        """
+        attribute_key = ReadingAttribute.key_for(table_name, create=True)
+
+        db.session.execute(
+            'INSERT INTO reading_sensor (sensor_id) '
+            'SELECT DISTINCT s_id FROM {} '
+            'ON CONFLICT DO NOTHING'.format(table_name))
+
+        result = db.session.execute(
+            'INSERT INTO reading '
+            '(attribute_id, sensor_id, ts, value, raw, timestamp) '
+            'SELECT :attribute_id, rs.id, t.api_timestamp, '
+            'CASE WHEN t.value ~ :numeric '
+            'THEN CAST(t.value AS DOUBLE PRECISION) END, '
+            't.value, t.timestamp '
+            'FROM {} t JOIN reading_sensor rs ON rs.sensor_id = t.s_id '
+            'ON CONFLICT DO NOTHING'.format(table_name),
+            {'attribute_id': attribute_key, 'numeric': NUMERIC_PATTERN})
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def discarded_readings(table_name: str) -> int:
+        """
+        Count the readings of an attribute data table missing from the
+        reading table, a reading of the same sensor at the same time stamp
+        with a different value having been kept instead
+        :param table_name: Attribute data table name
+        :return: Number of readings not copied
+        """
+        return db.session.execute(
+            'SELECT COUNT(*) FROM {} t '
+            'JOIN reading_sensor rs ON rs.sensor_id = t.s_id '
+            'LEFT JOIN reading r ON r.attribute_id = :attribute_id '
+            'AND r.sensor_id = rs.id AND r.ts = t.api_timestamp '
+            'AND r.raw = t.value '
+            'WHERE r.ts IS NULL'.format(table_name),
+            {'attribute_id': ReadingAttribute.key_for(table_name)}).scalar()
@@ -0,0 +1,102 @@
+''' Data table, store the execution and results of analytics requests '''
+
+from datetime import datetime
+import json
+import logging
+
+from sqlalchemy.dialects.postgresql import JSON
+
+from db import db
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+ACCEPTED = 'Accepted'
+RUNNING = 'Running'
+COMPLETED = 'Completed'
+FAILED = 'Failed'
+
+
+class AnalyticsResult(db.Model):
+    __tablename__ = 'analytics_result'
+
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.Integer, db.ForeignKey('requestanalytics.id',
+                                                     ondelete='CASCADE'),
+                           nullable=False, unique=True)
+    task_id = db.Column(db.String(50), nullable=True)
+    rows = db.Column(db.Integer, nullable=True)
+    features = db.Column(JSON, nullable=True)
+    result = db.Column(JSON, nullable=True)
+    reason = db.Column(db.Text)
+    started_timestamp = db.Column(db.DateTime, nullable=False)
+    finished_timestamp = db.Column(db.DateTime)
+    duration = db.Column(db.Float)
+
+    def __init__(self, request_id: int, task_id: str = None):
+        """
+        Initialise the Analytics Result instance attributes
+        :param request_id: id of the analytics request executed
+        :param task_id: id of the Celery task executing the request
+        """
+        self.request_id = request_id
+        self.task_id = task_id
+        self.started_timestamp = datetime.now()
+
+    def __str__(self) -> str:
+        """
+        override the dunder string method to cast the Analytics Result
+        attributes to a string
+        :return: a JSON string of the Analytics Result objects attributes
+        """
+        return json.dumps(self.json())
+
+    def json(self) -> dict:
+        """
+        Create a JSON dict of the Analytics Result object attributes
+        :return: the Analytics Result object attributes as a JSON (dict)
+        """
+        return {
+            'request_id': self.request_id,
+            'task_id': self.task_id,
+            'rows': self.rows,
+            'features': self.features,
+            'result': self.result,
+            'reason': self.reason,
+            'started_timestamp': str(self.started_timestamp),
+            'finished_timestamp': str(self.finished_timestamp),
+            'duration': self.duration
+        }
+
+    def save(self):
+        """ Add the current Analytics Result fields to the SQLAlchemy session """
+        db.session.add(self)
+        db.session.flush()
+
+    @staticmethod
+    def commit():
+        """ Commit updated items to the database """
+        db.session.commit()
+
+    def finish(self, result: dict = None, reason: str = None):
+        """
+        Persist the outcome of the execution
+        :param result: the result of the operation when it succeeded
+        :param reason: the error raised when the execution failed
+        """
+        self.result = result
+        self.reason = reason
+        self.finished_timestamp = datetime.now()
+        self.duration = (self.finished_timestamp -
+                         self.started_timestamp).total_seconds()
+        self.save()
+        self.commit()
+
+    @classmethod
+    def find_by_request_id(cls, request_id: int) -> db.Model:
+        """
+        Find the execution of an analytics request
+        :param request_id: id of the analytics request
+        :return: the Analytics Result or None if the request was not executed
+        """
+        return cls.query.filter_by(request_id=request_id).first()
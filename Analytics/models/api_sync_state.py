@@ -0,0 +1,173 @@
+''' Data table, store the synchronisation state of each API '''
+
+from datetime import datetime
+import json
+from typing import Union
+
+from sqlalchemy.exc import IntegrityError
+import logging
+
+from db import db
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+
+class APISyncState(db.Model):
+    __tablename__ = 'api_sync_state'
+
+    api_id = db.Column(db.Integer, db.ForeignKey('api.id', ondelete='CASCADE'),
+                       primary_key=True)
+    etag = db.Column(db.Text)
+    last_modified = db.Column(db.Text)
+    payload_hash = db.Column(db.String(64))
+    high_water_mark = db.Column(db.DateTime)
+    sensor_marks = db.Column(db.JSON, nullable=False, default=dict)
+    checked_timestamp = db.Column(db.DateTime)
+    changed_timestamp = db.Column(db.DateTime)
+
+    def __init__(self, api_id: int):
+        """
+        Initialise the API Sync State instance attributes
+        :param api_id: id of the API the state belongs to
+        """
+        self.api_id = api_id
+        self.sensor_marks = {}
+
+    def __str__(self) -> str:
+        """
+        override the dunder string method to cast the API Sync State
+        attributes to a string
+        :return: a JSON string of the API Sync State objects attributes
+        """
+        return json.dumps(self.json())
+
+    def json(self) -> dict:
+        """
+        Create a JSON dict of the API Sync State object attributes
+        :return: the API Sync State object attributes as a JSON (dict)
+        """
+        return {
+            'api_id': self.api_id,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'payload_hash': self.payload_hash,
+            'high_water_mark': str(self.high_water_mark),
+            'sensors': len(self.sensor_marks or {}),
+            'checked_timestamp': str(self.checked_timestamp),
+            'changed_timestamp': str(self.changed_timestamp)
+        }
+
+    def save(self):
+        """
+        Add the current API Sync State fields to the SQLAlchemy session
+        """
+        try:
+            db.session.add(self)
+            db.session.flush()
+        except IntegrityError as ie:
+            db.session.rollback()
+            logger.error(str(self.api_id) + ' sync state entry already exists')
+
+    @staticmethod
+    def commit():
+        """ Commit updated items to the database """
+        db.session.commit()
+
+    def conditional_headers(self) -> {str: str}:
+        """
+        Build the request headers asking the source to only send its data
+        when it has changed since the last successful import
+        :return: If-None-Match and If-Modified-Since headers
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    @staticmethod
+    def mark_key(table_name: str, sensor_id: str) -> str:
+        """
+        Key of the watermark of a sensor in an attribute table, sensors
+        report several attributes which are not always ingested together
+        :param table_name: name of the attribute table
+        :param sensor_id: id of the sensor
+        :return: key of the watermark in sensor_marks
+        """
+        return '{}:{}'.format(table_name.lower(), sensor_id)
+
+    def sensor_mark(self, table_name: str,
+                    sensor_id: str) -> Union[datetime, None]:
+        """
+        Get the most recent api_timestamp ingested for a sensor in an
+        attribute table
+        :param table_name: name of the attribute table
+        :param sensor_id: id of the sensor
+        :return: the time stamp or None when nothing was ingested yet
+        """
+        mark = (self.sensor_marks or {}).get(
+            self.mark_key(table_name, sensor_id))
+        return datetime.strptime(mark, '%Y-%m-%dT%H:%M:%S.%f') \
+            if mark else None
+
+    def advance(self, marks: {(str, str): datetime}, etag: Union[str, None],
+                last_modified: Union[str, None],
+                payload_hash: Union[str, None] = None):
+        """
+        Record a successful import and persist the new watermarks
+        :param marks: most recent api_timestamp ingested, keyed by attribute
+                      table name and sensor id
+        :param etag: ETag returned by the source
+        :param last_modified: Last-Modified returned by the source
+        :param payload_hash: SHA-256 of the payload returned by the source
+        """
+        sensor_marks = dict(self.sensor_marks or {})
+        for (table_name, sensor_id), mark in marks.items():
+            current = self.sensor_mark(table_name, sensor_id)
+            if current is None or mark > current:
+                sensor_marks[self.mark_key(table_name, sensor_id)] = \
+                    mark.strftime('%Y-%m-%dT%H:%M:%S.%f')
+        # reassign so the JSON column is flagged as modified
+        self.sensor_marks = sensor_marks
+        if marks:
+            latest = max(marks.values())
+            if self.high_water_mark is None or latest > self.high_water_mark:
+                self.high_water_mark = latest
+
+        now = datetime.now()
+        if etag != self.etag or last_modified != self.last_modified or \
+                payload_hash != self.payload_hash or marks:
+            self.changed_timestamp = now
+        self.etag = etag
+        self.last_modified = last_modified
+        self.payload_hash = payload_hash
+        self.checked_timestamp = now
+        self.save()
+        self.commit()
+
+    def unchanged(self):
+        """ Record that the source reported no change since the last import """
+        self.checked_timestamp = datetime.now()
+        self.save()
+        self.commit()
+
+    @classmethod
+    def find_by_api_id(cls, api_id: int) -> Union[db.Model, None]:
+        """
+        Return the sync state of an API
+        :param api_id: id of the API in the api table
+        :return: the API Sync State entry or None
+        """
+        return cls.query.filter_by(api_id=api_id).first()
+
+    @classmethod
+    def get_or_create(cls, api_id: int) -> db.Model:
+        """
+        Return the sync state of an API, creating it on the first import
+        :param api_id: id of the API in the api table
+        :return: the API Sync State entry
+        """
+        state = cls.find_by_api_id(api_id)
+        return state if state is not None else cls(api_id)
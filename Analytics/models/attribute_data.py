@@ -1,16 +1,579 @@
+"""
+Storage of attribute data
+
+Attribute readings are stored either in one table per attribute (the
+original layout, `<attribute>_<uuid>` with text sensor ids) or in the single
+consolidated `reading` table with integer surrogate keys. Both layouts are
+reached through an AttributeDataStore so resources, exports and importers
+keep working with attribute table names, sensor UUIDs and rows exposing
+`s_id`, `value`, `api_timestamp` and `timestamp` regardless of the layout.
+
+The layout is selected with the storage backend setting in config.env.yml:
+
+    storage:
+      backend: per_table | consolidated
+"""
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Float, MetaData, Table, asc, desc, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError
+from sqlalchemy.sql.expression import cast
+
 from db import db
+from models.data_version import data_versions
+from models.reading import Reading, ReadingAttribute, ReadingSensor, to_float
+from settings import GetConfig
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+PER_TABLE = 'per_table'
+CONSOLIDATED = 'consolidated'
+COLUMN_NAMES = ('s_id', 'value', 'api_timestamp', 'timestamp')
+
+
+class TableRegistry(object):
+    """
+    Thread safe cache of attribute data tables. Each table is reflected once
+    in to a Core Table on a MetaData private to the registry, so looking up a
+    table neither declares mapped classes nor touches db.metadata. The least
+    recently used tables are evicted once the registry is full.
+    """
+
+    def __init__(self, max_size: int = 256) -> None:
+        """
+        Initialise TableRegistry
+        :param max_size: Maximum number of tables kept in the registry
+        """
+        self.max_size = max_size
+        self.metadata = MetaData()
+        self._tables = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, table_name: str) -> Table:
+        """
+        Get the Table of an attribute data table, reflecting it on first use
+        :param table_name: Attribute data table name
+        :return: Reflected Table
+        :raises NoSuchTableError: If the table does not exist
+        """
+        table_name = table_name.lower()
+        with self._lock:
+            table = self._tables.get(table_name)
+            if table is not None:
+                self._tables.move_to_end(table_name)
+                return table
+
+            table = Table(table_name, self.metadata, autoload=True,
+                          autoload_with=db.engine)
+            self._tables[table_name] = table
+            while len(self._tables) > self.max_size:
+                _, evicted = self._tables.popitem(last=False)
+                self.metadata.remove(evicted)
+            return table
+
+    def evict(self, table_name: str) -> None:
+        """
+        Remove a table from the registry
+        :param table_name: Attribute data table name
+        """
+        with self._lock:
+            table = self._tables.pop(table_name.lower(), None)
+            if table is not None:
+                self.metadata.remove(table)
+
+    def clear(self) -> None:
+        """ Remove all tables from the registry """
+        with self._lock:
+            self._tables.clear()
+            self.metadata.clear()
+
+    def __contains__(self, table_name: str) -> bool:
+        return table_name.lower() in self._tables
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+
+def _table_cache_size() -> int:
+    """
+    Get the configured size of the table registry
+    :return: Maximum number of tables kept in the registry
+    """
+    try:
+        return int(GetConfig.setting('storage', 'table_cache_size', 256))
+    except ValueError:
+        return 256
+
+
+table_registry = TableRegistry(_table_cache_size())
+
+
+class AttributeDataStore(object):
+    """
+    Read and write attribute readings by attribute table name. Rows returned
+    by the query methods expose s_id, value, api_timestamp and timestamp
+    """
+    backend = None
+
+    def create_tables(self, table_names: [str]) -> None:
+        """
+        Prepare storage for attribute data tables
+        :param table_names: Attribute data table names
+        """
+        raise NotImplementedError
+
+    def drop_table(self, table_name: str) -> None:
+        """
+        Remove an attribute data table and all of its readings
+        :param table_name: Attribute data table name
+        """
+        raise NotImplementedError
+
+    def insert(self, table_name: str, rows: [dict]) -> None:
+        """
+        Persist readings, readings that already exist and readings without a
+        value are skipped
+        :param table_name: Attribute data table name
+        :param rows: Dictionaries with s_id, value, api_timestamp and timestamp
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _with_value(table_name: str, rows: [dict]) -> [dict]:
+        """
+        Drop the readings without a value, neither layout can store them
+        :param table_name: Attribute data table name
+        :param rows: Dictionaries with s_id, value, api_timestamp and timestamp
+        :return: The readings with a value
+        """
+        kept = [row for row in rows if row['value'] is not None]
+        if len(kept) < len(rows):
+            logger.info('Skipped {} readings of {} without a value'.format(
+                len(rows) - len(kept), table_name))
+        return kept
+
+    @staticmethod
+    def _log_skipped(table_name: str, inserted: int, total: int) -> None:
+        """
+        Log the readings an insert skipped as already stored
+        :param table_name: Attribute data table name
+        :param inserted: Number of readings inserted
+        :param total: Number of readings sent to the database
+        """
+        if 0 <= inserted < total:
+            logger.info('Skipped {} readings of {} already stored'.format(
+                total - inserted, table_name))
+
+    def count(self, table_name: str) -> int:
+        """
+        Count readings of an attribute
+        :param table_name: Attribute data table name
+        :return: Number of readings
+        """
+        query, _ = self._select(table_name)
+        return query.count()
+
+    def latest(self, table_name: str, limit: Union[int, None] = None) -> [Any]:
+        """
+        Fetch the most recent readings of an attribute
+        :param table_name: Attribute data table name
+        :param limit: Maximum number of readings
+        :return: Readings ordered by api_timestamp, most recent first
+        """
+        query, columns = self._select(table_name)
+        query = query.order_by(desc(columns['api_timestamp']))
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def between(self, table_name: str, fromdate: datetime, todate: datetime,
+                limit: Union[int, None] = None,
+                offset: Union[int, None] = None) -> [Any]:
+        """
+        Fetch readings of an attribute reported within a period
+        :param table_name: Attribute data table name
+        :param fromdate: Start of the period
+        :param todate: End of the period
+        :param limit: Maximum number of readings
+        :param offset: Number of readings to skip
+        :return: Readings reported between fromdate and todate
+        """
+        query, columns = self._select(table_name)
+        query = query.filter(columns['api_timestamp'] >= fromdate).filter(
+            columns['api_timestamp'] <= todate)
+        if limit is not None:
+            query = query.limit(limit)
+        if offset is not None:
+            query = query.offset(offset)
+        return query.all()
+
+    def all(self, table_name: str) -> [Any]:
+        """
+        Fetch all readings of an attribute
+        :param table_name: Attribute data table name
+        :return: All readings
+        """
+        query, _ = self._select(table_name)
+        return query.all()
+
+    def by_sensor(self, table_name: str, sensor_id: Union[str, None],
+                  limit: Union[int, None] = None) -> [Any]:
+        """
+        Fetch the most recent readings of an attribute, optionally for a
+        single sensor
+        :param table_name: Attribute data table name
+        :param sensor_id: Sensor UUID or None for all sensors
+        :param limit: Maximum number of readings
+        :return: Readings, most recent first
+        """
+        query, columns = self._select(table_name)
+        if sensor_id:
+            query = query.filter(columns['s_id'] == sensor_id)
+        query = query.order_by(desc(columns['api_timestamp']))
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def sensor_counts(self, table_name: str,
+                      sensor_ids: Union[List[str], None] = None
+                      ) -> Dict[str, int]:
+        """
+        Count the readings of every sensor of an attribute in a single query
+        :param table_name: Attribute data table name
+        :param sensor_ids: Sensor UUIDs or None for all sensors
+        :return: Number of readings keyed by sensor id
+        """
+        readings = self._select(table_name)[0].subquery()
+        query = db.session.query(readings.c.s_id, func.count()) \
+            .group_by(readings.c.s_id)
+        if sensor_ids:
+            query = query.filter(readings.c.s_id.in_(sensor_ids))
+        return {str(sensor_id): count for sensor_id, count in query.all()}
 
+    def recent_window(self, table_name: str,
+                      sensor_ids: Union[List[str], None],
+                      window: int) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Fetch the most recent readings of every sensor of an attribute in a
+        single query, ranking each sensor's readings by api_timestamp
+        :param table_name: Attribute data table name
+        :param sensor_ids: Sensor UUIDs or None for all sensors
+        :param window: Maximum number of readings per sensor
+        :return: Timestamps (datetime64) and values (float, NaN where not
+                 numeric) in ascending time order, keyed by sensor id
+        """
+        query, columns = self._select(table_name)
+        rank = func.row_number().over(
+            partition_by=columns['s_id'],
+            order_by=desc(columns['api_timestamp'])).label('rank')
+        query = query.add_columns(rank)
+        if sensor_ids:
+            query = query.filter(columns['s_id'].in_(sensor_ids))
+        ranked = query.subquery()
+        rows = db.session.query(ranked.c.s_id, ranked.c.api_timestamp,
+                                ranked.c.value) \
+            .filter(ranked.c.rank <= window) \
+            .order_by(ranked.c.s_id, ranked.c.api_timestamp).all()
 
-def ModelClass(tablename) -> db.Model:
+        frame = pd.DataFrame(rows, columns=['s_id', 'api_timestamp', 'value'])
+        frame['api_timestamp'] = pd.to_datetime(frame['api_timestamp'])
+        frame['value'] = pd.to_numeric(frame['value'], errors='coerce')
+        return {str(sensor_id): (group['api_timestamp'].values,
+                                 group['value'].values.astype(float))
+                for sensor_id, group in frame.groupby('s_id', sort=False)}
+
+    def most_recent(self, table_name: str) -> Any:
+        """
+        Fetch the reading with the most recent api_timestamp
+        :param table_name: Attribute data table name
+        :return: Reading or None if the attribute has no readings
+        """
+        query, columns = self._select(table_name)
+        return query.order_by(desc(columns['api_timestamp'])).first()
+
+    def most_recent_import(self, table_name: str) -> Any:
+        """
+        Fetch the most recently imported reading
+        :param table_name: Attribute data table name
+        :return: Reading or None if the attribute has no readings
+        """
+        query, columns = self._select(table_name)
+        return query.order_by(desc(columns['timestamp'])).first()
+
+    def maximum(self, table_name: str) -> Any:
+        """
+        Fetch the reading with the highest value, earliest imported first
+        :param table_name: Attribute data table name
+        :return: Reading or None
+        """
+        raise NotImplementedError
+
+    def minimum(self, table_name: str) -> Any:
+        """
+        Fetch the reading with the lowest value, earliest imported first
+        :param table_name: Attribute data table name
+        :return: Reading or None
+        """
+        raise NotImplementedError
+
+    def read_frame(self, table_name: str,
+                   limit: Union[int, None] = None) -> pd.DataFrame:
+        """
+        Read readings of an attribute in to a DataFrame
+        :param table_name: Attribute data table name
+        :param limit: Maximum number of readings
+        :return: DataFrame with the columns s_id, value, api_timestamp and
+                 timestamp
+        """
+        query, _ = self._select(table_name)
+        if limit is not None:
+            query = query.limit(limit)
+        return pd.read_sql(query.statement, con=db.engine)
+
+    def iter_frames(self, table_name: str, columns: [str],
+                    fromdate: Union[datetime, None] = None,
+                    todate: Union[datetime, None] = None,
+                    chunk_size: int = 50000) -> Iterator[pd.DataFrame]:
+        """
+        Read columns of the readings of an attribute in chunks, through a
+        server side cursor so only one chunk is held in memory at a time
+        :param table_name: Attribute data table name
+        :param columns: Names of the columns read, among COLUMN_NAMES
+        :param fromdate: Start of the period, from the first reading if None
+        :param todate: End of the period, to the last reading if None
+        :param chunk_size: Number of readings per chunk
+        :return: DataFrames of at most chunk_size readings
+        """
+        query, table_columns = self._select(table_name)
+        if fromdate is not None:
+            query = query.filter(table_columns['api_timestamp'] >= fromdate)
+        if todate is not None:
+            query = query.filter(table_columns['api_timestamp'] <= todate)
+        query = query.with_entities(
+            *[table_columns[name].label(name) for name in columns])
+
+        connection = db.engine.connect().execution_options(
+            stream_results=True)
+        try:
+            for frame in pd.read_sql(query.statement, connection,
+                                     chunksize=chunk_size):
+                yield frame
+        finally:
+            connection.close()
+
+    def _select(self, table_name: str) -> (Any, {str: Any}):
+        """
+        Build the base query for the readings of an attribute
+        :param table_name: Attribute data table name
+        :return: Query and the columns s_id, value, api_timestamp and
+                 timestamp it exposes
+        """
+        raise NotImplementedError
+
+
+class PerTableStore(AttributeDataStore):
     """
-    Decoratively define the schema for an attribute data table and extend
-    if the table exists.
+    One table per attribute, tables are looked up in the shared TableRegistry
     """
-    table = {
-        's_id': db.Column(db.Text, primary_key=True),
-        'value': db.Column(db.Text, primary_key=True),
-        'api_timestamp': db.Column(db.DateTime, primary_key=True),
-        'timestamp': db.Column(db.DateTime),
-        '__table_args__': {'extend_existing': True}
+    backend = PER_TABLE
+    INSERT_BATCH_SIZE = 5000
+
+    def __init__(self, registry: TableRegistry = None) -> None:
+        """
+        Initialise PerTableStore
+        :param registry: TableRegistry to look tables up in
+        """
+        self.registry = registry or table_registry
+
+    def table(self, table_name: str) -> Table:
+        """
+        Get the Table of an attribute data table
+        :param table_name: Attribute data table name
+        :return: Table from the registry
+        """
+        return self.registry.get(table_name)
+
+    def create_tables(self, table_names: [str]) -> None:
+        table_query = db.session.execute("select * from pg_catalog.pg_tables")
+        tables = set(t[1] for t in table_query.fetchall())
+
+        for table_name in table_names:
+            if table_name.lower() not in tables:
+                db.session.execute(
+                    'CREATE TABLE %s (s_id TEXT NOT NULL, value TEXT NOT NULL, api_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL, timestamp TIMESTAMP WITHOUT TIME ZONE, PRIMARY KEY(s_id, value, api_timestamp))' % (
+                        table_name))
+                logger.info('Created Table %s' % table_name.lower())
+            else:
+                logger.info('{} already exists'.format(
+                    table_name.replace('-', '_')))
+        # Tables are reflected on a connection of their own, make them visible
+        db.session.commit()
+
+    def drop_table(self, table_name: str) -> None:
+        self.table(table_name).drop(db.engine)
+        self.registry.evict(table_name)
+        data_versions.bump([table_name])
+
+    def insert(self, table_name: str, rows: [dict]) -> None:
+        rows = self._with_value(table_name, rows)
+        if not rows:
+            return
+        table = self.table(table_name)
+        values = [{
+            's_id': row['s_id'],
+            'value': str(row['value']),
+            'api_timestamp': row['api_timestamp'],
+            'timestamp': row['timestamp']
+        } for row in rows]
+        inserted = 0
+        for i in range(0, len(values), self.INSERT_BATCH_SIZE):
+            inserted += db.session.execute(insert(table).values(
+                values[i:i + self.INSERT_BATCH_SIZE]).on_conflict_do_nothing()
+            ).rowcount
+        db.session.commit()
+        self._log_skipped(table_name, inserted, len(values))
+        data_versions.bump([table_name])
+
+    def maximum(self, table_name: str) -> Any:
+        table = self.table(table_name)
+        try:
+            return db.session.query(table).order_by(
+                desc(cast(table.c.value, Float))).order_by(
+                asc(table.c.timestamp)).first()
+        except DataError:
+            db.session.rollback()
+        return None
+
+    def minimum(self, table_name: str) -> Any:
+        table = self.table(table_name)
+        try:
+            return db.session.query(table).order_by(
+                asc(cast(table.c.value, Float))).order_by(
+                asc(table.c.timestamp)).first()
+        except DataError:
+            db.session.rollback()
+        return None
+
+    def _select(self, table_name: str) -> (Any, {str: Any}):
+        table = self.table(table_name)
+        return db.session.query(table), table.c
+
+
+class ConsolidatedStore(AttributeDataStore):
+    """
+    Single reading table with integer surrogate keys. Rows are keyed tuples
+    exposing the same attributes as the per table layout, value is the raw
+    value as reported by the API
+    """
+    backend = CONSOLIDATED
+    INSERT_BATCH_SIZE = 5000
+
+    COLUMNS = {
+        's_id': ReadingSensor.sensor_id,
+        'value': Reading.raw,
+        'api_timestamp': Reading.ts,
+        'timestamp': Reading.timestamp
     }
-    return type(tablename, (db.Model,), table)
+
+    def attribute_key(self, table_name: str) -> int:
+        """
+        Get the surrogate key of an attribute data table
+        :param table_name: Attribute data table name
+        :return: Surrogate key
+        :raises LookupError: If the table is unknown
+        """
+        key = ReadingAttribute.key_for(table_name)
+        if key is None:
+            raise LookupError('Attribute table {} does not exist'.format(
+                table_name))
+        return key
+
+    def create_tables(self, table_names: [str]) -> None:
+        for table_name in table_names:
+            ReadingAttribute.key_for(table_name, create=True)
+        db.session.commit()
+
+    def drop_table(self, table_name: str) -> None:
+        key = self.attribute_key(table_name)
+        db.session.query(Reading).filter(
+            Reading.attribute_id == key).delete(synchronize_session=False)
+        db.session.query(ReadingAttribute).filter(
+            ReadingAttribute.id == key).delete(synchronize_session=False)
+        db.session.commit()
+        ReadingAttribute.forget(table_name)
+        data_versions.bump([table_name])
+
+    def insert(self, table_name: str, rows: [dict]) -> None:
+        rows = self._with_value(table_name, rows)
+        if not rows:
+            return
+        attribute_key = ReadingAttribute.key_for(table_name, create=True)
+        sensor_keys = ReadingSensor.keys_for([r['s_id'] for r in rows],
+                                             create=True)
+        values = [{
+            'attribute_id': attribute_key,
+            'sensor_id': sensor_keys[row['s_id']],
+            'ts': row['api_timestamp'],
+            'value': to_float(row['value']),
+            'raw': str(row['value']),
+            'timestamp': row['timestamp']
+        } for row in rows]
+        # one reading is kept per sensor and time stamp, see Reading
+        inserted = 0
+        for i in range(0, len(values), self.INSERT_BATCH_SIZE):
+            inserted += db.session.execute(insert(Reading.__table__).values(
+                values[i:i + self.INSERT_BATCH_SIZE]).on_conflict_do_nothing()
+            ).rowcount
+        db.session.commit()
+        self._log_skipped(table_name, inserted, len(values))
+        data_versions.bump([table_name])
+
+    def maximum(self, table_name: str) -> Any:
+        query, _ = self._select(table_name)
+        return query.filter(Reading.value.isnot(None)).order_by(
+            desc(Reading.value)).order_by(asc(Reading.timestamp)).first()
+
+    def minimum(self, table_name: str) -> Any:
+        query, _ = self._select(table_name)
+        return query.filter(Reading.value.isnot(None)).order_by(
+            asc(Reading.value)).order_by(asc(Reading.timestamp)).first()
+
+    def count(self, table_name: str) -> int:
+        return db.session.query(Reading).filter(
+            Reading.attribute_id == self.attribute_key(table_name)).count()
+
+    def _select(self, table_name: str) -> (Any, {str: Any}):
+        query = db.session.query(
+            *[self.COLUMNS[name].label(name) for name in COLUMN_NAMES]
+        ).join(ReadingSensor, ReadingSensor.id == Reading.sensor_id).filter(
+            Reading.attribute_id == self.attribute_key(table_name))
+        return query, self.COLUMNS
+
+
+_stores = {PER_TABLE: PerTableStore, CONSOLIDATED: ConsolidatedStore}
+_store = None
+
+
+def get_data_store() -> AttributeDataStore:
+    """
+    Get the configured attribute data store
+    :return: AttributeDataStore for the configured storage backend
+    """
+    global _store
+    if _store is None:
+        backend = GetConfig.setting('storage', 'backend', PER_TABLE)
+
+        if backend not in _stores:
+            logger.error('Unknown storage backend {}, falling back to '
+                         '{}'.format(backend, PER_TABLE))
+            backend = PER_TABLE
+        _store = _stores[backend]()
+    return _store
@@ -1,14 +1,11 @@
 import logging
 from datetime import datetime
 
-from sqlalchemy import desc, func
-from sqlalchemy.exc import IntegrityError, DataError
-from sqlalchemy.sql.expression import cast
-from sqlalchemy import Float, desc, asc
+from sqlalchemy.exc import IntegrityError
 from typing import Union
 
 from db import db
-from models.attribute_data import ModelClass
+from models.attribute_data import get_data_store
 
 logging.basicConfig(level='INFO')
 logger = logging.getLogger(__name__)
@@ -192,11 +189,7 @@ class Attributes(db.Model):
         :return: most recent timestamp present in table
         """
 
-        db.metadata.clear()
-        attribute_data_model = ModelClass(attribute_table.lower())
-        most_recent_entry = db.session.query(attribute_data_model).order_by(
-            desc(attribute_data_model.api_timestamp)).first()
-        db.metadata.clear()
+        most_recent_entry = get_data_store().most_recent(attribute_table)
 
         if most_recent_entry:
             return most_recent_entry.api_timestamp
@@ -211,19 +204,7 @@ class Attributes(db.Model):
         :return: maximum attribute value
         """
 
-        db.metadata.clear()
-        attribute_data_model = ModelClass(attribute_table.lower())
-        attr_max = None
-        try:
-            attr_max = db.session.query(
-                attribute_data_model).order_by(
-                desc(cast(attribute_data_model.value, Float))).order_by(
-                asc(attribute_data_model.timestamp)).first()
-
-        except DataError:
-            db.session.rollback()
-
-        return attr_max
+        return get_data_store().maximum(attribute_table)
 
     @classmethod
     def attribute_min(cls, attribute_table: str) -> (Union[db.Model, None]):
@@ -233,16 +214,4 @@ class Attributes(db.Model):
         :return: minimum attribute value
         """
 
-        db.metadata.clear()
-        attribute_data_model = ModelClass(attribute_table.lower())
-        attr_min = None
-        try:
-            attr_min = db.session.query(
-                attribute_data_model).order_by(
-                asc(cast(attribute_data_model.value, Float))).order_by(
-                asc(attribute_data_model.timestamp)).first()
-
-        except DataError:
-            db.session.rollback()
-
-        return attr_min
+        return get_data_store().minimum(attribute_table)
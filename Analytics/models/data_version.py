@@ -0,0 +1,170 @@
+"""
+Versions of the data served by the API
+
+Every attribute data table, and each group of tables the read endpoints
+depend on (themes, sensors and trackers), has a version counter and the
+time it last changed, kept in Redis hashes. Versions are bumped once writes
+are committed: by the attribute data stores for readings, and by session
+listeners for the models in MODEL_VERSIONS, so any write made through the
+ORM, including bulk Query.update() and Query.delete(), is picked up. Writes
+made with raw SQL or COPY bypass the listeners and must call
+data_versions.bump() once committed. resources.conditional derives ETags and
+Last-Modified headers from them.
+
+An epoch, regenerated whenever Redis loses it, is part of every ETag so
+counters that restart after a flush of Redis do not repeat earlier ETags.
+"""
+import logging
+import time
+import uuid
+from itertools import chain
+from typing import Union
+
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from create_celery import redis_client
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'data-versions'
+THEMES = 'themes'
+SENSORS = 'sensors'
+TRACKERS = 'trackers'
+# Tables of the models whose changes bump a version, by version name
+MODEL_VERSIONS = {
+    'theme': THEMES,
+    'subtheme': THEMES,
+    'attributes': THEMES,
+    'attr_alias': THEMES,
+    'unit': THEMES,
+    'sensor': SENSORS,
+    'location': SENSORS,
+    'sensorattribute': SENSORS,
+    'tracker': TRACKERS,
+    'location_data': TRACKERS,
+}
+_PENDING = 'data_versions'
+
+
+class DataVersions(object):
+    """
+    Version counters and modification times of the data served by the API
+    """
+
+    def __init__(self, client: redis.StrictRedis = None) -> None:
+        """
+        Initialise DataVersions
+        :param client: Redis client, created from CELERY_RESULT_BACKEND when
+                       None
+        """
+        self._client = client
+
+    @property
+    def client(self) -> redis.StrictRedis:
+        """
+        Connect to Redis on first use
+        :return: Redis client
+        """
+        if self._client is None:
+            self._client = redis_client()
+        return self._client
+
+    def bump(self, names: [str]) -> None:
+        """
+        Record that data has changed. Failures are logged, the data itself is
+        already committed
+        :param names: Attribute data table names or version names
+        """
+        names = sorted(set(names))
+        if not names:
+            return
+        now = time.time()
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.set(KEY_PREFIX + ':epoch', uuid.uuid4().hex, nx=True)
+            for name in names:
+                pipe.hincrby(KEY_PREFIX, name, 1)
+            pipe.hmset(KEY_PREFIX + ':modified',
+                       {name: now for name in names})
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error('Unable to bump the versions of {}: {}'.format(
+                names, e))
+
+    def state(self, names: [str]) -> Union[
+            (str, {str: int}, Union[float, None]), None]:
+        """
+        Read the versions of data
+        :param names: Attribute data table names or version names
+        :return: The epoch, the version of every name and the time the
+                 most recent of them changed, None when Redis is unavailable
+        """
+        names = sorted(set(names))
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.set(KEY_PREFIX + ':epoch', uuid.uuid4().hex, nx=True)
+            pipe.get(KEY_PREFIX + ':epoch')
+            pipe.hmget(KEY_PREFIX, names)
+            pipe.hmget(KEY_PREFIX + ':modified', names)
+            _, epoch, versions, modified = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning('Unable to read data versions: {}'.format(e))
+            return None
+
+        modified = [float(m) for m in modified if m is not None]
+        return (epoch.decode('utf8'),
+                {name: int(v or 0) for name, v in zip(names, versions)},
+                max(modified) if modified else None)
+
+
+data_versions = DataVersions()
+
+
+def _collect(session: Session, table: Union[str, None]) -> None:
+    """
+    Remember the version bumped by a change of a table until it is committed
+    :param session: Session the change was made in
+    :param table: Name of the table changed
+    """
+    if table in MODEL_VERSIONS:
+        session.info.setdefault(_PENDING, set()).add(MODEL_VERSIONS[table])
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session: Session, flush_context: object) -> None:
+    """
+    Remember the versions bumped by the changes of a flush until they are
+    committed
+    """
+    for instance in chain(session.new, session.dirty, session.deleted):
+        _collect(session, getattr(getattr(instance, '__table__', None),
+                                  'name', None))
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _collect_bulk_changes(context: object) -> None:
+    """
+    Remember the versions bumped by a Query.update() or Query.delete(), which
+    do not go through the flush, until they are committed
+    """
+    mapper = getattr(context, 'mapper', None)
+    _collect(context.session, getattr(getattr(mapper, 'local_table', None),
+                                      'name', None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed(session: Session) -> None:
+    """ Bump the versions of the changes committed """
+    names = session.info.pop(_PENDING, None)
+    if names:
+        data_versions.bump(names)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back(session: Session) -> None:
+    """ Forget the changes rolled back """
+    session.info.pop(_PENDING, None)
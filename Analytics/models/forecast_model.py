@@ -0,0 +1,251 @@
+''' Data table to store fitted forecasting models '''
+
+import json
+import logging
+import pickle
+from datetime import datetime, timedelta
+from typing import Any, Union
+
+from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.exc import IntegrityError
+
+from db import db
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+ALL_SENSORS = "All sensors"
+
+
+class ForecastModel(db.Model):
+    __tablename__ = 'forecastmodel'
+    __table_args__ = (
+        db.UniqueConstraint('attribute_table', 'sensor_id', 'freq', 'engine',
+                            name='uq_forecastmodel_series'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    attribute_table = db.Column(db.String(150), nullable=False)
+    sensor_id = db.Column(db.String(150), nullable=False)
+    freq = db.Column(db.String(20), nullable=False)
+    engine = db.Column(db.String(50), nullable=False)
+    model = db.Column(db.LargeBinary, nullable=True)
+    params = db.Column(JSON, nullable=True)
+    last_ds = db.Column(db.DateTime, nullable=False)
+    n_obs = db.Column(db.Integer, nullable=False)
+    mape = db.Column(db.Float, nullable=True)
+    mape_timestamp = db.Column(db.DateTime, nullable=True)
+    fit_seconds = db.Column(db.Float, nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    auto_selected = db.Column(db.Boolean, nullable=False, default=False)
+    created_timestamp = db.Column(db.DateTime, nullable=False)
+    updated_timestamp = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, attribute_table: str, sensor_id: Union[str, None],
+                 freq: str, engine: str, last_ds: datetime, n_obs: int,
+                 model: bytes = None, params: dict = None,
+                 fit_seconds: float = None,
+                 created_timestamp: datetime = None):
+        """
+        Initialise the ForecastModel object instance
+        :param attribute_table: the attribute table whose entries the model
+        was fitted on
+        :param sensor_id: the ID of the sensor the model was fitted on, None
+        for all sensors
+        :param freq: the frequency of the series the model was fitted on
+        :param engine: the name of the forecasting engine
+        :param last_ds: time stamp of the last observation the model was
+        fitted on
+        :param n_obs: the number of observations the model was fitted on
+        :param model: the pickled fitted model
+        :param params: fitted parameters used to warm start the next fit
+        :param fit_seconds: the time taken to fit the model
+        :param created_timestamp: time stamp of when the model was created
+        """
+        if created_timestamp is None:
+            created_timestamp = datetime.now()
+
+        self.attribute_table = attribute_table
+        self.sensor_id = sensor_id if sensor_id else ALL_SENSORS
+        self.freq = freq
+        self.engine = engine
+        self.last_ds = last_ds
+        self.n_obs = n_obs
+        self.model = model
+        self.params = params
+        self.fit_seconds = fit_seconds
+        self.version = 1
+        self.auto_selected = False
+        self.created_timestamp = created_timestamp
+        self.updated_timestamp = created_timestamp
+
+    def __str__(self) -> str:
+        """
+        override the dunder string method to cast the ForecastModel
+        attributes to a string
+        :return: a JSON string of the ForecastModel attributes
+        """
+        return json.dumps(self.json())
+
+    def json(self) -> dict:
+        """
+        Create a JSON dict of the ForecastModel attributes, the fitted model
+        itself is left out
+        :return: the ForecastModel attributes as a JSON (dict)
+        """
+        return {
+            'id': self.id,
+            'attribute_table': self.attribute_table,
+            'sensor_id': self.sensor_id,
+            'freq': self.freq,
+            'engine': self.engine,
+            'last_ds': str(self.last_ds),
+            'n_obs': self.n_obs,
+            'mape': self.mape,
+            'mape_timestamp': str(self.mape_timestamp),
+            'fit_seconds': self.fit_seconds,
+            'version': self.version,
+            'auto_selected': self.auto_selected
+        }
+
+    @property
+    def fitted_model(self) -> Any:
+        """
+        Unpickle the fitted model
+        :return: the fitted model or None if it was not stored
+        """
+        if self.model is None:
+            return None
+        return pickle.loads(self.model)
+
+    @fitted_model.setter
+    def fitted_model(self, fitted: Any) -> None:
+        """
+        Pickle a fitted model
+        :param fitted: the fitted model
+        """
+        self.model = pickle.dumps(fitted, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def covers(self, last_ds: datetime, n_obs: int) -> bool:
+        """
+        Determine if the model was fitted on the series described
+        :param last_ds: time stamp of the last observation of the series
+        :param n_obs: the number of observations in the series
+        :return: whether the series holds no data the model has not seen
+        """
+        return self.last_ds == last_ds and self.n_obs == n_obs
+
+    def mape_is_due(self, interval: timedelta) -> bool:
+        """
+        Determine if the holdout error should be recomputed
+        :param interval: how long a computed error is trusted for
+        :return: whether the error is missing or older than interval
+        """
+        return self.mape is None or self.mape_timestamp is None or \
+            datetime.now() - self.mape_timestamp > interval
+
+    def save(self):
+        """
+        Add the current ForecastModel fields to the SQLAlchemy session
+        """
+        try:
+            db.session.add(self)
+            db.session.flush()
+        except IntegrityError as ie:
+            db.session.rollback()
+            logger.error('Forecast model for {} {} {} already exists'.format(
+                self.attribute_table, self.sensor_id, self.freq))
+
+    def delete(self):
+        """
+        Add the current ForecastModel fields to the SQLAlchemy session to be
+        deleted
+        """
+        try:
+            db.session.delete(self)
+            db.session.flush()
+        except IntegrityError as ie:
+            db.session.rollback()
+            logger.error(str(self.id) + ' forecast model does not exists')
+
+    @staticmethod
+    def commit():
+        """ Commit updated items to the database """
+        db.session.commit()
+
+    def select_for_auto(self):
+        """
+        Mark the model as the one auto mode uses for its series
+        """
+        ForecastModel.query.filter(
+            ForecastModel.attribute_table == self.attribute_table,
+            ForecastModel.sensor_id == self.sensor_id,
+            ForecastModel.freq == self.freq,
+            ForecastModel.id != self.id).update(
+            {'auto_selected': False}, synchronize_session=False)
+        self.auto_selected = True
+        db.session.flush()
+
+    @classmethod
+    def find_by_series(cls, attribute_table: str, sensor_id: Union[str, None],
+                       freq: str, engine: str) -> db.Model:
+        """
+        Return the stored model of a series
+        :param attribute_table: name of the attribute table of the series
+        :param sensor_id: id of the sensor of the series, None for all sensors
+        :param freq: frequency of the series
+        :param engine: name of the forecasting engine
+        :return: the stored model or None
+        """
+        if not sensor_id:
+            sensor_id = ALL_SENSORS
+        return cls.query.filter_by(attribute_table=attribute_table,
+                                   sensor_id=sensor_id, freq=freq,
+                                   engine=engine).first()
+
+    @classmethod
+    def find_current(cls, attribute_table: str, sensor_id: Union[str, None],
+                     engine: str = None) -> db.Model:
+        """
+        Return the most recently updated model of a series, whatever its
+        frequency
+        :param attribute_table: name of the attribute table of the series
+        :param sensor_id: id of the sensor of the series, None for all sensors
+        :param engine: name of the forecasting engine, the model auto mode
+        uses when None
+        :return: the stored model or None
+        """
+        if not sensor_id:
+            sensor_id = ALL_SENSORS
+        query = cls.query.filter_by(attribute_table=attribute_table,
+                                    sensor_id=sensor_id)
+        if engine is None:
+            query = query.filter_by(auto_selected=True)
+        else:
+            query = query.filter_by(engine=engine)
+        return query.order_by(cls.updated_timestamp.desc()).first()
+
+    @classmethod
+    def find_auto_selected(cls, attribute_table: str,
+                           sensor_id: Union[str, None], freq: str) -> db.Model:
+        """
+        Return the model auto mode uses for a series
+        :param attribute_table: name of the attribute table of the series
+        :param sensor_id: id of the sensor of the series, None for all sensors
+        :param freq: frequency of the series
+        :return: the selected model or None
+        """
+        if not sensor_id:
+            sensor_id = ALL_SENSORS
+        return cls.query.filter_by(attribute_table=attribute_table,
+                                   sensor_id=sensor_id, freq=freq,
+                                   auto_selected=True).first()
+
+    @classmethod
+    def find_by_attribute_table(cls, attribute_table: str) -> [db.Model]:
+        """
+        Return the stored models fitted on an attribute table
+        :param attribute_table: name of the attribute table
+        :return: the stored models
+        """
+        return cls.query.filter_by(attribute_table=attribute_table).all()
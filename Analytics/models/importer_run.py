@@ -0,0 +1,233 @@
+''' Data table, store the history of importer runs '''
+
+from datetime import datetime
+import json
+
+from sqlalchemy import desc, func
+from sqlalchemy.exc import IntegrityError
+import logging
+
+from db import db
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCESS = 'success'
+FAILURE = 'failure'
+SKIPPED = 'skipped'
+NO_CHANGE = 'no-change'
+
+
+class ImporterRun(db.Model):
+    __tablename__ = 'importer_run'
+    __table_args__ = (
+        db.Index('ix_importer_run_api_started', 'api_id', 'started_timestamp'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    api_id = db.Column(db.Integer, db.ForeignKey('api.id', ondelete='CASCADE'),
+                       nullable=True)
+    import_class_name = db.Column(db.String(100), nullable=False)
+    task_id = db.Column(db.String(50), nullable=True)
+    worker = db.Column(db.String(255), nullable=True)
+    attempt = db.Column(db.Integer, nullable=False, default=0)
+    state = db.Column(db.String(50), nullable=False)
+    reason = db.Column(db.Text)
+    started_timestamp = db.Column(db.DateTime, nullable=False)
+    finished_timestamp = db.Column(db.DateTime)
+    duration = db.Column(db.Float)
+
+    stages = db.relationship('ImporterRunStage', backref='run', lazy=True,
+                             cascade='all, delete-orphan',
+                             order_by='ImporterRunStage.id')
+
+    def __init__(self, api_id: int, import_class_name: str,
+                 task_id: str = None, worker: str = None, attempt: int = 0,
+                 state: str = QUEUED):
+        """
+        Initialise the Importer Run instance attributes
+        :param api_id: id of the API from which data is imported from
+        :param import_class_name: name of the class that implements the
+                                  importer
+        :param task_id: id of the Celery task executing the run
+        :param worker: host name of the worker executing the run
+        :param attempt: number of retries that preceded the run
+        :param state: state of the run
+        """
+        self.api_id = api_id
+        self.import_class_name = import_class_name
+        self.task_id = task_id
+        self.worker = worker
+        self.attempt = attempt
+        self.state = state
+        self.started_timestamp = datetime.now()
+
+    def __str__(self) -> str:
+        """
+        override the dunder string method to cast the Importer Run
+        attributes to a string
+        :return: a JSON string of the Importer Run objects attributes
+        """
+        return json.dumps(self.json())
+
+    def json(self) -> dict:
+        """
+        Create a JSON dict of the Importer Run object attributes
+        :return: the Importer Run object attributes as a JSON (dict)
+        """
+        return {
+            'id': self.id,
+            'api_id': self.api_id,
+            'import_class_name': self.import_class_name,
+            'task_id': self.task_id,
+            'worker': self.worker,
+            'attempt': self.attempt,
+            'state': self.state,
+            'reason': self.reason,
+            'started_timestamp': str(self.started_timestamp),
+            'finished_timestamp': str(self.finished_timestamp),
+            'duration': self.duration,
+            'stages': [stage.json() for stage in self.stages]
+        }
+
+    def save(self):
+        """
+        Add the current Importer Run fields to the SQLAlchemy session
+        """
+        try:
+            db.session.add(self)
+            db.session.flush()
+        except IntegrityError as ie:
+            db.session.rollback()
+            logger.error(str(self.id) + ' importer run entry already exists')
+
+    @staticmethod
+    def commit():
+        """ Commit updated items to the database """
+        db.session.commit()
+
+    def start(self):
+        """ Persist the run as running """
+        self.state = RUNNING
+        self.started_timestamp = datetime.now()
+        self.save()
+        self.commit()
+
+    def finish(self, state: str, reason: str = None):
+        """
+        Persist the outcome of the run
+        :param state: final state of the run
+        :param reason: the error raised when the run failed or was skipped
+        """
+        self.state = state
+        self.reason = reason
+        self.finished_timestamp = datetime.now()
+        self.duration = (self.finished_timestamp -
+                         self.started_timestamp).total_seconds()
+        self.save()
+        self.commit()
+
+    def record_stages(self, stages: [dict]):
+        """
+        Persist the stage metrics of the run
+        :param stages: the totals of each stage, as returned by
+                       ImportMetrics.json
+        """
+        for stage in stages:
+            self.stages.append(ImporterRunStage(
+                stage['stage'], stage['calls'], stage['seconds'],
+                stage['bytes'], stage['rows'], stage['statements']))
+        self.save()
+        self.commit()
+
+    @classmethod
+    def latest_per_api(cls) -> [db.Model]:
+        """
+        Return the most recent finished run of every importer
+        :return: the Importer Run entries, one per API
+        """
+        latest = db.session.query(
+            cls.api_id, func.max(cls.started_timestamp).label('started')
+        ).filter(cls.finished_timestamp.isnot(None)).group_by(
+            cls.api_id).subquery()
+        return cls.query.join(latest, (cls.api_id == latest.c.api_id) & (
+            cls.started_timestamp == latest.c.started)).all()
+
+    @classmethod
+    def count_by_state(cls) -> [tuple]:
+        """
+        Count the runs of every importer by outcome
+        :return: (api id, state, number of runs) tuples
+        """
+        return db.session.query(cls.api_id, cls.state, func.count(
+            cls.id)).group_by(cls.api_id, cls.state).all()
+
+    @classmethod
+    def find_by_api_id(cls, api_id: int, limit: int = 50) -> [db.Model]:
+        """
+        Return the most recent runs of an importer
+        :param api_id: id of importer which is contained in the api table
+        :param limit: maximum number of runs returned
+        :return: the Importer Run entries, most recent first
+        """
+        return cls.query.filter_by(api_id=api_id).order_by(
+            desc(cls.started_timestamp)).limit(limit).all()
+
+    @classmethod
+    def find_by_task_id(cls, task_id: str) -> [db.Model]:
+        """
+        Return the runs of a Celery task, one per attempt
+        :param task_id: id of the Celery task
+        :return: the Importer Run entries of the task
+        """
+        return cls.query.filter_by(task_id=task_id).order_by(
+            cls.attempt).all()
+
+
+class ImporterRunStage(db.Model):
+    __tablename__ = 'importer_run_stage'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer,
+                       db.ForeignKey('importer_run.id', ondelete='CASCADE'),
+                       nullable=False, index=True)
+    stage = db.Column(db.String(50), nullable=False)
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    seconds = db.Column(db.Float, nullable=False, default=0.0)
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    statements = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, stage: str, calls: int, seconds: float, size: int,
+                 rows: int, statements: int):
+        """
+        Initialise the Importer Run Stage instance attributes
+        :param stage: name of the pipeline stage
+        :param calls: number of times the stage was entered
+        :param seconds: time spent in the stage
+        :param size: number of bytes handled by the stage
+        :param rows: number of rows handled by the stage
+        :param statements: number of SQL statements executed by the stage
+        """
+        self.stage = stage
+        self.calls = calls
+        self.seconds = seconds
+        self.bytes = size
+        self.rows = rows
+        self.statements = statements
+
+    def json(self) -> dict:
+        """
+        Create a JSON dict of the Importer Run Stage object attributes
+        :return: the Importer Run Stage object attributes as a JSON (dict)
+        """
+        return {
+            'stage': self.stage,
+            'calls': self.calls,
+            'seconds': self.seconds,
+            'bytes': self.bytes,
+            'rows': self.rows,
+            'statements': self.statements
+        }
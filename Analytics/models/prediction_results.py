@@ -6,11 +6,13 @@ import json
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import desc
-import flask_sqlalchemy
 import logging
 
 from db import db
-from resources.predict import predict
+from forecast.engines import AUTO, get_engine
+from models.attribute_data import get_data_store
+from models.forecast_model import ForecastModel
+from models.user_predictions import UserPredictions
 
 logging.basicConfig(level='INFO')
 logger = logging.getLogger(__name__)
@@ -25,6 +27,7 @@ class PredictionResults(db.Model):
     attribute_table = db.Column(db.String(150), nullable=False)
     sensor_id = db.Column(db.String(150), nullable=False)
     num_predictions = db.Column(db.Integer, nullable=False)
+    model_version = db.Column(db.Integer, nullable=True)
     result = db.Column(JSON, nullable=False)
     created_timestamp = db.Column(db.DateTime, nullable=False)
     updated_timestamp = db.Column(db.DateTime, nullable=False)
@@ -32,7 +35,8 @@ class PredictionResults(db.Model):
     def __init__(self, eng: str, mape: float, attribute_table: str,
                  sensor_id: str,  num_predictions: int, result: JSON,
                  created_timestamp: datetime = datetime.now(),
-                 updated_timestamp: datetime = datetime.now()):
+                 updated_timestamp: datetime = datetime.now(),
+                 model_version: int = None):
         """
         Initialise the RequestPrediction object instance
         :param eng: the name of the forecasting engine used for predictions
@@ -45,6 +49,8 @@ class PredictionResults(db.Model):
         :param result: the prediction list returned from get_predictions
         :param created_timestamp: time stamp of when the result was created
         :param updated_timestamp: time stamp of when the result was last used
+        :param model_version: version of the stored forecast model the
+        predictions were made with
         """
         self.forcasting_engine = eng
         self.mean_absolute_percentage_error = mape
@@ -54,6 +60,7 @@ class PredictionResults(db.Model):
         self.result = result
         self.created_timestamp = created_timestamp
         self.updated_timestamp = updated_timestamp
+        self.model_version = model_version
 
     def __str__(self) -> str:
         """
@@ -75,9 +82,27 @@ class PredictionResults(db.Model):
             'attribute_table': self.attribute_table,
             'sensor_id': self.sensor_id,
             'num_predictions': self.num_predictions,
+            'model_version': self.model_version,
             'result': self.result
         }
 
+    def horizon(self, num_pred: int) -> dict:
+        """
+        Create the response to a prediction request from the stored result,
+        keeping the first num_pred predictions of the stored horizon
+        :param num_pred: the number of predictions requested
+        :return: a dictionary containing prediction metadata and the
+        corresponding prediction results
+        """
+        return {
+            "Sensor_id": self.sensor_id,
+            "Forcasting_engine": self.forcasting_engine,
+            "Mean_Absolute_Percentage_Error":
+                self.mean_absolute_percentage_error,
+            "Prediction_id": self.id,
+            "Predictions": self.result[:num_pred]
+        }
+
     def save(self):
         """
         Add the current Prediction Results fields to the SQLAlchemy session
@@ -101,18 +126,18 @@ class PredictionResults(db.Model):
             db.session.rollback()
             logger.error(str(self.id) + ' prediction request does not exists')
 
-    def is_stale(self, model: flask_sqlalchemy.model) -> bool:
+    def is_stale(self, attribute_table: str) -> bool:
         """
         Determine if new data has been imported into the table which was used
         to create the prediction result
-        :param model: the model class corresponding to the table which was
-        used to generate predictions
+        :param attribute_table: the name of the attribute data table which
+        was used to generate predictions
         :return: whether the prediction was created before the import of more 
         recent data
         """
 
-        recent_import_entry = db.session.query(model).order_by(desc(
-            model.timestamp)).first()
+        recent_import_entry = get_data_store().most_recent_import(
+            attribute_table)
         recent_import_timestamp = recent_import_entry.timestamp
 
         return recent_import_timestamp > self.created_timestamp
@@ -122,28 +147,90 @@ class PredictionResults(db.Model):
         """ Commit updated items to the database """
         db.session.commit()
 
+    def supersede(self) -> None:
+        """
+        Move the users of older results of the same series and engine onto
+        this result and delete the older results. The time each user last
+        requested the series is kept, a refresh is not a request
+        """
+        older = PredictionResults.query.filter(
+            PredictionResults.attribute_table == self.attribute_table,
+            PredictionResults.sensor_id == self.sensor_id,
+            PredictionResults.forcasting_engine == self.forcasting_engine,
+            PredictionResults.created_timestamp <= self.created_timestamp,
+            PredictionResults.id != self.id).all()
+
+        for result in older:
+            for entry in UserPredictions.find_by_pred_id(result.id):
+                current = UserPredictions.get_entry(entry.user_id, self.id)
+                if current:
+                    current.timestamp = max(current.timestamp, entry.timestamp)
+                    current.save()
+                    entry.delete()
+                else:
+                    entry.pred_result_id = self.id
+                    entry.save()
+            result.delete()
+        self.commit()
+
+    @classmethod
+    def find_by_id(cls, pred_id: int) -> db.Model:
+        """
+        Return the prediction result with the given id
+        :param pred_id: id of the prediction result
+        :return: the prediction result entry or None
+        """
+        return cls.query.filter_by(id=pred_id).first()
+
     @classmethod
     def find_by_prediction_args(cls, attr_table_name: str, sensor_id: str,
-                                num_pred: int) -> db.Model:
+                                engine: str = None) -> db.Model:
         """
-        Return a stored result that matches the prediction arguments
+        Return the stored result of a series. A single result holding the
+        longest horizon computed is kept per series, engine and version of
+        the stored forecast model, shorter horizons are served from its
+        first predictions
         :param attr_table_name: name of table which was used during prediction
         :param sensor_id: id of the sensor that was used to during prediction
-        :param num_pred: number of predictions included in the result
-        :return: most recent prediction result entry
+        :param engine: name of the forecasting engine requested, None for
+        the default engine, results of the engine auto mode uses match 'auto'
+        :return: most recent prediction result entry made with the current
+        model of the series, the longest horizon first among results created
+        at the same time. None in auto mode until a model has been selected
+        for the series
         """
-
         if sensor_id is None:
             sensor_id = "All sensors"
-        return cls.query.filter(
+        query = cls.query.filter(
             PredictionResults.attribute_table == attr_table_name,
-            PredictionResults.sensor_id == sensor_id,
-            PredictionResults.num_predictions == num_pred).order_by(desc(
-                cls.created_timestamp)).first()
+            PredictionResults.sensor_id == sensor_id)
+
+        if engine == AUTO:
+            model = ForecastModel.find_current(attr_table_name, sensor_id)
+            if model is None:
+                # nothing to match a result against, let auto mode choose
+                return None
+            query = query.filter(PredictionResults.forcasting_engine ==
+                                 get_engine(model.engine).label)
+        else:
+            forecaster = get_engine(engine)
+            query = query.filter(PredictionResults.forcasting_engine ==
+                                 forecaster.label)
+            model = ForecastModel.find_current(attr_table_name, sensor_id,
+                                               forecaster.name)
+        if model is not None:
+            # results of an earlier fit are superseded by the refitted model
+            query = query.filter(PredictionResults.model_version ==
+                                 model.version)
+
+        return query.order_by(desc(cls.created_timestamp),
+                              desc(cls.num_predictions)).first()
 
     @classmethod
-    def generate_predictions_results(cls, attr_table: str, sensor_id: str,  
-                                     num_pred: int, data: list, timestamps: list) -> dict:
+    def generate_predictions_results(cls, attr_table: str, sensor_id: str,
+                                     num_pred: int, data: list, timestamps: list,
+                                     engine: str = None,
+                                     existing: db.Model = None) -> dict:
         """
         Generate time series predictions and store them in the prediction
         results table
@@ -154,27 +241,98 @@ class PredictionResults(db.Model):
         :param num_pred: number of predictions to generate
         :param data: the values extracted from attr_table
         :param timestamps: timestamps of the values extracted from attr_table
+        :param engine: name of the forecasting engine, 'auto' to let the
+        forecasting service choose or None for the default engine
+        :param existing: a stored result of the series to replace with the
+        new predictions instead of adding a result
         :return a dictionary containing prediction metadata and the
         corresponding prediction results:
         """
-        _pred, _mape, _method = predict(data, timestamps, num_pred)
+        from forecast.service import ForecastService
+
+        _pred, _mape, _method, _version = ForecastService().forecast(
+            attr_table, sensor_id, data, timestamps, num_pred, engine)
 
         if sensor_id:
             _sensor_id = sensor_id
         else:
             _sensor_id = "All sensors"
 
-        prediction_result = PredictionResults(_method, _mape, attr_table,
-                                              _sensor_id, num_pred,
-                                              _pred, datetime.now(),
-                                              datetime.now())
+        if existing is None:
+            prediction_result = PredictionResults(_method, _mape, attr_table,
+                                                  _sensor_id, num_pred,
+                                                  _pred, datetime.now(),
+                                                  datetime.now(), _version)
+        else:
+            prediction_result = existing
+            prediction_result.forcasting_engine = _method
+            prediction_result.mean_absolute_percentage_error = _mape
+            prediction_result.num_predictions = num_pred
+            prediction_result.result = _pred
+            prediction_result.model_version = _version
+            prediction_result.created_timestamp = datetime.now()
+            prediction_result.updated_timestamp = datetime.now()
         prediction_result.save()
         prediction_result.commit()
 
-        return {
-            "Sensor_id": _sensor_id,
-            "Forcasting_engine": _method,
-            "Mean_Absolute_Percentage_Error": _mape,
-            "Prediction_id": prediction_result.id,
-            "Predictions": _pred
-        }
+        return prediction_result.horizon(num_pred)
+
+    @classmethod
+    def serve(cls, u_id: int, attr_table: str, sensor_id: str, num_pred: int,
+              data: list, timestamps: list, engine: str = None) -> dict:
+        """
+        Return the predictions for a user, reusing a stored result unless
+        more recent data has been imported since it was generated. Shorter
+        horizons than the stored one are sliced from it, longer horizons
+        extend it
+        :param u_id: the users id found in the Users table
+        :param attr_table: name of table from which data will be taken for
+        prediction
+        :param sensor_id: id of the sensor(s) which will be used during
+        prediction
+        :param num_pred: number of predictions to generate
+        :param data: the values extracted from attr_table
+        :param timestamps: timestamps of the values extracted from attr_table
+        :param engine: name of the forecasting engine, 'auto' to let the
+        forecasting service choose or None for the default engine
+        :return a dictionary containing prediction metadata and the
+        corresponding prediction results:
+        """
+        predict_from_db = cls.find_by_prediction_args(attr_table, sensor_id,
+                                                      engine)
+        horizon = num_pred
+
+        if predict_from_db:
+            existing_user_result = UserPredictions.get_entry(
+                u_id, predict_from_db.id)
+
+            if existing_user_result and predict_from_db.is_stale(attr_table):
+                horizon = max(num_pred, predict_from_db.num_predictions)
+                existing_user_result.delete()
+                existing_user_result.commit()
+
+                if not UserPredictions.find_by_pred_id(predict_from_db.id):
+                    predict_from_db.delete()
+                    predict_from_db.commit()
+            elif predict_from_db.num_predictions < num_pred:
+                # extend the stored horizon, the stored forecast model is
+                # reused as long as no data has been imported since its fit
+                result = cls.generate_predictions_results(
+                    attr_table, sensor_id, num_pred, data, timestamps, engine,
+                    existing=predict_from_db)
+                UserPredictions.add_entry(u_id, result["Prediction_id"])
+                return result
+            else:
+                # use a cached result
+                predict_from_db.updated_timestamp = datetime.now()
+                predict_from_db.save()
+                predict_from_db.commit()
+                UserPredictions.add_entry(u_id, predict_from_db.id)
+
+                return predict_from_db.horizon(num_pred)
+
+        result = cls.generate_predictions_results(
+            attr_table, sensor_id, horizon, data, timestamps, engine)
+        UserPredictions.add_entry(u_id, result["Prediction_id"])
+        result["Predictions"] = result["Predictions"][:num_pred]
+        return result
@@ -0,0 +1,247 @@
+"""
+Consolidated storage for attribute readings
+
+All readings live in a single `reading` table keyed by integer surrogate keys
+instead of one `<attribute>_<uuid>` table per attribute. The surrogate keys
+map back to the attribute table names and sensor UUIDs used everywhere else
+in the system through the `reading_attribute` and `reading_sensor` tables.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Union
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+
+from db import db
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+
+class ReadingAttribute(db.Model):
+    """
+    Surrogate key for an attribute data table
+    """
+    __tablename__ = 'reading_attribute'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    table_name = db.Column(db.String(255), nullable=False, unique=True)
+    timestamp = db.Column(db.DateTime)
+
+    _cache = {}
+    _lock = threading.Lock()
+
+    def __init__(self, table_name: str, timestamp: datetime = None):
+        """
+        Initialise ReadingAttribute
+        :param table_name: Attribute data table name the key stands in for
+        :param timestamp: Creation timestamp
+        """
+        self.table_name = table_name.lower()
+        if timestamp is None:
+            timestamp = datetime.utcnow()
+        self.timestamp = timestamp
+
+    def __repr__(self) -> str:
+        return 'Reading Attribute: %s, Table Name: %s' % (self.id,
+                                                          self.table_name)
+
+    def json(self) -> dict:
+        """
+        Create JSON format of ReadingAttribute
+        :return: JSON of ReadingAttribute
+        """
+        return {'id': self.id, 'table_name': self.table_name}
+
+    @classmethod
+    def key_for(cls, table_name: str, create: bool = False) -> Union[int, None]:
+        """
+        Get the surrogate key of an attribute data table. Keys never change
+        once issued so they are cached for the lifetime of the process
+        :param table_name: Attribute data table name
+        :param create: Issue a new key if the table has none yet
+        :return: Surrogate key or None if it does not exist
+        """
+        table_name = table_name.lower()
+        key = cls._cache.get(table_name)
+        if key is not None:
+            return key
+
+        if create:
+            db.session.execute(insert(cls.__table__).values(
+                table_name=table_name,
+                timestamp=datetime.utcnow()).on_conflict_do_nothing())
+
+        key = db.session.query(cls.id).filter(
+            cls.table_name == table_name).scalar()
+        if key is not None:
+            with cls._lock:
+                cls._cache[table_name] = key
+        return key
+
+    @classmethod
+    def forget(cls, table_name: str) -> None:
+        """
+        Drop the cached key of an attribute data table
+        :param table_name: Attribute data table name
+        """
+        with cls._lock:
+            cls._cache.pop(table_name.lower(), None)
+
+
+class ReadingSensor(db.Model):
+    """
+    Surrogate key for a Sensor UUID
+    """
+    __tablename__ = 'reading_sensor'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    sensor_id = db.Column(db.Text, nullable=False, unique=True)
+
+    _cache = {}
+    _lock = threading.Lock()
+
+    def __init__(self, sensor_id: str):
+        """
+        Initialise ReadingSensor
+        :param sensor_id: Sensor UUID the key stands in for
+        """
+        self.sensor_id = sensor_id
+
+    def __repr__(self) -> str:
+        return 'Reading Sensor: %s, Sensor ID: %s' % (self.id, self.sensor_id)
+
+    def json(self) -> dict:
+        """
+        Create JSON format of ReadingSensor
+        :return: JSON of ReadingSensor
+        """
+        return {'id': self.id, 'sensor_id': self.sensor_id}
+
+    @classmethod
+    def keys_for(cls, sensor_ids: [str], create: bool = False) -> {str: int}:
+        """
+        Get the surrogate keys of Sensor UUIDs in a single round trip
+        :param sensor_ids: Sensor UUIDs
+        :param create: Issue keys for sensors that have none yet
+        :return: Dictionary of Sensor UUID to surrogate key
+        """
+        keys = {}
+        missing = []
+        for sensor_id in set(sensor_ids):
+            key = cls._cache.get(sensor_id)
+            if key is None:
+                missing.append(sensor_id)
+            else:
+                keys[sensor_id] = key
+
+        if not missing:
+            return keys
+
+        if create:
+            db.session.execute(insert(cls.__table__).values(
+                [{'sensor_id': s_id} for s_id in missing]
+            ).on_conflict_do_nothing())
+
+        found = db.session.query(cls.sensor_id, cls.id).filter(
+            cls.sensor_id.in_(missing)).all()
+        with cls._lock:
+            for sensor_id, key in found:
+                cls._cache[sensor_id] = key
+                keys[sensor_id] = key
+        return keys
+
+
+class Reading(db.Model):
+    """
+    A single attribute reading reported by a sensor. A sensor has at most one
+    reading of an attribute per time stamp: a reading reported at the time
+    stamp of a stored one is skipped even when its value differs, where the
+    per table layout keeps both
+    """
+    __tablename__ = 'reading'
+    __table_args__ = (
+        db.Index('ix_reading_attribute_ts', 'attribute_id', 'ts'),
+    )
+
+    attribute_id = db.Column(db.Integer,
+                             db.ForeignKey('reading_attribute.id',
+                                           ondelete='CASCADE'),
+                             primary_key=True)
+    sensor_id = db.Column(db.Integer, db.ForeignKey('reading_sensor.id'),
+                          primary_key=True)
+    ts = db.Column(db.DateTime, primary_key=True)
+    value = db.Column(db.Float(precision=53), nullable=True)
+    raw = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime)
+
+    def __init__(self, attribute_id: int, sensor_id: int, ts: datetime,
+                 raw: str, value: float = None, timestamp: datetime = None):
+        """
+        Initialise Reading
+        :param attribute_id: Surrogate key of the attribute
+        :param sensor_id: Surrogate key of the sensor
+        :param ts: Timestamp reported by the API
+        :param raw: Value exactly as it was reported by the API
+        :param value: Numeric value of the reading if it has one
+        :param timestamp: Import timestamp
+        """
+        self.attribute_id = attribute_id
+        self.sensor_id = sensor_id
+        self.ts = ts
+        self.raw = raw
+        self.value = value if value is not None else to_float(raw)
+        if timestamp is None:
+            timestamp = datetime.utcnow()
+        self.timestamp = timestamp
+
+    def __repr__(self) -> str:
+        return 'Attribute: %s, Sensor: %s, Timestamp: %s, Value: %s' % (
+            self.attribute_id, self.sensor_id, self.ts, self.raw)
+
+    def json(self) -> dict:
+        """
+        Create JSON format of Reading
+        :return: JSON of Reading
+        """
+        return {
+            'attribute_id': self.attribute_id,
+            'sensor_id': self.sensor_id,
+            'ts': str(self.ts),
+            'value': self.value,
+            'raw': self.raw
+        }
+
+    def save(self) -> None:
+        """ Put Reading in queue to be persisted """
+        try:
+            db.session.add(self)
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            logger.info('Reading for sensor %s at %s already exists' % (
+                self.sensor_id, self.ts))
+
+    @staticmethod
+    def commit() -> None:
+        """ Commit changes to database """
+        db.session.commit()
+
+
+def to_float(raw: Union[str, float, int, None]) -> Union[float, None]:
+    """
+    Convert a raw reading to a float
+    :param raw: Value as reported by the API
+    :return: The numeric value or None when the reading is not a finite number
+    """
+    if raw is None:
+        return None
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        return None
+    if value != value or value in (float('inf'), float('-inf')):
+        return None
+    return value
@@ -46,4 +46,8 @@ class RequestAnalytics(db.Model):
 
     def save(self):
         db.session.add(self)
-        db.session.flush()
\ No newline at end of file
+        db.session.flush()
+
+    @classmethod
+    def find_by_id(cls, request_id):
+        return cls.query.filter_by(id=request_id).first()
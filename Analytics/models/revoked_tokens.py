@@ -1,29 +1,214 @@
 '''
-Data model class for storing decrypted access and refresh JWTs that have been revoked 
+Data model class for storing decrypted access and refresh JWTs that have been revoked
+
+Every revocation is also kept in Redis, one key per JWT ID expiring with the
+token, so the check made on every authenticated request is a single round
+trip instead of a query on a table that only grows. The table remains the
+record of revocations: it is read when Redis is unavailable, and the
+revocations of tokens that have expired are purged from it, and the unexpired
+ones written back to Redis, on a schedule by the importer scheduler.
+
+A JWT ID missing from Redis is only trusted as not revoked while the
+"revocations loaded" key is present. The key is set once every revocation of
+the table has been written to Redis, by create_db, by the purge or when a
+check finds it missing, and deleted when the revocation of a token could not
+be written, so a cache that was flushed, evicted or missed a write falls back
+to the table until it is rebuilt.
 '''
+import logging
+import time
+from datetime import datetime
+from typing import Union
 
+import redis
+
+from create_celery import redis_client
 from db import db
 
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'revoked-token:'
+LOADED_KEY = 'revoked-tokens-loaded'
+
+
+class RevocationCache(object):
+    """
+    Revoked JWT IDs in Redis, expiring with their tokens
+    """
+
+    def __init__(self, client: redis.StrictRedis = None) -> None:
+        """
+        Initialise RevocationCache
+        :param client: Redis client, created from CELERY_RESULT_BACKEND when
+                       None
+        """
+        self._client = client
+
+    @property
+    def client(self) -> redis.StrictRedis:
+        """
+        Connect to Redis on first use
+        :return: Redis client
+        """
+        if self._client is None:
+            self._client = redis_client()
+        return self._client
+
+    @staticmethod
+    def key(jti: str) -> str:
+        """
+        Name of the key marking a JWT ID as revoked
+        :param jti: JWT ID
+        :return: Redis key
+        """
+        return KEY_PREFIX + jti
+
+    def add(self, revoked: [(str, Union[float, None])]) -> None:
+        """
+        Mark JWT IDs as revoked until their tokens expire
+        :param revoked: JWT IDs with the UNIX time stamp their token expires
+                        at, None for tokens that do not expire
+        :raise redis.RedisError: when Redis is unavailable
+        """
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for jti, expires in revoked:
+            if expires is None:
+                pipe.set(self.key(jti), 1)
+            elif expires > now:
+                pipe.set(self.key(jti), 1, ex=max(int(expires - now), 1))
+        pipe.execute()
+
+    def contains(self, jti: str) -> Union[bool, None]:
+        """
+        Check whether a JWT ID is revoked
+        :param jti: JWT ID
+        :return: Whether the JWT ID is revoked, None when it is not cached and
+                 the cache does not hold every revocation
+        :raise redis.RedisError: when Redis is unavailable
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.exists(self.key(jti))
+        pipe.exists(LOADED_KEY)
+        revoked, loaded = pipe.execute()
+        if revoked:
+            return True
+        return False if loaded else None
+
+    def mark_loaded(self) -> None:
+        """
+        Record that every revocation has been written to the cache
+        :raise redis.RedisError: when Redis is unavailable
+        """
+        self.client.set(LOADED_KEY, 1)
+
+    def mark_dirty(self) -> None:
+        """
+        Record that a revocation may be missing from the cache
+        :raise redis.RedisError: when Redis is unavailable
+        """
+        self.client.delete(LOADED_KEY)
+
+
+revocation_cache = RevocationCache()
+
 
 class RevokedTokens(db.Model):
-    
+
     __tablename__ = 'revoked_tokens'
     id = db.Column(db.Integer, primary_key = True)
-    jti = db.Column(db.String(200))
+    jti = db.Column(db.String(200), index=True)
+    expires = db.Column(db.DateTime, nullable=True)
+
+    def __init__(self, jti: str, expires: Union[int, float, None] = None):
+        """
+        :param jti: the JWT ID of the revoked token
+        :param expires: UNIX time stamp the token expires at, the exp claim
+        """
+        self.jti = jti
+        self.expires = datetime.utcfromtimestamp(expires) \
+            if expires is not None else None
 
     def add(self):
-        """ Adds the current values of the Users fields to SQLAlchemy session and then writes the changes to the database """
-        
+        """
+        Adds the current values of the Users fields to SQLAlchemy session and then writes the changes to the database
+        :raise redis.RedisError: when the revocation can neither be cached nor the cache marked as missing it, the
+                                 revocation is then not recorded
+        """
+
         db.session.add(self)
+        db.session.flush()
+        try:
+            revocation_cache.add([(self.jti, self.expires_at)])
+        except redis.RedisError as e:
+            logger.error('Unable to cache the revocation of {}: {}'.format(
+                self.jti, e))
+            try:
+                revocation_cache.mark_dirty()
+            except redis.RedisError:
+                # once Redis is back the token would be reported as not revoked
+                db.session.rollback()
+                raise
         db.session.commit()
 
+    @property
+    def expires_at(self) -> Union[float, None]:
+        """
+        :return: UNIX time stamp the token expires at, None if it does not
+        """
+        if self.expires is None:
+            return None
+        return (self.expires - datetime(1970, 1, 1)).total_seconds()
+
     @classmethod
     def is_jti_blacklisted(cls, jti: str) -> bool:
-        """ 
-        Queries the revoked tokens table to determine if the provided JWT ID is presented and hence has been revoked
+        """
+        Determine whether the provided JWT ID has been revoked, from Redis or
+        from the revoked tokens table when Redis is unavailable
         :param jti: the JWT ID that is used when generating access and refresh JWTs
-        :return: Whether the jti is present in the revoked tokens table
+        :return: Whether the jti has been revoked
         """
-        
+        try:
+            revoked = revocation_cache.contains(jti)
+            if revoked is not None:
+                return revoked
+        except redis.RedisError as e:
+            logger.warning('Revoked tokens cache unavailable, querying the '
+                           'database: {}'.format(e))
+        else:
+            logger.warning('Revoked tokens cache not loaded, querying the '
+                           'database and rebuilding it')
+            cls.warm_cache()
+
         query = cls.query.filter_by(jti=jti).first()
         return bool(query)
+
+    @classmethod
+    def warm_cache(cls) -> bool:
+        """
+        Write every revocation of the table to Redis and mark the cache as
+        loaded
+        :return: Whether the cache was rebuilt
+        """
+        try:
+            revocation_cache.add([(token.jti, token.expires_at)
+                                  for token in cls.query.all()])
+            revocation_cache.mark_loaded()
+        except redis.RedisError as e:
+            logger.error('Unable to cache revoked tokens: {}'.format(e))
+            return False
+        return True
+
+    @classmethod
+    def purge_expired(cls) -> int:
+        """
+        Delete the revocations of tokens that have expired and write the
+        remaining revocations to Redis, in case its keys were lost
+        :return: The number of revocations deleted
+        """
+        deleted = cls.query.filter(cls.expires < datetime.utcnow()).delete(
+            synchronize_session=False)
+        db.session.commit()
+        cls.warm_cache()
+        return deleted
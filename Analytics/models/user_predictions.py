@@ -21,19 +21,19 @@ class UserPredictions(db.Model):
         'predictionresults.id'))
     timestamp = db.Column(db.DateTime)
 
-    def __init__(self, user_id: int, pred_result_id: int, timestamp: datetime =
-                 datetime.now()):
+    def __init__(self, user_id: int, pred_result_id: int,
+                 timestamp: datetime = None):
         """
         Initialise the User Predictions object instance
         :param user_id: users id in the users table
         :param pred_result_id: the Prediction Result id that is
         associated with the user
-        :param timestamp: time stamp of when the prediction was associated
-        with a user
+        :param timestamp: time stamp of when the user last requested the
+        prediction, now when None
         """
         self.user_id = user_id
         self.pred_result_id = pred_result_id
-        self.timestamp = timestamp
+        self.timestamp = timestamp if timestamp is not None else datetime.now()
 
     def __str__(self) -> str:
         """
@@ -118,15 +118,20 @@ class UserPredictions(db.Model):
     @classmethod
     def add_entry(cls, user_id, prediction_result_id):
         """
-        Add an entry into the user predictions table if it does not exists
+        Add an entry into the user predictions table if it does not exists,
+        otherwise record that the user has requested the prediction again
         :param user_id: id of user requesting the prediction
         :param prediction_result_id: id of prediction result
         """
         if user_id:
-            if not cls.get_entry(user_id, prediction_result_id):
+            user_prediction_entry = cls.get_entry(user_id,
+                                                  prediction_result_id)
+            if user_prediction_entry:
+                user_prediction_entry.timestamp = datetime.now()
+            else:
                 user_prediction_entry = UserPredictions(user_id,
                                                         prediction_result_id,
                                                         datetime.now())
-                user_prediction_entry.save()
-                user_prediction_entry.commit()
+            user_prediction_entry.save()
+            user_prediction_entry.commit()
 
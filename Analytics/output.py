@@ -0,0 +1,267 @@
+"""
+Response output layer
+
+Replaces the JSON representation of the API with a faster encoder and
+compresses large responses, configured in the output section of the
+configuration:
+
+    output:
+      compress: true
+      compression_threshold: 1024
+      gzip_level: 6
+      brotli_quality: 4
+
+Responses are serialised with orjson when it is installed, falling back to
+the standard library encoder otherwise. Both understand numpy scalars and
+arrays, dates and decimals, and RawJSON: JSON that has already been
+serialised, such as the records pandas writes directly from the buffers of a
+DataFrame with to_json, which is embedded as is instead of being parsed and
+serialised again.
+
+Responses of at least compression_threshold bytes are compressed with
+brotli, when it is installed and accepted by the client, or with gzip.
+"""
+import datetime
+import decimal
+import gzip
+import json
+import logging
+from typing import Any, Union
+
+import flask
+import numpy as np
+from flask import make_response, request
+
+from settings.get_config_decorator import GetConfig
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/geo+json',
+                          'application/javascript', 'application/xml',
+                          'application/vnd.apache.arrow.stream',
+                          'image/svg+xml'}
+
+
+class RawJSON(object):
+    """
+    JSON text embedded verbatim in a response
+    """
+    __slots__ = ('text',)
+
+    def __init__(self, text: Union[str, bytes]) -> None:
+        """
+        :param text: Serialised JSON
+        """
+        self.text = text
+
+    def __repr__(self) -> str:
+        return 'RawJSON({!r})'.format(self.text[:50])
+
+    def load(self) -> Any:
+        """
+        Parse the JSON
+        :return: The decoded value
+        """
+        return orjson.loads(self.text) if orjson else json.loads(self.text)
+
+
+def frame_records(df: 'pd.DataFrame',
+                  replacements: [(str, str)] = ()) -> RawJSON:
+    """
+    Serialise the rows of a DataFrame as a list of records, written by pandas
+    directly from the column buffers
+    :param df: DataFrame
+    :param replacements: Substrings of the JSON to replace, in order, with
+                         their replacement
+    :return: The records, with timestamps in milliseconds since the epoch
+    """
+    text = df.to_json(orient='records')
+    for old, new in replacements:
+        text = text.replace(old, new)
+    return RawJSON(text)
+
+
+def materialise(data: Any) -> Any:
+    """
+    Parse data held as RawJSON, to be modified
+    :param data: Response data
+    :return: The data as python objects
+    """
+    return data.load() if isinstance(data, RawJSON) else data
+
+
+def default(obj: Any) -> Any:
+    """
+    Convert the objects the encoders do not support natively
+    :param obj: Object to serialise
+    :return: A serialisable equivalent
+    :raise TypeError: when the object cannot be serialised
+    """
+    if isinstance(obj, RawJSON):
+        return obj.load()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'f':
+            # null like orjson instead of the invalid NaN
+            return np.where(np.isfinite(obj), obj, None).tolist()
+        return obj.tolist()
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError('Object of type {} is not JSON serializable'.format(
+        type(obj).__name__))
+
+
+def dumps(data: Any, indent: bool = False) -> bytes:
+    """
+    Serialise data to JSON
+    :param data: Data to serialise
+    :param indent: Whether to indent the JSON
+    :return: UTF-8 encoded JSON
+    """
+    if isinstance(data, RawJSON):
+        text = data.text
+        return text.encode('utf8') if isinstance(text, str) else text
+
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(data, default=default, option=option)
+        except TypeError as e:
+            # e.g. integers beyond 64 bits, which the standard library handles
+            logger.debug('orjson could not serialise the response, falling '
+                         'back to json: {}'.format(e))
+
+    return json.dumps(data, default=default, indent=4 if indent else None,
+                      ensure_ascii=False).encode('utf8')
+
+
+def output_json(data: Any, code: int, headers: dict = None) -> flask.Response:
+    """
+    Make a JSON response, the JSON representation of the API
+    :param data: Response data
+    :param code: HTTP status code
+    :param headers: Additional headers
+    :return: The response
+    """
+    response = make_response(dumps(data, flask.current_app.debug) + b'\n',
+                             code)
+    response.mimetype = 'application/json'
+    response.headers.extend(headers or {})
+    return response
+
+
+class ResponseCompression(object):
+    """
+    Compress large responses with the best encoding the client accepts
+    """
+
+    def __init__(self, threshold: int, gzip_level: int,
+                 brotli_quality: int) -> None:
+        """
+        :param threshold: Size in bytes from which responses are compressed
+        :param gzip_level: gzip compression level
+        :param brotli_quality: brotli compression quality
+        """
+        self.threshold = threshold
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def init_app(self, app: flask.app.Flask) -> None:
+        """
+        Register the compression hook
+        :param app: The Flask application
+        """
+        app.after_request(self.after_request)
+        app.extensions['response_compression'] = self
+
+    @staticmethod
+    def compressible(response: flask.Response) -> bool:
+        """
+        Check whether a response can be compressed
+        :param response: The response
+        :return: Whether the response is compressible
+        """
+        if response.status_code != 200 or response.direct_passthrough or \
+                response.is_streamed or 'Content-Encoding' in response.headers:
+            return False
+        mimetype = response.mimetype or ''
+        return mimetype.startswith('text/') or \
+            mimetype in COMPRESSIBLE_MIMETYPES or \
+            mimetype.endswith(('+json', '+xml'))
+
+    def compress(self, data: bytes, encoding: str) -> bytes:
+        """
+        Compress a response body
+        :param data: Response body
+        :param encoding: Content encoding, br or gzip
+        :return: The compressed body
+        """
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level)
+
+    def after_request(self, response: flask.Response) -> flask.Response:
+        """
+        Compress the response when it is large enough and the client accepts
+        a supported encoding
+        :param response: The response
+        :return: The response, compressed or unchanged
+        """
+        if request.method == 'HEAD' or not self.compressible(response):
+            return response
+        data = response.get_data()
+        if len(data) < self.threshold:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        response.set_data(self.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def init_output(app: flask.app.Flask, api: 'flask_restful.Api') -> None:
+    """
+    Install the JSON representation of the API and, unless disabled by the
+    COMPRESS application setting or the output configuration section, the
+    compression of large responses
+    :param app: The Flask application
+    :param api: The API of the application
+    """
+    api.representation('application/json')(output_json)
+    if not app.config.get('COMPRESS',
+                          GetConfig.setting('output', 'compress', True)):
+        return
+
+    ResponseCompression(
+        int(GetConfig.setting('output', 'compression_threshold',
+                              DEFAULT_COMPRESSION_THRESHOLD)),
+        int(GetConfig.setting('output', 'gzip_level', DEFAULT_GZIP_LEVEL)),
+        int(GetConfig.setting('output', 'brotli_quality',
+                              DEFAULT_BROTLI_QUALITY))
+    ).init_app(app)
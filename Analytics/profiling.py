@@ -0,0 +1,334 @@
+"""
+Request profiling middleware
+
+Opt-in instrumentation of the Flask application, enabled with
+create_app(PROFILING=True) or in the profiling section of the
+configuration:
+
+    profiling:
+      enabled: false
+      sample_rate: 0.1
+      slow_request_seconds: 1.0
+      slow_log_size: 20
+      max_statements: 50
+
+The latency and response size of every request are recorded in a histogram
+per endpoint, which costs two clock reads. A sample of the requests is also
+profiled at the SQL level through SQLAlchemy event hooks: the number of
+statements, the time spent executing them and the time spent waiting for a
+pooled connection. Sampled requests slower than slow_request_seconds are
+logged with their statements and the slowest are returned, to admin users,
+by /metrics/slow_requests.
+
+The metrics are exposed at /metrics. They are kept in the memory of each
+process, so with several gunicorn workers every worker reports its own
+requests.
+"""
+import heapq
+import logging
+import random
+import threading
+import time
+from typing import Any, Union
+
+import flask
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from db import db
+from resources.metrics import MetricFamily, register_collector
+from settings.get_config_decorator import GetConfig
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_SLOW_REQUEST_SECONDS = 1.0
+DEFAULT_SLOW_LOG_SIZE = 20
+DEFAULT_MAX_STATEMENTS = 50
+STATEMENT_LENGTH = 500
+
+_active = threading.local()
+_profiler = None
+
+
+class RequestProfile(object):
+    """
+    SQL activity of a sampled request
+    """
+
+    def __init__(self, max_statements: int) -> None:
+        """
+        :param max_statements: Number of statements kept for the slow log
+        """
+        self.max_statements = max_statements
+        self.statements = []
+        self.statement_count = 0
+        self.sql_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+    def add_statement(self, statement: str, seconds: float) -> None:
+        """
+        Account an executed statement
+        :param statement: SQL statement
+        :param seconds: Execution time
+        """
+        self.statement_count += 1
+        self.sql_seconds += seconds
+        if len(self.statements) < self.max_statements:
+            self.statements.append((round(seconds, 6),
+                                    statement[:STATEMENT_LENGTH]))
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement(conn, cursor, statement, parameters, context,
+                    executemany) -> None:
+    """ Time the statements of a sampled request """
+    if getattr(_active, 'profile', None) is not None:
+        conn.info.setdefault('profiling_start', []).append(
+            time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def end_statement(conn, cursor, statement, parameters, context,
+                  executemany) -> None:
+    """ Account the statements of a sampled request """
+    profile = getattr(_active, 'profile', None)
+    starts = conn.info.get('profiling_start')
+    if profile is not None and starts:
+        profile.add_statement(statement, time.perf_counter() - starts.pop())
+
+
+class EndpointStats(object):
+    """
+    Aggregated metrics of an endpoint
+    """
+
+    def __init__(self) -> None:
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.response_bytes = 0
+        self.sampled = 0
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+    def observe(self, latency: float, size: int,
+                profile: Union[RequestProfile, None]) -> None:
+        """
+        Add a request to the aggregates
+        :param latency: Request latency in seconds
+        :param size: Response size in bytes
+        :param profile: SQL activity of the request when it was sampled
+        """
+        self.count += 1
+        self.latency_sum += latency
+        self.response_bytes += size
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[index] += 1
+        if profile is not None:
+            self.sampled += 1
+            self.statements += profile.statement_count
+            self.sql_seconds += profile.sql_seconds
+            self.pool_wait_seconds += profile.pool_wait_seconds
+
+
+class RequestProfiler(object):
+    """
+    Record per endpoint latency, response size and SQL activity
+    """
+
+    def __init__(self, sample_rate: float, slow_request_seconds: float,
+                 slow_log_size: int, max_statements: int) -> None:
+        """
+        :param sample_rate: Fraction of the requests profiled at SQL level
+        :param slow_request_seconds: Latency above which a sampled request
+                                     is logged with its statements
+        :param slow_log_size: Number of slowest requests kept
+        :param max_statements: Number of statements kept per request
+        """
+        self.sample_rate = sample_rate
+        self.slow_request_seconds = slow_request_seconds
+        self.slow_log_size = slow_log_size
+        self.max_statements = max_statements
+        self.endpoints = {}
+        self.slowest = []
+        self.lock = threading.Lock()
+
+    def init_app(self, app: flask.app.Flask) -> None:
+        """
+        Register the request hooks and time the connection checkouts of the
+        application's engine
+        :param app: The Flask application
+        """
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        self.time_pool_checkouts(db.get_engine(app).pool)
+        app.extensions['request_profiler'] = self
+
+    @staticmethod
+    def time_pool_checkouts(pool: Any) -> None:
+        """
+        Account the time a sampled request waits for a pooled connection
+        :param pool: The connection pool of the engine
+        """
+        if getattr(pool, 'profiling_timed', False):
+            return
+        connect = pool.connect
+
+        def timed_connect():
+            profile = getattr(_active, 'profile', None)
+            if profile is None:
+                return connect()
+            start = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                profile.pool_wait_seconds += time.perf_counter() - start
+
+        pool.connect = timed_connect
+        pool.profiling_timed = True
+
+    def before_request(self) -> None:
+        """ Start the clock and decide whether the request is sampled """
+        g.profiling_start = time.perf_counter()
+        _active.profile = RequestProfile(self.max_statements) \
+            if random.random() < self.sample_rate else None
+
+    def after_request(self, response: flask.Response) -> flask.Response:
+        """
+        Record the request
+        :param response: The response
+        :return: The response, unchanged
+        """
+        start = g.get('profiling_start')
+        if start is None:
+            return response
+        latency = time.perf_counter() - start
+        profile = getattr(_active, 'profile', None)
+        _active.profile = None
+        size = response.calculate_content_length() or 0
+        key = (request.endpoint or 'unknown', request.method)
+
+        with self.lock:
+            self.endpoints.setdefault(key, EndpointStats()).observe(
+                latency, size, profile)
+
+        if profile is not None and latency >= self.slow_request_seconds:
+            self.log_slow_request(key, latency, response.status_code,
+                                  profile)
+        return response
+
+    @staticmethod
+    def teardown_request(exception: Union[Exception, None]) -> None:
+        """ Stop profiling the thread when a request ends in an error """
+        _active.profile = None
+
+    def log_slow_request(self, key: tuple, latency: float, status: int,
+                         profile: RequestProfile) -> None:
+        """
+        Log a slow sampled request and keep it if it is among the slowest
+        :param key: Endpoint and method of the request
+        :param latency: Request latency in seconds
+        :param status: HTTP status code of the response
+        :param profile: SQL activity of the request
+        """
+        entry = {'endpoint': key[0], 'method': key[1], 'path': request.path,
+                 'status': status, 'seconds': round(latency, 6),
+                 'statement_count': profile.statement_count,
+                 'sql_seconds': round(profile.sql_seconds, 6),
+                 'pool_wait_seconds': round(profile.pool_wait_seconds, 6),
+                 'statements': profile.statements}
+        logger.warning('Slow request {} {} took {:.3f}s, {} SQL statements in '
+                       '{:.3f}s: {}'.format(key[1], request.path, latency,
+                                            profile.statement_count,
+                                            profile.sql_seconds,
+                                            profile.statements))
+        with self.lock:
+            item = (latency, id(entry), entry)
+            if len(self.slowest) < self.slow_log_size:
+                heapq.heappush(self.slowest, item)
+            elif latency > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, item)
+
+    def slow_requests(self) -> [dict]:
+        """
+        Return the slowest sampled requests
+        :return: The logged slow requests, slowest first
+        """
+        with self.lock:
+            return [entry for _, _, entry in sorted(self.slowest,
+                                                    reverse=True)]
+
+    def collect(self) -> [MetricFamily]:
+        """
+        Collect the request metric families
+        :return: Request metric families
+        """
+        latency = MetricFamily('http_request_duration_seconds', 'histogram',
+                               'Latency of the requests by endpoint')
+        size = MetricFamily('http_response_size_bytes_total', 'counter',
+                            'Size of the responses by endpoint')
+        sampled = MetricFamily('http_requests_sampled_total', 'counter',
+                               'Requests profiled at SQL level by endpoint')
+        statements = MetricFamily('http_request_sql_statements_total',
+                                  'counter', 'SQL statements executed by the '
+                                             'sampled requests by endpoint')
+        sql_seconds = MetricFamily('http_request_sql_seconds_total', 'counter',
+                                   'Time spent executing SQL by the sampled '
+                                   'requests by endpoint')
+        pool_wait = MetricFamily('http_request_pool_wait_seconds_total',
+                                 'counter', 'Time the sampled requests waited '
+                                            'for a pooled connection')
+
+        with self.lock:
+            endpoints = list(self.endpoints.items())
+        for (endpoint, method), stats in endpoints:
+            labels = {'endpoint': endpoint, 'method': method}
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                latency.add(dict(labels, le=bound), count, '_bucket')
+            latency.add(dict(labels, le='+Inf'), stats.count, '_bucket')
+            latency.add(labels, stats.latency_sum, '_sum')
+            latency.add(labels, stats.count, '_count')
+            size.add(labels, stats.response_bytes)
+            sampled.add(labels, stats.sampled)
+            statements.add(labels, stats.statements)
+            sql_seconds.add(labels, stats.sql_seconds)
+            pool_wait.add(labels, stats.pool_wait_seconds)
+
+        return [latency, size, sampled, statements, sql_seconds, pool_wait]
+
+
+def init_profiling(app: flask.app.Flask) -> Union[RequestProfiler, None]:
+    """
+    Install the request profiler when profiling is enabled by the PROFILING
+    application setting or the profiling configuration section
+    :param app: The Flask application
+    :return: The profiler of the process or None when profiling is disabled
+    """
+    global _profiler
+    if not app.config.get('PROFILING',
+                          GetConfig.setting('profiling', 'enabled', False)):
+        return None
+
+    if _profiler is None:
+        _profiler = RequestProfiler(
+            float(GetConfig.setting('profiling', 'sample_rate',
+                                    DEFAULT_SAMPLE_RATE)),
+            float(GetConfig.setting('profiling', 'slow_request_seconds',
+                                    DEFAULT_SLOW_REQUEST_SECONDS)),
+            int(GetConfig.setting('profiling', 'slow_log_size',
+                                  DEFAULT_SLOW_LOG_SIZE)),
+            int(GetConfig.setting('profiling', 'max_statements',
+                                  DEFAULT_MAX_STATEMENTS)))
+        register_collector(_profiler.collect)
+    _profiler.init_app(app)
+    logger.info('Request profiling enabled, sampling {:.0%} of the '
+                'requests'.format(_profiler.sample_rate))
+    return _profiler
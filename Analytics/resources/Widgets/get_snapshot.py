@@ -0,0 +1,171 @@
+import ast
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Union
+
+from flask import Flask, Response, current_app
+from flask_jwt_extended import jwt_required
+from flask_restful import Resource
+from flask_restful import reqparse
+from sqlalchemy.orm import joinedload
+from werkzeug.exceptions import HTTPException
+
+from models.widget import WidgetModel
+from resources.request_for_data import RequestForData
+from settings import GetConfig
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+
+
+def widget_query(data: Any) -> Union[dict, None]:
+    """
+    Extract the /data query parameters stored with a widget. Widget data is
+    saved by the dashboard either as JSON or as the string representation of
+    a python dictionary
+    :param data: Stored widget data
+    :return: The query parameters or None if the widget has none
+    """
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            try:
+                data = ast.literal_eval(data)
+            except (ValueError, SyntaxError):
+                return None
+    if not isinstance(data, dict):
+        return None
+
+    params = data.get('queryParams')
+    if not isinstance(params, dict) or not params:
+        return None
+    return {key: value for key, value in params.items() if value is not None}
+
+
+def query_key(params: dict) -> tuple:
+    """
+    Identify a query regardless of the order of its parameters
+    :param params: Query parameters
+    :return: Hashable key of the query
+    """
+    return tuple(sorted((str(key), str(value))
+                        for key, value in params.items()))
+
+
+def run_query(app: Flask, params: dict) -> dict:
+    """
+    Answer a /data query in its own request context
+    :param app: Flask application
+    :param params: Query parameters
+    :return: The status code and data of the response
+    """
+    with app.test_request_context('/data', query_string=params):
+        try:
+            response = RequestForData().get()
+        except HTTPException as e:
+            return {'status': e.code, 'data': {'error': e.description}}
+        except Exception as e:
+            logger.error('Widget query {} failed: {}'.format(params, e))
+            return {'status': HTTPStatus.INTERNAL_SERVER_ERROR.value,
+                    'data': {'error': str(e)}}
+
+    if isinstance(response, Response):
+        # binary formats, such as arrow, cannot be embedded in JSON
+        return {'status': HTTPStatus.NOT_ACCEPTABLE.value,
+                'data': {'error': 'Unable to embed a {} response'.format(
+                    response.mimetype)}}
+    if isinstance(response, tuple):
+        data, status = response[0], response[1]
+    else:
+        data, status = response, HTTPStatus.OK.value
+    return {'status': int(status), 'data': data}
+
+
+class GetSnapshot(Resource):
+    """
+    Get the widgets of a user with their layouts and the data of their
+    queries in one response
+    Parameters can be passed using a POST request that contains a JSON with the following fields:
+    :param  userID: Unique user identification number
+    :param  layoutID: Identification number of a layout, only the widget it places is returned (optional)
+    :param  limit: the max count of widgets to be returned (optional)
+
+    :type userID: int
+    :type layoutID: int
+    :type limit: int
+    """
+
+    def __init__(self) -> None:
+        """
+        instantiates the snapshot endpoint
+        """
+        self.reqparser = reqparse.RequestParser()
+        self.reqparser.add_argument('userID', required=True, type=int,
+                                    help='A userID is required',
+                                    location=['form', 'json'])
+        self.reqparser.add_argument('layoutID', required=False, type=int,
+                                    default=None,
+                                    help='unable to parse layoutID',
+                                    location=['form', 'json'])
+        self.reqparser.add_argument('limit', required=False, type=int,
+                                    default=None,
+                                    help='unable to parse limit',
+                                    location=['form', 'json'])
+        super().__init__()
+
+    @jwt_required
+    def post(self) -> (dict, int):
+        """
+        Get the widgets of a user with their layouts and the data of their
+        queries. Widgets and layouts are loaded with a single query, the
+        distinct data queries of the widgets are answered concurrently and
+        widgets with the same query share its result
+
+        :returns: The widgets, their layouts and a map from widget id to the status code and data of its query, with
+                  a status code 200
+        """
+        args = self.reqparser.parse_args()
+
+        query = WidgetModel.query.options(
+            joinedload(WidgetModel.layout)).filter_by(
+            user_id=args['userID']).order_by(WidgetModel.id)
+        if args['layoutID'] is not None:
+            query = query.filter_by(layout_id=args['layoutID'])
+        if args['limit'] is not None:
+            query = query.limit(args['limit'])
+        widgets = query.all()
+
+        widget_list, layout_list, queries = [], [], {}
+        for widget in widgets:
+            widget_list.append(widget.json())
+            layout = widget.layout.json()
+            layout['id'] = str(widget.id)
+            layout_list.append(layout)
+
+            params = widget_query(widget.data)
+            if params is not None:
+                queries.setdefault(query_key(params), (params, []))[1].append(
+                    str(widget.id))
+
+        results = {}
+        if queries:
+            app = current_app._get_current_object()
+            workers = min(int(GetConfig.setting('widgets', 'snapshot_workers',
+                                                DEFAULT_WORKERS)),
+                          len(queries))
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+                answers = executor.map(
+                    lambda entry: run_query(app, entry[0]),
+                    queries.values())
+                for (_, widget_ids), answer in zip(queries.values(),
+                                                   answers):
+                    for widget_id in widget_ids:
+                        results[widget_id] = answer
+
+        return {'widgets': widget_list, 'layouts': layout_list,
+                'data': results}, HTTPStatus.OK.value
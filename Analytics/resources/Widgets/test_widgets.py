@@ -154,3 +154,29 @@ def test_save_layouts_endpoints() -> NoReturn:
             assert layout.height == widget_id
             assert layout.width == widget_id
             assert layout.static
+
+
+def test_snapshot_endpoint() -> NoReturn:
+    """
+    Tests the '/widgets/snapshot' endpoint. Dummy widgets sharing the same data query are created, the snapshot
+    returns every widget with its layout and answers their common query once for all of them
+    """
+    global dependencies
+    widget_data = dependencies.get_widget_data()
+    widget_data["queryParams"] = {"limit": 1}
+    widget_ids = []
+    for _ in range(3):
+        new_widget = WidgetModel(dependencies.user.id, Layouts(-1, 0, 0, 5, 5, False), widget_data)
+        db.session.add(new_widget)
+        db.session.flush()
+        widget_ids.append(str(new_widget.id))
+    db.session.commit()
+
+    response = dependencies.client.post('/widgets/snapshot', json={'userID': dependencies.user.id},
+                                        headers=dependencies.auth_header, follow_redirects=True)
+    assert response.status_code == 200
+    snapshot = response.get_json()
+    assert {widget["id"] for widget in snapshot["widgets"]} >= set(widget_ids)
+    assert {layout["id"] for layout in snapshot["layouts"]} >= set(widget_ids)
+    assert all(snapshot["data"][widget_id]["status"] == 200 for widget_id in widget_ids)
+    assert snapshot["data"][widget_ids[0]] == snapshot["data"][widget_ids[-1]]
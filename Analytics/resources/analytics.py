@@ -1,6 +1,8 @@
 from flask_restful import Resource, reqparse
 import json
 
+from analysis.tasks import dispatch
+from models.analytics_result import AnalyticsResult
 from models.request_analytics import RequestAnalytics
 from models.operation import Operation
 from models.request_tables import RequestTables
@@ -46,7 +48,7 @@ class Analytics(Resource):
     parser.add_argument('missingValues',
                         type=str,
                         required=True,
-                        choices=('remove', 'mean', 'median', 'backward fill', 'forward fill', 'default'),
+                        choices=('remove', 'mean', 'median', 'backward fill', 'forward fill', 'default', 'interpolate'),
                         help='Provide what needs to be done with missing values')
 
     parser.add_argument('dataRangeFrom',
@@ -102,7 +104,8 @@ class Analytics(Resource):
 
         self.save_dependent_variable(request_id, _request.tableY, _request.columnY, is_present)
         self.save_request()
-        
+        dispatch(request_id)
+
         return {
             'status': {
                 'message': 'Request Accepted',
@@ -133,6 +136,37 @@ class Analytics(Resource):
     def save_request(self):
         db.session.commit()
 
+class AnalyticsStatus(Resource):
+    """
+    API endpoint, return the status of an analytics request and, once it was
+    executed, its result or the reason it failed
+    """
+    parser = reqparse.RequestParser()
+    parser.add_argument('request_id',
+                        type=int,
+                        required=True,
+                        help='Request Id is mandatory')
+
+    def get(self) -> (dict, int):
+        """
+        GET request endpoint
+        :return: the status of the request and its execution, or an error
+                 message when the request does not exist
+        """
+        args = self.parser.parse_args()
+        request = RequestAnalytics.find_by_id(args['request_id'])
+        if request is None:
+            return {'error': 'Analytics request {} not found'.format(
+                args['request_id'])}, 404
+
+        execution = AnalyticsResult.find_by_request_id(request.id)
+        return {
+            'id': request.id,
+            'status': request.status,
+            'timestamp': str(request.timestamp),
+            'execution': execution.json() if execution else None
+        }, 200
+
 class Dataset(object):
     def __init__(self, X, Y):
         self.X = X
@@ -0,0 +1,246 @@
+"""
+Batch forecasting
+
+Forecast every sensor of one or more attributes in a single request. The
+readings of every sensor are counted with one query per attribute table,
+each sensor's most recent readings are read and fitted by its own Celery
+task and the tasks run as a group whose results are aggregated by a chord
+callback. Per sensor progress
+is reported by /pred_status?batch_id=<batch_id>.
+
+The number of predictions per sensor is limited by a setting, larger
+requests are capped and the capped value is returned with the batch.
+
+    forecast:
+      batch_max_predictions: 1000
+"""
+import logging
+from typing import Union
+
+import celery
+import numpy as np
+from celery import chord, group
+from celery.result import GroupResult
+from celery.utils.log import get_task_logger
+from flask_restful import Resource, reqparse
+
+from db import db
+from forecast.engines import AUTO, engine_names
+from forecast.task_registry import task_registry
+from settings import GetConfig
+from models.attribute_data import get_data_store
+from models.attributes import Attributes
+from models.prediction_results import PredictionResults
+from models.users import Users
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+celery_logger = get_task_logger(__name__)
+
+MIN_READINGS = 100
+WINDOW = 10000
+N_PREDICTIONS = 100
+DEFAULT_MAX_PREDICTIONS = 1000
+
+
+@celery.task(bind=True)
+def forecast_sensor(self, attribute_table: str, sensor_id: str, window: int,
+                    n_pred: int, u_id: int,
+                    engine: Union[str, None] = None) -> dict:
+    """
+    Forecast the series of a single sensor as part of a batch. The most recent
+    readings are read by the task so they do not travel through the broker
+    :param attribute_table: the name of the table the readings are taken from
+    :param sensor_id: the id of the sensor the readings are taken from
+    :param window: the number of most recent readings used for fitting
+    :param n_pred: the number of predictions to be made
+    :param u_id: the users id found in the Users table
+    :param engine: the forecasting engine to use, 'auto' or None for the
+    default engine
+    :return: a dictionary containing the sensor, the task status and the
+    predictions
+    """
+    meta = {"attribute_table": attribute_table, "sensor_id": sensor_id}
+    if not self.request.called_directly and not self.request.is_eager:
+        self.update_state(state='PROGRESS', meta=dict(
+            meta, status="prediction task is in progress"))
+    try:
+        readings = get_data_store().recent_window(attribute_table,
+                                                  [sensor_id], window)
+        timestamps, values = readings.get(
+            sensor_id, (np.array([], dtype='datetime64[ns]'), np.array([])))
+        numeric = ~np.isnan(values)
+        if numeric.sum() < MIN_READINGS:
+            return dict(meta, status="not enough numeric data to make "
+                                     "reliable predictions", result="UNABLE")
+
+        result = PredictionResults.serve(u_id, attribute_table, sensor_id,
+                                         n_pred, values[numeric].tolist(),
+                                         timestamps[numeric], engine)
+    except Exception as e:
+        # A failed fit is reported rather than raised, a failed header task
+        # would fail the chord and with it the results of the other sensors
+        db.session.rollback()
+        celery_logger.error("Unable to make predictions for args "
+                            "attr_table={}, sensor_id={}, n_pred={}: "
+                            "{}".format(attribute_table, sensor_id, n_pred, e))
+        return dict(meta, status="unable to make predictions: {}".format(e),
+                    result="UNABLE")
+
+    return dict(meta, status="task complete", result=result)
+
+
+@celery.task(bind=True)
+def collect_batch(self, results: [dict]) -> dict:
+    """
+    Aggregate the results of a batch once every sensor has been forecast
+    :param results: the results of the forecast_sensor tasks
+    :return: a dictionary containing the batch status and the results per
+    sensor
+    """
+    failed = [r for r in results if r["result"] == "UNABLE"]
+    return {"status": "batch complete",
+            "result": {"completed": len(results) - len(failed),
+                       "failed": len(failed),
+                       "predictions": results}}
+
+
+class BatchPredictions(Resource):
+    """
+    API Resource class. Forecast all sensors of one or more attributes
+    @params
+        attributedata: accepts names of attributes, more than one attribute
+                       name can be passed as comma separated values
+        subtheme: accepts an integer id, all the attributes of the subtheme
+                  are forecast. Used when attributedata is not passed
+        sensorid: accepts comma separated sensor ids, all sensors of the
+                  attributes are forecast when not passed
+        n_predictions: the number of predictions per sensor, default is 100,
+                       at most forecast.batch_max_predictions
+        engine: forecasting engine, one of the registered engine names or
+                'auto'
+        window: the number of most recent readings per sensor used for
+                fitting, default is 10000 and at least 100
+        user_id: the users id found in the Users table
+    Examples:
+        {URL}?subtheme=<id>&n_predictions=24&user_id=<id>
+        {URL}?attributedata=<name1>,<name2>&engine=auto&user_id=<id>
+    """
+    parser = reqparse.RequestParser()
+    parser.add_argument('attributedata', type=str, store_missing=False)
+    parser.add_argument('subtheme', type=int, store_missing=False)
+    parser.add_argument('sensorid', type=str, store_missing=False)
+    parser.add_argument('n_predictions', type=int, default=N_PREDICTIONS)
+    parser.add_argument('engine', type=str, default=None,
+                        choices=tuple(engine_names()) + (AUTO,))
+    parser.add_argument('window', type=int, default=WINDOW)
+    parser.add_argument('user_id', type=int, required=True)
+
+    def post(self) -> (dict, int):
+        """
+        POST method endpoint. Queue a forecast of every requested sensor
+        :return: the batch id, the id of the task aggregating the results,
+        the task id of every sensor, the series that were skipped and the
+        number of predictions and readings used per sensor, with an HTTP
+        status code
+        """
+        args = self.parser.parse_args()
+
+        if args['n_predictions'] < 1:
+            return {"message": "n_predictions must be a positive "
+                               "integer"}, 400
+        if args['window'] < MIN_READINGS:
+            return {"message": "window must be at least {} readings".format(
+                MIN_READINGS)}, 400
+
+        if 'attributedata' in args:
+            attributes = Attributes.get_by_name_in(
+                args['attributedata'].split(','))
+        elif 'subtheme' in args:
+            attributes = Attributes.get_by_sub_theme_id(args['subtheme'])
+        else:
+            return {"message": "attributedata or subtheme is required"}, 400
+
+        if not attributes:
+            return {"message": "No attributes found to make predictions "
+                               "on"}, 404
+
+        if not Users.find_by_id(args['user_id']):
+            return {"message": "Unable to make predictions as user id {} "
+                               "does not exists".format(args['user_id'])}, 404
+
+        sensor_ids = args['sensorid'].split(',') if 'sensorid' in args \
+            else None
+        max_pred = int(GetConfig.setting('forecast', 'batch_max_predictions',
+                                         DEFAULT_MAX_PREDICTIONS))
+        n_pred = min(args['n_predictions'], max_pred)
+        window = args['window']
+
+        store = get_data_store()
+        series, skipped = [], []
+        for attribute in attributes:
+            counts = store.sensor_counts(attribute.table_name, sensor_ids)
+            for sensor_id, count in counts.items():
+                if count < MIN_READINGS:
+                    skipped.append({
+                        "attribute_table": attribute.table_name,
+                        "sensor_id": sensor_id,
+                        "status": "not enough data to make reliable "
+                                  "predictions"})
+                    continue
+                series.append((attribute.table_name, sensor_id))
+
+        if not series:
+            return {"message": "No series with enough data to make "
+                               "predictions", "skipped": skipped}, 422
+
+        header = group(forecast_sensor.s(table_name, sensor_id, window,
+                                         n_pred, args['user_id'],
+                                         args['engine'])
+                       for table_name, sensor_id in series)
+        aggregate = chord(header)(collect_batch.s())
+        batch = aggregate.parent
+        batch.save()
+
+        tasks = [{"task_id": task.id, "attribute_table": table_name,
+                  "sensor_id": sensor_id}
+                 for task, (table_name, sensor_id) in
+                 zip(batch.results, series)]
+        task_registry.record([task["task_id"] for task in tasks] +
+                             [aggregate.id], args['user_id'])
+        logger.info("Queued batch {} forecasting {} series".format(
+            batch.id, len(tasks)))
+
+        return {"message": "Forecasting engine making predictions",
+                "batch_id": batch.id, "task_id": aggregate.id,
+                "tasks": tasks, "skipped": skipped,
+                "n_predictions": n_pred, "window": window}, 200
+
+
+def batch_status(batch_id: str) -> (dict, int):
+    """
+    Report the progress of a batch sensor by sensor
+    :param batch_id: the batch id returned by the batch predictions endpoint
+    :return: the state of every sensor task and the number completed, with an
+    HTTP status code
+    """
+    batch = GroupResult.restore(batch_id, app=forecast_sensor.app)
+    if batch is None:
+        return {"message": "Batch {} not found".format(batch_id)}, 404
+
+    tasks = []
+    for task in batch.results:
+        info = task.info if isinstance(task.info, dict) else {}
+        status = info.get("status", "") if task.state != 'FAILURE' \
+            else str(task.info)
+        tasks.append({"task_id": task.id, "state": task.state,
+                      "attribute_table": info.get("attribute_table"),
+                      "sensor_id": info.get("sensor_id"),
+                      "status": status})
+
+    return {"batch_id": batch_id,
+            "state": "SUCCESS" if batch.ready() else "PROGRESS",
+            "completed": batch.completed_count(),
+            "total": len(batch.results),
+            "tasks": tasks}, 200
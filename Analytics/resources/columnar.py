@@ -0,0 +1,150 @@
+"""
+Compact formats of the attribute data returned by /data
+
+The default rows format repeats the attribute and the sensor of a reading on
+every reading. With format=columnar each attribute lists its sensors once,
+under Sensors, followed by parallel arrays of the index of the sensor of
+every reading, its timestamp in milliseconds since the epoch and its value,
+null when it is not numeric:
+
+    {"Attribute_Name": "NO2", ..., "Total_Records": 3,
+     "Sensors": [{"Sensor_id": "...", "Name": "...", "Latitude": 51.5,
+                  "Longitude": -0.12}],
+     "Sensor_index": [0, 0, 0],
+     "Timestamp": [1546300800000, 1546304400000, 1546308000000],
+     "Value": [41.2, 39.8, null]}
+
+The arrays are numpy arrays, serialised straight from their buffers by the
+output layer. format=arrow returns the same readings as an Arrow IPC stream
+with the columns Attribute_Name, Sensor_id, Timestamp and Value, and the
+attributes with their sensors as JSON in the attributes field of the schema
+metadata.
+"""
+import json
+from typing import Any, Union
+
+import numpy as np
+import pandas as pd
+from flask import Response
+
+from models.location import Location
+from models.reading import to_float
+from models.sensor import Sensor
+
+ROWS = 'rows'
+COLUMNAR = 'columnar'
+ARROW = 'arrow'
+FORMATS = (ROWS, COLUMNAR, ARROW)
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+ARRAYS = ('Sensor_index', 'Timestamp', 'Value')
+
+
+def epoch_milliseconds(timestamps: [Any]) -> np.ndarray:
+    """
+    Convert timestamps to milliseconds since the epoch, UTC when they are
+    timezone aware
+    :param timestamps: datetimes or strings
+    :return: int64 array
+    """
+    if not len(timestamps):
+        return np.array([], dtype=np.int64)
+    return pd.to_datetime(list(timestamps), utc=True).values.astype(
+        'datetime64[ms]').astype(np.int64)
+
+
+def columnar_values(values: [Any]) -> Union[dict, None]:
+    """
+    Build the columnar representation of the readings of an attribute, in
+    the order of the rows format, oldest first. Readings of sensors that
+    have no sensor or location record are left out as in the rows format
+    :param values: Readings, most recent first
+    :return: Sensors and arrays of the readings, None if no reading has a
+             known sensor
+    """
+    sensors, index = [], {}
+    sensor_index, timestamps, readings = [], [], []
+    for value in reversed(values):
+        position = index.get(value.s_id)
+        if position is None:
+            sensor = Sensor.get_by_id(value.s_id)
+            location = Location.get_by_id(sensor.l_id) if sensor else None
+            if location is None:
+                index[value.s_id] = -1
+                continue
+            position = index[value.s_id] = len(sensors)
+            sensors.append({'Sensor_id': value.s_id, 'Name': sensor.name,
+                            'Latitude': location.lat,
+                            'Longitude': location.lon})
+        elif position < 0:
+            continue
+
+        sensor_index.append(position)
+        timestamps.append(value.api_timestamp)
+        readings.append(to_float(value.value))
+
+    if not sensors:
+        return None
+    return {'Sensors': sensors,
+            'Sensor_index': np.array(sensor_index, dtype=np.int32),
+            'Timestamp': epoch_milliseconds(timestamps),
+            'Value': np.array(readings, dtype=np.float64)}
+
+
+def arrow_available() -> bool:
+    """
+    :return: Whether pyarrow is installed
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+def arrow_response(data: [dict]) -> Response:
+    """
+    Write attributes in the columnar format as an Arrow IPC stream
+    :param data: Attributes with their columnar readings
+    :return: Response holding the stream
+    """
+    import pyarrow as pa
+
+    attributes, names, sensor_ids = [], [], []
+    timestamps, values = [], []
+    for attribute in data:
+        metadata = {key: value for key, value in attribute.items()
+                    if key not in ARRAYS}
+        attributes.append(metadata)
+        if 'Sensor_index' not in attribute:
+            continue
+        count = len(attribute['Sensor_index'])
+        ids = np.array([s['Sensor_id'] for s in attribute['Sensors']],
+                       dtype=object)
+        names.append(np.full(count, attribute['Attribute_Name'],
+                             dtype=object))
+        sensor_ids.append(ids[attribute['Sensor_index']])
+        timestamps.append(attribute['Timestamp'])
+        values.append(attribute['Value'])
+
+    def concatenate(arrays: [np.ndarray], dtype: Any) -> np.ndarray:
+        return np.concatenate(arrays) if arrays else np.array([], dtype=dtype)
+
+    table = pa.Table.from_arrays([
+        pa.array(concatenate(names, object), type=pa.string())
+            .dictionary_encode(),
+        pa.array(concatenate(sensor_ids, object), type=pa.string())
+            .dictionary_encode(),
+        pa.array(concatenate(timestamps, np.int64),
+                 type=pa.timestamp('ms', tz='UTC')),
+        pa.array(concatenate(values, np.float64), type=pa.float64(),
+                 from_pandas=True)],
+        ['Attribute_Name', 'Sensor_id', 'Timestamp', 'Value'])
+    table = table.replace_schema_metadata(
+        {'attributes': json.dumps(attributes)})
+
+    sink = pa.BufferOutputStream()
+    writer = pa.RecordBatchStreamWriter(sink, table.schema)
+    writer.write_table(table)
+    writer.close()
+    return Response(sink.getvalue().to_pybytes(), status=200,
+                    mimetype=ARROW_MIMETYPE)
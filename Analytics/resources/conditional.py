@@ -0,0 +1,128 @@
+"""
+Conditional GET for the read endpoints
+
+Responses carry a weak ETag derived from the request URL and the versions
+of the data they are built from (models.data_version) and a Last-Modified
+header from the last time that data changed. A request whose If-None-Match
+matches the current ETag, or, without If-None-Match, whose
+If-Modified-Since is not older than the data, is answered with 304 Not
+Modified before the resource runs its queries. Polling dashboards then only
+download data again once an importer or an edit has changed it.
+
+Resources opt in with the conditional decorator, below jwt_required so
+unauthenticated requests are still rejected:
+
+    @jwt_required
+    @conditional(lambda: [TRACKERS])
+    def get(self):
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Union
+
+from flask import Response, request
+from werkzeug.http import http_date
+
+from models.attributes import Attributes
+from models.data_version import SENSORS, THEMES, TRACKERS, data_versions
+
+# /data parameters whose answers are not derived from stored data alone
+UNVERSIONED_DATA_ARGS = ('predictions', 'batch_id', 'task_id')
+
+
+def data_dependencies() -> Union[list, None]:
+    """
+    Versions a /data request depends on
+    :return: Version names and attribute data tables, None when the request
+             cannot be answered conditionally
+    """
+    if any(request.args.get(arg) not in (None, '', 'false', 'False')
+           for arg in UNVERSIONED_DATA_ARGS):
+        return None
+
+    names = [THEMES, SENSORS, TRACKERS]
+    attribute_names = request.args.get('attributedata')
+    if attribute_names:
+        names.extend(attribute.table_name for attribute in
+                     Attributes.get_by_name_in(attribute_names.split(',')))
+    return names
+
+
+def etag_for(epoch: str, versions: {str: int}) -> str:
+    """
+    ETag of the current request
+    :param epoch: Epoch of the data versions
+    :param versions: Versions the response depends on
+    :return: Unquoted entity tag
+    """
+    # arguments can also be sent in the body of GET requests
+    digest = hashlib.sha1(request.full_path.encode('utf8'))
+    digest.update(request.get_data())
+    digest.update(epoch.encode('utf8'))
+    for name, version in sorted(versions.items()):
+        digest.update('{}={};'.format(name, version).encode('utf8'))
+    return digest.hexdigest()
+
+
+def not_modified(etag: str, modified: Union[datetime, None]) -> bool:
+    """
+    Check the preconditions of the current request
+    :param etag: Current entity tag
+    :param modified: Time the data last changed
+    :return: Whether the client already holds the current representation
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and modified is not None:
+        return modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional(dependencies: Callable[[], Union[list, None]]) -> Callable:
+    """
+    Answer GET requests conditionally
+    :param dependencies: Called in the request context, returns the version
+                         names and attribute data tables the response
+                         depends on or None to answer unconditionally
+    :return: Decorator of a resource method
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            names = dependencies()
+            state = data_versions.state(names) if names is not None else None
+            if state is None:
+                return method(*args, **kwargs)
+
+            epoch, versions, modified = state
+            etag = etag_for(epoch, versions)
+            modified = datetime.utcfromtimestamp(modified) \
+                if modified is not None else None
+            # no-cache: browsers revalidate instead of guessing freshness
+            # from Last-Modified
+            headers = {'ETag': 'W/"{}"'.format(etag),
+                       'Cache-Control': 'no-cache'}
+            if modified is not None:
+                headers['Last-Modified'] = http_date(modified)
+
+            if not_modified(etag, modified):
+                return Response(status=304, headers=headers)
+
+            result = method(*args, **kwargs)
+            if isinstance(result, Response):
+                if result.status_code == 200:
+                    result.headers.extend(headers)
+                return result
+            if not isinstance(result, tuple):
+                result = (result, 200)
+            if result[1] != 200:
+                return result
+            if len(result) > 2:
+                headers.update(result[2])
+            return result[0], result[1], headers
+
+        return wrapper
+
+    return decorator
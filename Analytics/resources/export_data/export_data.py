@@ -5,16 +5,15 @@ from datetime import datetime
 from http import HTTPStatus
 from typing import Any
 
-import geojson
 import numpy as np
 import pandas as pd
 from flask import send_from_directory, after_this_request
 from flask_jwt_extended import jwt_required
 from flask_restful import Resource
 from flask_restful import reqparse
-from geojson import Feature
 
 from db import db
+from models.attribute_data import get_data_store
 from models.location import Location
 from models.sensor import Sensor
 
@@ -67,9 +66,8 @@ class ExportData(Resource):
 
         try:
             # Fetch Data Table
-            sql_statement = "SELECT * FROM {} LIMIT {};".format(
-                args['table_name'], args['limit'])
-            df_rsql = pd.read_sql(sql_statement, con=db.engine)
+            df_rsql = get_data_store().read_frame(args['table_name'],
+                                                  args['limit'])
         except Exception as ex:
             return dict(message="Table not found",
                         table_name=args['table_name']), HTTPStatus.NOT_FOUND
@@ -229,7 +227,7 @@ class ExportData(Resource):
     @staticmethod
     def create_feature_properties(data_frame: pd.DataFrame,
                                   column_names: {str}, table_name: str) -> [
-        Feature]:
+        'geojson.Feature']:
         """
         Create Feature and Properties for GeoJson export
         :param data_frame: Pandas Dataframe to be exported
@@ -237,6 +235,8 @@ class ExportData(Resource):
         param table_name: Name of Attribute table to export
         :return: A list of GeoJson Feature to be exported
         """
+        from geojson import Feature, Point
+
         features = list()
         properties = dict()
         unit = "NO_UNIT"
@@ -247,7 +247,7 @@ class ExportData(Resource):
             if not header_added:
                 attribute_id = row["a_id"]
 
-                geometry = geojson.Point([row["longitude"], row["latitude"]])
+                geometry = Point([row["longitude"], row["latitude"]])
                 column_names.remove("longitude")
                 column_names.remove("latitude")
                 header_added = True
@@ -285,6 +285,8 @@ class ExportData(Resource):
         :param extension: File extension
         :return: True if the data is exported successfully otherwise, False
         """
+        import geojson
+
         columns_names = data_frame.columns
         sensor_ids = set(data_frame["s_id"].to_list())
         features = []
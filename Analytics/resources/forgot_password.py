@@ -3,9 +3,7 @@ import logging
 import random
 import sys
 import flask
-import sendgrid
 from flask_restful import Resource, reqparse
-from sendgrid.helpers.mail import Email, Content, Mail
 from models.users import Users
 sys.path.append("../..")
 from settings import GetConfig
@@ -86,6 +84,9 @@ class ForgotPassword(Resource):
             self.html_template, username=name,
             password=new_password)
 
+        import sendgrid
+        from sendgrid.helpers.mail import Email, Content, Mail
+
         sg = sendgrid.SendGridAPIClient(
             apikey=self.api_key)
 
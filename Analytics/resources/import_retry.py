@@ -1,12 +1,13 @@
 import datetime
-import importlib
 import logging
+from typing import Union
 
 from flask_restful import Resource, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_claims
 
 from db import db
 from importers.state_decorator import ImporterStatus
+from importers.tasks import dispatch
 from models.importer_status import ImporterStatuses
 from models.api import API
 
@@ -33,8 +34,8 @@ class ImportRetry(Resource):
         logger.info(status)
         importer_status = ImporterStatuses.find_by_name(status.name)
         if importer_status:
-            if status.state == "success":
-                importer_status.state = "success"
+            if status.state in ("success", "no-change"):
+                importer_status.state = status.state
             else:
                 importer_status.state = "failure"
                 importer_status.reason = status.reason
@@ -53,27 +54,25 @@ class ImportRetry(Resource):
         """
         args = self.parser.parse_args()
         if get_jwt_claims()["admin"]:
-            if self.retry_importer(args["api_id"]):
-                return {"message": "success"}, 200
+            task_id = self.retry_importer(args["api_id"])
+            if task_id:
+                return {"message": "success", "task_id": task_id}, 200
             else:
                 return {"message": "importer could not be found"}, 200
         else:
             return {"message": "Not Authorised"}, 403
 
     @staticmethod
-    def retry_importer(api_id) -> bool:
+    def retry_importer(api_id) -> Union[str, None]:
         """
-        Execute the importer that corresponds to the api_id arguments
+        Queue a run of the importer that corresponds to the api_id arguments
+        on the Celery importer queue
         :param api_id: id of an entry in the api table
-        :return: whether the was importer executed
+        :return: the id of the task executing the importer or None if the
+                 importer could not be found
         """
         api_entry = API.get_by_api_id(api_id)
         if api_entry:
-            _module, _class = api_entry.api_class.rsplit('.', 1)
-            data_class = getattr(importlib.import_module(_module), _class)
-            _d_class = data_class()
-            _d_class._create_datasource()
-
-            return True
+            return dispatch(api_entry.api_class, api_entry.name).id
         else:
-            return False
+            return None
@@ -3,29 +3,45 @@ from flask_jwt_extended import jwt_required, get_jwt_claims
 
 from db import db
 
+from models.importer_run import ImporterRun
 from models.importer_status import ImporterStatuses
 
 
 class ImportStatus(Resource):
     """
     API endpoint, return the status of importers and if their state is
-    failure, return the reasons for the failure
+    failure, return the reasons for the failure, along with the stage
+    metrics of their last run. When api_id is passed the run history of the
+    importer is returned instead
     """
+    parser = reqparse.RequestParser()
+    parser.add_argument('api_id', type=int, store_missing=False)
+    parser.add_argument('limit', type=inputs.positive, default=50)
 
     @jwt_required
     def get(self) -> (str, int):
         """
         GET request endpoint. Retrieve all entries in the importer status
-        table.
+        table, or the most recent runs of the importer identified by api_id
         :return: a dictionary containing importer status entries if
         successful or a dictionary containing an error message if unsuccessful
         """
         if get_jwt_claims()["admin"]:
+            args = self.parser.parse_args()
+            if 'api_id' in args:
+                runs = ImporterRun.find_by_api_id(args['api_id'],
+                                                  args['limit'])
+                return [run.json() for run in runs], 200
+
             statuses = ImporterStatuses.get_all()
             if statuses:
+                last_runs = {run.api_id: run.json() for run in
+                             ImporterRun.latest_per_api()}
                 status_list = []
                 for status in statuses:
-                    status_list.append(status.json())
+                    status_json = status.json()
+                    status_json['last_run'] = last_runs.get(status.api_id)
+                    status_list.append(status_json)
 
                 return status_list, 200
             else:
@@ -16,9 +16,10 @@ class UserLogoutAccess(Resource):
         :return: A message that indicates whether the token has been revoked
         :rtype: JSON
         """
-        jti = get_raw_jwt()['jti']
+        raw_jwt = get_raw_jwt()
         try:
-            revoked_token = RevokedTokens(jti = jti)
+            revoked_token = RevokedTokens(jti=raw_jwt['jti'],
+                                          expires=raw_jwt.get('exp'))
             revoked_token.add()
             return {'message': 'Access token has been revoked'}, 200
         except:
@@ -35,9 +36,10 @@ class UserLogoutRefresh(Resource):
         :return: A message that indicates whether the token has been revoked 
         :rtype: JSON
         """
-        jti = get_raw_jwt()['jti']
+        raw_jwt = get_raw_jwt()
         try:
-            revoked_token = RevokedTokens(jti = jti)
+            revoked_token = RevokedTokens(jti=raw_jwt['jti'],
+                                          expires=raw_jwt.get('exp'))
             revoked_token.add()
             return {'message': 'Refresh token has been revoked'}, 200
         except:
@@ -0,0 +1,160 @@
+"""
+Prometheus metrics
+
+/metrics renders, in the Prometheus text exposition format, the metric
+families returned by every registered collector. Collectors are functions
+returning MetricFamily objects and are registered with register_collector.
+"""
+import logging
+from typing import Callable, Union
+
+from flask import Response, current_app
+from flask_jwt_extended import get_jwt_claims, jwt_required
+from flask_restful import Resource
+
+from models.api import API
+from models.importer_run import ImporterRun
+
+logging.basicConfig(level='INFO')
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_collectors = []
+
+
+class MetricFamily(object):
+    """
+    Samples of a metric sharing a name, type and help text
+    """
+
+    def __init__(self, name: str, kind: str, help_text: str) -> None:
+        """
+        :param name: Metric name
+        :param kind: Prometheus metric type: counter, gauge or histogram
+        :param help_text: Description of the metric
+        """
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.samples = []
+
+    def add(self, labels: dict, value: Union[int, float],
+            suffix: str = '') -> None:
+        """
+        Add a sample to the family
+        :param labels: Sample labels
+        :param value: Sample value
+        :param suffix: Suffix of the sample name, e.g. _bucket for histograms
+        """
+        self.samples.append((self.name + suffix, labels, value))
+
+    def render(self) -> [str]:
+        """
+        Render the family in the text exposition format
+        :return: Lines of the family
+        """
+        lines = ['# HELP {} {}'.format(self.name, self.help_text),
+                 '# TYPE {} {}'.format(self.name, self.kind)]
+        for name, labels, value in self.samples:
+            label_text = ','.join('{}="{}"'.format(
+                key, str(val).replace('\\', r'\\').replace('"', r'\"').replace(
+                    '\n', r'\n')) for key, val in labels.items())
+            lines.append('{}{} {}'.format(
+                name, '{' + label_text + '}' if label_text else '',
+                float(value)))
+        return lines
+
+
+def register_collector(collector: Callable) -> Callable:
+    """
+    Register a function returning metric families to be exposed at /metrics
+    :param collector: Function returning a list of MetricFamily
+    :return: The collector, so the function can be used as a decorator
+    """
+    _collectors.append(collector)
+    return collector
+
+
+@register_collector
+def importer_metrics() -> [MetricFamily]:
+    """
+    Collect the outcome counts and the stage metrics of the most recent run
+    of every importer
+    :return: Importer metric families
+    """
+    names = {api.id: api.name for api in API.get_all()}
+
+    runs = MetricFamily('importer_runs_total', 'counter',
+                        'Importer runs by outcome')
+    for api_id, state, count in ImporterRun.count_by_state():
+        runs.add({'api': names.get(api_id, api_id), 'state': state}, count)
+
+    duration = MetricFamily('importer_last_run_duration_seconds', 'gauge',
+                            'Duration of the most recent importer run')
+    finished = MetricFamily('importer_last_run_timestamp_seconds', 'gauge',
+                            'Time the most recent importer run finished')
+    stage_families = {
+        field: MetricFamily('importer_stage_{}'.format(field), 'gauge',
+                            help_text)
+        for field, help_text in (
+            ('seconds', 'Time spent in a stage of the most recent run'),
+            ('bytes', 'Bytes handled by a stage of the most recent run'),
+            ('rows', 'Rows handled by a stage of the most recent run'),
+            ('statements', 'SQL statements executed by a stage of the most '
+                           'recent run'))}
+
+    for run in ImporterRun.latest_per_api():
+        api = names.get(run.api_id, run.api_id)
+        duration.add({'api': api, 'state': run.state}, run.duration or 0)
+        finished.add({'api': api}, run.finished_timestamp.timestamp())
+        for stage in run.stages:
+            for field, family in stage_families.items():
+                family.add({'api': api, 'stage': stage.stage},
+                           getattr(stage, field))
+
+    return [runs, duration, finished] + list(stage_families.values())
+
+
+class Metrics(Resource):
+    """
+    API Resource class. Expose the application metrics to Prometheus
+    """
+
+    def get(self) -> Response:
+        """
+        GET method endpoint. Render every registered collector
+        :return: The metrics in the Prometheus text exposition format
+        """
+        lines = []
+        for collector in _collectors:
+            try:
+                for family in collector():
+                    lines.extend(family.render())
+            except Exception as e:
+                logger.error('Unable to collect {} metrics: {}'.format(
+                    collector.__name__, e))
+        return Response('\n'.join(lines) + '\n',
+                        content_type=CONTENT_TYPE)
+
+
+class SlowRequests(Resource):
+    """
+    API Resource class. Return the slowest requests sampled by the request
+    profiler, with their SQL statements
+    """
+
+    @jwt_required
+    def get(self) -> (list, int):
+        """
+        GET method endpoint. Admin users only
+        :return: The slowest sampled requests, slowest first, with an HTTP
+        status code
+        """
+        if not get_jwt_claims()["admin"]:
+            return {"message": "Not Authorised"}, 403
+
+        profiler = current_app.extensions.get('request_profiler')
+        if profiler is None:
+            return {"message": "Request profiling is not enabled"}, 404
+        return profiler.slow_requests(), 200
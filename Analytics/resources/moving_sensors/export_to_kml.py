@@ -1,6 +1,5 @@
 from http import HTTPStatus
 
-import simplekml
 from flask_jwt_extended import jwt_required
 from flask_restful import Resource
 from flask_restful import reqparse
@@ -34,6 +33,8 @@ class ExportToKML(Resource):
         :return: JSON containing the filename and an HTTPStatus of 204(created)
             otherwise an JSON error response with the appropriate HTTPStatus
         """
+        import simplekml
+
         args = self.reqparser.parse_args()
         kml = simplekml.Kml()
         tracker = Tracker.get_by_tracker_id(args["tracker_id"])
@@ -2,7 +2,6 @@ import logging
 import random
 from http import HTTPStatus
 
-import pandas as pd
 from flask_jwt_extended import jwt_required
 from flask_restful import Resource
 from flask_restful import reqparse
@@ -51,6 +50,8 @@ class GetDummyData(Resource):
             func.count(Tracker.id)).scalar()
 
         # Fetch Data from CSV
+        import pandas as pd
+
         try:
             df = pd.read_csv(args['file_name'])
         except IOError as ioe:
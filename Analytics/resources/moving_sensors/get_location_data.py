@@ -5,7 +5,9 @@ from flask_jwt_extended import jwt_required
 from flask_restful import Resource
 from flask_restful import reqparse
 
+from models.data_version import TRACKERS
 from models.pin_location_data import LocationData, Tracker
+from resources.conditional import conditional
 
 
 class GetLocationData(Resource):
@@ -32,6 +34,7 @@ class GetLocationData(Resource):
                                                                      '%d/%m/%Y %H:%M'))
 
     @jwt_required
+    @conditional(lambda: [TRACKERS])
     def get(self) -> (dict, HTTPStatus):
         """
         Fetch location data by date range
@@ -5,7 +5,9 @@ from flask_jwt_extended import jwt_required
 from flask_restful import Resource
 from flask_restful import reqparse
 
+from models.data_version import TRACKERS
 from models.pin_location_data import Tracker
+from resources.conditional import conditional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,6 +26,7 @@ class GetTracker(Resource):
         self.reqparser.add_argument('id', required=True, type=str)
 
     @jwt_required
+    @conditional(lambda: [TRACKERS])
     def get(self) -> (str, HTTPStatus):
         """
         Get Tracker
@@ -1,8 +1,7 @@
-from resources.helper_functions import mean_absolute_percentage_error
-import numpy as np
-import pandas as pd
 from fbprophet import Prophet
-from datetime import datetime
+
+from forecast.series import (format_predictions, holdout_error,
+                             prepare_series, split_holdout)
 
 '''
 @Params
@@ -13,79 +12,41 @@ from datetime import datetime
 	and forecasts the next n_pred values. For more details on the calculation
 	consult the github page 
 	
+	Forecasts served through the API are produced by forecast.service which
+	keeps the fitted models, this function always fits from scratch
 '''
 def predict(values, timestamp, n_pred):
-    df = pd.DataFrame(columns = ['value', 'api_timestamp'])
-    df['value'] = values
-    df['api_timestamp'] = timestamp
-    df['value'] = df.value.astype(float)
-    df = df.set_index('api_timestamp')
-
-    #### try to infer freq
-    pred_freq = pd.infer_freq(index = df.index)
-
-    #### if freq = None then default to 1H
-    if not pred_freq:
-
-        #### backup frequency inference if pandas can't figure it out 
-        averaged_df = df.groupby('api_timestamp').mean()
-        res = (pd.Series(averaged_df.index[1:]) - pd.Series(averaged_df.index[:-1])).value_counts()
-        pred_freq = pd.tseries.frequencies.to_offset(res.index[0]).freqstr
-
-        #### last resort backup: default to 1H
-        if not pred_freq:
-            pred_freq = '1H'
+    #### build a regularly spaced series, inferring its frequency
+    df, pred_freq = prepare_series(values, timestamp)
 
     #### try prophet forecasting engine
     forecasting_engine = 'Prophet'
 
-    #### resample to make predictions consistent.
-    df = df.resample(pred_freq).mean()
-
-    #### prophet requires specific naming of columns
-    df = df.reset_index()
-    df = df.rename(index=str, columns={'api_timestamp': 'ds', 'value': 'y'})
-
-    #### prophet fails with inf values. Replacing them with nan
-    df.replace([np.inf, -np.inf], np.nan)
-
     #### Instantiate the prophet object and fit
     m = Prophet()
     m.fit(df)
 
     #### Make forecast
-    future = m.make_future_dataframe(periods=n_pred, freq=pred_freq)
+    future = m.make_future_dataframe(periods=n_pred, freq=pred_freq,
+                                     include_history=False)
     forecast = m.predict(future)
 
     #### Compute MAPE by refitting on 70% and testing on 30%
-    df_mape = df.iloc[0: len(df)-round(len(df)/100 * 30)]
+    df_mape, n_pred_mape = split_holdout(df)
     m = Prophet()
     m.fit(df_mape)
 
-    #### Generate the remaining 30% of the dataset as predictions
-    n_pred_mape = np.abs(len(df) - len(df)-round(len(df)/100 * 30))
-
     #### Predict the 30%
-    future_mape = m.make_future_dataframe(periods=n_pred_mape, freq=pred_freq)
+    future_mape = m.make_future_dataframe(periods=n_pred_mape, freq=pred_freq,
+                                          include_history=False)
     forecast_mape = m.predict(future_mape)
 
     #### Compute MAPE
-    mape = np.round(mean_absolute_percentage_error(df.y.values[len(df_mape):len(df)],
-                          forecast_mape.yhat.values[len(df_mape):len(df)]),3)
+    mape = holdout_error(df, forecast_mape.yhat.values)
 
     #### Gather the forecasted values
-
-    temp = []
-    num_results = len(forecast.ds)
-    pred_timestamps = forecast.ds.values[num_results-n_pred:num_results]
-
-    for i, j in enumerate(range(num_results-n_pred,num_results)):
-        temp.append({
-            'Value': np.round(forecast.yhat.values[j],3),
-            'Value_Upper':  np.round(forecast.yhat_upper.values[j],3),
-            'Value_Lower':  np.round(forecast.yhat_lower.values[j],3),
-            'Timestamp': datetime.strftime(pd.to_datetime(pred_timestamps[i]), '%Y-%m-%d %H:%M:%S')
-        })
+    temp = format_predictions(forecast.ds.values, forecast.yhat.values,
+                              forecast.yhat_upper.values,
+                              forecast.yhat_lower.values)
 
     return temp, mape, forecasting_engine
-
@@ -50,7 +50,7 @@ from db import db
 from models.theme import Theme
 from models.attributes import Attributes
 from models.theme import SubTheme
-from models.attribute_data import ModelClass
+from models.attribute_data import get_data_store
 from models.sensor_attribute import SensorAttribute
 from models.sensor import Sensor
 from resources.predict import predict
@@ -194,39 +194,28 @@ class RequestForAttribute(Resource):
 	'''
 	def get_attribute_data(self, attribute_name, limit, offset,
 							fromdate=None, todate=None, operation=None):
-		# clearing previous metadata
-		db.metadata.clear()
 		attrs = attribute_name.split(',')
+		store = get_data_store()
 
 		attributes = Attributes.get_by_name_in(attrs)
 		data = []
 		for attribute in attributes:
-			model = ModelClass(attribute.table_name.lower())
-			count = db.session.query(model).count()
+			count = store.count(attribute.table_name)
 			values = []
 			if fromdate is not None and todate is not None:
 				if operation is None:
-					values = db.session.query(model) \
-							.filter(model.api_timestamp >= fromdate) \
-							.filter(model.api_timestamp <= todate) \
-							.limit(limit).offset(abs(count - offset)) \
-							.all()
+					values = store.between(attribute.table_name, fromdate, todate,
+											limit, abs(count - offset))
 				else:
-					values = db.session.query(model) \
-							.filter(model.api_timestamp >= fromdate) \
-							.filter(model.api_timestamp <= todate) \
-							.all()
+					values = store.between(attribute.table_name, fromdate, todate)
 			else:
 				if operation is None:
 
 					### refactored the query to fetch the latest values by default
-					values = db.session.query(model).order_by(desc(model.api_timestamp)).limit(limit).all() # \
-
-					# values = db.session.query(model).limit(limit) \
-					# 				.offset(abs(count - offset)).all()
+					values = store.latest(attribute.table_name, limit)
 
 				else:
-					values = db.session.query(model).all()
+					values = store.all(attribute.table_name)
 
 
 
@@ -268,16 +257,14 @@ class RequestForAttribute(Resource):
 			
 	'''
 	def get_predictions(self, attribute_table, sensor_id, n_pred):
-		db.metadata.clear()
-
 		_data = []
 		_timestamps = []
 		_limit = 10000
 
-		model = ModelClass(attribute_table.lower())
+		store = get_data_store()
 
 
-		if db.session.query(model).count() < 100:
+		if store.count(attribute_table) < 100:
 			pred_data =  {
 							"Predictions": "not enough data to make reliable predictions"
 						}
@@ -285,19 +272,14 @@ class RequestForAttribute(Resource):
 		else:
 		# check for sensor_id
 			if sensor_id:
-				values = db.session.query(model) \
-							.filter(model.s_id == sensor_id) \
-							.limit(_limit) \
-							.all()
+				values = store.by_sensor(attribute_table, sensor_id, _limit)
 				if len(values) < 100:
 					pred_data =  {
 								"Predictions": "not enough data to make reliable predictions"
 								}
 					return pred_data
 			else:	
-				values = db.session.query(model) \
-							.limit(_limit) \
-							.all()
+				values = store.by_sensor(attribute_table, None, _limit)
 				if len(values) < 100:
 					pred_data =  {
 								"Predictions": "not enough data to make reliable predictions"
@@ -1,17 +1,14 @@
 import logging
 import statistics
-import subprocess
 from datetime import datetime
 from typing import Union, Any
 
 import celery
-import sqlalchemy
 from celery.exceptions import Ignore
 from celery.utils.log import get_task_logger
 from flask_restful import Resource, reqparse, inputs
 
-from db import db
-from models.attribute_data import ModelClass
+from models.attribute_data import get_data_store
 from models.attributes import Attributes
 from models.location import Location
 from models.pin_location_data import Tracker, LocationData
@@ -21,11 +18,15 @@ from models.sensor_attribute import SensorAttribute
 from models.theme import SubTheme
 from models.theme import Theme
 from models.unit import Unit
-from models.user_predictions import UserPredictions
 from models.users import Users
+from output import materialise
+from forecast.engines import AUTO, engine_names
+from forecast.task_registry import task_registry
+from resources.batch_predictions import batch_status
+from resources.columnar import (ARROW, FORMATS, ROWS, arrow_available,
+                                arrow_response, columnar_values)
+from resources.conditional import conditional, data_dependencies
 from resources.helper_functions import is_number
-from resources.request_grouped import request_grouped_data
-from resources.request_grouped import request_harmonised_data
 
 LIMIT = 30
 OFFSET = 30
@@ -71,6 +72,15 @@ class RequestForData(Resource):
                         per individual sensor. Defaults to False
         moving: boolean specifying whether data related to moving sensors is to
                 be returned
+        engine: forecasting engine used when predictions are requested, one of
+                prophet, seasonal_naive, holt_winters, arima or auto. auto
+                uses the cheapest engine whose backtested error is within
+                tolerance. Defaults to the configured default engine
+        format: format of attribute data that is neither grouped nor
+                predicted, rows (default), columnar for the sensors of each
+                attribute followed by parallel arrays of sensor index,
+                timestamp in epoch milliseconds and value, or arrow for an
+                Arrow IPC stream, see resources.columnar
 
         Note: fromdate and todate both needs to be present in order for date
         filtering to work
@@ -95,6 +105,10 @@ class RequestForData(Resource):
           the most records. It also reformats the data to be structured as long
           (row stacked) or wide (column stacked)
             {URL}?attributedata='<name1><name2>&limit=1000&grouped=True&harmonising_method=long
+        - Retrieves records as parallel arrays instead of one object per record
+            {URL}?attributedata='<name1><name2>&limit=10000&format=columnar
+        - Forecasts the next 24 values of a sensor with Holt-Winters
+            {URL}?attributedata='<name1>&predictions=True&sensorid=<id>&n_predictions=24&engine=holt_winters&user_id=<id>
 
     """
     parser = reqparse.RequestParser()
@@ -129,10 +143,16 @@ class RequestForData(Resource):
     parser.add_argument('n_predictions', type=int, store_missing=False)
     parser.add_argument('predictions', type=inputs.boolean,
                         store_missing=False)
+    parser.add_argument('engine', type=str,
+                        choices=tuple(engine_names()) + (AUTO,),
+                        store_missing=False)
     parser.add_argument('user_id', type=int, store_missing=False)
     parser.add_argument('moving', type=inputs.boolean, required=False,
                         store_missing=False)
+    parser.add_argument('format', type=str, choices=FORMATS,
+                        store_missing=False)
 
+    @conditional(data_dependencies)
     def get(self) -> ({str: Any}, int):
         """
         Get requested attribute data or forecast prediction
@@ -148,6 +168,7 @@ class RequestForData(Resource):
         predictions, grouped, harmonising_method = None, None, None
         per_sensor, freq, method = None, '1H', 'mean'
         user_id = None
+        engine = None
 
         if 'moving' in args:
             if args['moving']:
@@ -348,6 +369,9 @@ class RequestForData(Resource):
         if 'user_id' in args:
             user_id = args['user_id']
 
+        if 'engine' in args:
+            engine = args['engine']
+
         if theme is None and subtheme is None \
                 and len(attributes) == 0 and attribute_data is None \
                 and sensor is None and sensor_name is None and sensor_attribute is None:
@@ -355,31 +379,48 @@ class RequestForData(Resource):
             return [a.json() for a in themes], 200
 
         if attribute_data is not None:
-            global LIMIT, OFFSET
+            # grouping pulls in pandas, geojson and shapely, only import
+            # them once grouped data is requested
+            if grouped:
+                from resources.request_grouped import (request_grouped_data,
+                                                       request_harmonised_data)
+
+            # request local, requests are answered concurrently by the
+            # dashboard snapshot
+            limit, offset = LIMIT, OFFSET
             data = None
             operation = None
             if 'limit' in args and args['limit'] is not None:
-                LIMIT = args['limit']
+                limit = args['limit']
 
             if 'offset' in args and args['offset'] is not None:
-                OFFSET = args['offset']
+                offset = args['offset']
 
             if 'operation' in args and args['operation'] is not None:
                 operation = args['operation']
 
+            output_format = args.get('format') or ROWS
+            if output_format != ROWS:
+                if grouped or predictions:
+                    return {"error": "format={} is not available for grouped "
+                                     "data or predictions".format(
+                        output_format)}, 400
+                if output_format == ARROW and not arrow_available():
+                    return {"error": "Arrow output requires pyarrow"}, 406
+
             if ('fromdate' in args and args['fromdate'] is not None
                     and 'todate' in args and args['todate'] is not None):
                 if grouped:
                     if harmonising_method:
                         data, status_code = self.get_attribute_data(
-                            attribute_data, LIMIT, OFFSET, args['fromdate'],
+                            attribute_data, limit, offset, args['fromdate'],
                             args['todate'], operation)
                         if status_code != 422:
                             data, status_code = request_harmonised_data(
                                 data, harmonising_method=harmonising_method)
                     else:
                         data, status_code = self.get_attribute_data(
-                            attribute_data, LIMIT, OFFSET, args['fromdate'],
+                            attribute_data, limit, offset, args['fromdate'],
                             args['todate'], operation)
                         if status_code != 422:
                             data, status_code = request_grouped_data(
@@ -387,9 +428,10 @@ class RequestForData(Resource):
                                 method=method)
                 else:
                     data, status_code = self.get_attribute_data(
-                        attribute_data, LIMIT, OFFSET, args['fromdate'],
-                        args['todate'], operation)
+                        attribute_data, limit, offset, args['fromdate'],
+                        args['todate'], operation, output_format)
                 if predictions:
+                    data = materialise(data)
                     if not Attributes.get_by_name(attribute_data):
                         pred_data = {
                             "message": "Unable to make predictions as "
@@ -410,7 +452,9 @@ class RequestForData(Resource):
                         else:
                             prediction_task = self.get_predictions.apply_async(
                                 args=(data[0]["Attribute_Table"], sensorid,
-                                      n_predictions, user_id))
+                                      n_predictions, user_id, engine))
+                            task_registry.record([prediction_task.id],
+                                                 user_id)
 
                             data.append({"message": "Forecasting engine making"
                                                     " predictions",
@@ -420,7 +464,7 @@ class RequestForData(Resource):
                     if harmonising_method:
                         data, status_code = self.get_attribute_data(
                             attribute_data,
-                            LIMIT, OFFSET,
+                            limit, offset,
                             operation=operation)
                         if status_code != 422:
                             data, status_code = request_harmonised_data(
@@ -428,18 +472,19 @@ class RequestForData(Resource):
                     else:
                         data, status_code = self.get_attribute_data(
                             attribute_data,
-                            LIMIT, OFFSET,
+                            limit, offset,
                             operation=operation)
                         if status_code != 422:
                             data, status_code = request_grouped_data(
                                 data, per_sensor=per_sensor, freq=freq,
                                 method=method)
                 else:
-                    data, status_code = self.get_attribute_data(attribute_data,
-                                                                LIMIT, OFFSET,
-                                                                operation=operation)
+                    data, status_code = self.get_attribute_data(
+                        attribute_data, limit, offset, operation=operation,
+                        output_format=output_format)
 
                 if predictions:
+                    data = materialise(data)
                     if not Attributes.get_by_name(attribute_data):
                         pred_data = {
                             "message": "Unable to make predictions as "
@@ -468,7 +513,9 @@ class RequestForData(Resource):
                                         self.get_predictions.apply_async(args=(
                                             data[0]["Attribute_Table"],
                                             sensorid,
-                                            n_predictions, user_id))
+                                            n_predictions, user_id, engine))
+                                    task_registry.record(
+                                        [prediction_task.id], user_id)
 
                                     data.append({
                                         "message": "Forecasting engine "
@@ -480,6 +527,8 @@ class RequestForData(Resource):
                                                    "non-numeric data"})
                             else:
                                 pass
+            if output_format == ARROW and status_code == 200:
+                return arrow_response(data)
             return data, status_code
 
         if attributes:
@@ -504,8 +553,8 @@ class RequestForData(Resource):
     def get_attribute_data(self, attribute_name: str, limit: int, offset: int,
                            fromdate: Union[None, datetime] = None,
                            todate: Union[None, datetime] = None,
-                           operation: Union[None, str] = None) -> (
-            {str: Any}, int):
+                           operation: Union[None, str] = None,
+                           output_format: str = ROWS) -> ({str: Any}, int):
         """
         Get attribute data
         :param attribute_name: Attribute name
@@ -515,40 +564,32 @@ class RequestForData(Resource):
         :param operation: Mathematical operations that can be performed on data
                     accepted values are: 'mean', 'median', 'sum'
                     (More to be added)
+        :param output_format: rows, or columnar for the readings as parallel
+                              arrays (resources.columnar)
         :return: Attribute data and an HTTP status code
         """
-        # clearing previous metadata
-        db.metadata.clear()
         attrs = attribute_name.split(',')
+        store = get_data_store()
 
         attributes = Attributes.get_by_name_in(attrs)
         data = []
         got_sensor = False
         for attribute in attributes:
-            model = ModelClass(attribute.table_name.lower())
-            count = db.session.query(model).count()
+            count = store.count(attribute.table_name)
             values = []
             if fromdate is not None and todate is not None:
                 if operation is None:
-
-                    values = db.session.query(model) \
-                        .filter(model.api_timestamp >= fromdate) \
-                        .filter(model.api_timestamp <= todate) \
-                        .limit(limit).all()
-
+                    values = store.between(attribute.table_name, fromdate,
+                                           todate, limit)
                 else:
-                    values = db.session.query(model) \
-                        .filter(model.api_timestamp >= fromdate) \
-                        .filter(model.api_timestamp <= todate) \
-                        .all()
+                    values = store.between(attribute.table_name, fromdate,
+                                           todate)
             else:
                 if operation is None:
-                    db.metadata.clear()
                     # refactored the query to fetch the latest values by default
-                    values = db.session.query(model).order_by(sqlalchemy.desc(
-                        model.api_timestamp)).limit(limit).all()
+                    values = store.latest(attribute.table_name, limit)
                 else:
-                    values = db.session.query(model).all()
+                    values = store.all(attribute.table_name)
 
             _common = {
                 'Attribute_Table': attribute.table_name,
@@ -564,33 +605,39 @@ class RequestForData(Resource):
             temp = []
 
             if operation is None:
-                for i in range(len(values) - 1, -1, -1):
-                    s = Sensor.get_by_id(values[i].s_id)
-                    if s:
-                        # Ensure the data set has at least one sensor
-                        # If no sensor is present the data source page loads
-                        # incorrectly
+                if output_format != ROWS:
+                    columns = columnar_values(values)
+                    if columns is not None:
                         got_sensor = True
-                    try:
-                        temp.append({
-                            'Attribute_Name': attribute.name,
-                            'Attribute_id': attribute.id,
-                            'Sensor_id': values[i].s_id,
-                            'Timestamp': str(values[i].api_timestamp),
-                            'Value': values[i].value,
-                            'Name': s.name,
-                            'Latitude': Location.get_by_id(s.l_id).lat,
-                            'Longitude': Location.get_by_id(s.l_id).lon
-
-                        })
-                    except (TypeError, ValueError, AttributeError) as e:
-                        # missing/ incorrect data entry found in requested data
-                        logger.log(logging.DEBUG,
-                                   "Possible missing db entries:"
-                                   "{} , {}".format(s, e))
-                        pass
-                if temp:
-                    _common['Attribute_Values'] = temp
+                        _common.update(columns)
+                else:
+                    for i in range(len(values) - 1, -1, -1):
+                        s = Sensor.get_by_id(values[i].s_id)
+                        if s:
+                            # Ensure the data set has at least one sensor
+                            # If no sensor is present the data source page loads
+                            # incorrectly
+                            got_sensor = True
+                        try:
+                            temp.append({
+                                'Attribute_Name': attribute.name,
+                                'Attribute_id': attribute.id,
+                                'Sensor_id': values[i].s_id,
+                                'Timestamp': str(values[i].api_timestamp),
+                                'Value': values[i].value,
+                                'Name': s.name,
+                                'Latitude': Location.get_by_id(s.l_id).lat,
+                                'Longitude': Location.get_by_id(s.l_id).lon
+
+                            })
+                        except (TypeError, ValueError, AttributeError) as e:
+                            # missing/ incorrect data entry found in requested data
+                            logger.log(logging.DEBUG,
+                                       "Possible missing db entries:"
+                                       "{} , {}".format(s, e))
+                            pass
+                    if temp:
+                        _common['Attribute_Values'] = temp
 
                 if not got_sensor:
                     logger.log(logging.DEBUG, "No sensor id found for data:"
@@ -616,7 +663,7 @@ class RequestForData(Resource):
 
     @celery.task(bind=True)
     def get_predictions(self, attribute_table: str, sensor_id: str, n_pred:
-    int, u_id: int) -> dict:
+    int, u_id: int, engine: str = None) -> dict:
         """
         Generate time series predictions or retrieve a time series 
         from database if the corresponding predictions have been cached.
@@ -628,18 +675,19 @@ class RequestForData(Resource):
         the sensors from the attribute_table
         :param n_pred: the number of predictions to be made
         :param u_id: the users id found in the Users table
+        :param engine: the forecasting engine to use, 'auto' to use the
+        cheapest engine whose backtested error is within tolerance or None
+        for the default engine
         :return: a dictionary containing the predicted values with their 
         corresponding time stamps 
         """
-        db.metadata.clear()
-
         _data = []
         _timestamps = []
         _limit = 10000
 
-        model = ModelClass(attribute_table.lower())
+        store = get_data_store()
 
-        if db.session.query(model).count() < 100:
+        if store.count(attribute_table) < 100:
             pred_data = {"status": "not enough data to make reliable  "
                                    "predictions", "result": "UNABLE"}
             celery_logger.error("{} for args attr_table={}, sensor_id={}, "
@@ -652,10 +700,7 @@ class RequestForData(Resource):
         else:
             # check for sensor_id
             if sensor_id:
-                values = db.session.query(model) \
-                    .filter(model.s_id == sensor_id) \
-                    .limit(_limit) \
-                    .all()
+                values = store.by_sensor(attribute_table, sensor_id, _limit)
                 if len(values) < 100:
                     pred_data = {"status": "not enough sensor data to make "
                                            "reliable predictions",
@@ -669,9 +714,7 @@ class RequestForData(Resource):
                                       meta={'status': pred_data["status"]})
                     raise Ignore()
             else:
-                values = db.session.query(model) \
-                    .limit(_limit) \
-                    .all()
+                values = store.by_sensor(attribute_table, None, _limit)
                 if len(values) < 100:
                     pred_data = {"status": "not enough data to make reliable"
                                            "predictions", "result": "UNABLE"}
@@ -692,44 +735,9 @@ class RequestForData(Resource):
                 _data.append(float(val.value))
                 _timestamps.append(val.api_timestamp)
 
-            predict_from_db = PredictionResults.find_by_prediction_args(
-                attribute_table, sensor_id, n_pred)
-
-            if predict_from_db:
-                existing_user_result = UserPredictions.get_entry(u_id,
-                                                                 predict_from_db.id)
-
-                if existing_user_result and predict_from_db.is_stale(model):
-                    existing_user_result.delete()
-                    existing_user_result.commit()
-
-                    if not UserPredictions.find_by_pred_id(predict_from_db.id):
-                        predict_from_db.delete()
-                        predict_from_db.commit()
-
-                    result = PredictionResults.generate_predictions_results(
-                        attribute_table, sensor_id, n_pred, _data, _timestamps)
-                    UserPredictions.add_entry(u_id, result["Prediction_id"])
-
-                else:
-                    # use a cached result
-                    predict_from_db.updated_timestamp = datetime.now()
-                    predict_from_db.save()
-                    predict_from_db.commit()
-                    UserPredictions.add_entry(u_id, predict_from_db.id)
-
-                    result = {
-                        "Sensor_id": predict_from_db.sensor_id,
-                        "Forcasting_engine": predict_from_db.forcasting_engine,
-                        "Mean_Absolute_Percentage_Error":
-                            predict_from_db.mean_absolute_percentage_error,
-                        "Prediction_id": predict_from_db.id,
-                        "Predictions": predict_from_db.result
-                    }
-            else:
-                result = PredictionResults.generate_predictions_results(
-                    attribute_table, sensor_id, n_pred, _data, _timestamps)
-                UserPredictions.add_entry(u_id, result["Prediction_id"])
+            result = PredictionResults.serve(u_id, attribute_table,
+                                             sensor_id, n_pred, _data,
+                                             _timestamps, engine)
 
             pred_data = {"status": "task complete", "result": result}
 
@@ -743,32 +751,34 @@ class PredictionStatus(Resource):
 
     parser = reqparse.RequestParser()
     parser.add_argument('task_id', type=str, store_missing=False)
+    parser.add_argument('batch_id', type=str, store_missing=False)
+    parser.add_argument('user_id', type=int, store_missing=False)
+    parser.add_argument('page', type=inputs.positive, default=1)
+    parser.add_argument('per_page', type=inputs.int_range(1, 500), default=50)
 
     def get(self) -> (dict, int):
         """
         GET method endpoint. Use task_id argument and return state
         and result of the corresponding asynchronous prediction task. If no
-        task_id is provided, the state of all executed tasks are returned
+        task_id is provided, a page of the submitted tasks is returned, most
+        recent first
         :param task_id: The task_id returned upon request of the prediction task
+        :param batch_id: The batch_id returned by /batch_predictions, the
+        state of the task of every sensor in the batch is returned
+        :param user_id: List the tasks submitted for this user only
+        :param page: Page of the task listing, starting from 1
+        :param per_page: Number of tasks per page, 50 by default
         """
 
         args = self.parser.parse_args()
+        if "batch_id" in args:
+            return batch_status(args["batch_id"])
+
         if "task_id" not in args:
-            tasks = subprocess.Popen(["redis-cli", "keys", "*"],
-                                     stdout=subprocess.PIPE)
-            task_list = str(tasks.communicate()[0].decode("utf8")).split(
-                "\n")
-
-            if len(task_list) > 0:
-                # remove celery-task-meta prefix from items in task_list
-                task_list = [item[17:] for item in task_list if
-                             "celery-task-meta-" in item]
-                task_id_states = [{"task_id": t_id, "state":
-                    RequestForData.get_predictions.AsyncResult(
-                        t_id).state} for t_id in task_list]
-                response = {"task_states": task_id_states}
-            else:
-                response = {"task_states": []}
+            total, tasks = task_registry.page(args.get("user_id"),
+                                              args["page"], args["per_page"])
+            response = {"task_states": tasks, "total": total,
+                        "page": args["page"], "per_page": args["per_page"]}
         else:
             task_id = args['task_id']
             task = RequestForData.get_predictions.AsyncResult(task_id)
@@ -10,6 +10,7 @@ from geoalchemy2.shape import to_shape
 
 from models.location import Location
 from models.sensor import Sensor
+from output import frame_records
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -175,7 +176,7 @@ def request_grouped_data(data: {str: Any}, per_sensor: bool, freq: str,
             _harm_df = pd.merge(_harm_df.reset_index(drop=True), temp,
                                 on='Sensor_id', how='left')
 
-        data = json.loads(_harm_df.to_json(orient='records'))
+        data = frame_records(_harm_df)
 
         return data, 200
     except Exception as e:
@@ -323,12 +324,10 @@ def request_harmonised_data(data: {str: Any}, harmonising_method: str) -> [
                                   values=['Value', 'timestamp', 'Latitude',
                                           'Longitude'])
 
-            data = json.loads(
-                _df.to_json(orient='records').replace('["', '').replace('"]',
-                                                                        '').replace(
-                    '","', ','))
+            data = frame_records(_df, [('["', ''), ('"]', ''),
+                                       ('","', ',')])
         elif harmonising_method == 'long':
-            data = json.loads(_df.to_json(orient='records'))
+            data = frame_records(_df)
 
         else:
             ### using geolachemy's to_shape function to grab the geometry of sensors (instead of lat lon).
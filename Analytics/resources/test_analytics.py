@@ -157,4 +157,14 @@ class AnalyticsTest(unittest.TestCase):
 
 
 
-        
\ No newline at end of file
+        
+    def test_status(self):
+        request_id = self.create_request().get_json()['status']['id']
+        response = self.app.get('/analytics/status',
+                                query_string={'request_id': request_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['id'], request_id)
+
+        response = self.app.get('/analytics/status',
+                                query_string={'request_id': -1})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,99 @@
+import unittest
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from geoalchemy2.elements import WKTElement
+
+from app import create_app
+from db import db
+from models.api import API
+from models.location import Location
+from models.sensor import Sensor
+from resources.columnar import (arrow_available, arrow_response,
+                                columnar_values)
+
+Reading = namedtuple('Reading', ['s_id', 'value', 'api_timestamp'])
+
+
+class ColumnarTestCase(unittest.TestCase):
+    """
+    Test the columnar and arrow formats of attribute data
+    """
+
+    def setUp(self):
+        """ Create testing app, an API and a sensor with a location """
+        self.test_app = create_app(DATABASE_NAME='test_analysis',
+                                   TESTING=True)
+        self.testing_client_context = self.test_app.app_context()
+        self.testing_client_context.push()
+
+        self.api = API('_test_columnar_api_', 'http://localhost', '',
+                       '_test_columnar_', 60, None)
+        db.session.add(self.api)
+        self.location = Location(51.5, -0.12,
+                                 WKTElement('POINT(-0.12 51.5)', 4326))
+        db.session.add(self.location)
+        db.session.flush()
+        self.sensor = Sensor('_test_columnar_sensor_', self.api.id,
+                             self.location.id, '_test_columnar_sensor_')
+        db.session.add(self.sensor)
+        db.session.commit()
+
+        start = datetime(2019, 1, 1)
+        values = [(self.sensor.id, '1.5'), ('_unknown_', '7'),
+                  (self.sensor.id, 'n/a'), (self.sensor.id, 3)]
+        # most recent first, as returned by the data store
+        self.readings = [Reading(s_id, value, start + timedelta(hours=hour))
+                         for hour, (s_id, value) in enumerate(values)][::-1]
+
+    def tearDown(self):
+        """ Delete the sensor, location and API, remove the app context """
+        for instance in (self.sensor, self.location, self.api):
+            db.session.delete(instance)
+            db.session.commit()
+        db.session.remove()
+        self.testing_client_context.pop()
+
+    def test_columnar_values(self):
+        """
+        Test that sensors are listed once and readings of unknown sensors are
+        left out, oldest reading first
+        """
+        columns = columnar_values(self.readings)
+
+        self.assertEqual(columns['Sensors'], [{
+            'Sensor_id': self.sensor.id, 'Name': self.sensor.name,
+            'Latitude': 51.5, 'Longitude': -0.12}])
+        self.assertEqual(columns['Sensor_index'].tolist(), [0, 0, 0])
+        self.assertEqual(columns['Timestamp'].tolist(),
+                         [1546300800000, 1546308000000, 1546311600000])
+        values = columns['Value'].tolist()
+        self.assertEqual(values[0], 1.5)
+        self.assertNotEqual(values[1], values[1])
+        self.assertEqual(values[2], 3.0)
+
+    def test_unknown_sensors(self):
+        """ Test that attributes without known sensors have no columns """
+        self.assertIsNone(columnar_values(self.readings[2:3]))
+
+    @unittest.skipUnless(arrow_available(), 'pyarrow is not installed')
+    def test_arrow_stream(self):
+        """ Test the arrow stream holds the readings and their attributes """
+        import json
+        import pyarrow as pa
+
+        attribute = {'Attribute_Name': 'NO2', 'Total_Records': 4}
+        attribute.update(columnar_values(self.readings))
+        response = arrow_response([attribute])
+
+        table = pa.RecordBatchStreamReader(
+            pa.BufferReader(response.get_data())).read_all()
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column('Value').null_count, 1)
+        attributes = json.loads(table.schema.metadata[b'attributes'])
+        self.assertEqual(attributes[0]['Sensors'][0]['Sensor_id'],
+                         self.sensor.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,11 @@
+import time
+
 import pytest
 from sqlalchemy import func
 
 from app import create_app
 from db import db
-from models.revoked_tokens import RevokedTokens
+from models.revoked_tokens import LOADED_KEY, RevokedTokens, revocation_cache
 from models.users import Users
 
 
@@ -156,3 +158,44 @@ def test_refresh_token(test_client, dummy_user):
 
     db.session.delete(dummy_user)
     db.session.commit()
+
+
+def test_purge_expired_revocations(test_client):
+    """
+    Tests whether the revocations of expired tokens are purged from the revoked tokens table while the revocations
+    of unexpired tokens are kept and still reported as revoked
+    :param test_client: Flask test client
+    :type test_client: FlaskClient
+    """
+    expired = RevokedTokens(jti="expired-jti", expires=time.time() - 60)
+    expired.add()
+    active = RevokedTokens(jti="active-jti", expires=time.time() + 3600)
+    active.add()
+
+    assert RevokedTokens.purge_expired() >= 1
+    assert RevokedTokens.query.filter_by(jti="expired-jti").first() is None
+    assert RevokedTokens.query.filter_by(jti="active-jti").first() is not None
+    assert RevokedTokens.is_jti_blacklisted("active-jti")
+
+    db.session.delete(active)
+    db.session.commit()
+
+
+def test_revocations_survive_cache_loss(test_client):
+    """
+    Tests whether a revoked token missing from Redis, after the cache was flushed, is still reported as revoked from
+    the revoked tokens table and whether the cache is rebuilt
+    :param test_client: Flask test client
+    :type test_client: FlaskClient
+    """
+    revoked = RevokedTokens(jti="flushed-jti", expires=time.time() + 3600)
+    revoked.add()
+    revocation_cache.client.delete(revocation_cache.key("flushed-jti"), LOADED_KEY)
+
+    assert revocation_cache.contains("flushed-jti") is None
+    assert RevokedTokens.is_jti_blacklisted("flushed-jti")
+    assert revocation_cache.contains("flushed-jti") is True
+    assert revocation_cache.contains("unknown-jti") is False
+
+    db.session.delete(revoked)
+    db.session.commit()
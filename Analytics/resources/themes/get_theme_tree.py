@@ -6,8 +6,10 @@ from flask_restful import reqparse
 from db import db
 from models.attribute_alias import AttrAlias
 from models.attributes import Attributes
+from models.data_version import THEMES
 from models.theme import Theme, SubTheme
 from models.users import Users
+from resources.conditional import conditional
 
 
 class GetThemeTree(Resource):
@@ -26,6 +28,7 @@ class GetThemeTree(Resource):
         self.error_response = {}
         self.response = []
 
+    @conditional(lambda: [THEMES])
     def get(self) -> (dict, HTTPStatus):
         """
         Fetch Theme Tree
@@ -201,6 +201,31 @@ class TestGetThemeTree(TestCase):
             for attr in sub["attributes"]:
                 self.assertTrue("alias" in attr)
 
+    def test_conditional_get(self) -> None:
+        """
+        Test the Theme Tree is answered with 304 (Not Modified) until a Theme changes
+        """
+        resp = self.client.get('/admin/themes/get_tree', data=dict(user_id=self.user.id, theme_id=self.theme.id),
+                               headers=self.auth_header)
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        etag = resp.headers['ETag']
+        self.assertIn('Last-Modified', resp.headers)
+
+        headers = dict(self.auth_header, **{'If-None-Match': etag})
+        resp = self.client.get('/admin/themes/get_tree', data=dict(user_id=self.user.id, theme_id=self.theme.id),
+                               headers=headers)
+        self.assertEqual(resp.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(resp.headers['ETag'], etag)
+        self.assertEqual(resp.get_data(), b'')
+
+        self.theme.name = "_test_theme_renamed_"
+        self.theme.save()
+        self.theme.commit()
+        resp = self.client.get('/admin/themes/get_tree', data=dict(user_id=self.user.id, theme_id=self.theme.id),
+                               headers=headers)
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        self.assertNotEqual(resp.headers['ETag'], etag)
+
     def tearDown(self) -> None:
         """ Clean up all dependencies after tests"""
 
@@ -12,6 +12,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import unittest
 from resources.test_analytics_health import AnalyticsHealthCheck
+from test_import_time import ImportTimeTestCase
 
 if __name__ == '__main__':
     unittest.main()
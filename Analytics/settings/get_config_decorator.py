@@ -98,6 +98,22 @@ class GetConfig(object):
                 config_path = os.path.join(working_dir, 'config.env.yml')
             return Configurations.get_configurations(config_path)
 
+    @staticmethod
+    def setting(category: str, name: str, default: Any) -> Any:
+        """
+        Get a single setting, falling back to a default when the category or
+        the setting is missing from the configurations file
+        :param category: Configurations Category
+        :param name: Setting name
+        :param default: Value used when the setting is missing or null
+        :return: The configured value or default
+        """
+        try:
+            value = GetConfig.configure(category, name)
+        except (KeyError, TypeError):
+            return default
+        return default if value is None else value
+
     @staticmethod
     def save_config(config: {str: Any},
                     config_path: Union[str, None] = None) -> None:
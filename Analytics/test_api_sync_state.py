@@ -0,0 +1,73 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app
+from db import db
+from models.api import API
+from models.api_sync_state import APISyncState
+
+
+class APISyncStateTestCase(unittest.TestCase):
+    """
+    Test the watermarks and validators kept between imports of an API
+    """
+
+    def setUp(self):
+        """ Create testing client version of flask app and an API entry """
+
+        self.test_app = create_app(DATABASE_NAME='test_analysis',
+                                   TESTING=True)
+        self.testing_client_context = self.test_app.app_context()
+        self.testing_client_context.push()
+
+        self.api = API(name='sync_state_test_api',
+                       url='http://sync-state.test', api_key='',
+                       api_class='importers.test.SyncStateTest',
+                       refresh_time=300, token_expiry=None)
+        self.api = self.api.save()
+        db.session.commit()
+
+    def tearDown(self):
+        """ Remove the API entry and the testing client context """
+
+        APISyncState.query.filter_by(api_id=self.api.id).delete()
+        db.session.delete(self.api)
+        db.session.commit()
+        self.testing_client_context.pop()
+
+    def test_first_import_has_no_validators(self):
+        """
+        Test that the first import of an API is not conditional
+        """
+        state = APISyncState.get_or_create(self.api.id)
+        self.assertEqual(state.conditional_headers(), {})
+        self.assertIsNone(state.sensor_mark('attr_no2', 'sensor-1'))
+
+    def test_advance_keeps_latest_marks(self):
+        """
+        Test that the validators are sent back and that watermarks only move
+        forward
+        """
+        now = datetime.utcnow().replace(microsecond=0)
+        state = APISyncState.get_or_create(self.api.id)
+        state.advance({('attr_no2', 'sensor-1'): now,
+                       ('attr_no2', 'sensor-2'): now - timedelta(hours=1),
+                       ('attr_pm10', 'sensor-1'): now - timedelta(hours=3)},
+                      '"abc"', 'Mon, 01 Jul 2019 10:00:00 GMT')
+        state.advance({('attr_no2', 'sensor-1'): now - timedelta(hours=2)},
+                      '"def"', None, payload_hash='0' * 64)
+
+        state = APISyncState.find_by_api_id(self.api.id)
+        self.assertEqual(state.conditional_headers(),
+                         {'If-None-Match': '"def"'})
+        self.assertEqual(state.sensor_mark('attr_no2', 'sensor-1'), now)
+        self.assertEqual(state.sensor_mark('attr_no2', 'sensor-2'),
+                         now - timedelta(hours=1))
+        self.assertEqual(state.sensor_mark('attr_pm10', 'sensor-1'),
+                         now - timedelta(hours=3))
+        self.assertEqual(state.high_water_mark, now)
+        self.assertEqual(state.payload_hash, '0' * 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app
+from db import db
+from models.attribute_data import PerTableStore, TableRegistry
+
+
+class TableRegistryTestCase(unittest.TestCase):
+    """
+    Test the attribute data table registry and the per table store built
+    on top of it
+    """
+
+    TABLES = ['test_registry_a', 'test_registry_b', 'test_registry_c']
+
+    def setUp(self):
+        """ Create testing app and attribute data tables """
+        self.test_app = create_app(DATABASE_NAME='test_analysis',
+                                   TESTING=True)
+        self.testing_client_context = self.test_app.app_context()
+        self.testing_client_context.push()
+
+        self.registry = TableRegistry(max_size=2)
+        self.store = PerTableStore(self.registry)
+        self.store.create_tables(self.TABLES)
+
+    def tearDown(self):
+        """ Drop attribute data tables and remove testing app context """
+        for table_name in self.TABLES:
+            self.store.drop_table(table_name)
+        db.session.remove()
+        self.testing_client_context.pop()
+
+    def test_table_is_reflected_once(self):
+        """ Repeated look ups return the cached Table """
+        table = self.registry.get(self.TABLES[0])
+        self.assertIs(table, self.registry.get(self.TABLES[0].upper()))
+        self.assertEqual(set(table.c.keys()),
+                         {'s_id', 'value', 'api_timestamp', 'timestamp'})
+
+    def test_least_recently_used_table_is_evicted(self):
+        """ The registry holds at most max_size tables """
+        self.registry.get(self.TABLES[0])
+        self.registry.get(self.TABLES[1])
+        self.registry.get(self.TABLES[0])
+        self.registry.get(self.TABLES[2])
+
+        self.assertEqual(len(self.registry), 2)
+        self.assertIn(self.TABLES[0], self.registry)
+        self.assertNotIn(self.TABLES[1], self.registry)
+        self.assertNotIn(self.TABLES[1], self.registry.metadata.tables)
+
+    def test_registry_does_not_touch_global_metadata(self):
+        """ Reflected tables are kept out of db.metadata """
+        before = set(db.metadata.tables)
+        self.registry.get(self.TABLES[0])
+        self.assertEqual(before, set(db.metadata.tables))
+
+    def test_insert_skips_existing_readings(self):
+        """ Inserting the same reading twice stores it once """
+        row = {'s_id': 'sensor', 'value': 1.5,
+               'api_timestamp': datetime(2019, 1, 1),
+               'timestamp': datetime.utcnow()}
+        self.store.insert(self.TABLES[0], [row])
+        self.store.insert(self.TABLES[0], [row, dict(row, value=2)])
+
+        self.assertEqual(self.store.count(self.TABLES[0]), 2)
+        self.assertEqual(self.store.maximum(self.TABLES[0]).value, '2')
+
+    def test_insert_skips_readings_without_value(self):
+        """ Readings without a value are dropped, not the whole batch """
+        row = {'s_id': 'sensor', 'value': 1.5,
+               'api_timestamp': datetime(2019, 1, 1),
+               'timestamp': datetime.utcnow()}
+        self.store.insert(self.TABLES[0], [row, dict(row, value=None)])
+
+        self.assertEqual(self.store.count(self.TABLES[0]), 1)
+
+    def test_recent_window_keeps_latest_readings_per_sensor(self):
+        """ Each sensor's window holds its most recent readings in order """
+        start = datetime(2019, 1, 1)
+        rows = [{'s_id': s_id, 'value': hour,
+                 'api_timestamp': start + timedelta(hours=hour),
+                 'timestamp': datetime.utcnow()}
+                for s_id in ('sensor_a', 'sensor_b') for hour in range(10)]
+        rows.append(dict(rows[0], s_id='sensor_c', value='n/a'))
+        self.store.insert(self.TABLES[0], rows)
+
+        window = self.store.recent_window(self.TABLES[0],
+                                          ['sensor_a', 'sensor_c'], 3)
+
+        self.assertEqual(set(window), {'sensor_a', 'sensor_c'})
+        timestamps, values = window['sensor_a']
+        self.assertEqual(list(values), [7.0, 8.0, 9.0])
+        self.assertTrue((timestamps[1:] > timestamps[:-1]).all())
+        self.assertTrue(all(v != v for v in window['sensor_c'][1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
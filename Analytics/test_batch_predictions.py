@@ -0,0 +1,76 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app import create_app
+from db import db
+from models.attribute_data import PerTableStore
+from models.users import Users
+from resources.batch_predictions import forecast_sensor
+
+
+class BatchPredictionsTestCase(unittest.TestCase):
+    """
+    Test the per sensor task of batch forecasts
+    """
+
+    TABLE = 'test_batch_predictions'
+
+    def setUp(self):
+        """ Create testing app, user and readings """
+        self.test_app = create_app(DATABASE_NAME='test_analysis',
+                                   TESTING=True)
+        self.testing_client = self.test_app.test_client()
+        self.testing_client_context = self.test_app.app_context()
+        self.testing_client_context.push()
+
+        self.dummy_user = Users("Batch", "batch@FCC.com",
+                                Users.generate_hash("1234".encode(
+                                    "utf8")).decode("utf8"), True, True)
+        self.dummy_user.save()
+        self.dummy_user.commit()
+
+        self.store = PerTableStore()
+        self.store.create_tables([self.TABLE])
+        start = datetime(2019, 1, 1)
+        hours = np.arange(24 * 7)
+        self.store.insert(self.TABLE, [
+            {'s_id': 'sensor', 'api_timestamp': start + timedelta(hours=h),
+             'value': str(round(20 + 5 * np.sin(2 * np.pi * h / 24), 3)),
+             'timestamp': datetime.utcnow()}
+            for h in hours if h % 10])
+
+    def tearDown(self):
+        """ Drop readings and user, remove testing app context """
+        self.store.drop_table(self.TABLE)
+        self.dummy_user.delete()
+        self.dummy_user.commit()
+        db.session.remove()
+        self.testing_client_context.pop()
+
+    def test_forecast_sensor(self):
+        """ The task reads the sensor's window and forecasts it """
+        result = forecast_sensor(self.TABLE, 'sensor', 1000, 12,
+                                 self.dummy_user.id, 'holt_winters')
+        self.assertEqual(result['status'], 'task complete', result)
+        self.assertEqual(len(result['result']['Predictions']), 12)
+
+    def test_forecast_sensor_without_enough_data(self):
+        """ Sensors with too few readings are reported as UNABLE """
+        result = forecast_sensor(self.TABLE, 'unknown', 1000, 12,
+                                 self.dummy_user.id)
+        self.assertEqual(result['result'], 'UNABLE')
+
+    def test_invalid_horizon_and_window_are_rejected(self):
+        """ Non positive horizons and too short windows return a 400 """
+        for query in ('n_predictions=0', 'n_predictions=-5', 'window=0',
+                      'window=50'):
+            response = self.testing_client.post(
+                '/batch_predictions?attributedata=NO2&user_id={}&{}'.format(
+                    self.dummy_user.id, query))
+            self.assertEqual(response.status_code, 400, query)
+
+
+if __name__ == '__main__':
+    unittest.main()
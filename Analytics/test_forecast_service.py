@@ -0,0 +1,112 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+
+from app import create_app
+from db import db
+from forecast.engines import HoltWinters
+from forecast.service import ForecastService
+from models.forecast_model import ForecastModel
+
+
+class ForecastServiceTestCase(unittest.TestCase):
+    """
+    Test the persisted models of the forecasting service
+    """
+
+    TABLE = 'test_forecast_service'
+
+    def setUp(self):
+        """ Create testing app, series and record the fits made """
+        self.test_app = create_app(DATABASE_NAME='test_analysis',
+                                   TESTING=True)
+        self.testing_client_context = self.test_app.app_context()
+        self.testing_client_context.push()
+
+        start = datetime(2019, 1, 1)
+        hours = np.arange(24 * 7)
+        self.timestamps = [start + timedelta(hours=int(h)) for h in hours]
+        self.values = list(20 + 5 * np.sin(2 * np.pi * hours / 24))
+
+        self.inits = []
+        fit = HoltWinters.fit
+
+        def recording_fit(engine, df, freq, init=None):
+            self.inits.append(init)
+            return fit(engine, df, freq, init)
+
+        self.patch = mock.patch.object(HoltWinters, 'fit', recording_fit)
+        self.patch.start()
+
+    def tearDown(self):
+        """ Remove models and patches, pop app context """
+        self.patch.stop()
+        for model in ForecastModel.query.filter_by(
+                attribute_table=self.TABLE).all():
+            model.delete()
+        db.session.commit()
+        db.session.remove()
+        self.testing_client_context.pop()
+
+    def forecast(self, service: ForecastService, extra: int = 0) -> tuple:
+        """
+        Forecast the series
+        :param service: the forecasting service
+        :param extra: number of new hourly readings added to the series
+        :return: the forecast, MAPE, engine label and model version
+        """
+        timestamps = self.timestamps + [
+            self.timestamps[-1] + timedelta(hours=h + 1) for h in range(extra)]
+        values = self.values + [20.0] * extra
+        return service.forecast(self.TABLE, 'sensor', values, timestamps, 12,
+                                'holt_winters')
+
+    def stored(self) -> ForecastModel:
+        """ The stored model of the series """
+        return ForecastModel.query.filter_by(attribute_table=self.TABLE).one()
+
+    def test_unchanged_series_is_not_refitted(self):
+        """ The stored model answers a series it was fitted on """
+        service = ForecastService()
+        first = self.forecast(service)
+        fits = len(self.inits)
+        second = self.forecast(service)
+
+        self.assertEqual(len(self.inits), fits)
+        self.assertEqual(second[0], first[0])
+        self.assertEqual(second[1], first[1])
+        self.assertEqual(second[3], 1)
+
+    def test_new_data_refits_warm(self):
+        """ New data refits from the stored parameters and bumps the version """
+        service = ForecastService()
+        self.forecast(service)
+        params = self.stored().params
+        mape = self.stored().mape
+        self.inits.clear()
+
+        _, second_mape, _, version = self.forecast(service, extra=3)
+
+        self.assertEqual(self.inits, [params])
+        self.assertEqual(version, 2)
+        self.assertEqual(self.stored().version, 2)
+        self.assertEqual(second_mape, mape)
+
+    def test_holdout_is_fitted_cold(self):
+        """ A due holdout error is computed from a cold fit """
+        service = ForecastService(mape_refresh=timedelta(microseconds=1))
+        self.forecast(service)
+        self.assertEqual(self.inits, [None, None])
+        params = self.stored().params
+        self.inits.clear()
+
+        self.forecast(service, extra=3)
+
+        self.assertEqual(self.inits, [params, None])
+        self.assertIsNotNone(self.stored().mape)
+
+
+if __name__ == '__main__':
+    unittest.main()
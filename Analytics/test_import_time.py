@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ANALYTICS_DIR = os.path.abspath(os.path.dirname(__file__))
+# Seconds allowed to import the application, override with
+# IMPORT_TIME_BUDGET on slow machines
+IMPORT_TIME_BUDGET = float(os.environ.get('IMPORT_TIME_BUDGET', 3.0))
+# Dependencies only needed by a few endpoints or tasks, imported on first use
+LAZY_MODULES = ('fbprophet', 'pystan', 'sendgrid', 'shapely', 'simplekml',
+                'geojson', 'pyarrow', 'resources.request_grouped',
+                'forecast.service')
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    """
+    Run code in a fresh interpreter from the Analytics directory
+    :param code: Python code to run
+    :param options: Interpreter options
+    :return: The completed process
+    """
+    return subprocess.run([sys.executable, *options, '-c', code],
+                          cwd=ANALYTICS_DIR, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True,
+                          timeout=120)
+
+
+def import_times(stderr: str) -> [(float, str)]:
+    """
+    Parse the output of python -X importtime
+    :param stderr: Standard error of the interpreter
+    :return: Cumulative seconds and indented name of every module imported
+    """
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            # nested imports are indented below the module importing them
+            times.append((int(cumulative) / 1e6, name[1:].rstrip()))
+    return times
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    """
+    Test the application starts quickly and without side effects
+    """
+
+    def test_import_within_budget(self):
+        """
+        Test that importing the application and building it stays within
+        the import time budget. The time is measured by the interpreter
+        itself, -X importtime only breaks it down on Python 3.7 and later
+        """
+        process = run_python('import time\n'
+                             'start = time.perf_counter()\n'
+                             'from app import create_app\n'
+                             'create_app()\n'
+                             'print(time.perf_counter() - start)',
+                             '-X', 'importtime')
+        self.assertEqual(process.returncode, 0, process.stderr[-2000:])
+
+        total = float(process.stdout.splitlines()[-1])
+        slowest = sorted(import_times(process.stderr), reverse=True)[:15]
+        self.assertLess(total, IMPORT_TIME_BUDGET,
+                        'Importing the application took {:.2f}s, slowest '
+                        'imports:\n{}'.format(total, '\n'.join(
+                            '{:8.3f}s {}'.format(seconds, name.strip())
+                            for seconds, name in slowest) or
+                            'run on Python 3.7 or later for a breakdown'))
+
+    def test_heavy_dependencies_are_lazy(self):
+        """
+        Test that optional heavy dependencies are not imported with the
+        application
+        """
+        process = run_python(
+            'import json, sys\n'
+            'from app import create_app\n'
+            'create_app()\n'
+            'print(json.dumps([m for m in {} if m in sys.modules]))'.format(
+                LAZY_MODULES))
+        self.assertEqual(process.returncode, 0, process.stderr[-2000:])
+        self.assertEqual(json.loads(process.stdout.splitlines()[-1]), [])
+
+    def test_importers_do_not_create_app(self):
+        """
+        Test that importing the importer decorators does not build an
+        application
+        """
+        process = run_python(
+            'from importers.attr_range_decorator import '
+            'update_attribute_ranges\n'
+            'from db import db\n'
+            'print(getattr(db, "app", None) is None)')
+        self.assertEqual(process.returncode, 0, process.stderr[-2000:])
+        self.assertEqual(process.stdout.splitlines()[-1], 'True')
+
+
+if __name__ == '__main__':
+    unittest.main()
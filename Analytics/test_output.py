@@ -0,0 +1,83 @@
+import gzip
+import json
+import unittest
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+from flask_restful import Api, Resource
+
+import output
+from output import RawJSON, dumps, frame_records, init_output
+
+
+class Readings(Resource):
+    """ Resource returning readings held in a DataFrame """
+
+    def get(self):
+        df = pd.DataFrame({
+            'Timestamp': pd.date_range('2019-01-01', periods=500, freq='H'),
+            'Value': np.arange(500, dtype=float)})
+        return {'data': frame_records(df), 'count': np.int64(500)}, 200
+
+
+class OutputTestCase(unittest.TestCase):
+    """
+    Test the JSON representation and the compression of responses
+    """
+
+    def setUp(self):
+        """ Build an application with the output layer """
+        self.app = Flask(__name__)
+        api = Api(self.app)
+        api.add_resource(Readings, '/readings')
+        init_output(self.app, api)
+        self.client = self.app.test_client()
+
+    def test_dumps(self):
+        """
+        Test that numpy values and RawJSON are serialised like their python
+        equivalents, with orjson and with the standard library
+        """
+        data = {'value': np.float64(1.5), 'values': np.arange(3),
+                'raw': RawJSON('[{"a":1}]')}
+        expected = {'value': 1.5, 'values': [0, 1, 2], 'raw': [{'a': 1}]}
+        self.assertEqual(json.loads(dumps(data)), expected)
+
+        encoder, output.orjson = output.orjson, None
+        try:
+            self.assertEqual(json.loads(dumps(data)), expected)
+        finally:
+            output.orjson = encoder
+
+    def test_frame_records(self):
+        """
+        Test that DataFrame records keep the format of to_json, with
+        timestamps in milliseconds
+        """
+        df = pd.DataFrame({'Timestamp': pd.to_datetime(['2019-01-01']),
+                           'Value': [1.0]})
+        self.assertEqual(json.loads(dumps(frame_records(df))),
+                         [{'Timestamp': 1546300800000, 'Value': 1.0}])
+
+    def test_compression(self):
+        """
+        Test that large responses are compressed only for clients accepting
+        gzip
+        """
+        response = self.client.get('/readings')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(json.loads(response.data.decode())['count'], 500)
+
+        response = self.client.get('/readings',
+                                   headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        data = json.loads(gzip.decompress(response.data).decode())
+        self.assertEqual(len(data['data']), 500)
+        self.assertEqual(data['data'][0]['Timestamp'], 1546300800000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app
+from db import db
+from forecast.precompute import DEFAULT_FIT_SECONDS, plan, popular_forecasts
+from models.attribute_data import PerTableStore
+from models.prediction_results import PredictionResults
+from models.user_predictions import UserPredictions
+from models.users import Users
+
+
+class PrecomputeTestCase(unittest.TestCase):
+    """
+    Test the ranking and planning of forecast precomputation
+    """
+
+    TABLE = 'test_precompute'
+
+    def setUp(self):
+        """ Create testing app, users, readings and prediction results """
+        self.test_app = create_app(DATABASE_NAME='test_analysis',
+                                   TESTING=True)
+        self.testing_client_context = self.test_app.app_context()
+        self.testing_client_context.push()
+
+        self.users = []
+        for name in ('Ada', 'Grace'):
+            user = Users(name, "{}@FCC.com".format(name),
+                         Users.generate_hash("1234".encode(
+                             "utf8")).decode("utf8"), True, True)
+            user.save()
+            user.commit()
+            self.users.append(user)
+
+        self.store = PerTableStore()
+        self.store.create_tables([self.TABLE])
+        self.store.insert(self.TABLE, [
+            {'s_id': 'sensor_a', 'api_timestamp': datetime(2019, 1, 1),
+             'value': '1', 'timestamp': datetime.now()}])
+
+        self.now = datetime.now()
+        self.lookback = self.now - timedelta(days=7)
+        self.popular = self.add_result('sensor_a', self.users)
+        self.unpopular = self.add_result('sensor_b', self.users[:1])
+
+    def tearDown(self):
+        """ Remove results, users and readings, remove testing app context """
+        for result in PredictionResults.query.filter_by(
+                attribute_table=self.TABLE).all():
+            for entry in UserPredictions.find_by_pred_id(result.id):
+                entry.delete()
+            result.delete()
+        for user in self.users:
+            user.delete()
+        db.session.commit()
+        self.store.drop_table(self.TABLE)
+        db.session.remove()
+        self.testing_client_context.pop()
+
+    def add_result(self, sensor_id: str, users: [Users],
+                   created: datetime = datetime(2019, 1, 1)) -> db.Model:
+        """
+        Store a prediction result requested by users
+        :param sensor_id: sensor of the series
+        :param users: users that have requested the result
+        :param created: time stamp of when the result was created
+        :return: the prediction result
+        """
+        result = PredictionResults('HoltWinters', 1.0, self.TABLE, sensor_id,
+                                   12, [], created, created)
+        result.save()
+        result.commit()
+        for user in users:
+            UserPredictions.add_entry(user.id, result.id)
+        return result
+
+    def test_forecasts_are_ranked_by_users(self):
+        """ The forecast requested by the most users comes first """
+        ranked = popular_forecasts([self.TABLE], self.lookback)
+        self.assertEqual([(r['sensor_id'], r['users']) for r in ranked],
+                         [('sensor_a', 2), ('sensor_b', 1)])
+        self.assertEqual(ranked[0]['engine'], 'HoltWinters')
+        self.assertEqual(ranked[0]['n_pred'], 12)
+
+    def test_refreshed_forecast_drops_out_after_lookback(self):
+        """
+        A forecast nobody requested during the lookback period is no longer
+        ranked, even though a refresh has just written a new result
+        """
+        entry = UserPredictions.get_entry(self.users[0].id,
+                                          self.unpopular.id)
+        entry.timestamp = self.now - timedelta(days=30)
+        entry.save()
+        entry.commit()
+
+        refreshed = self.add_result('sensor_b', [], self.now)
+        refreshed.supersede()
+
+        self.assertEqual(UserPredictions.find_by_pred_id(refreshed.id)[0]
+                         .timestamp, self.now - timedelta(days=30))
+        ranked = popular_forecasts([self.TABLE], self.lookback)
+        self.assertEqual([r['sensor_id'] for r in ranked], ['sensor_a'])
+
+    def test_request_keeps_forecast_ranked(self):
+        """ Requesting a forecast again moves it into the lookback period """
+        entry = UserPredictions.get_entry(self.users[0].id,
+                                          self.unpopular.id)
+        entry.timestamp = self.now - timedelta(days=30)
+        entry.save()
+        entry.commit()
+
+        UserPredictions.add_entry(self.users[0].id, self.unpopular.id)
+
+        ranked = popular_forecasts([self.TABLE], self.lookback)
+        self.assertEqual([r['sensor_id'] for r in ranked],
+                         ['sensor_a', 'sensor_b'])
+
+    def test_plan_stops_at_budget(self):
+        """ Forecasts are planned most popular first within the budget """
+        ranked = popular_forecasts([self.TABLE], self.lookback)
+
+        planned = plan(ranked, DEFAULT_FIT_SECONDS * 1.5, 10)
+        self.assertEqual([p['sensor_id'] for p in planned], ['sensor_a'])
+        self.assertEqual(planned[0]['engine'], 'holt_winters')
+
+        planned = plan(ranked, DEFAULT_FIT_SECONDS * 3, 1)
+        self.assertEqual([p['sensor_id'] for p in planned], ['sensor_a'])
+
+        planned = plan(ranked, DEFAULT_FIT_SECONDS * 3, 10)
+        self.assertEqual([p['sensor_id'] for p in planned],
+                         ['sensor_a', 'sensor_b'])
+
+    def test_plan_skips_fresh_forecasts(self):
+        """ Forecasts created after the last import are not refreshed """
+        self.add_result('sensor_a', [], self.now + timedelta(minutes=1))
+
+        planned = plan(popular_forecasts([self.TABLE], self.lookback),
+                       DEFAULT_FIT_SECONDS * 3, 10)
+        self.assertEqual([p['sensor_id'] for p in planned], ['sensor_b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app import create_app
+from db import db
+from forecast.engines import AUTO
+from models.attribute_data import PerTableStore
+from models.forecast_model import ForecastModel
+from models.prediction_results import PredictionResults
+from models.user_predictions import UserPredictions
+from models.users import Users
+
+
+class PredictionResultsTestCase(unittest.TestCase):
+    """
+    Test serving prediction horizons from the stored result of a series
+    """
+
+    TABLE = 'test_prediction_results'
+
+    def setUp(self):
+        """ Create testing app, user, readings and series """
+        self.test_app = create_app(DATABASE_NAME='test_analysis',
+                                   TESTING=True)
+        self.testing_client_context = self.test_app.app_context()
+        self.testing_client_context.push()
+
+        self.dummy_user = Users("Horizon", "horizon@FCC.com",
+                                Users.generate_hash("1234".encode(
+                                    "utf8")).decode("utf8"), True, True)
+        self.dummy_user.save()
+        self.dummy_user.commit()
+
+        self.store = PerTableStore()
+        self.store.create_tables([self.TABLE])
+        self.store.insert(self.TABLE, [
+            {'s_id': 'sensor', 'api_timestamp': datetime(2019, 1, 1),
+             'value': '1', 'timestamp': datetime.now() - timedelta(days=1)}])
+
+        start = datetime(2019, 1, 1)
+        hours = np.arange(24 * 7)
+        self.timestamps = [start + timedelta(hours=int(h)) for h in hours]
+        self.values = list(20 + 5 * np.sin(2 * np.pi * hours / 24))
+
+    def tearDown(self):
+        """ Remove results, models, user and readings, pop app context """
+        for result in PredictionResults.query.filter_by(
+                attribute_table=self.TABLE).all():
+            for entry in UserPredictions.find_by_pred_id(result.id):
+                entry.delete()
+            result.delete()
+        for model in ForecastModel.query.filter_by(
+                attribute_table=self.TABLE).all():
+            model.delete()
+        self.dummy_user.delete()
+        db.session.commit()
+        self.store.drop_table(self.TABLE)
+        db.session.remove()
+        self.testing_client_context.pop()
+
+    def serve(self, num_pred: int, values: list = None,
+              timestamps: list = None) -> dict:
+        """
+        Request predictions of the series for the dummy user
+        :param num_pred: number of predictions requested
+        :param values: values of the series, the setUp series when None
+        :param timestamps: timestamps of the series, the setUp series when
+        None
+        :return: the predictions served
+        """
+        return PredictionResults.serve(
+            self.dummy_user.id, self.TABLE, 'sensor', num_pred,
+            values or self.values, timestamps or self.timestamps,
+            'holt_winters')
+
+    def stored_results(self) -> [PredictionResults]:
+        """ The stored results of the series """
+        return PredictionResults.query.filter_by(
+            attribute_table=self.TABLE).all()
+
+    def test_shorter_horizon_is_sliced(self):
+        """ A shorter horizon is served from the stored result """
+        longer = self.serve(24)
+        shorter = self.serve(12)
+
+        self.assertEqual(shorter['Prediction_id'], longer['Prediction_id'])
+        self.assertEqual(shorter['Predictions'], longer['Predictions'][:12])
+        self.assertEqual(len(self.stored_results()), 1)
+
+    def test_longer_horizon_extends_result(self):
+        """ A longer horizon replaces the stored result in place """
+        shorter = self.serve(12)
+        longer = self.serve(48)
+
+        self.assertEqual(longer['Prediction_id'], shorter['Prediction_id'])
+        self.assertEqual(len(longer['Predictions']), 48)
+        stored = self.stored_results()
+        self.assertEqual(len(stored), 1)
+        self.assertEqual(stored[0].num_predictions, 48)
+
+    def test_stale_result_is_replaced(self):
+        """
+        Once newer data has been imported the user's stale result and link
+        are dropped and the longest horizon is generated again
+        """
+        stale = self.serve(24)
+        self.store.insert(self.TABLE, [
+            {'s_id': 'sensor', 'api_timestamp': datetime(2019, 1, 8),
+             'value': '2', 'timestamp': datetime.now()}])
+
+        fresh = self.serve(12, self.values + [21.0], self.timestamps +
+                           [self.timestamps[-1] + timedelta(hours=1)])
+
+        self.assertNotEqual(fresh['Prediction_id'], stale['Prediction_id'])
+        self.assertIsNone(PredictionResults.find_by_id(
+            stale['Prediction_id']))
+        self.assertEqual(len(fresh['Predictions']), 12)
+        self.assertEqual(PredictionResults.find_by_id(
+            fresh['Prediction_id']).num_predictions, 24)
+        self.assertEqual([entry.pred_result_id for entry in
+                          UserPredictions.find_by_user_id(
+                              self.dummy_user.id)],
+                         [fresh['Prediction_id']])
+
+    def test_auto_without_selected_model_is_not_served(self):
+        """ Auto mode does not reuse results before a model is selected """
+        self.serve(12)
+        self.assertIsNotNone(PredictionResults.find_by_prediction_args(
+            self.TABLE, 'sensor', 'holt_winters'))
+        self.assertIsNone(PredictionResults.find_by_prediction_args(
+            self.TABLE, 'sensor', AUTO))
+
+
+if __name__ == '__main__':
+    unittest.main()
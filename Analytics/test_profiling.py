@@ -0,0 +1,56 @@
+import unittest
+
+from app import create_app
+from profiling import RequestProfile
+
+
+class RequestProfilingTestCase(unittest.TestCase):
+    """
+    Test the request latency and SQL profiling middleware
+    """
+
+    def setUp(self):
+        """ Create testing client version of flask app with profiling """
+
+        self.test_app = create_app(DATABASE_NAME='test_analysis',
+                                   TESTING=True, PROFILING=True)
+        self.testing_client = self.test_app.test_client()
+        self.testing_client_context = self.test_app.app_context()
+        self.testing_client_context.push()
+        self.profiler = self.test_app.extensions['request_profiler']
+
+    def tearDown(self):
+        """ Remove the testing client context """
+
+        self.testing_client_context.pop()
+
+    def test_latency_exposed_per_endpoint(self):
+        """
+        Test that the latency of a request is exposed at /metrics
+        """
+        self.testing_client.get('/')
+        response = self.testing_client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        text = response.get_data(as_text=True)
+        self.assertIn('http_request_duration_seconds_count{', text)
+        self.assertIn('http_response_size_bytes_total{', text)
+
+    def test_slow_request_kept(self):
+        """
+        Test that only the slowest sampled requests are kept
+        """
+        self.profiler.slowest = []
+        with self.test_app.test_request_context('/slow'):
+            for latency in range(self.profiler.slow_log_size + 5):
+                self.profiler.log_slow_request(
+                    ('slow', 'GET'), float(latency), 200, RequestProfile(1))
+
+        slowest = self.profiler.slow_requests()
+        self.assertEqual(len(slowest), self.profiler.slow_log_size)
+        self.assertEqual(slowest[0]['seconds'],
+                         self.profiler.slow_log_size + 4)
+
+
+if __name__ == '__main__':
+    unittest.main()